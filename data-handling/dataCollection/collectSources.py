@@ -0,0 +1,468 @@
+#!/usr/bin/env python3
+"""
+Incremental Source Collectors for WWIZ Knowledge Base
+
+Pulls records from the corporate source systems (Employment Hero, Entra ID,
+Google Cloud Identity, Jira, Confluence, calendars, Teams and Slack) and
+writes them in the layout the importer expects:
+
+    data/<source>/<PREFIX>NNN.json     (person records, e.g. EHS001.json)
+    data/<source>/<projectKey>.json    (jira-projectSummary)
+    data/<source>/<spaceKey>.json      (confluence-spacesSummary)
+
+Features:
+- All sources are fetched concurrently, each with its own pooled HTTP session
+- Per-source rate limiting (token bucket) and retry with back-off on 429/5xx
+- Keyset paging on (lastUpdated, id), so records changing mid-run are never skipped
+- Per-source (lastUpdated, id) watermark so only changed records are fetched
+- Unchanged records are not rewritten, so file mtimes only move on real changes
+
+Every source is read through the same paged contract:
+    GET <url>?updatedSince=<ISO time>&afterId=<id>&cursor=<cursor>&limit=<n>
+    -> {"records": [...], "nextCursor": "<cursor>" | null}
+Records come back ordered by (lastUpdated, id), strictly after
+(updatedSince, afterId); the cursor is opaque and carries the same keyset.
+Single records are fetched with ?ids=<id>,<id> (webhookReceiver.py).
+mockSourceApi.py serves this contract locally, seeded from sample-data/.
+
+Usage:
+    python data-handling/dataCollection/collectSources.py                 # all sources, incremental
+    python data-handling/dataCollection/collectSources.py jira-userStats  # selected sources
+    python data-handling/dataCollection/collectSources.py --full          # ignore watermarks
+"""
+
+import json
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Source registry: output naming, default rate limit (requests/sec) and connection pool size
+SOURCES: Dict[str, Dict] = {
+    "employmentHero-staff": {"prefix": "EHS", "rateLimit": 5, "poolSize": 2},
+    "entraAd-user": {"prefix": "EAD", "rateLimit": 10, "poolSize": 4},
+    "googleCloudIdentity-user": {"prefix": "GCI", "rateLimit": 10, "poolSize": 4},
+    "jira-userStats": {"prefix": "JIR", "rateLimit": 5, "poolSize": 2},
+    "jira-projectSummary": {"keyField": "projectKey", "rateLimit": 5, "poolSize": 2},
+    "confluence-userStats": {"prefix": "CNF", "rateLimit": 5, "poolSize": 2},
+    "confluence-spacesSummary": {"keyField": "spaceKey", "rateLimit": 5, "poolSize": 2},
+    "calendar-availabilitySummary": {"prefix": "CAL", "rateLimit": 10, "poolSize": 4},
+    "teams-userActivitySummary": {"prefix": "TMS", "rateLimit": 10, "poolSize": 4},
+    "slack-userActivitySummary": {"prefix": "SLK", "rateLimit": 1, "poolSize": 1},
+}
+
+# Keyset position: (lastUpdated, record id) of the newest record seen
+Watermark = Tuple[str, str]
+
+# Default location, overridable with COLLECTOR_STATE_FILE
+DEFAULT_STATE_FILE = os.path.join("data-handling", "dataCollection", ".collectorState.json")
+
+# Record ids become file names - anything else (path separators, "..") is rejected
+SAFE_ID_PATTERN = re.compile(r"[A-Za-z0-9_-]+")
+
+# Retry settings for rate limited / failing requests
+MAX_RETRIES = 5
+BACKOFF_SECONDS = 1.0
+
+
+class TokenBucket:
+    """Thread-safe token bucket limiting requests per second for one source."""
+
+    def __init__(self, ratePerSecond: float, burst: Optional[int] = None):
+        self.rate = ratePerSecond
+        self.capacity = burst or max(1, int(ratePerSecond))
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Block until a request may be sent."""
+        if self.rate <= 0:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def envName(source: str) -> str:
+    """
+    Convert a source folder name into an env variable suffix.
+
+    Args:
+        source: Source folder name (e.g. "employmentHero-staff")
+
+    Returns:
+        Suffix (e.g. "EMPLOYMENTHERO_STAFF")
+    """
+    return source.upper().replace("-", "_")
+
+
+def sourceUrl(source: str, env: Dict[str, str]) -> str:
+    """
+    Work out the endpoint for a source.
+
+    SOURCE_URL_<NAME> wins, otherwise COLLECTOR_BASE_URL/<source>.
+
+    Args:
+        source: Source folder name
+        env: Environment variables
+
+    Returns:
+        Source endpoint URL
+    """
+    override = env.get(f"SOURCE_URL_{envName(source)}")
+    if override:
+        return override
+    return f"{env.get('COLLECTOR_BASE_URL', 'http://localhost:3100').rstrip('/')}/{source}"
+
+
+def createSession(source: str, env: Dict[str, str], poolSize: int) -> requests.Session:
+    """
+    Create a pooled HTTP session for one source.
+
+    Args:
+        source: Source folder name
+        env: Environment variables (SOURCE_TOKEN_<NAME> adds bearer auth)
+        poolSize: Maximum pooled connections for the source
+
+    Returns:
+        Configured requests session
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=poolSize)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+    token = env.get(f"SOURCE_TOKEN_{envName(source)}")
+    if token:
+        session.headers["Authorization"] = f"Bearer {token}"
+    return session
+
+
+def fetchPage(session: requests.Session, url: str, params: Dict, limiter: TokenBucket) -> Dict:
+    """
+    Fetch one page, retrying on rate limits and server errors.
+
+    Args:
+        session: Source session
+        url: Source endpoint
+        params: Query parameters (updatedSince, cursor, limit)
+        limiter: Source rate limiter
+
+    Returns:
+        Page JSON ({"records": [...], "nextCursor": ...})
+
+    Raises:
+        requests.RequestException: If the page still fails after all retries
+    """
+    for attempt in range(MAX_RETRIES):
+        limiter.acquire()
+        try:
+            response = session.get(url, params=params, timeout=30)
+        except requests.RequestException:
+            if attempt == MAX_RETRIES - 1:
+                raise
+            time.sleep(BACKOFF_SECONDS * 2 ** attempt)
+            continue
+
+        if response.status_code == 200:
+            return response.json()
+
+        if response.status_code == 429 or response.status_code >= 500:
+            retryAfter = response.headers.get("Retry-After")
+            time.sleep(float(retryAfter) if retryAfter else BACKOFF_SECONDS * 2 ** attempt)
+            continue
+
+        response.raise_for_status()
+
+    raise requests.RequestException(f"Giving up on {url} after {MAX_RETRIES} attempts")
+
+
+def recordFileName(source: str, record: Dict) -> Optional[str]:
+    """
+    Work out the file name for a record, matching generate_test_data.py.
+
+    Args:
+        source: Source folder name
+        record: Source record
+
+    Returns:
+        File name (e.g. "EHS001.json", "HORROR.json"), or None if the record has no usable id
+    """
+    config = SOURCES.get(source, {})
+
+    if config.get("keyField"):
+        key = record.get(config["keyField"])
+        return f"{key}.json" if isinstance(key, str) and SAFE_ID_PATTERN.fullmatch(key) else None
+
+    if record.get("fileId"):
+        fileId = record["fileId"]
+        return f"{fileId}.json" if isinstance(fileId, str) and SAFE_ID_PATTERN.fullmatch(fileId) else None
+
+    ehsId = str(record.get("ehsId") or "")
+    digits = "".join(ch for ch in ehsId if ch.isascii() and ch.isdigit())
+    return f"{config.get('prefix', 'FMP')}{digits}.json" if digits else None
+
+
+def recordIds(source: str, record: Dict) -> List[str]:
+    """
+    List the identifiers a record can be looked up by.
+
+    Args:
+        source: Source folder name
+        record: Source record
+
+    Returns:
+        Key field value for project/space sources, otherwise fileId and ehsId (whichever are set)
+    """
+    keyField = SOURCES.get(source, {}).get("keyField")
+    fields = [keyField] if keyField else ["fileId", "ehsId"]
+    return [str(record[field]) for field in fields if record.get(field)]
+
+
+def recordKey(source: str, record: Dict) -> Watermark:
+    """Keyset position of a record: (lastUpdated, first lookup id)."""
+    ids = recordIds(source, record)
+    return (record.get("lastUpdated") or "", ids[0] if ids else "")
+
+
+def stateWatermark(entry: Dict) -> Optional[Watermark]:
+    """Read a source's watermark from its collector state entry (None if never collected)."""
+    if not entry.get("lastUpdated"):
+        return None
+    return (entry["lastUpdated"], entry.get("lastId", ""))
+
+
+def writeRecord(dataPath: str, source: str, record: Dict) -> str:
+    """
+    Write a record atomically, skipping the write if nothing changed.
+
+    Args:
+        dataPath: Root data folder
+        source: Source folder name
+        record: Source record
+
+    Returns:
+        "written", "unchanged" or "skipped" (no usable id)
+    """
+    fileName = recordFileName(source, record)
+    if not fileName or source not in SOURCES:
+        return "skipped"
+
+    folder = os.path.join(dataPath, source)
+    fullPath = os.path.join(folder, fileName)
+    # Belt and braces on top of the id check - never write outside data/<source>/
+    if os.path.dirname(os.path.realpath(fullPath)) != os.path.realpath(folder):
+        print(f"[{source}] Refusing to write {fileName}: outside {folder}")
+        return "skipped"
+    os.makedirs(folder, exist_ok=True)
+    content = json.dumps(record, indent=2)
+
+    if os.path.exists(fullPath):
+        with open(fullPath, "r", encoding="utf-8") as f:
+            if f.read() == content:
+                return "unchanged"
+
+    tempPath = f"{fullPath}.tmp"
+    with open(tempPath, "w", encoding="utf-8") as f:
+        f.write(content)
+    os.replace(tempPath, fullPath)
+    return "written"
+
+
+def collectSource(source: str, env: Dict[str, str], watermark: Optional[Watermark], dataPath: str) -> Tuple[Dict, Optional[Watermark]]:
+    """
+    Page through one source and write every changed record.
+
+    Args:
+        source: Source folder name
+        env: Environment variables
+        watermark: (lastUpdated, id) watermark from the previous run (None for a full sync)
+        dataPath: Root data folder
+
+    Returns:
+        Tuple of (stats dictionary, new watermark)
+    """
+    config = SOURCES[source]
+    rateLimit = float(env.get(f"RATE_LIMIT_{envName(source)}", config["rateLimit"]))
+    limiter = TokenBucket(rateLimit)
+    session = createSession(source, env, int(config["poolSize"]))
+    url = sourceUrl(source, env)
+    pageSize = int(env.get("COLLECTOR_PAGE_SIZE", 100))
+
+    stats = {"source": source, "pages": 0, "records": 0, "written": 0, "unchanged": 0, "skipped": 0, "error": None}
+    newWatermark = watermark
+    cursor = None
+    started = time.monotonic()
+
+    try:
+        while True:
+            params = {"limit": pageSize}
+            if watermark:
+                params["updatedSince"], params["afterId"] = watermark
+            if cursor:
+                params["cursor"] = cursor
+
+            page = fetchPage(session, url, params, limiter)
+            stats["pages"] += 1
+
+            for record in page.get("records", []):
+                stats["records"] += 1
+                stats[writeRecord(dataPath, source, record)] += 1
+                key = recordKey(source, record)
+                # ISO-8601 UTC timestamps compare correctly as strings; the id breaks ties
+                if key[0] and (newWatermark is None or key > newWatermark):
+                    newWatermark = key
+
+            cursor = page.get("nextCursor")
+            if not cursor:
+                break
+
+    except (requests.RequestException, ValueError) as e:
+        stats["error"] = str(e)
+        # Keep the old watermark so the next run retries everything we missed
+        newWatermark = watermark
+
+    finally:
+        session.close()
+
+    stats["seconds"] = round(time.monotonic() - started, 3)
+    return stats, newWatermark
+
+
+def collectSources(sources: List[str], env: Dict[str, str], fullSync: bool = False) -> List[Dict]:
+    """
+    Collect several sources concurrently and update their watermarks.
+
+    Args:
+        sources: Source folder names to collect
+        env: Environment variables
+        fullSync: Ignore watermarks and fetch everything
+
+    Returns:
+        List of per-source stats dictionaries
+    """
+    statePath = env.get("COLLECTOR_STATE_FILE", DEFAULT_STATE_FILE)
+    state = loadState(statePath)
+    dataPath = env.get("DATA_PATH", "data")
+    maxSources = int(env.get("COLLECTOR_MAX_SOURCES", len(sources) or 1))
+
+    def runSource(source: str) -> Dict:
+        watermark = None if fullSync else stateWatermark(state.get(source, {}))
+        stats, newWatermark = collectSource(source, env, watermark, dataPath)
+        stats["watermark"] = newWatermark
+        return stats
+
+    with ThreadPoolExecutor(max_workers=max(1, min(maxSources, len(sources)))) as executor:
+        results = list(executor.map(runSource, sources))
+
+    for stats in results:
+        if stats["error"]:
+            continue
+        watermark = stats["watermark"] or (None, None)
+        state[stats["source"]] = {
+            "lastUpdated": watermark[0],
+            "lastId": watermark[1],
+            "lastRun": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "lastChanged": stats["written"],
+        }
+    saveState(state, statePath)
+
+    return results
+
+
+def loadState(statePath: str) -> Dict:
+    """Load per-source watermarks (empty if there is no state yet)."""
+    if not os.path.exists(statePath):
+        return {}
+    with open(statePath, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def saveState(state: Dict, statePath: str) -> None:
+    """Atomically save per-source watermarks."""
+    folder = os.path.dirname(statePath)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    tempPath = f"{statePath}.tmp"
+    with open(tempPath, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tempPath, statePath)
+
+
+def printSummary(results: List[Dict]) -> None:
+    """Print a per-source results table."""
+    print(f"\n{'Source':<30} {'Pages':>6} {'Records':>8} {'Written':>8} {'Same':>6} {'Secs':>7} {'Rec/s':>8}")
+    for stats in results:
+        rate = stats["records"] / stats["seconds"] if stats["seconds"] else 0
+        print(f"{stats['source']:<30} {stats['pages']:>6} {stats['records']:>8} {stats['written']:>8} {stats['unchanged']:>6} {stats['seconds']:>7.2f} {rate:>8.1f}")
+        if stats["error"]:
+            print(f"  Error: {stats['error']}")
+
+
+def loadEnv() -> Dict[str, str]:
+    """
+    Load environment variables from .collectSources.env file.
+
+    Returns:
+        Dictionary of environment variables
+    """
+    env = {}
+    envPath = os.path.join("data-handling", "dataCollection", ".collectSources.env")
+
+    if not os.path.exists(envPath):
+        print(f"Environment file not found: {envPath}")
+        sys.exit(1)
+
+    with open(envPath, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+
+            if not line or line.startswith("#"):
+                continue
+
+            if "=" in line:
+                key, value = line.split("=", 1)
+                env[key.strip()] = value.strip().strip('\'"')
+
+    return env
+
+
+def main() -> None:
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    fullSync = "--full" in sys.argv
+
+    unknown = [arg for arg in args if arg not in SOURCES]
+    if unknown:
+        print(f"Unknown source(s): {', '.join(unknown)}")
+        print(f"Available sources: {', '.join(SOURCES)}")
+        sys.exit(1)
+
+    env = loadEnv()
+    sources = args or list(SOURCES)
+    print(f"Collecting {len(sources)} sources ({'full' if fullSync else 'incremental'} sync)...")
+
+    started = time.monotonic()
+    results = collectSources(sources, env, fullSync)
+    printSummary(results)
+    print(f"\nCollection finished in {time.monotonic() - started:.2f}s")
+
+    if any(stats["error"] for stats in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+Mock Source APIs for Testing the WWIZ Collectors Offline
+
+Serves every source used by collectSources.py from one local HTTP server,
+using the paged contract the collectors expect:
+
+    GET /<source>?updatedSince=<ISO time>&afterId=<id>&cursor=<cursor>&limit=<n>
+    GET /<source>?ids=<id>,<id>     (only the named records - ehsId, fileId or project/space key)
+    -> {"records": [...], "nextCursor": "<cursor>" | null}
+
+Records are ordered by (lastUpdated, id) and paged by keyset: each page
+holds the records strictly after the cursor (or updatedSince/afterId), so a
+record touched mid-run moves behind the cursor instead of shifting pages.
+
+Records are seeded from the templates in sample-data/<source>/sample.json,
+with the identity fields (ehsId, names, emails, project/space keys)
+rewritten per record so every source describes the same set of people.
+Every record gets its own lastUpdated, and touched records always move to
+a newer timestamp than anything seen before.
+
+Options let the server behave like a real upstream for benchmarking:
+- --latency-ms adds a fixed delay to every response
+- --rate-limit returns 429 + Retry-After above N requests/sec per source
+- --churn-seconds touches a few records every N seconds so incremental runs have work to do
+- --webhook-url posts the ids of churned records to webhookReceiver.py, like a push-capable source
+
+Usage:
+    python data-handling/dataCollection/mockSourceApi.py
+    python data-handling/dataCollection/mockSourceApi.py --port 3100 --records 500 --latency-ms 20 --rate-limit 5 --churn-seconds 30
+"""
+
+import argparse
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Set
+from urllib.parse import parse_qs, urlparse
+
+import requests
+
+from collectSources import SOURCES, Watermark, recordIds, recordKey
+
+# Template folder, relative to the repo root
+SAMPLE_DATA_PATH = "sample-data"
+
+# Names used to build mock people
+FIRST_NAMES = ["Alex", "Sam", "Jordan", "Taylor", "Morgan", "Casey", "Riley", "Jamie", "Avery", "Quinn", "Harper", "Rowan"]
+LAST_NAMES = ["Nguyen", "Patel", "Garcia", "Kim", "Okafor", "Rossi", "Schmidt", "Tanaka", "Silva", "Murphy", "Cohen", "Singh"]
+
+# Fraction of each source touched per churn tick
+CHURN_FRACTION = 0.05
+
+
+# Seeded records are spread over the day before the server started
+SEED_WINDOW_SECONDS = 86400
+
+
+def isoTime(seconds: float) -> str:
+    """UTC time in the format used by lastUpdated."""
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(seconds))
+
+
+def parseCursor(cursor: str) -> Watermark:
+    """Split a "<lastUpdated>|<id>" cursor into its keyset position."""
+    lastUpdated, _, recordId = cursor.partition("|")
+    return (lastUpdated, recordId)
+
+
+def loadTemplate(source: str) -> str:
+    """
+    Load the sample template for a source as raw JSON text.
+
+    Args:
+        source: Source folder name
+
+    Returns:
+        Template JSON text
+    """
+    with open(os.path.join(SAMPLE_DATA_PATH, source, "sample.json"), "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def personRecord(template: str, index: int, source: str) -> Dict:
+    """
+    Build one person record by rewriting the identity fields of a template.
+
+    Args:
+        template: Template JSON text
+        index: 1-based person number
+        source: Source folder name
+
+    Returns:
+        Record dictionary
+    """
+    firstName = FIRST_NAMES[index % len(FIRST_NAMES)]
+    lastName = LAST_NAMES[(index // len(FIRST_NAMES)) % len(LAST_NAMES)]
+    login = f"{firstName.lower()}.{lastName.lower()}{index}"
+
+    text = (template
+            .replace("EHS001234", f"FMP{index:03d}")
+            .replace("John Smith", f"{firstName} {lastName}")
+            .replace("john.smith", login)
+            .replace('"John"', f'"{firstName}"')
+            .replace('"Smith"', f'"{lastName}"'))
+
+    record = json.loads(text)
+    record["fileId"] = f"{SOURCES[source]['prefix']}{index:03d}"
+    return record
+
+
+def keyedRecord(template: str, index: int, keyField: str) -> Dict:
+    """
+    Build one project/space record by rewriting the key of a template.
+
+    Args:
+        template: Template JSON text
+        index: 1-based record number
+        keyField: Key field name ("projectKey" or "spaceKey")
+
+    Returns:
+        Record dictionary
+    """
+    record = json.loads(template)
+    templateKey = record[keyField]
+    key = f"{templateKey}{index}"
+
+    # Child keys such as epic keys ("PLAT-100") follow the new key
+    record = json.loads(template.replace(f'"{templateKey}-', f'"{key}-'))
+    record[keyField] = key
+    return record
+
+
+def seedRecords(recordCount: int) -> Dict[str, List[Dict]]:
+    """
+    Build the mock data set for every source.
+
+    Args:
+        recordCount: Number of people (projects and spaces get a tenth of that)
+
+    Returns:
+        Dictionary mapping source names to record lists
+    """
+    data: Dict[str, List[Dict]] = {}
+    seedStart = time.time() - SEED_WINDOW_SECONDS
+
+    for source, config in SOURCES.items():
+        template = loadTemplate(source)
+        if config.get("keyField"):
+            count = max(1, recordCount // 10)
+            data[source] = [keyedRecord(template, i, config["keyField"]) for i in range(1, count + 1)]
+        else:
+            data[source] = [personRecord(template, i, source) for i in range(1, recordCount + 1)]
+
+        # Distinct timestamps, so an incremental run only sees what changed since the last one
+        step = SEED_WINDOW_SECONDS / (len(data[source]) + 1)
+        for i, record in enumerate(data[source]):
+            record["lastUpdated"] = isoTime(seedStart + i * step)
+
+    return data
+
+
+class MockState:
+    """Shared server state: records, per-source request windows and options."""
+
+    def __init__(self, records: Dict[str, List[Dict]], latencyMs: int, rateLimit: int):
+        self.records = records
+        self.latency = latencyMs / 1000
+        self.rateLimit = rateLimit
+        self.lock = threading.Lock()
+        self.windows: Dict[str, List[float]] = {}
+        self.lastTouched = int(time.time())
+
+    def allowRequest(self, source: str) -> bool:
+        """Sliding one-second window rate limit per source."""
+        if self.rateLimit <= 0:
+            return True
+        with self.lock:
+            now = time.monotonic()
+            window = [t for t in self.windows.get(source, []) if now - t < 1]
+            allowed = len(window) < self.rateLimit
+            if allowed:
+                window.append(now)
+            self.windows[source] = window
+            return allowed
+
+    def page(self, source: str, after: Watermark, limit: int, ids: Optional[Set[str]] = None) -> Dict:
+        """Return one page of records strictly after the keyset position (optionally only the given ids)."""
+        with self.lock:
+            matching = sorted(((recordKey(source, r), r) for r in self.records[source] if recordKey(source, r) > after), key=lambda item: item[0])
+            if ids:
+                matching = [(key, r) for key, r in matching if ids.intersection(recordIds(source, r))]
+            pageRecords = [json.loads(json.dumps(r)) for key, r in matching[:limit]]
+
+        lastKey = matching[limit - 1][0] if len(matching) > limit else None
+        return {"records": pageRecords, "nextCursor": "|".join(lastKey) if lastKey else None}
+
+    def churn(self) -> Dict[str, List[str]]:
+        """
+        Touch a random sample of records in every source.
+
+        Returns:
+            Source -> ids of the touched records
+        """
+        touched: Dict[str, List[str]] = {}
+        with self.lock:
+            # One second past anything already handed out, so a collector's watermark never hides a touch
+            self.lastTouched = max(int(time.time()), self.lastTouched + 1)
+            for source, records in self.records.items():
+                for record in random.sample(records, max(1, int(len(records) * CHURN_FRACTION))):
+                    record["lastUpdated"] = isoTime(self.lastTouched)
+                    touched.setdefault(source, []).append(recordIds(source, record)[0])
+        return touched
+
+
+def makeHandler(state: MockState):
+    """Create a request handler class bound to the shared state."""
+
+    class MockSourceHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            source = url.path.strip("/")
+
+            if source not in state.records:
+                self.sendJson(404, {"error": f"Unknown source: {source}"})
+                return
+
+            if not state.allowRequest(source):
+                self.send_response(429)
+                self.send_header("Retry-After", "1")
+                self.end_headers()
+                return
+
+            query = parse_qs(url.query)
+            try:
+                limit = max(1, min(1000, int(query.get("limit", ["100"])[0])))
+            except ValueError:
+                self.sendJson(400, {"error": "limit must be an integer"})
+                return
+
+            # The cursor always lies past the watermark it started from
+            cursor = query.get("cursor", [""])[0]
+            after = parseCursor(cursor) if cursor else (query.get("updatedSince", [""])[0], query.get("afterId", [""])[0])
+            ids = {value for value in query.get("ids", [""])[0].split(",") if value}
+            if state.latency:
+                time.sleep(state.latency)
+            self.sendJson(200, state.page(source, after, limit, ids))
+
+        def sendJson(self, status: int, body: Dict):
+            payload = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            return
+
+    return MockSourceHandler
+
+
+def churnLoop(state: MockState, interval: float, webhookUrl: str = "") -> None:
+    """Periodically touch records so incremental collection has changes to fetch."""
+    while True:
+        time.sleep(interval)
+        touched = state.churn()
+        print(f"Churn: touched {sum(len(ids) for ids in touched.values())} records")
+        if not webhookUrl:
+            continue
+        # Notify the way a push-capable source would - one call per source
+        for source, ids in touched.items():
+            try:
+                response = requests.post(f"{webhookUrl.rstrip('/')}/{source}", json={"ids": ids}, timeout=5)
+                if response.status_code >= 400:
+                    print(f"Webhook for {source} rejected: {response.status_code} - {response.text}")
+            except requests.RequestException as e:
+                print(f"Webhook to {webhookUrl} failed: {str(e)}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Mock source APIs for the WWIZ collectors")
+    parser.add_argument("--port", type=int, default=3100, help="Port to listen on (default 3100)")
+    parser.add_argument("--records", type=int, default=52, help="Number of people to generate (default 52)")
+    parser.add_argument("--latency-ms", type=int, default=0, help="Delay added to every response")
+    parser.add_argument("--rate-limit", type=int, default=0, help="Max requests/sec per source before 429s (0 = off)")
+    parser.add_argument("--churn-seconds", type=float, default=0, help="Touch some records every N seconds (0 = off)")
+    parser.add_argument("--webhook-url", default="", help="Post churned record ids here, e.g. http://localhost:9109/webhook")
+    args = parser.parse_args()
+
+    state = MockState(seedRecords(args.records), args.latency_ms, args.rate_limit)
+
+    if args.churn_seconds > 0:
+        threading.Thread(target=churnLoop, args=(state, args.churn_seconds, args.webhook_url), daemon=True).start()
+
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), makeHandler(state))
+    print(f"Mock source APIs serving {len(state.records)} sources ({args.records} people) on http://127.0.0.1:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nShutting down mock source APIs")
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
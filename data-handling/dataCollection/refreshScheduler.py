@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""
+Tiered Refresh Scheduler for the WWIZ Collectors
+
+Keeps every source about as fresh as it needs to be instead of refreshing
+all ten together. Calendar availability is stale within minutes, HRIS
+records change weekly, so each source gets its own refresh interval:
+
+- Each source is collected when it is due (interval +/- jitter so sources
+  don't line up), at most REFRESH_MAX_CONCURRENT at a time
+- Collection is incremental from the source's lastUpdated watermark, so a
+  refresh with no upstream changes is a single empty page
+- The import command (REFRESH_IMPORT_COMMAND) only runs when a refresh
+  actually wrote records, and is told which sources changed
+- Failed sources are retried with back-off, capped at their interval
+- Per-source staleness is served as Prometheus metrics on /metrics
+
+Watermarks and next-run times are kept in the collector state file, so a
+restarted scheduler carries on where it left off.
+
+Usage:
+    python data-handling/dataCollection/refreshScheduler.py           # run until stopped
+    python data-handling/dataCollection/refreshScheduler.py --once    # refresh whatever is due, then exit
+    python data-handling/dataCollection/refreshScheduler.py status    # staleness per source
+"""
+
+import calendar
+import os
+import random
+import shlex
+import signal
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Set
+
+from collectSources import DEFAULT_STATE_FILE, SOURCES, collectSource, envName, loadEnv, loadState, saveState, stateWatermark
+
+# Default refresh interval per source (seconds), overridable with REFRESH_INTERVAL_<NAME>
+DEFAULT_INTERVALS: Dict[str, int] = {
+    "calendar-availabilitySummary": 5 * 60,
+    "teams-userActivitySummary": 15 * 60,
+    "slack-userActivitySummary": 15 * 60,
+    "jira-userStats": 60 * 60,
+    "jira-projectSummary": 60 * 60,
+    "confluence-userStats": 2 * 60 * 60,
+    "confluence-spacesSummary": 2 * 60 * 60,
+    "entraAd-user": 6 * 60 * 60,
+    "googleCloudIdentity-user": 6 * 60 * 60,
+    "employmentHero-staff": 24 * 60 * 60,
+}
+
+# Fraction of the interval each run is moved by at random
+DEFAULT_JITTER = 0.1
+
+# Sources collected at the same time
+DEFAULT_MAX_CONCURRENT = 3
+
+# First retry delay after a failure, doubled per consecutive failure
+RETRY_SECONDS = 60
+
+# How often the scheduler checks for due sources
+TICK_SECONDS = 1.0
+
+# Default metrics port (0 disables the endpoint)
+DEFAULT_METRICS_PORT = 9108
+
+
+def parseIsoTime(value: Optional[str]) -> Optional[float]:
+    """Convert a lastUpdated-style UTC timestamp to epoch seconds (None if missing or invalid)."""
+    if not value:
+        return None
+    try:
+        return calendar.timegm(time.strptime(value.rstrip("Z")[:19], "%Y-%m-%dT%H:%M:%S"))
+    except ValueError:
+        return None
+
+
+class RefreshScheduler:
+    """Runs each source on its own interval and tracks freshness per source."""
+
+    def __init__(self, env: Dict[str, str], sources: List[str]):
+        self.env = env
+        self.sources = sources
+        self.intervals = {source: float(env.get(f"REFRESH_INTERVAL_{envName(source)}", DEFAULT_INTERVALS.get(source, 3600))) for source in sources}
+        self.jitter = float(env.get("REFRESH_JITTER", DEFAULT_JITTER))
+        self.maxConcurrent = int(env.get("REFRESH_MAX_CONCURRENT", DEFAULT_MAX_CONCURRENT))
+        self.importCommand = env.get("REFRESH_IMPORT_COMMAND", "")
+        self.dataPath = env.get("DATA_PATH", "data")
+        self.statePath = env.get("COLLECTOR_STATE_FILE", DEFAULT_STATE_FILE)
+        self.state = loadState(self.statePath)
+        self.lock = threading.Lock()
+        self.stopping = threading.Event()
+        self.running: Dict[str, Future] = {}
+        self.changedSources: Set[str] = set()
+        self.importProcess: Optional[subprocess.Popen] = None
+        self.counters = {source: {"runs": 0, "errors": 0, "written": 0, "skipped": 0, "seconds": 0.0} for source in sources}
+
+    def nextRun(self, source: str) -> float:
+        """Epoch time the source is next due (0 if it has never run)."""
+        return self.state.get(source, {}).get("nextRun", 0)
+
+    def dueSources(self, now: float) -> List[str]:
+        """Sources that are due and not already running, most overdue first."""
+        due = [source for source in self.sources if source not in self.running and self.nextRun(source) <= now]
+        return sorted(due, key=self.nextRun)
+
+    def refreshSource(self, source: str) -> None:
+        """Collect one source incrementally and record the outcome."""
+        with self.lock:
+            watermark = stateWatermark(self.state.get(source, {}))
+
+        stats, newWatermark = collectSource(source, self.env, watermark, self.dataPath)
+        now = time.time()
+        interval = self.intervals[source]
+
+        with self.lock:
+            entry = self.state.setdefault(source, {})
+            counters = self.counters[source]
+            counters["runs"] += 1
+            counters["seconds"] = stats["seconds"]
+
+            if stats["error"]:
+                counters["errors"] += 1
+                entry["failures"] = entry.get("failures", 0) + 1
+                entry["nextRun"] = now + min(interval, RETRY_SECONDS * 2 ** (entry["failures"] - 1))
+                print(f"[{source}] Failed ({stats['error']}) - retrying in {entry['nextRun'] - now:.0f}s")
+            else:
+                entry.update({
+                    "lastUpdated": newWatermark[0] if newWatermark else None,
+                    "lastId": newWatermark[1] if newWatermark else None,
+                    "lastRun": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(now)),
+                    "lastChanged": stats["written"],
+                    "lastSuccess": now,
+                    "failures": 0,
+                    "nextRun": now + interval * (1 + random.uniform(-self.jitter, self.jitter)),
+                })
+                counters["written"] += stats["written"]
+                if stats["written"]:
+                    self.changedSources.add(source)
+                    print(f"[{source}] {stats['written']} records changed ({stats['records']} fetched in {stats['seconds']:.2f}s)")
+                else:
+                    counters["skipped"] += 1
+                    print(f"[{source}] No changes")
+
+            saveState(self.state, self.statePath)
+
+    def startDue(self, executor: ThreadPoolExecutor) -> None:
+        """Start due sources while there is room under the concurrency cap."""
+        for source in self.dueSources(time.time()):
+            if len(self.running) >= self.maxConcurrent:
+                break
+            self.running[source] = executor.submit(self.refreshSource, source)
+
+    def reapFinished(self) -> None:
+        """Forget finished refreshes, reporting any that crashed."""
+        for source, future in list(self.running.items()):
+            if future.done():
+                del self.running[source]
+                if future.exception():
+                    print(f"[{source}] Refresh crashed: {future.exception()}")
+
+    def runImport(self) -> None:
+        """Start the import command for changed sources, one import at a time."""
+        if self.importProcess is not None:
+            returnCode = self.importProcess.poll()
+            if returnCode is None:
+                return
+            print(f"Import finished (exit code {returnCode})")
+            self.importProcess = None
+
+        with self.lock:
+            if not self.importCommand or not self.changedSources:
+                self.changedSources.clear()
+                return
+            changed = ",".join(sorted(self.changedSources))
+            self.changedSources.clear()
+
+        print(f"Importing changes from: {changed}")
+        command = self.importCommand.replace("{sources}", changed)
+        self.importProcess = subprocess.Popen(shlex.split(command), env={**os.environ, "REFRESH_CHANGED_SOURCES": changed})
+
+    def run(self, once: bool = False) -> None:
+        """
+        Refresh sources as they fall due until stopped.
+
+        Args:
+            once: Refresh the sources that are due now, wait for them (and the import), then return
+        """
+        with ThreadPoolExecutor(max_workers=max(1, self.maxConcurrent)) as executor:
+            if once:
+                for source in self.dueSources(time.time()):
+                    self.running[source] = executor.submit(self.refreshSource, source)
+
+            while not self.stopping.is_set():
+                self.reapFinished()
+                if not once:
+                    self.startDue(executor)
+                self.runImport()
+                if once and not self.running:
+                    break
+                self.stopping.wait(TICK_SECONDS)
+
+            print("Waiting for running refreshes to finish...")
+            for future in self.running.values():
+                future.exception()
+            self.running.clear()
+
+        self.runImport()
+        if self.importProcess is not None:
+            self.importProcess.wait()
+            print(f"Import finished (exit code {self.importProcess.returncode})")
+
+    def renderMetrics(self) -> str:
+        """Render per-source freshness in the Prometheus text format."""
+        now = time.time()
+        metrics = [
+            ("wwiz_source_staleness_seconds", "gauge", "Seconds since the source was last refreshed successfully"),
+            ("wwiz_source_watermark_age_seconds", "gauge", "Age of the newest record seen from the source (lastUpdated watermark)"),
+            ("wwiz_source_refresh_interval_seconds", "gauge", "Configured refresh interval"),
+            ("wwiz_source_next_refresh_seconds", "gauge", "Seconds until the source is next due"),
+            ("wwiz_source_last_refresh_duration_seconds", "gauge", "Duration of the last refresh"),
+            ("wwiz_source_consecutive_failures", "gauge", "Failed refreshes since the last success"),
+            ("wwiz_source_refreshes_total", "counter", "Refreshes run since the scheduler started"),
+            ("wwiz_source_refresh_errors_total", "counter", "Failed refreshes since the scheduler started"),
+            ("wwiz_source_unchanged_refreshes_total", "counter", "Refreshes that found no changes"),
+            ("wwiz_source_records_written_total", "counter", "Records written since the scheduler started"),
+        ]
+        lines: List[str] = []
+
+        with self.lock:
+            for name, metricType, description in metrics:
+                lines.append(f"# HELP {name} {description}")
+                lines.append(f"# TYPE {name} {metricType}")
+                for source in self.sources:
+                    entry = self.state.get(source, {})
+                    counters = self.counters[source]
+                    lastSuccess = entry.get("lastSuccess") or parseIsoTime(entry.get("lastRun"))
+                    watermark = parseIsoTime(entry.get("lastUpdated"))
+                    value = {
+                        "wwiz_source_staleness_seconds": now - lastSuccess if lastSuccess else None,
+                        "wwiz_source_watermark_age_seconds": now - watermark if watermark else None,
+                        "wwiz_source_refresh_interval_seconds": self.intervals[source],
+                        "wwiz_source_next_refresh_seconds": max(0.0, self.nextRun(source) - now),
+                        "wwiz_source_last_refresh_duration_seconds": counters["seconds"],
+                        "wwiz_source_consecutive_failures": entry.get("failures", 0),
+                        "wwiz_source_refreshes_total": counters["runs"],
+                        "wwiz_source_refresh_errors_total": counters["errors"],
+                        "wwiz_source_unchanged_refreshes_total": counters["skipped"],
+                        "wwiz_source_records_written_total": counters["written"],
+                    }[name]
+                    # Sources that never succeeded have no staleness - leave the series out rather than report 0
+                    if value is not None:
+                        lines.append(f'{name}{{source="{source}"}} {value:.3f}' if isinstance(value, float) else f'{name}{{source="{source}"}} {value}')
+
+        return "\n".join(lines) + "\n"
+
+
+def startMetricsServer(scheduler: RefreshScheduler, port: int) -> ThreadingHTTPServer:
+    """Serve /metrics for the scheduler in a background thread."""
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_response(404)
+                self.end_headers()
+                return
+            body = scheduler.renderMetrics().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    # Local only - put a reverse proxy (or the Prometheus agent) on the host to expose it
+    server = ThreadingHTTPServer(("127.0.0.1", port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Metrics on http://localhost:{port}/metrics")
+    return server
+
+
+def printStatus(scheduler: RefreshScheduler) -> None:
+    """Print interval, staleness and next run per source."""
+    now = time.time()
+    print(f"\n{'Source':<30} {'Interval':>9} {'Stale':>9} {'Next in':>9} {'Changed':>8}  Watermark")
+    for source in scheduler.sources:
+        entry = scheduler.state.get(source, {})
+        lastSuccess = entry.get("lastSuccess") or parseIsoTime(entry.get("lastRun"))
+        stale = f"{now - lastSuccess:.0f}s" if lastSuccess else "never"
+        nextIn = f"{max(0.0, scheduler.nextRun(source) - now):.0f}s"
+        overdue = " OVERDUE" if lastSuccess and now - lastSuccess > 2 * scheduler.intervals[source] else ""
+        print(f"{source:<30} {scheduler.intervals[source]:>8.0f}s {stale:>9} {nextIn:>9} {entry.get('lastChanged', '-'):>8}  {entry.get('lastUpdated') or '-'}{overdue}")
+
+
+def main() -> None:
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    env = loadEnv()
+
+    sources = [arg for arg in args if arg != "status"] or list(SOURCES)
+    unknown = [source for source in sources if source not in SOURCES]
+    if unknown:
+        print(f"Unknown source(s): {', '.join(unknown)}")
+        print(f"Available sources: {', '.join(SOURCES)}")
+        sys.exit(1)
+
+    scheduler = RefreshScheduler(env, sources)
+
+    if "status" in args:
+        printStatus(scheduler)
+        return
+
+    once = "--once" in sys.argv
+    metricsPort = int(env.get("REFRESH_METRICS_PORT", DEFAULT_METRICS_PORT))
+    if metricsPort and not once:
+        startMetricsServer(scheduler, metricsPort)
+
+    # Finish the refreshes in flight on Ctrl+C / SIGTERM instead of dropping them half-written
+    signal.signal(signal.SIGTERM, lambda signum, frame: scheduler.stopping.set())
+    signal.signal(signal.SIGINT, lambda signum, frame: scheduler.stopping.set())
+
+    print(f"Scheduling {len(sources)} sources (max {scheduler.maxConcurrent} at a time, jitter {scheduler.jitter:.0%})")
+    scheduler.run(once)
+    printStatus(scheduler)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,510 @@
+#!/usr/bin/env python3
+"""
+Webhook Receiver for Push-Based Source Updates
+
+Employment Hero, Jira, Slack and Teams can all say exactly which record
+changed. Instead of waiting for the next scheduled poll or full rescan,
+this small local HTTP server takes those change notifications and moves
+only the affected records into the knowledge base:
+
+- Notifications: POST /webhook/<source> with {"id": ...}, {"ids": [...]}
+  or the changed records themselves in {"records": [...]}
+- Coalescing: notifications for the same record are merged until it has
+  been quiet for WEBHOOK_COALESCE_SECONDS (never longer than
+  WEBHOOK_MAX_DELAY_SECONDS), so a burst of edits costs one fetch and one upload
+- Fetch: records sent without a body are fetched by id (?ids=...) through
+  the same rate-limited source sessions as collectSources.py, then written
+  to data/<source>/; records that didn't change on disk stop here
+- Upload: changed files go through the importer's per-file steps (PII
+  scrub, schema validation and, with PARTITION_FIELDS, volatile field
+  stripping plus a rebuilt live status document) and are uploaded to their
+  folder and workspaces in batches of WEBHOOK_BATCH_SIZE, replacing the
+  version already on the server. Uploads are recorded in the import state
+  like the importer's, so the next import neither re-uploads them nor
+  misses the copy it has to replace
+
+GET /status returns pending notifications and counters as JSON. Every
+request must carry WEBHOOK_SECRET in the X-Webhook-Token header (the
+receiver doesn't start without one), and it listens on WEBHOOK_HOST
+(127.0.0.1 unless set) - put a TLS reverse proxy in front to take
+notifications from outside the host.
+
+Usage:
+    python data-handling/dataCollection/webhookReceiver.py               # listen on WEBHOOK_HOST:WEBHOOK_PORT (127.0.0.1:9109)
+    python data-handling/dataCollection/webhookReceiver.py --no-upload   # only write data/<source>/ files
+    curl -X POST localhost:9109/webhook/jira-userStats -H "X-Webhook-Token: $WEBHOOK_SECRET" -d '{"ids": ["JIR001"]}'
+"""
+
+import hmac
+import json
+import os
+import signal
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+import requests
+
+from collectSources import SAFE_ID_PATTERN, SOURCES, TokenBucket, createSession, envName, fetchPage, loadEnv, recordFileName, recordIds, sourceUrl, writeRecord
+
+# The upload path (importFiles.py and friends) lives in dataImport
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "dataImport"))
+
+# Default address, overridable with WEBHOOK_HOST and WEBHOOK_PORT
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 9109
+
+# Quiet time before a record is processed, and the longest a record may wait under constant updates
+DEFAULT_COALESCE_SECONDS = 2.0
+DEFAULT_MAX_DELAY_SECONDS = 10.0
+
+# Records processed (and uploaded) per batch
+DEFAULT_BATCH_SIZE = 50
+
+# Largest notification body accepted
+MAX_BODY_BYTES = 1024 * 1024
+
+# How often pending notifications are checked
+TICK_SECONDS = 0.2
+
+
+class WebhookReceiver:
+    """Coalesces change notifications and pushes the changed records through to AnythingLLM."""
+
+    def __init__(self, env: Dict[str, str], importEnv: Optional[Dict[str, str]]):
+        self.env = env
+        self.importEnv = importEnv
+        self.dataPath = env.get("DATA_PATH", "data")
+        self.coalesceSeconds = float(env.get("WEBHOOK_COALESCE_SECONDS", DEFAULT_COALESCE_SECONDS))
+        self.maxDelaySeconds = float(env.get("WEBHOOK_MAX_DELAY_SECONDS", DEFAULT_MAX_DELAY_SECONDS))
+        self.batchSize = int(env.get("WEBHOOK_BATCH_SIZE", DEFAULT_BATCH_SIZE))
+        self.lock = threading.Lock()
+        self.stopping = threading.Event()
+        # (source, record id) -> {"first", "last", "count", "record"}
+        self.pending: Dict[Tuple[str, str], Dict] = {}
+        self.sessions: Dict[str, Tuple[requests.Session, TokenBucket]] = {}
+        self.counters = {"notifications": 0, "coalesced": 0, "batches": 0, "fetched": 0, "missing": 0,
+                         "written": 0, "unchanged": 0, "uploaded": 0, "invalid": 0, "errors": 0}
+        self.lastBatch: Dict = {}
+        self.uploader: Optional[Dict] = None
+
+    def notify(self, source: str, recordId: str, record: Optional[Dict] = None) -> None:
+        """
+        Queue a change notification, merging it with one already pending for the same record.
+
+        Args:
+            source: Source folder name
+            recordId: Record identifier (ehsId, fileId or project/space key)
+            record: The changed record, when the source sent it (newest wins)
+        """
+        now = time.monotonic()
+        with self.lock:
+            self.counters["notifications"] += 1
+            entry = self.pending.get((source, recordId))
+            if entry is None:
+                self.pending[(source, recordId)] = {"first": now, "last": now, "count": 1, "record": record}
+                return
+            self.counters["coalesced"] += 1
+            entry["last"] = now
+            entry["count"] += 1
+            if record is not None:
+                entry["record"] = record
+
+    def requeue(self, source: str, ids: List[str]) -> None:
+        """Put records whose fetch failed back in the queue so a later batch retries them."""
+        now = time.monotonic()
+        with self.lock:
+            for recordId in ids:
+                self.pending.setdefault((source, recordId), {"first": now, "last": now, "count": 1, "record": None})
+
+    def takeDue(self, now: float) -> List[Tuple[str, str, Optional[Dict]]]:
+        """
+        Remove up to one batch of records that are ready to process.
+
+        Args:
+            now: Current monotonic time
+
+        Returns:
+            (source, record id, record or None) for each due record, oldest first
+        """
+        with self.lock:
+            due = [key for key, entry in self.pending.items()
+                   if now - entry["last"] >= self.coalesceSeconds or now - entry["first"] >= self.maxDelaySeconds]
+            due.sort(key=lambda key: self.pending[key]["first"])
+            return [(source, recordId, self.pending.pop((source, recordId))["record"]) for source, recordId in due[:self.batchSize]]
+
+    def sourceSession(self, source: str) -> Tuple[requests.Session, TokenBucket]:
+        """Pooled session and rate limiter for a source, created on first use."""
+        if source not in self.sessions:
+            config = SOURCES[source]
+            limiter = TokenBucket(float(self.env.get(f"RATE_LIMIT_{envName(source)}", config["rateLimit"])))
+            self.sessions[source] = (createSession(source, self.env, int(config["poolSize"])), limiter)
+        return self.sessions[source]
+
+    def fetchRecords(self, source: str, ids: List[str]) -> List[Dict]:
+        """
+        Fetch records by id through the source contract.
+
+        Args:
+            source: Source folder name
+            ids: Record identifiers
+
+        Returns:
+            Records found (ids the source no longer has are left out)
+
+        Raises:
+            requests.RequestException: If a page still fails after all retries
+        """
+        session, limiter = self.sourceSession(source)
+        pageSize = int(self.env.get("COLLECTOR_PAGE_SIZE", 100))
+        records: List[Dict] = []
+        for start in range(0, len(ids), pageSize):
+            chunk = ids[start:start + pageSize]
+            cursor = None
+            while True:
+                params = {"ids": ",".join(chunk), "limit": pageSize}
+                if cursor:
+                    params["cursor"] = cursor
+                page = fetchPage(session, sourceUrl(source, self.env), params, limiter)
+                records.extend(page.get("records", []))
+                cursor = page.get("nextCursor")
+                if not cursor:
+                    break
+        return records
+
+    def processBatch(self, batch: List[Tuple[str, str, Optional[Dict]]]) -> None:
+        """
+        Write the batch's records to data/<source>/ and upload the ones that changed.
+
+        Args:
+            batch: Due records from takeDue
+        """
+        started = time.monotonic()
+        bySource: Dict[str, Dict[str, Optional[Dict]]] = {}
+        for source, recordId, record in batch:
+            bySource.setdefault(source, {})[recordId] = record
+
+        changed: Dict[str, Tuple[bytes, str]] = {}
+        stats = {"records": len(batch), "fetched": 0, "missing": 0, "written": 0, "unchanged": 0, "errors": 0}
+        for source, entries in bySource.items():
+            records = [record for record in entries.values() if record is not None]
+            toFetch = [recordId for recordId, record in entries.items() if record is None]
+            if toFetch:
+                try:
+                    fetched = self.fetchRecords(source, toFetch)
+                except (requests.RequestException, ValueError) as e:
+                    print(f"[{source}] Fetch failed for {len(toFetch)} records: {str(e)}")
+                    stats["errors"] += len(toFetch)
+                    fetched = []
+                    self.requeue(source, toFetch)
+                else:
+                    stats["fetched"] += len(fetched)
+                    found = {recordId for record in fetched for recordId in recordIds(source, record)}
+                    stats["missing"] += sum(1 for recordId in toFetch if recordId not in found)
+                records.extend(fetched)
+
+            for record in records:
+                outcome = writeRecord(self.dataPath, source, record)
+                if outcome == "written":
+                    stats["written"] += 1
+                    filePath = os.path.join(self.dataPath, source, recordFileName(source, record))
+                    with open(filePath, "rb") as f:
+                        changed[filePath] = (f.read(), source)
+                elif outcome == "unchanged":
+                    stats["unchanged"] += 1
+
+        uploaded, invalid = self.uploadChanged(changed) if changed and self.importEnv is not None else (0, 0)
+
+        seconds = time.monotonic() - started
+        with self.lock:
+            self.counters["batches"] += 1
+            for key in ("fetched", "missing", "written", "unchanged", "errors"):
+                self.counters[key] += stats[key]
+            self.counters["uploaded"] += uploaded
+            self.counters["invalid"] += invalid
+            self.lastBatch = {**stats, "uploaded": uploaded, "seconds": round(seconds, 3)}
+        print(f"Batch: {len(batch)} records, {stats['written']} changed, {stats['unchanged']} unchanged, "
+              f"{stats['missing']} missing, {uploaded} uploaded in {seconds:.2f}s")
+
+    def startUploader(self) -> None:
+        """Read the importer settings and make sure the source folders exist on the server."""
+        from importFiles import buildExistingFileList, createFolderStructure
+        from importState import DEFAULT_STATE_FILE
+        from workspaceRebuild import resolveWorkspaces, DEFAULT_POINTER_FILE
+        from workspaceShards import loadDepartmentIndex, parseShardMap
+
+        env = self.importEnv
+        sharding = env.get("SHARDING", "off").lower()
+        self.uploader = {
+            "serverUrl": env.get("ANYTHINGLLM_URL", "").rstrip("/"),
+            "apiKey": env.get("ANYTHINGLLM_API_KEY", ""),
+            "workspaces": resolveWorkspaces(env.get("WORKSPACES"), env.get("WORKSPACE_POINTER_FILE", DEFAULT_POINTER_FILE)),
+            "sharding": sharding,
+            "shardPrefix": env.get("SHARD_PREFIX", "wwiz"),
+            "folderShards": parseShardMap(env.get("SHARD_MAP", "")),
+            "departments": {},
+            "shardWorkspaces": set(),
+            "scrubConfig": None,
+            "validate": env.get("VALIDATE_SCHEMAS", "true").lower() == 'true',
+            "partitionFields": env.get("PARTITION_FIELDS", "false").lower() == 'true',
+            "shardMap": env.get("SHARD_MAP", ""),
+            "statePath": env.get("IMPORT_STATE_FILE", DEFAULT_STATE_FILE),
+        }
+        if env.get("PII_SCRUB", "false").lower() == 'true':
+            from piiScrubber import loadScrubConfig
+            self.uploader["scrubConfig"] = loadScrubConfig(env)
+
+        # Department shards need everyone's department, not just the people in a batch
+        if sharding == "department":
+            self.uploader["departments"] = loadDepartmentIndex(self.dataPath)
+
+        # Fetched once - adopted server copies are replaced rather than duplicated
+        self.uploader["existingFiles"] = buildExistingFileList(self.uploader["serverUrl"], self.uploader["apiKey"])
+        folders = sorted(SOURCES)
+        if self.uploader["partitionFields"]:
+            from fieldPartitioner import LIVE_STATUS_FOLDER
+            folders.append(LIVE_STATUS_FOLDER)
+        createFolderStructure(folders, self.uploader["serverUrl"], self.uploader["apiKey"])
+
+    def uploadChanged(self, changed: Dict[str, Tuple[bytes, str]]) -> Tuple[int, int]:
+        """
+        Upload changed files the way the importer would, replacing their previous versions.
+
+        Args:
+            changed: File path -> (content, source folder)
+
+        Returns:
+            (files uploaded, files that failed validation)
+        """
+        from fieldPartitioner import uploadDerivedDocuments
+        from importState import contentHash, hasChanged, loadState
+        from importFiles import parseWorkspaces
+        from uploadScheduler import runScheduledUploads
+        from workspaceShards import buildDepartmentIndex, ensureShardWorkspaces, shardForFile, shardSlug, workspacesForDocument
+
+        uploader = self.uploader
+        invalid = 0
+        if uploader["scrubConfig"] is not None:
+            from piiScrubber import scrubFiles
+            changed, scrubStats = scrubFiles(changed, uploader["scrubConfig"], 1)
+            print(f"PII scrub: {scrubStats['files']} of {len(changed)} files changed")
+
+        # Uploads are tracked with the importer's, so either one replaces the other's copy
+        statePath = uploader["statePath"]
+        state = loadState(statePath)
+        changed = {path: (content, folder) for path, (content, folder) in changed.items() if path not in state["files"] or hasChanged(state, path, content)}
+        sourceHashes = {path: contentHash(content) for path, (content, folder) in changed.items()}
+
+        if uploader["validate"]:
+            from schemaValidators import validateFiles
+            summary = validateFiles([(path, folder) for path, (content, folder) in changed.items()], 1,
+                                    contents={path: content for path, (content, folder) in changed.items()})
+            invalidFiles = {path for folder in summary.values() for path in folder["invalid"]}
+            if invalidFiles:
+                print(f"Skipping {len(invalidFiles)} files that failed validation")
+                changed = {path: value for path, value in changed.items() if path not in invalidFiles}
+                invalid = len(invalidFiles)
+
+        # Same split as the importer: rebuild the changed people's live status, upload stable fields only
+        liveDocs: Dict[str, Tuple[bytes, str]] = {}
+        if uploader["partitionFields"] and changed:
+            from fieldPartitioner import buildLiveDocuments, loadRecord, readPersonFiles, stripVolatileFields
+            people = []
+            for content, folder in changed.values():
+                record = loadRecord(content, folder)
+                if record is not None and (record.get("ehsId") or record.get("upn")):
+                    people.append(record.get("ehsId") or record.get("upn"))
+            if people:
+                # Scrub the other sources too - they are read straight from disk
+                personFiles = readPersonFiles(self.dataPath, people)
+                personFiles.update(changed)
+                if uploader["scrubConfig"] is not None:
+                    personFiles = scrubFiles(personFiles, uploader["scrubConfig"], 1)[0]
+                liveDocs = buildLiveDocuments(personFiles)
+            changed = stripVolatileFields(changed)
+
+        # Group by workspace list - uploads take one workspace list per folder
+        groups: Dict[str, Dict[str, Tuple[bytes, str]]] = {}
+        if uploader["sharding"] == "off":
+            groups[uploader["workspaces"] or ""] = changed
+        else:
+            uploader["departments"].update(buildDepartmentIndex(changed))
+            for path, (content, folder) in changed.items():
+                shard = shardSlug(uploader["shardPrefix"], shardForFile(content, folder, uploader["sharding"], uploader["folderShards"], uploader["departments"]))
+                if shard not in uploader["shardWorkspaces"]:
+                    ensureShardWorkspaces([shard], uploader["serverUrl"], uploader["apiKey"])
+                    uploader["shardWorkspaces"].add(shard)
+                groups.setdefault(",".join(ws for ws in [shard, uploader["workspaces"] or ""] if ws), {})[path] = (content, folder)
+
+        schedule = [(path, content, folder, workspaces) for workspaces, documents in groups.items() for path, (content, folder) in sorted(documents.items())]
+        uploaded = len(runScheduledUploads(schedule, uploader["serverUrl"], uploader["apiKey"], 0, state, statePath, uploader["existingFiles"], sourceHashes)[0]) if schedule else 0
+        if liveDocs:
+            liveWorkspaces = {key: workspacesForDocument(content, folder, uploader["sharding"], uploader["shardPrefix"], uploader["shardMap"], uploader["workspaces"], uploader["departments"])
+                              for key, (content, folder) in liveDocs.items()}
+            if uploader["sharding"] != "off":
+                newShards = {ws for value in liveWorkspaces.values() for ws in parseWorkspaces(value)} - set(parseWorkspaces(uploader["workspaces"])) - uploader["shardWorkspaces"]
+                ensureShardWorkspaces(sorted(newShards), uploader["serverUrl"], uploader["apiKey"])
+                uploader["shardWorkspaces"].update(newShards)
+            uploaded += len(uploadDerivedDocuments(liveDocs, uploader["existingFiles"], liveWorkspaces, uploader["serverUrl"], uploader["apiKey"], state, statePath))
+        uploader["existingFiles"].extend(name for name in {os.path.basename(path) for path in list(changed) + list(liveDocs)} if name not in uploader["existingFiles"])
+        return uploaded, invalid
+
+    def run(self) -> None:
+        """Process due records until stopped, then drain what is still pending."""
+        while not self.stopping.is_set():
+            batch = self.takeDue(time.monotonic())
+            if batch:
+                self.processBatch(batch)
+            else:
+                self.stopping.wait(TICK_SECONDS)
+
+        while True:
+            batch = self.takeDue(float("inf"))
+            if not batch:
+                break
+            self.processBatch(batch)
+
+    def status(self) -> Dict:
+        """Pending notifications, counters and the last batch for GET /status."""
+        now = time.monotonic()
+        with self.lock:
+            oldest = max((now - entry["first"] for entry in self.pending.values()), default=0.0)
+            return {"pending": len(self.pending), "oldestPendingSeconds": round(oldest, 3),
+                    "counters": dict(self.counters), "lastBatch": self.lastBatch}
+
+
+def parseNotification(source: str, body: Dict) -> List[Tuple[str, Optional[Dict]]]:
+    """
+    Read the changed record ids (and records) out of a notification body.
+
+    Args:
+        source: Source folder name
+        body: Parsed JSON body - {"id": ...}, {"ids": [...]} and/or {"records": [...]}
+
+    Returns:
+        (record id, record or None) pairs
+
+    Raises:
+        ValueError: If the body names no records, or a record has no usable id
+    """
+    changes: List[Tuple[str, Optional[Dict]]] = []
+    ids = body.get("ids") or ([body["id"]] if body.get("id") else [])
+    if not isinstance(ids, list):
+        raise ValueError('"ids" must be a list')
+    for recordId in ids:
+        if not SAFE_ID_PATTERN.fullmatch(str(recordId)):
+            raise ValueError(f"Invalid record id {str(recordId)[:40]!r} - ids must be letters, digits, '_' or '-'")
+        changes.append((str(recordId), None))
+
+    for record in body.get("records") or []:
+        identifiers = recordIds(source, record) if isinstance(record, dict) else []
+        if not identifiers or not recordFileName(source, record):
+            raise ValueError(f"Record without an id for {source}")
+        changes.append((identifiers[0], record))
+
+    if not changes:
+        raise ValueError('Body must contain "id", "ids" or "records"')
+    return changes
+
+
+def tokenMatches(token: str, secret: str) -> bool:
+    """Constant-time check of the X-Webhook-Token header against WEBHOOK_SECRET."""
+    return bool(secret) and hmac.compare_digest(token.encode("utf-8"), secret.encode("utf-8"))
+
+
+def makeHandler(receiver: WebhookReceiver, secret: str):
+    """Create a request handler class bound to the receiver."""
+
+    class WebhookHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            parts = self.path.split("?")[0].strip("/").split("/")
+            if len(parts) != 2 or parts[0] != "webhook" or parts[1] not in SOURCES:
+                self.sendJson(404, {"error": f"Unknown webhook: {self.path}", "sources": list(SOURCES)})
+                return
+            source = parts[1]
+
+            if not tokenMatches(self.headers.get("X-Webhook-Token", ""), secret):
+                self.sendJson(401, {"error": "Missing or wrong X-Webhook-Token"})
+                return
+
+            length = int(self.headers.get("Content-Length") or 0)
+            if length > MAX_BODY_BYTES:
+                self.sendJson(413, {"error": f"Body over {MAX_BODY_BYTES} bytes"})
+                return
+
+            try:
+                body = json.loads(self.rfile.read(length) or b"{}")
+                changes = parseNotification(source, body if isinstance(body, dict) else {})
+            except ValueError as e:
+                self.sendJson(400, {"error": str(e)})
+                return
+
+            for recordId, record in changes:
+                receiver.notify(source, recordId, record)
+            self.sendJson(202, {"accepted": len(changes), "pending": receiver.status()["pending"]})
+
+        def do_GET(self):
+            if self.path.split("?")[0] != "/status":
+                self.sendJson(404, {"error": "Not found"})
+                return
+            if not tokenMatches(self.headers.get("X-Webhook-Token", ""), secret):
+                self.sendJson(401, {"error": "Missing or wrong X-Webhook-Token"})
+                return
+            self.sendJson(200, receiver.status())
+
+        def sendJson(self, status: int, body: Dict):
+            payload = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            return
+
+    return WebhookHandler
+
+
+def main() -> None:
+    env = loadEnv()
+    upload = "--no-upload" not in sys.argv and env.get("WEBHOOK_UPLOAD", "true").lower() == 'true'
+
+    # Anyone who can reach the port could write records into data/ and the knowledge base
+    secret = env.get("WEBHOOK_SECRET", "")
+    if not secret:
+        print("Error: WEBHOOK_SECRET is not set in .collectSources.env - refusing to accept unauthenticated webhooks")
+        sys.exit(1)
+
+    importEnv = None
+    if upload:
+        from importFiles import loadEnv as loadImportEnv
+        importEnv = loadImportEnv()
+        if not importEnv.get("ANYTHINGLLM_URL"):
+            print("Error: ANYTHINGLLM_URL missing from .importFiles.env (use --no-upload to only write files)")
+            sys.exit(1)
+
+    receiver = WebhookReceiver(env, importEnv)
+    if upload:
+        receiver.startUploader()
+
+    host = env.get("WEBHOOK_HOST", DEFAULT_HOST)
+    port = int(env.get("WEBHOOK_PORT", DEFAULT_PORT))
+    server = ThreadingHTTPServer((host, port), makeHandler(receiver, secret))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    # Finish the batch in flight and drain pending notifications on Ctrl+C / SIGTERM
+    signal.signal(signal.SIGTERM, lambda signum, frame: receiver.stopping.set())
+    signal.signal(signal.SIGINT, lambda signum, frame: receiver.stopping.set())
+
+    print(f"Webhooks on http://{host}:{port}/webhook/<source> (coalescing {receiver.coalesceSeconds:.1f}s, "
+          f"{'uploading to ' + importEnv['ANYTHINGLLM_URL'] if upload else 'writing files only'})")
+    receiver.run()
+    server.shutdown()
+    print(f"Stopped: {json.dumps(receiver.status()['counters'])}")
+
+
+if __name__ == "__main__":
+    main()
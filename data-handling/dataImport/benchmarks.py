@@ -0,0 +1,427 @@
+#!/usr/bin/env python3
+"""
+Micro-Benchmarks for the Data-Handling Helpers
+
+The import and cleanup scripts lean on a few small helpers that were written
+for a 425-file corpus: name membership in removeUnchanged, list dedupe in
+generatePostBody, recursive walks in extractFileNamesRecursively and
+extractFileList, and EMPLOYEES.index() inside the generator loops. This suite
+drives them with synthetic inputs from 1k to 1M items so their cost at scale
+is measured instead of guessed:
+
+- Inputs: a fabricated /api/v1/documents tree, an upload list with nested
+  target folders and an employee list, all built from a fixed seed
+- Time: best of several runs with time.perf_counter (input building excluded)
+- Memory: tracemalloc peak of one more run, counting only what the call allocates
+- Budget: a size is skipped when the growth seen so far predicts it would run
+  past --budget seconds, so quadratic helpers still finish
+- Baselines: results are compared with benchmarkBaselines.json and the run
+  fails (exit code 1) when a helper got slower or hungrier than the tolerance.
+  Times are scaled by a calibration loop, so a slower machine doesn't read as
+  a regression
+
+Usage:
+    python data-handling/dataImport/benchmarks.py                       # compare with the baselines
+    python data-handling/dataImport/benchmarks.py --only removeUnchanged --max-size 1000000
+    python data-handling/dataImport/benchmarks.py --update               # record new baselines
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+import uuid
+from typing import Callable, Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "testing-dataCreation"))
+from generate_test_data import DEPARTMENTS, generate_ehs_id
+
+from cleanupDocuments import extractFileList, generatePostBody
+from importFiles import extractFileNamesRecursively, extractFolderStructure, removeUnchanged
+from importState import contentHash
+
+# Default baselines file, overridable with --baselines
+DEFAULT_BASELINES_FILE = os.path.join("data-handling", "dataImport", "benchmarkBaselines.json")
+
+# Input sizes, smallest first. Sizes above --max-size (default 100k) are left out
+SIZES: List[int] = [1_000, 10_000, 100_000, 1_000_000]
+DEFAULT_MAX_SIZE = 100_000
+
+# Seconds one run may take before larger sizes are skipped
+DEFAULT_BUDGET = 5.0
+
+# Allowed growth over the baseline before a result counts as a regression
+DEFAULT_TIME_TOLERANCE = 1.5
+DEFAULT_MEMORY_TOLERANCE = 1.2
+
+# Differences below these are noise, whatever the ratio
+MIN_TIME_DELTA = 0.005
+MIN_MEMORY_DELTA = 64 * 1024
+
+# Timed runs per size; runs stop early once they add up to REPEAT_SECONDS
+REPEATS = 5
+REPEAT_SECONDS = 1.0
+
+# Runs of the calibration workload (the fastest one counts)
+CALIBRATION_RUNS = 50
+
+# Source folders and file prefixes the synthetic corpus is spread over
+SOURCES: List[Tuple[str, str]] = [
+    ("employmentHero-staff", "EHS"),
+    ("entraAd-user", "EAD"),
+    ("googleCloudIdentity-user", "GCI"),
+    ("jira-userStats", "JIR"),
+    ("confluence-userStats", "CNF"),
+    ("calendar-availabilitySummary", "CAL"),
+    ("teams-userActivitySummary", "TMS"),
+    ("slack-userActivitySummary", "SLK"),
+]
+
+# Files per sub-folder of a source folder
+FOLDER_SIZE = 1_000
+
+# Departments whose employees join game project teams in generate_project_data
+TEAM_DEPARTMENTS: List[str] = ["Development", "Game Design", "Art & Animation", "QA"]
+
+# Shared content for every synthetic upload - only the keys and folders matter
+CONTENT = b'{"dataSource": "benchmark"}'
+
+
+def fileStem(index: int) -> Tuple[str, str]:
+    """Source folder and file name of synthetic file number index."""
+    source, prefix = SOURCES[index % len(SOURCES)]
+    return source, f"{prefix}{index:07d}.json"
+
+
+def fileFolder(index: int) -> str:
+    """Nested target folder of synthetic file number index."""
+    source, name = fileStem(index)
+    return os.path.join(source, f"part-{index // FOLDER_SIZE:04d}")
+
+
+def documentsTree(size: int, offset: int = 0) -> Dict:
+    """
+    Fabricate an AnythingLLM /api/v1/documents response.
+
+    Files sit two folders deep (source folder, then part-NNNN) and carry the
+    UUID-suffixed names the API returns.
+
+    Args:
+        size: Number of files
+        offset: Index of the first file (shifts which names exist)
+
+    Returns:
+        Parsed documents response
+    """
+    rng = random.Random(size)
+    sources: Dict[str, Dict[str, List[Dict]]] = {}
+    for index in range(offset, offset + size):
+        source, name = fileStem(index)
+        fileId = str(uuid.UUID(int=rng.getrandbits(128), version=4))
+        sources.setdefault(source, {}).setdefault(f"part-{index // FOLDER_SIZE:04d}", []).append({
+            "name": f"{name}-{fileId}.json",
+            "type": "file",
+            "id": fileId,
+            "title": name,
+        })
+
+    items = [
+        {"name": source, "type": "folder", "items": [{"name": part, "type": "folder", "items": files} for part, files in parts.items()]}
+        for source, parts in sources.items()
+    ]
+    return {"localFiles": {"name": "documents", "type": "folder", "items": items}}
+
+
+def uploadList(size: int) -> Dict[str, Tuple[bytes, str]]:
+    """
+    Fabricate the upload list buildFileListWithFolders would return.
+
+    Args:
+        size: Number of files
+
+    Returns:
+        Dictionary mapping file paths to (content, target folder) tuples
+    """
+    filesToUpload: Dict[str, Tuple[bytes, str]] = {}
+    for index in range(size):
+        source, name = fileStem(index)
+        folder = fileFolder(index)
+        filesToUpload[os.path.join("data", folder, name)] = (CONTENT, folder)
+    return filesToUpload
+
+
+def employeeList(size: int) -> List[Dict]:
+    """
+    Fabricate an EMPLOYEES list in the generator's format.
+
+    Args:
+        size: Number of employees
+
+    Returns:
+        List of employee records
+    """
+    rng = random.Random(size)
+    departments = list(DEPARTMENTS)
+    employees = []
+    for index in range(size):
+        department = departments[index % len(departments)]
+        employees.append({
+            "firstName": f"First{index}",
+            "lastName": f"Last{index}",
+            "position": rng.choice(DEPARTMENTS[department]),
+            "department": department,
+            "manager": None,
+            "startDate": "2020-01-01",
+        })
+    return employees
+
+
+def projectTeam(employees: List[Dict]) -> List[Dict]:
+    """
+    Team member loop of generate_project_data.
+
+    The generator functions write to a fixed data folder, so the loop is
+    reproduced here with the same EMPLOYEES.index() lookup.
+    """
+    teamMembers = []
+    for employee in employees:
+        if employee["department"] in TEAM_DEPARTMENTS:
+            teamMembers.append({
+                "ehsId": generate_ehs_id(employees.index(employee) + 1),
+                "displayName": f"{employee['firstName']} {employee['lastName']}",
+            })
+    return teamMembers
+
+
+def setupRemoveUnchanged(size: int) -> tuple:
+    """
+    Upload list, server file names and import state for removeUnchanged.
+
+    The first quarter of the files is in the state unchanged and the second
+    quarter with an old hash; the rest are only matched by name against a
+    server listing that overlaps the upload list by half, with one source
+    reported as changed.
+    """
+    filesToUpload = uploadList(size)
+    existing = extractFileNamesRecursively(documentsTree(size, size // 2)["localFiles"]["items"])
+    state: Dict = {"files": {}}
+    for index, filePath in enumerate(filesToUpload):
+        if index < size // 4:
+            state["files"][filePath] = {"hash": contentHash(CONTENT)}
+        elif index < size // 2:
+            state["files"][filePath] = {"hash": "stale"}
+    return filesToUpload, existing, state, [SOURCES[0][0]]
+
+
+def setupPostBody(size: int) -> tuple:
+    """Matching files from extractFileList with one in ten listed twice."""
+    files = extractFileList(documentsTree(size - size // 10))
+    return (files + files[:size // 10],)
+
+
+BENCHMARKS: Dict[str, Tuple[Callable[[int], tuple], Callable]] = {
+    "removeUnchanged": (setupRemoveUnchanged, removeUnchanged),
+    "generatePostBody": (setupPostBody, generatePostBody),
+    "extractFileNamesRecursively": (lambda size: (documentsTree(size)["localFiles"]["items"],), extractFileNamesRecursively),
+    "extractFileList": (lambda size: (documentsTree(size),), extractFileList),
+    "extractFolderStructure": (lambda size: (uploadList(size),), extractFolderStructure),
+    "employeeIndex": (lambda size: (employeeList(size),), projectTeam),
+}
+
+
+def calibrate() -> float:
+    """
+    Time a fixed pure-Python workload to compare machine speed with the baselines.
+
+    The workload is short and repeated many times so the best run comes from
+    a quiet moment even on a shared instance.
+
+    Returns:
+        Best run time in seconds
+    """
+    best = math.inf
+    for attempt in range(CALIBRATION_RUNS):
+        start = time.perf_counter()
+        table = {f"key{index}": index for index in range(10_000)}
+        sum(table[f"key{index}"] for index in range(0, 10_000, 3))
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def measure(function: Callable, args: tuple) -> Tuple[float, int]:
+    """
+    Time one helper and measure the memory it allocates.
+
+    Args:
+        function: Helper under test
+        args: Prebuilt arguments
+
+    Returns:
+        (best run time in seconds, peak traced bytes)
+    """
+    times: List[float] = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        while len(times) < REPEATS and sum(times) < REPEAT_SECONDS:
+            start = time.perf_counter()
+            function(*args)
+            times.append(time.perf_counter() - start)
+
+        tracemalloc.start()
+        try:
+            function(*args)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return min(times), peak
+
+
+def runBenchmark(name: str, maxSize: int, budget: float) -> Dict[str, Dict]:
+    """
+    Run one benchmark over the sizes up to maxSize.
+
+    Args:
+        name: Benchmark name
+        maxSize: Largest input size
+        budget: Seconds a run may take before larger sizes are skipped
+
+    Returns:
+        {size: {"seconds", "peakBytes"}} or {size: {"skipped": predicted seconds}}
+    """
+    setup, function = BENCHMARKS[name]
+    results: Dict[str, Dict] = {}
+    measured: List[Tuple[int, float]] = []
+
+    for size in (size for size in SIZES if size <= maxSize):
+        if measured:
+            # Predict from the growth between the last two sizes (linear until there are two)
+            exponent = 1.0
+            if len(measured) > 1:
+                (smaller, smallerTime), (larger, largerTime) = measured[-2:]
+                exponent = max(1.0, math.log(max(largerTime, 1e-9) / max(smallerTime, 1e-9)) / math.log(larger / smaller))
+            lastSize, lastTime = measured[-1]
+            predicted = lastTime * (size / lastSize) ** exponent
+            if predicted > budget:
+                results[str(size)] = {"skipped": round(predicted, 1)}
+                continue
+
+        args = setup(size)
+        seconds, peak = measure(function, args)
+        del args
+        measured.append((size, seconds))
+        results[str(size)] = {"seconds": round(seconds, 6), "peakBytes": peak}
+
+    return results
+
+
+def loadBaselines(path: str) -> Dict:
+    """Load the baselines file, or an empty one if there is none yet."""
+    if not os.path.exists(path):
+        return {"results": {}}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def saveBaselines(path: str, baselines: Dict) -> None:
+    """Write the baselines file atomically."""
+    tempPath = path + ".tmp"
+    with open(tempPath, "w", encoding="utf-8") as f:
+        json.dump(baselines, f, indent=2, sort_keys=True)
+        f.write("\n")
+    os.replace(tempPath, path)
+
+
+def compareResult(result: Dict, baseline: Optional[Dict], speed: float, timeTolerance: float, memoryTolerance: float) -> List[str]:
+    """
+    Compare one measurement with its baseline.
+
+    Args:
+        result: Measurement from runBenchmark
+        baseline: Baseline measurement, or None if there is none
+        speed: Calibration time of this machine over that of the baseline machine
+        timeTolerance: Allowed time growth factor
+        memoryTolerance: Allowed memory growth factor
+
+    Returns:
+        Regression descriptions (empty when the result is within tolerance)
+    """
+    if baseline is None or "seconds" not in baseline:
+        return []
+    if "skipped" in result:
+        return [f"over budget (predicted {result['skipped']}s), baseline ran in {baseline['seconds']:.3f}s"]
+
+    regressions = []
+    expected = baseline["seconds"] * speed
+    if result["seconds"] > expected * timeTolerance and result["seconds"] - expected > MIN_TIME_DELTA:
+        regressions.append(f"time {result['seconds']:.3f}s vs {expected:.3f}s expected")
+    if result["peakBytes"] > baseline["peakBytes"] * memoryTolerance and result["peakBytes"] - baseline["peakBytes"] > MIN_MEMORY_DELTA:
+        regressions.append(f"memory {formatBytes(result['peakBytes'])} vs {formatBytes(baseline['peakBytes'])}")
+    return regressions
+
+
+def formatBytes(count: int) -> str:
+    """Format a byte count for the results table."""
+    for unit in ("B", "KB", "MB"):
+        if count < 1024:
+            return f"{count:.0f}{unit}" if unit == "B" else f"{count:.1f}{unit}"
+        count /= 1024
+    return f"{count:.1f}GB"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the pure data-handling helpers against committed baselines")
+    parser.add_argument("--only", action="append", choices=list(BENCHMARKS), help="Run only this benchmark (repeatable)")
+    parser.add_argument("--max-size", type=int, default=DEFAULT_MAX_SIZE, help=f"Largest input size (default {DEFAULT_MAX_SIZE}, up to {SIZES[-1]})")
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET, help="Seconds one run may take before larger sizes are skipped")
+    parser.add_argument("--time-tolerance", type=float, default=DEFAULT_TIME_TOLERANCE, help="Allowed slowdown over the baseline (default 1.5x)")
+    parser.add_argument("--memory-tolerance", type=float, default=DEFAULT_MEMORY_TOLERANCE, help="Allowed memory growth over the baseline (default 1.2x)")
+    parser.add_argument("--baselines", default=DEFAULT_BASELINES_FILE, help="Baselines JSON file")
+    parser.add_argument("--update", action="store_true", help="Record this run as the new baselines instead of comparing")
+    args = parser.parse_args()
+
+    baselines = loadBaselines(args.baselines)
+    calibration = calibrate()
+    speed = calibration / baselines["calibration"] if baselines.get("calibration") else 1.0
+    print(f"Calibration: {calibration * 1000:.1f}ms ({speed:.2f}x the baseline machine's time)")
+
+    print(f"\n{'Benchmark':<28} {'Size':>9} {'Time':>10} {'Peak memory':>12} {'Baseline':>10}  Status")
+    results: Dict[str, Dict[str, Dict]] = {}
+    failures = 0
+    for name in args.only or BENCHMARKS:
+        results[name] = runBenchmark(name, args.max_size, args.budget)
+        for size, result in results[name].items():
+            baseline = baselines["results"].get(name, {}).get(size)
+            expected = f"{baseline['seconds'] * speed * 1000:.1f}ms" if baseline and "seconds" in baseline else "-"
+            if "skipped" in result:
+                measured, memory = f"~{result['skipped']:.0f}s", "skipped"
+            else:
+                measured, memory = f"{result['seconds'] * 1000:.1f}ms", formatBytes(result["peakBytes"])
+
+            regressions = [] if args.update else compareResult(result, baseline, speed, args.time_tolerance, args.memory_tolerance)
+            failures += bool(regressions)
+            status = "REGRESSION: " + "; ".join(regressions) if regressions else ("new" if baseline is None and not args.update else "ok")
+            print(f"{name:<28} {int(size):>9,} {measured:>10} {memory:>12} {expected:>10}  {status}")
+
+    if args.update:
+        baselines["calibration"] = round(calibration, 6)
+        baselines["python"] = platform.python_version()
+        for name, sizes in results.items():
+            baselines["results"].setdefault(name, {}).update(sizes)
+        saveBaselines(args.baselines, baselines)
+        print(f"\nBaselines written to {args.baselines}")
+        return
+
+    if failures:
+        print(f"\n{failures} result(s) regressed against {args.baselines}")
+        sys.exit(1)
+    print("\nNo regressions")
+
+
+if __name__ == "__main__":
+    main()
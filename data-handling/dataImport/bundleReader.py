@@ -0,0 +1,339 @@
+"""
+Bundle Reader for Archived Import Data
+
+Collectors and backups hand over compressed bundles instead of a folder
+tree. FILE_PATH can point straight at one of these and the members are
+read into the upload list without unpacking anything to disk:
+
+- tar:   .tar, .tar.gz/.tgz, .tar.bz2, .tar.xz read as a stream (one pass, no seeking),
+         .tar.zst when the optional zstandard package is installed
+- zip:   .zip members read one at a time
+- JSONL: .jsonl, .jsonl.gz (and .jsonl.zst) - one record per line, each becomes a .json file
+
+Tar and zip members keep the folder from their path inside the archive
+(BUNDLE_STRIP_COMPONENTS drops leading directories, like tar's
+--strip-components). JSONL records take their folder from a record field
+(BUNDLE_FOLDER_FIELD, "dataSource" by default) and their name from the
+first of BUNDLE_NAME_FIELDS the record has.
+
+Members are keyed as "<bundle>/<member path>" so basenames, de-duplication
+and the import state work the same as for files on disk. Absolute member
+paths and paths with ".." parts are skipped, and JSONL folder and name
+fields are reduced to plain path parts, so nothing lands outside the
+bundle's folders on the server. Splittable members
+over the upload limit are handed to the splitter (fileSplitter.py) with
+their content, like oversized files on disk.
+
+Usage:
+    python data-handling/dataImport/bundleReader.py <bundle>    # list what would be imported
+"""
+
+import gzip
+import io
+import json
+import os
+import re
+import sys
+import tarfile
+import zipfile
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+# Bundle suffixes, longest first so ".tar.gz" wins over ".gz"
+TAR_SUFFIXES: List[str] = [".tar.gz", ".tar.bz2", ".tar.xz", ".tar.zst", ".tgz", ".tar"]
+ZIP_SUFFIXES: List[str] = [".zip"]
+JSONL_SUFFIXES: List[str] = [".jsonl.gz", ".jsonl.zst", ".jsonl"]
+
+# Record fields used to place and name JSONL records
+DEFAULT_FOLDER_FIELD = "dataSource"
+DEFAULT_NAME_FIELDS: List[str] = ["fileId", "projectKey", "spaceKey", "ehsId"]
+
+
+def bundleKind(path: str) -> Optional[str]:
+    """
+    Work out what kind of bundle a path is from its suffix.
+
+    Args:
+        path: FILE_PATH value
+
+    Returns:
+        "tar", "zip" or "jsonl", or None when the path isn't a bundle file
+    """
+    if not path or not os.path.isfile(path):
+        return None
+    lower = path.lower()
+    for kind, suffixes in (("tar", TAR_SUFFIXES), ("zip", ZIP_SUFFIXES), ("jsonl", JSONL_SUFFIXES)):
+        if any(lower.endswith(suffix) for suffix in suffixes):
+            return kind
+    return None
+
+
+def isBundle(path: str) -> bool:
+    """
+    Check whether FILE_PATH points at a bundle rather than a directory.
+
+    Args:
+        path: FILE_PATH value
+
+    Returns:
+        True for a supported bundle file
+    """
+    return bundleKind(path) is not None
+
+
+def openZstd(rawFile: BinaryIO) -> BinaryIO:
+    """
+    Wrap a file in a streaming zstandard decompressor.
+
+    zstandard is optional - only .zst bundles need it.
+
+    Args:
+        rawFile: Compressed file opened in binary mode
+
+    Returns:
+        Readable stream of decompressed bytes
+    """
+    try:
+        import zstandard
+    except ImportError:
+        print("Error: .zst bundles need the zstandard package (pip install zstandard)")
+        sys.exit(1)
+    return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(rawFile))
+
+
+def memberParts(memberPath: str) -> Optional[List[str]]:
+    """
+    Split an archive member path into its parts.
+
+    Args:
+        memberPath: Path of the member inside the archive
+
+    Returns:
+        Path parts, or None for absolute paths and paths with ".." parts
+    """
+    normalized = memberPath.replace("\\", "/")
+    if normalized.startswith("/") or re.match(r"^[A-Za-z]:", normalized):
+        return None
+    parts = [part for part in normalized.split("/") if part and part != "."]
+    return None if ".." in parts else parts
+
+
+def safePathPart(value: str) -> str:
+    """Reduce a record field to a single path part ("../../p" becomes "p", "a/b" becomes "a-b")."""
+    return "-".join(part.strip(". ") for part in re.split(r"[\\/:]+", value) if part.strip(". "))
+
+
+def memberFolder(memberPath: str, stripComponents: int) -> Optional[str]:
+    """
+    Get the target folder for an archive member.
+
+    Args:
+        memberPath: Path of the member inside the archive
+        stripComponents: Leading directories to drop
+
+    Returns:
+        Folder path ("" for the root), or None when stripping removes the file itself
+        or the path is unsafe (absolute or with ".." parts)
+    """
+    parts = memberParts(memberPath)
+    if parts is None or len(parts) <= stripComponents:
+        return None
+    return "/".join(parts[stripComponents:-1])
+
+
+def iterTar(path: str) -> Iterator[Tuple[str, bytes]]:
+    """
+    Stream the regular files out of a tar bundle in archive order.
+
+    Args:
+        path: Tar bundle path
+
+    Yields:
+        (member path, content) tuples
+    """
+    with open(path, "rb") as rawFile:
+        if path.lower().endswith(".zst"):
+            with tarfile.open(fileobj=openZstd(rawFile), mode="r|") as archive:
+                yield from tarMembers(archive)
+        else:
+            with tarfile.open(fileobj=rawFile, mode="r|*") as archive:
+                yield from tarMembers(archive)
+
+
+def tarMembers(archive: tarfile.TarFile) -> Iterator[Tuple[str, bytes]]:
+    """
+    Read each regular file of an open streaming tar archive.
+
+    Args:
+        archive: Tar archive opened in stream mode
+
+    Yields:
+        (member path, content) tuples
+    """
+    for member in archive:
+        if member.isfile():
+            yield member.name, archive.extractfile(member).read()
+
+
+def iterZip(path: str) -> Iterator[Tuple[str, bytes]]:
+    """
+    Read the files out of a zip bundle one at a time.
+
+    Args:
+        path: Zip bundle path
+
+    Yields:
+        (member path, content) tuples
+    """
+    with zipfile.ZipFile(path) as archive:
+        for info in archive.infolist():
+            if not info.is_dir():
+                yield info.filename, archive.read(info)
+
+
+def iterJsonl(path: str, folderField: str, nameFields: List[str]) -> Iterator[Tuple[str, bytes]]:
+    """
+    Turn each JSONL record into a JSON document under its source folder.
+
+    Records are named from the first of nameFields they have; names repeated
+    within a folder get a -2, -3... suffix so nothing is overwritten.
+
+    Args:
+        path: JSONL bundle path
+        folderField: Record field holding the target folder
+        nameFields: Record fields tried in order for the file name
+
+    Yields:
+        (member path, content) tuples
+    """
+    stem = os.path.basename(path).split(".")[0]
+    seen: Dict[str, int] = {}
+
+    with open(path, "rb") as rawFile:
+        if path.lower().endswith(".gz"):
+            stream: BinaryIO = gzip.GzipFile(fileobj=rawFile)
+        elif path.lower().endswith(".zst"):
+            stream = openZstd(rawFile)
+        else:
+            stream = rawFile
+
+        for lineNumber, line in enumerate(stream, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                print(f"Skipping line {lineNumber} of {os.path.basename(path)}: {str(e)}")
+                continue
+
+            fields = record if isinstance(record, dict) else {}
+            # Record values name server folders - keep them to plain parts ("../../x" becomes "x")
+            folder = "/".join(part for part in map(safePathPart, re.split(r"[\\/]+", str(fields.get(folderField) or ""))) if part)
+            name = next((safePathPart(str(fields[field])) for field in nameFields if fields.get(field) and safePathPart(str(fields[field]))), f"{stem}-{lineNumber}")
+            memberPath = f"{folder}/{name}" if folder else name
+            seen[memberPath] = seen.get(memberPath, 0) + 1
+            if seen[memberPath] > 1:
+                memberPath = f"{memberPath}-{seen[memberPath]}"
+
+            yield f"{memberPath}.json", json.dumps(record, indent=2, ensure_ascii=False).encode("utf-8")
+
+
+def iterBundle(path: str, env: Dict[str, str]) -> Iterator[Tuple[str, bytes, str]]:
+    """
+    Stream the files in a bundle with their target folders.
+
+    Args:
+        path: Bundle path
+        env: Environment settings (BUNDLE_STRIP_COMPONENTS, BUNDLE_FOLDER_FIELD, BUNDLE_NAME_FIELDS)
+
+    Yields:
+        (member path, content, target folder) tuples
+    """
+    kind = bundleKind(path)
+    if kind == "jsonl":
+        nameFields = [field.strip() for field in env.get("BUNDLE_NAME_FIELDS", "").split(",") if field.strip()] or DEFAULT_NAME_FIELDS
+        for memberPath, content in iterJsonl(path, env.get("BUNDLE_FOLDER_FIELD") or DEFAULT_FOLDER_FIELD, nameFields):
+            yield memberPath, content, os.path.dirname(memberPath)
+        return
+
+    stripComponents = int(env.get("BUNDLE_STRIP_COMPONENTS", 0) or 0)
+    members = iterTar(path) if kind == "tar" else iterZip(path)
+    for memberPath, content in members:
+        parts = memberParts(memberPath)
+        if parts is None:
+            print(f"Skipping bundle member {memberPath}: absolute paths and '..' are not allowed")
+            continue
+        folder = memberFolder(memberPath, stripComponents)
+        if folder is not None:
+            yield "/".join(parts), content, folder
+
+
+def readBundle(path: str, env: Dict[str, str], smallBatchRun: bool, smallBatchSize: int, includedFileTypes: List[str],
+               oversizedFiles: Optional[List[Tuple[str, str]]] = None, oversizedContents: Optional[Dict[str, bytes]] = None) -> Dict[str, Tuple[bytes, str]]:
+    """
+    Build the upload list from a bundle, like buildFileListWithFolders does for a directory.
+
+    Args:
+        path: Bundle path
+        env: Environment settings
+        smallBatchRun: Whether to limit the number of files read
+        smallBatchSize: Maximum number of files when smallBatchRun is True
+        includedFileTypes: File extensions to include
+        oversizedFiles: If given (with oversizedContents), splittable members over the upload
+            limit are appended here as (key, targetFolder) instead of joining the upload list
+        oversizedContents: Receives the content of those members by key
+
+    Returns:
+        Dictionary mapping "<bundle>/<member>" keys to (file_content, target_folder) tuples
+    """
+    from fileSplitter import SPLITTABLE_FILE_TYPES
+    from importFiles import MAX_UPLOAD_BYTES
+
+    filesDict: Dict[str, Tuple[bytes, str]] = {}
+    splitMembers = oversizedFiles is not None and oversizedContents is not None
+
+    for memberPath, content, folder in iterBundle(path, env):
+        if smallBatchRun and len(filesDict) >= smallBatchSize:
+            print(f"Reached small batch limit of {smallBatchSize} files")
+            break
+        name = os.path.basename(memberPath)
+        ext = name.split(".")[-1].lower()
+        if name.startswith(".") or ext not in includedFileTypes:
+            continue
+        key = os.path.join(path, *memberPath.split("/"))
+        # Same size check as for files on disk - the member is split from memory instead of sent whole
+        if splitMembers and ext in SPLITTABLE_FILE_TYPES and len(content) > MAX_UPLOAD_BYTES:
+            oversizedFiles.append((key, folder))
+            oversizedContents[key] = content
+            continue
+        filesDict[key] = (content, folder)
+
+    if not filesDict and not (splitMembers and oversizedContents):
+        print(f"Error: Bundle {path} has no files to import")
+        sys.exit(1)
+
+    return filesDict
+
+
+def main() -> None:
+    """
+    List the files a bundle would import and their folders.
+    """
+    if len(sys.argv) < 2 or not isBundle(sys.argv[1]):
+        print("Usage: python data-handling/dataImport/bundleReader.py <bundle.tar[.gz|.zst]|.zip|.jsonl[.gz]>")
+        sys.exit(1)
+
+    from importFiles import loadEnv
+    env = loadEnv()
+    includedFileTypes = env.get("INCLUDED_FILE_TYPES", "txt,json,xml,csv").split(",")
+    files = readBundle(sys.argv[1], env, False, 0, includedFileTypes)
+
+    folders: Dict[str, int] = {}
+    for content, folder in files.values():
+        folders[folder] = folders.get(folder, 0) + 1
+    for folder, count in sorted(folders.items()):
+        print(f"{folder or '(root)'}: {count} files")
+    print(f"{len(files)} files, {sum(len(content) for content, folder in files.values())} bytes")
+
+
+if __name__ == "__main__":
+    main()
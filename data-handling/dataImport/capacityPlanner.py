@@ -0,0 +1,399 @@
+"""
+Dry-Run Capacity Planner for WWIZ Imports
+
+Estimates what an import will cost before it runs: per-folder file counts,
+bytes, tokens, embedding chunks, projected duration and vector store
+growth.
+
+- Tokens use a local approximation of a BPE tokenizer (short words are one
+  token, long words and digit runs are split, punctuation is one token
+  each) - close enough for planning, no tokenizer download needed
+- Chunks follow AnythingLLM's character splitter: CHUNK_SIZE characters
+  with CHUNK_OVERLAP characters repeated between neighbouring chunks
+- Duration uses UPLOAD_RATE / EMBED_RATE, or the upload rate measured on
+  previous runs (from the import state timestamps) when UPLOAD_RATE is blank
+- Storage counts one float32 vector per chunk plus the chunk text and
+  metadata, and the stored copy of each document
+- Files already uploaded are skipped by the importer's rule: files the
+  import state knows are compared by content hash (after the PII scrub),
+  others by name. Oversized files count as the parts they are split into
+
+Generated documents (live status, rollups, collaboration, workload scores)
+are built from the whole corpus at import time and are not planned, and
+SMALL_BATCH / SAMPLE_SIZE are not applied - the plan lists what it leaves
+out.
+
+Files are walked and read one block at a time and only per-folder totals
+are kept, so planning a 1M-file import uses constant memory.
+
+Usage:
+    python data-handling/dataImport/capacityPlanner.py            # plan FILE_PATH from .importFiles.env
+    python data-handling/dataImport/capacityPlanner.py /big/export
+"""
+
+import math
+import os
+import re
+import sys
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from importState import DEFAULT_STATE_FILE, hasChanged, loadState
+from workspaceShards import sourceFolderName
+
+# AnythingLLM text splitter defaults (characters)
+DEFAULT_CHUNK_SIZE = 1000
+DEFAULT_CHUNK_OVERLAP = 20
+
+# Default native embedder (all-MiniLM-L6-v2) vector size
+DEFAULT_EMBEDDING_DIMENSIONS = 384
+
+# Planning rates used when nothing better is known
+DEFAULT_UPLOAD_RATE = 5.0    # files per second
+DEFAULT_EMBED_RATE = 20.0    # chunks per second
+
+# Per-chunk metadata kept alongside each vector (ids, title, source, etc.)
+METADATA_BYTES_PER_CHUNK = 512
+
+# Upload gaps longer than this start a new measured session
+SESSION_GAP_SECONDS = 60
+
+# Text read per block when counting tokens
+READ_BLOCK_CHARS = 1024 * 1024
+
+TOKEN_PATTERN = re.compile(r"[A-Za-z]+|\d+|[^\sA-Za-z\d]")
+
+
+def countTokens(text: str) -> int:
+    """
+    Approximate the BPE token count of a piece of text.
+
+    Args:
+        text: Text to count
+
+    Returns:
+        Estimated token count
+    """
+    tokens = 0
+    for match in TOKEN_PATTERN.finditer(text):
+        piece = match.group()
+        length = len(piece)
+        if piece[0].isalpha():
+            # Common words are single tokens, longer ones split every ~4 letters
+            tokens += 1 if length <= 6 else 1 + math.ceil((length - 6) / 4)
+        elif piece[0].isdigit():
+            tokens += math.ceil(length / 3)
+        else:
+            tokens += 1
+    return tokens
+
+
+def countFileTokens(filePath: str) -> Tuple[int, int]:
+    """
+    Count characters and tokens in a file, one block at a time.
+
+    Args:
+        filePath: File to count
+
+    Returns:
+        Tuple of (characters, tokens)
+    """
+    chars = tokens = 0
+    carry = ""
+
+    with open(filePath, "r", encoding="utf-8", errors="replace") as f:
+        while True:
+            block = f.read(READ_BLOCK_CHARS)
+            if not block:
+                break
+            chars += len(block)
+            text = carry + block
+            # Hold back a trailing word/number so it isn't split across blocks
+            cut = len(text)
+            while cut > 0 and text[cut - 1].isalnum():
+                cut -= 1
+            if cut == 0:
+                carry = text
+                continue
+            tokens += countTokens(text[:cut])
+            carry = text[cut:]
+
+    return chars, tokens + countTokens(carry)
+
+
+def countChunks(chars: int, chunkSize: int, chunkOverlap: int) -> int:
+    """
+    Count the chunks the character splitter makes from a document.
+
+    Args:
+        chars: Document length in characters
+        chunkSize: Chunk size in characters
+        chunkOverlap: Overlap between neighbouring chunks
+
+    Returns:
+        Number of chunks
+    """
+    if chars <= 0:
+        return 0
+    if chars <= chunkSize:
+        return 1
+    step = max(1, chunkSize - chunkOverlap)
+    return math.ceil((chars - chunkOverlap) / step)
+
+
+def iterFiles(filePath: str, recursive: bool, includedFileTypes: List[str]) -> Iterator[Tuple[str, str]]:
+    """
+    Walk the import tree lazily, in the same folder layout as the importer.
+
+    Args:
+        filePath: Root directory
+        recursive: Include subdirectories
+        includedFileTypes: File extensions to include
+
+    Yields:
+        (fullPath, targetFolder) tuples
+    """
+    for root, dirs, files in os.walk(filePath):
+        dirs.sort()
+        relativePath = os.path.relpath(root, filePath)
+        targetFolder = relativePath if relativePath != "." else ""
+        for file in sorted(files):
+            if file.split('.')[-1].lower() in includedFileTypes:
+                yield os.path.join(root, file), targetFolder
+        if not recursive:
+            break
+
+
+def measuredUploadRate(statePath: str = DEFAULT_STATE_FILE) -> Optional[float]:
+    """
+    Work out the upload rate achieved on previous runs from the import state.
+
+    Upload times are grouped into sessions (gaps over SESSION_GAP_SECONDS
+    start a new one) and the rate is files uploaded over session time.
+
+    Args:
+        statePath: Import state file
+
+    Returns:
+        Files per second, or None if there isn't enough history
+    """
+    times = sorted(record["uploadedAt"] for record in loadState(statePath)["files"].values() if "uploadedAt" in record)
+    if len(times) < 2:
+        return None
+
+    files = 0
+    seconds = 0.0
+    sessionStart = previous = times[0]
+    sessionFiles = 1
+    for uploadedAt in times[1:] + [math.inf]:
+        if uploadedAt - previous > SESSION_GAP_SECONDS:
+            if sessionFiles > 1 and previous > sessionStart:
+                files += sessionFiles - 1
+                seconds += previous - sessionStart
+            sessionStart, sessionFiles = uploadedAt, 1
+        else:
+            sessionFiles += 1
+        previous = uploadedAt
+
+    return files / seconds if seconds > 0 else None
+
+
+def fileChanged(fullPath: str, targetFolder: str, state: Dict, scrubConfig: Optional[Dict]) -> bool:
+    """Compare a file the import state knows with its recorded hash (scrubbed first, as the importer does)."""
+    with open(fullPath, "rb") as f:
+        content = f.read()
+    if scrubConfig:
+        from piiScrubber import scrubContent
+        content = scrubContent(content, targetFolder, scrubConfig)
+    return hasChanged(state, fullPath, content)
+
+
+def planImport(filePath: str, recursive: bool, includedFileTypes: List[str], existingFiles: Set[str], chunkSize: int, chunkOverlap: int,
+               state: Optional[Dict] = None, changedSources: Optional[Set[str]] = None, scrubConfig: Optional[Dict] = None,
+               splitBytes: int = 0, partBytes: int = 0, splittableTypes: Optional[List[str]] = None) -> Dict[str, Dict[str, int]]:
+    """
+    Stream the import tree and total up files, bytes, tokens and chunks per folder.
+
+    Args:
+        filePath: Root directory
+        recursive: Include subdirectories
+        includedFileTypes: File extensions to include
+        existingFiles: Names already on the server (skipped unless the state says they changed)
+        chunkSize: Chunk size in characters
+        chunkOverlap: Overlap between chunks
+        state: Import state - files it knows are compared by content hash instead of by name
+        changedSources: Source folders whose untracked server copies are replaced (REFRESH_CHANGED_SOURCES)
+        scrubConfig: PII scrub configuration, applied before hashing like the importer does
+        splitBytes: Files of splittableTypes over this size are split (0 to upload them whole)
+        partBytes: Split part size
+        splittableTypes: File extensions the splitter handles
+
+    Returns:
+        Folder -> totals dictionary
+    """
+    totals: Dict[str, Dict[str, int]] = {}
+    trackedFiles = (state or {}).get("files", {})
+    changedSources = changedSources or set()
+
+    for fullPath, targetFolder in iterFiles(filePath, recursive, includedFileTypes):
+        folder = totals.setdefault(targetFolder or "root", {"files": 0, "changed": 0, "skipped": 0, "split": 0, "bytes": 0, "chars": 0, "tokens": 0, "chunks": 0, "embeddedChars": 0, "embeddedTokens": 0})
+        size = os.path.getsize(fullPath)
+        split = splitBytes > 0 and size > splitBytes and fullPath.split(".")[-1].lower() in (splittableTypes or [])
+
+        # Same rule as removeUnchanged; split files keep per-part hashes and are counted in full
+        if not split and fullPath in trackedFiles:
+            if not fileChanged(fullPath, targetFolder, state, scrubConfig):
+                folder["skipped"] += 1
+                continue
+            folder["changed"] += 1
+        elif not split and os.path.basename(fullPath) in existingFiles:
+            if sourceFolderName(targetFolder) not in changedSources:
+                folder["skipped"] += 1
+                continue
+            folder["changed"] += 1
+
+        chars, tokens = countFileTokens(fullPath)
+        chunks = countChunks(chars, chunkSize, chunkOverlap)
+        # Overlapping characters are embedded twice
+        embeddedChars = chars + max(0, chunks - 1) * chunkOverlap
+
+        if split:
+            folder["split"] += 1
+        folder["files"] += math.ceil(size / partBytes) if split and partBytes else 1
+        folder["bytes"] += size
+        folder["chars"] += chars
+        folder["tokens"] += tokens
+        folder["chunks"] += chunks
+        folder["embeddedChars"] += embeddedChars
+        folder["embeddedTokens"] += round(tokens * embeddedChars / chars) if chars else 0
+
+    return totals
+
+
+def formatBytes(size: float) -> str:
+    """Human readable byte size."""
+    for unit in ["B", "KB", "MB", "GB"]:
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+
+def formatDuration(seconds: float) -> str:
+    """Human readable duration."""
+    if seconds < 120:
+        return f"{seconds:.0f}s"
+    if seconds < 7200:
+        return f"{seconds / 60:.1f}m"
+    return f"{seconds / 3600:.1f}h"
+
+
+def printPlan(totals: Dict[str, Dict[str, int]], uploadRate: float, uploadRateSource: str, embedRate: float, dimensions: int) -> Dict[str, float]:
+    """
+    Print the per-folder plan and the projected duration and storage.
+
+    Args:
+        totals: Result of planImport
+        uploadRate: Files per second
+        uploadRateSource: Where the upload rate came from (for the report)
+        embedRate: Chunks per second
+        dimensions: Embedding vector size
+
+    Returns:
+        Projection dictionary (uploadSeconds, embedSeconds, vectorBytes, documentBytes)
+    """
+    print(f"\n{'Folder':<32} {'Files':>8} {'Changed':>8} {'Skipped':>8} {'Size':>10} {'Tokens':>11} {'Chunks':>9}")
+    grand = {"files": 0, "changed": 0, "skipped": 0, "split": 0, "bytes": 0, "tokens": 0, "chunks": 0, "embeddedChars": 0, "embeddedTokens": 0}
+    for folder, folderTotals in sorted(totals.items()):
+        print(f"{folder:<32} {folderTotals['files']:>8} {folderTotals['changed']:>8} {folderTotals['skipped']:>8} {formatBytes(folderTotals['bytes']):>10} {folderTotals['tokens']:>11,} {folderTotals['chunks']:>9,}")
+        for key in grand:
+            grand[key] += folderTotals[key]
+    print(f"{'TOTAL':<32} {grand['files']:>8} {grand['changed']:>8} {grand['skipped']:>8} {formatBytes(grand['bytes']):>10} {grand['tokens']:>11,} {grand['chunks']:>9,}")
+    if grand["split"]:
+        print(f"Files include the parts of {grand['split']} oversized files, counted in full (parts that haven't changed are skipped at upload)")
+
+    uploadSeconds = grand["files"] / uploadRate if uploadRate else 0
+    embedSeconds = grand["chunks"] / embedRate if embedRate else 0
+    # float32 vector + chunk text + metadata per chunk; documents are stored once more as parsed JSON
+    vectorBytes = grand["chunks"] * (dimensions * 4 + METADATA_BYTES_PER_CHUNK) + grand["embeddedChars"]
+    documentBytes = grand["bytes"] * 1.1
+
+    print(f"\nEmbedded tokens (incl. overlap): {grand['embeddedTokens']:,}")
+    print(f"Upload:  {formatDuration(uploadSeconds)} at {uploadRate:.2f} files/s ({uploadRateSource})")
+    print(f"Embed:   {formatDuration(embedSeconds)} at {embedRate:.2f} chunks/s")
+    print(f"Total:   {formatDuration(uploadSeconds + embedSeconds)}")
+    print(f"Vector store growth: {formatBytes(vectorBytes)} ({grand['chunks']:,} x {dimensions}-dim vectors)")
+    print(f"Document storage:    {formatBytes(documentBytes)}")
+
+    return {"uploadSeconds": uploadSeconds, "embedSeconds": embedSeconds, "vectorBytes": vectorBytes, "documentBytes": documentBytes}
+
+
+def runCapacityPlan(env: Dict[str, str], existingFiles: Set[str]) -> Dict[str, float]:
+    """
+    Plan an import from the env settings.
+
+    Args:
+        env: Environment variables
+        existingFiles: Names already on the server
+
+    Returns:
+        Projection dictionary from printPlan
+    """
+    filePath = env.get("FILE_PATH", "data")
+    recursive = str(env.get("RECURSIVE", "true")).lower() == 'true'
+    includedFileTypes = env.get("INCLUDED_FILE_TYPES", "txt,json,xml,csv").split(",")
+    chunkSize = int(env.get("CHUNK_SIZE", DEFAULT_CHUNK_SIZE) or DEFAULT_CHUNK_SIZE)
+    chunkOverlap = int(env.get("CHUNK_OVERLAP", DEFAULT_CHUNK_OVERLAP) or 0)
+    dimensions = int(env.get("EMBEDDING_DIMENSIONS", DEFAULT_EMBEDDING_DIMENSIONS) or DEFAULT_EMBEDDING_DIMENSIONS)
+    embedRate = float(env.get("EMBED_RATE", DEFAULT_EMBED_RATE) or DEFAULT_EMBED_RATE)
+
+    uploadRate = float(env.get("UPLOAD_RATE", 0) or 0)
+    uploadRateSource = "UPLOAD_RATE"
+    if not uploadRate:
+        uploadRate = measuredUploadRate(env.get("IMPORT_STATE_FILE", DEFAULT_STATE_FILE)) or DEFAULT_UPLOAD_RATE
+        uploadRateSource = "measured on previous runs" if uploadRate != DEFAULT_UPLOAD_RATE else "default"
+
+    from importFiles import parseChangedSources, MAX_UPLOAD_BYTES
+    from fileSplitter import DEFAULT_PART_BYTES, SPLITTABLE_FILE_TYPES
+
+    scrubConfig = None
+    if env.get("PII_SCRUB", "false").lower() == 'true':
+        from piiScrubber import loadScrubConfig
+        try:
+            scrubConfig = loadScrubConfig(env)
+        except ValueError as e:
+            print(f"Error: {e}")
+            return {}
+    splitBytes = MAX_UPLOAD_BYTES if env.get("SPLIT_LARGE_FILES", "true").lower() == 'true' else 0
+    partBytes = int(env.get("SPLIT_PART_BYTES", 0) or 0) or DEFAULT_PART_BYTES
+
+    print(f"Capacity plan for {filePath} (chunk size {chunkSize}, overlap {chunkOverlap})")
+    totals = planImport(filePath, recursive, includedFileTypes, existingFiles, chunkSize, chunkOverlap, loadState(env.get("IMPORT_STATE_FILE", DEFAULT_STATE_FILE)),
+                        set(parseChangedSources(env)), scrubConfig, splitBytes, partBytes, SPLITTABLE_FILE_TYPES)
+    projection = printPlan(totals, uploadRate, uploadRateSource, embedRate, dimensions)
+    printExclusions(env)
+    return projection
+
+
+def printExclusions(env: Dict[str, str]) -> None:
+    """Print the import stages this plan doesn't cover."""
+    generated = [name for setting, name in [("PARTITION_FIELDS", "live status"), ("ROLLUPS", "rollup"), ("COLLABORATION", "collaboration"), ("WORKLOAD_SCORES", "workload score")]
+                 if env.get(setting, "false").lower() == 'true']
+    if generated:
+        print(f"Not planned: {', '.join(generated)} documents (built from the whole corpus at import time, uploaded when changed)")
+    if env.get("SAMPLE_SIZE", "").strip():
+        print(f"Not applied: SAMPLE_SIZE={env['SAMPLE_SIZE'].strip()} - the plan covers every file, not the sample")
+    if env.get("SMALL_BATCH", "false").lower() == 'true':
+        print("Not applied: SMALL_BATCH - the plan covers every file, not the batch")
+
+
+def main() -> None:
+    from importFiles import loadEnv
+
+    env = loadEnv()
+    if len(sys.argv) > 1:
+        env["FILE_PATH"] = sys.argv[1]
+    runCapacityPlan(env, set())
+
+
+if __name__ == "__main__":
+    main()
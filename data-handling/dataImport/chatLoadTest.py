@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+"""
+WWIZ Chat Load Test
+
+Replays chat questions against the AnythingLLM workspace chat API (or the
+local chatStub.py stand-in) to size the EC2 instance and the AnythingLLM
+mem_limit in infra/scripts/docker-compose.yml from measurements instead of
+guesswork.
+
+Arrival models:
+- closed: --concurrency virtual users, each asking its next question as soon
+  as the previous answer arrives (plus optional think time)
+- open:   questions arrive at --rate per second (Poisson) whether or not
+  earlier ones finished; latency is measured from the scheduled arrival,
+  so queueing inside the server shows up in the numbers
+
+Reports throughput, p50/p95/p99 latency, time-to-first-token (streaming
+endpoint) and error rate. Every run is appended to a JSONL results file
+with its labels so runs can be compared across instance sizes and corpus
+layouts.
+
+Usage:
+    python data-handling/dataImport/chatLoadTest.py --mode closed --concurrency 4 --duration 60
+    python data-handling/dataImport/chatLoadTest.py --mode open --rate 2 --label instance=t3.large --label corpus=sharded
+    python data-handling/dataImport/chatLoadTest.py --compare
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import requests
+
+from percentiles import percentile
+
+# Default question source
+SUGGESTED_TEST_CASES = "SuggestedTestCases.md"
+
+# Default results file, overridable with --results
+DEFAULT_RESULTS_FILE = os.path.join("data-handling", "dataImport", "loadTestResults.jsonl")
+
+# Questions in SuggestedTestCases.md are bold quoted lines: **"Who ...?"**
+QUESTION_PATTERN = re.compile(r'^\*\*"(.+)"\*\*\s*$')
+
+
+def loadQuestions(path: str) -> List[str]:
+    """
+    Load questions from a markdown test-case file or a plain text file.
+
+    Markdown files contribute their **"..."** questions; any other file
+    contributes one question per non-empty line.
+
+    Args:
+        path: Question file
+
+    Returns:
+        List of questions
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        lines = [line.strip() for line in f]
+
+    if path.lower().endswith(".md"):
+        return [match.group(1) for match in map(QUESTION_PATTERN.match, lines) if match]
+    return [line for line in lines if line and not line.startswith("#")]
+
+
+def parseMix(mix: str) -> List[Tuple[List[str], float]]:
+    """
+    Parse a question mix into weighted question pools.
+
+    Format: "SuggestedTestCases.md=3,notes/more-questions.txt=1"
+
+    Args:
+        mix: Comma-separated file=weight entries (weight defaults to 1)
+
+    Returns:
+        List of (questions, weight) tuples
+    """
+    pools = []
+    for entry in mix.split(","):
+        if not entry.strip():
+            continue
+        path, _, weight = entry.partition("=")
+        questions = loadQuestions(path.strip())
+        if not questions:
+            print(f"No questions found in {path.strip()} - ignoring")
+            continue
+        pools.append((questions, float(weight or 1)))
+    return pools
+
+
+def pickQuestion(pools: List[Tuple[List[str], float]], rng: random.Random) -> str:
+    """Pick a question: a pool by weight, then a question from that pool."""
+    questions = rng.choices([pool for pool, weight in pools], weights=[weight for pool, weight in pools])[0]
+    return rng.choice(questions)
+
+
+_local = threading.local()
+
+
+def getSession(apiKey: str) -> requests.Session:
+    """One keep-alive session per load-test thread."""
+    if not hasattr(_local, "session"):
+        _local.session = requests.Session()
+        _local.session.headers.update({"Authorization": f"Bearer {apiKey}", "Content-Type": "application/json"})
+    return _local.session
+
+
+def askQuestion(question: str, workspace: str, serverUrl: str, apiKey: str, stream: bool, timeout: float, sentAt: Optional[float] = None) -> Dict:
+    """
+    Ask one question and time it.
+
+    Args:
+        question: Chat question
+        workspace: Workspace slug
+        serverUrl: AnythingLLM (or stub) URL
+        apiKey: API key for authentication
+        stream: Use the stream-chat endpoint so time-to-first-token can be measured
+        timeout: Request timeout in seconds
+        sentAt: Scheduled arrival time (open loop) - latency is measured from here
+
+    Returns:
+        Sample dictionary: {"ok", "latency", "ttft", "error"}
+    """
+    started = sentAt if sentAt is not None else time.perf_counter()
+    endpoint = f"{serverUrl}/api/v1/workspace/{workspace}/{'stream-chat' if stream else 'chat'}"
+    sample: Dict = {"ok": False, "latency": None, "ttft": None, "error": None}
+
+    try:
+        session = getSession(apiKey)
+        response = session.post(endpoint, json={"message": question, "mode": "query"}, stream=stream, timeout=timeout)
+        if response.status_code != 200:
+            sample["error"] = f"HTTP {response.status_code}"
+            response.close()
+            return sample
+
+        if stream:
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                chunk = json.loads(line[5:])
+                if chunk.get("error"):
+                    sample["error"] = str(chunk["error"])
+                    break
+                if sample["ttft"] is None and chunk.get("textResponse"):
+                    sample["ttft"] = time.perf_counter() - started
+                if chunk.get("close"):
+                    break
+            response.close()
+        else:
+            body = response.json()
+            if body.get("error"):
+                sample["error"] = str(body["error"])
+
+    except (requests.RequestException, ValueError) as e:
+        sample["error"] = type(e).__name__
+
+    sample["latency"] = time.perf_counter() - started
+    sample["ok"] = sample["error"] is None
+    return sample
+
+
+def runClosedLoop(pools, workspace: str, serverUrl: str, apiKey: str, concurrency: int, duration: float, maxRequests: int, thinkTime: float, stream: bool, timeout: float, seed: int) -> List[Dict]:
+    """
+    Run virtual users that each ask, wait for the answer, think, and repeat.
+
+    Returns:
+        List of samples
+    """
+    samples: List[Dict] = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+    issued = [0]
+
+    def virtualUser(userId: int) -> None:
+        rng = random.Random(seed + userId)
+        while time.perf_counter() < deadline:
+            with lock:
+                if maxRequests and issued[0] >= maxRequests:
+                    return
+                issued[0] += 1
+            sample = askQuestion(pickQuestion(pools, rng), workspace, serverUrl, apiKey, stream, timeout)
+            with lock:
+                samples.append(sample)
+            if thinkTime:
+                time.sleep(rng.expovariate(1 / thinkTime))
+
+    threads = [threading.Thread(target=virtualUser, args=(i,), daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples
+
+
+def runOpenLoop(pools, workspace: str, serverUrl: str, apiKey: str, rate: float, concurrency: int, duration: float, maxRequests: int, stream: bool, timeout: float, seed: int) -> List[Dict]:
+    """
+    Send questions at a Poisson arrival rate, independent of response times.
+
+    Requests that can't start because every worker is busy wait in the
+    executor queue; that wait counts towards their latency.
+
+    Returns:
+        List of samples
+    """
+    rng = random.Random(seed)
+    futures = []
+    started = time.perf_counter()
+    nextArrival = started
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        while nextArrival < started + duration and (not maxRequests or len(futures) < maxRequests):
+            delay = nextArrival - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            futures.append(executor.submit(askQuestion, pickQuestion(pools, rng), workspace, serverUrl, apiKey, stream, timeout, nextArrival))
+            nextArrival += rng.expovariate(rate)
+
+    return [future.result() for future in futures]
+
+
+def summarise(samples: List[Dict], elapsed: float) -> Dict:
+    """
+    Turn raw samples into the run summary.
+
+    Args:
+        samples: Per-request samples
+        elapsed: Wall-clock duration of the run
+
+    Returns:
+        Summary dictionary (times in milliseconds)
+    """
+    latencies = [s["latency"] for s in samples if s["ok"]]
+    ttfts = [s["ttft"] for s in samples if s["ok"] and s["ttft"] is not None]
+    errors = [s for s in samples if not s["ok"]]
+
+    def ms(value: Optional[float]) -> Optional[float]:
+        return round(value * 1000, 1) if value is not None else None
+
+    return {
+        "requests": len(samples),
+        "errors": len(errors),
+        "errorRate": round(len(errors) / len(samples), 4) if samples else 0,
+        "errorTypes": {error: sum(1 for s in errors if s["error"] == error) for error in sorted({s["error"] for s in errors})},
+        "throughput": round(len(latencies) / elapsed, 3) if elapsed else 0,
+        "latencyMs": {name: ms(percentile(latencies, pct)) for name, pct in (("p50", 50), ("p95", 95), ("p99", 99))},
+        "ttftMs": {name: ms(percentile(ttfts, pct)) for name, pct in (("p50", 50), ("p95", 95), ("p99", 99))},
+        "elapsedSeconds": round(elapsed, 2),
+    }
+
+
+def printSummary(result: Dict) -> None:
+    """Print one run's summary."""
+    summary = result["summary"]
+    print(f"\n=== {result['config']['mode']} loop against {result['config']['workspace']} ===")
+    print(f"Requests: {summary['requests']}  Errors: {summary['errors']} ({summary['errorRate']:.1%})  Throughput: {summary['throughput']} req/s")
+    print(f"Latency ms  p50: {summary['latencyMs']['p50']}  p95: {summary['latencyMs']['p95']}  p99: {summary['latencyMs']['p99']}")
+    print(f"TTFT ms     p50: {summary['ttftMs']['p50']}  p95: {summary['ttftMs']['p95']}  p99: {summary['ttftMs']['p99']}")
+    for error, count in summary["errorTypes"].items():
+        print(f"  {count} x {error}")
+
+
+def saveResult(result: Dict, resultsPath: str) -> None:
+    """Append one run to the JSONL results file."""
+    folder = os.path.dirname(resultsPath)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    with open(resultsPath, "a", encoding="utf-8") as f:
+        f.write(json.dumps(result) + "\n")
+    print(f"Result appended to {resultsPath}")
+
+
+def compareResults(resultsPath: str) -> None:
+    """Print every stored run side by side."""
+    if not os.path.exists(resultsPath):
+        print(f"No results yet: {resultsPath}")
+        return
+
+    print(f"{'Run':<20} {'Labels':<34} {'Mode':<7} {'Load':>6} {'Req/s':>7} {'p50':>8} {'p95':>8} {'p99':>8} {'TTFT50':>8} {'Err':>6}")
+    with open(resultsPath, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            result = json.loads(line)
+            config, summary = result["config"], result["summary"]
+            labels = ",".join(f"{k}={v}" for k, v in sorted(result.get("labels", {}).items()))
+            load = config["rate"] if config["mode"] == "open" else config["concurrency"]
+            print(f"{result['startedAt']:<20} {labels[:34]:<34} {config['mode']:<7} {load:>6} {summary['throughput']:>7} "
+                  f"{str(summary['latencyMs']['p50']):>8} {str(summary['latencyMs']['p95']):>8} {str(summary['latencyMs']['p99']):>8} "
+                  f"{str(summary['ttftMs']['p50']):>8} {summary['errorRate']:>6.1%}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load test the WWIZ workspace chat API")
+    parser.add_argument("--mode", choices=["closed", "open"], default="closed", help="Arrival model (default closed)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Virtual users (closed) or max in-flight requests (open)")
+    parser.add_argument("--rate", type=float, default=1.0, help="Open loop arrival rate, questions per second")
+    parser.add_argument("--duration", type=float, default=60, help="Run length in seconds")
+    parser.add_argument("--requests", type=int, default=0, help="Stop after this many requests (0 = no limit)")
+    parser.add_argument("--think-ms", type=float, default=0, help="Mean think time between a user's questions (closed loop)")
+    parser.add_argument("--mix", default=SUGGESTED_TEST_CASES, help='Question files and weights, e.g. "SuggestedTestCases.md=3,extra.txt=1"')
+    parser.add_argument("--workspace", help="Workspace slug (default WORKSPACE_SLUG or the first of WORKSPACES)")
+    parser.add_argument("--url", help="Server URL (default ANYTHINGLLM_URL from .importFiles.env)")
+    parser.add_argument("--api-key", help="API key (default ANYTHINGLLM_API_KEY from .importFiles.env)")
+    parser.add_argument("--no-stream", action="store_true", help="Use the blocking chat endpoint (no time-to-first-token)")
+    parser.add_argument("--timeout", type=float, default=120, help="Per-request timeout in seconds")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed for question choice and arrivals")
+    parser.add_argument("--label", action="append", default=[], help="key=value stored with the run, e.g. instance=t3.large")
+    parser.add_argument("--results", default=DEFAULT_RESULTS_FILE, help="JSONL file runs are appended to")
+    parser.add_argument("--compare", action="store_true", help="Print stored runs and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compareResults(args.results)
+        return
+
+    env: Dict[str, str] = {}
+    if not args.url or args.api_key is None or not args.workspace:
+        from importFiles import loadEnv
+        env = loadEnv()
+
+    serverUrl = (args.url or env.get("ANYTHINGLLM_URL", "")).rstrip("/")
+    apiKey = args.api_key if args.api_key is not None else env.get("ANYTHINGLLM_API_KEY", "")
+    workspace = args.workspace or env.get("WORKSPACE_SLUG") or (env.get("WORKSPACES") or "wizz").split(",")[0].strip() or "wizz"
+    # Follow a blue/green rebuild alias to the workspace currently taking traffic
+    from workspaceRebuild import resolveWorkspace, DEFAULT_POINTER_FILE
+    workspace = resolveWorkspace(workspace, env.get("WORKSPACE_POINTER_FILE", DEFAULT_POINTER_FILE))
+
+    pools = parseMix(args.mix)
+    if not pools:
+        print("No questions to ask - check --mix")
+        return
+
+    stream = not args.no_stream
+    print(f"Load testing {serverUrl} workspace '{workspace}' with {sum(len(q) for q, w in pools)} questions "
+          f"({args.mode} loop, {'rate ' + str(args.rate) + '/s' if args.mode == 'open' else str(args.concurrency) + ' users'}, {args.duration:.0f}s)")
+
+    startedAt = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+    started = time.perf_counter()
+    if args.mode == "closed":
+        samples = runClosedLoop(pools, workspace, serverUrl, apiKey, args.concurrency, args.duration, args.requests, args.think_ms / 1000, stream, args.timeout, args.seed)
+    else:
+        samples = runOpenLoop(pools, workspace, serverUrl, apiKey, args.rate, args.concurrency, args.duration, args.requests, stream, args.timeout, args.seed)
+    elapsed = time.perf_counter() - started
+
+    result = {
+        "startedAt": startedAt,
+        "labels": dict(label.split("=", 1) for label in args.label if "=" in label),
+        "config": {
+            "mode": args.mode, "concurrency": args.concurrency, "rate": args.rate, "duration": args.duration,
+            "thinkMs": args.think_ms, "mix": args.mix, "workspace": workspace, "serverUrl": serverUrl, "stream": stream,
+        },
+        "summary": summarise(samples, elapsed),
+    }
+    printSummary(result)
+    saveResult(result, args.results)
+
+
+if __name__ == "__main__":
+    main()
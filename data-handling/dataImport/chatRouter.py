@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+WWIZ Chat Router
+
+Sits in front of AnythingLLM chat when the knowledge base is sharded
+(see workspaceShards.py). Each question is routed to the shard
+workspace(s) most likely to hold the answer, so every search covers a
+much smaller vector set.
+
+Usage:
+    python data-handling/dataImport/chatRouter.py "Who reports to Maya Patel?"
+    python data-handling/dataImport/chatRouter.py --route-only "Is Tim free this week?"
+"""
+
+import sys
+from collections import Counter
+from typing import Dict, List
+
+import requests
+
+from importFiles import loadEnv
+from workspaceShards import loadDepartmentIndex, routeQuestion, shardSlug, slugify
+
+
+def loadDepartments(filePath: str) -> List[str]:
+    """
+    Read the department names from the local HRIS staff records (the whole tree).
+
+    Args:
+        filePath: Root data folder (FILE_PATH)
+
+    Returns:
+        Unique department names, largest first (the order routeQuestion falls back in)
+    """
+    # Same lookup the importer shards by, so every department shard is considered
+    headcounts = Counter(loadDepartmentIndex(filePath).values())
+
+    return sorted(headcounts, key=lambda department: (-headcounts[department], department))
+
+
+def mentionedDepartments(question: str, env: Dict[str, str]) -> List[str]:
+    """
+    Find the departments of people a question names (by email, Slack mention or full name).
+
+    Args:
+        question: User's chat question
+        env: Environment settings (IDENTITY_INDEX_FILE)
+
+    Returns:
+        Department names in order of first mention (empty without an identity index)
+    """
+    from identityIndex import loadIdentityIndex
+    identityIndex = loadIdentityIndex(env)
+    departments = [identityIndex.profile(ehsId).get("department") for ehsId in identityIndex.findPeople(question)]
+    return list(dict.fromkeys(department for department in departments if department))
+
+
+def chatWithWorkspace(question: str, workspace: str, serverUrl: str, apiKey: str, mode: str = "query") -> Dict:
+    """
+    Send a question to a single workspace.
+
+    Args:
+        question: User's chat question
+        workspace: Workspace slug
+        serverUrl: AnythingLLM server URL
+        apiKey: API key for authentication
+        mode: AnythingLLM chat mode ("query" or "chat")
+
+    Returns:
+        Response JSON, or an empty dict on failure
+    """
+    endpoint = f"{serverUrl}/api/v1/workspace/{workspace}/chat"
+    headers = {'Authorization': f"Bearer {apiKey}", 'Content-Type': 'application/json'}
+
+    try:
+        response = requests.post(endpoint, headers=headers, json={"message": question, "mode": mode})
+        if response.status_code == 200:
+            return response.json()
+        print(f"Chat failed in workspace '{workspace}': {response.status_code} - {response.text}")
+    except Exception as e:
+        print(f"Error chatting with workspace '{workspace}': {str(e)}")
+
+    return {}
+
+
+def main() -> None:
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    routeOnly = "--route-only" in sys.argv
+
+    if not args:
+        print("Usage:")
+        print('  python chatRouter.py "<question>"               # Route and ask')
+        print('  python chatRouter.py --route-only "<question>"  # Only show the chosen shards')
+        sys.exit(1)
+
+    question = " ".join(args)
+    env = loadEnv()
+    sharding = env.get("SHARDING", "off").lower()
+    shardPrefix = env.get("SHARD_PREFIX", "wwiz")
+    maxShards = int(env.get("MAX_SHARDS_PER_QUERY", 2))
+
+    if sharding == "off":
+        print("SHARDING is off - nothing to route. Chat with your workspace directly.")
+        return
+
+    departments = loadDepartments(env.get("FILE_PATH", "data")) if sharding == "department" else []
+    shards = routeQuestion(question, sharding, shardPrefix, env.get("SHARD_MAP", ""), departments, maxShards)
+    if sharding == "department":
+        # A question about a named person goes to their department instead of every department
+        personShards = [shardSlug(shardPrefix, slugify(department)) for department in mentionedDepartments(question, env)]
+        if personShards:
+            departmentShards = {shardSlug(shardPrefix, slugify(department)) for department in departments}
+            shards = list(dict.fromkeys(personShards + [shard for shard in shards if shard not in departmentShards]))[:maxShards]
+    print(f"Routing to: {', '.join(shards)}")
+
+    if routeOnly:
+        return
+
+    # Shards rebuilt blue/green (workspaceRebuild.py) are aliases for their active workspace
+    from workspaceRebuild import resolveWorkspace, DEFAULT_POINTER_FILE
+    pointerPath = env.get("WORKSPACE_POINTER_FILE", DEFAULT_POINTER_FILE)
+    for shard in shards:
+        response = chatWithWorkspace(question, resolveWorkspace(shard, pointerPath), env.get("ANYTHINGLLM_URL"), env.get("ANYTHINGLLM_API_KEY"))
+        if not response:
+            continue
+        print(f"\n[{shard}]")
+        print(response.get("textResponse", ""))
+        sources = [source.get("title", "") for source in response.get("sources", [])]
+        if sources:
+            print(f"  Sources: {', '.join(sources)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Local Stand-In for the AnythingLLM Workspace Chat API
+
+Lets chatLoadTest.py be exercised without a real AnythingLLM instance.
+Answers POST /api/v1/workspace/<slug>/chat and /stream-chat with a canned
+reply, simulating an LLM with a limited number of generation slots:
+
+- --slots        concurrent generations before requests start to queue
+- --ttft-ms      delay before the first token
+- --tokens / --token-ms   length and pace of the streamed answer
+- --error-rate   fraction of requests answered with HTTP 500
+
+Usage:
+    python data-handling/dataImport/chatStub.py --port 3002 --slots 2 --ttft-ms 400
+    python data-handling/dataImport/chatLoadTest.py --url http://127.0.0.1:3002 --api-key stub --workspace wizz
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CHAT_PATH = re.compile(r"^/api/v1/workspace/([^/]+)/(chat|stream-chat)$")
+
+ANSWER_WORDS = "Jordan Martinez is the Game Director for Fantasy Realm Online and Alex Thompson is the Lead Developer".split()
+
+
+def makeHandler(args):
+    """Create a request handler class bound to the stub settings."""
+    slots = threading.BoundedSemaphore(args.slots)
+
+    class ChatStubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            body = self.rfile.read(length)
+            match = CHAT_PATH.match(self.path)
+
+            if not match:
+                self.sendJson(404, {"error": "Not found"})
+                return
+            try:
+                json.loads(body or b"{}")
+            except ValueError:
+                self.sendJson(400, {"error": "Invalid JSON"})
+                return
+            if random.random() < args.error_rate:
+                self.sendJson(500, {"error": "Simulated failure"})
+                return
+
+            words = [ANSWER_WORDS[i % len(ANSWER_WORDS)] for i in range(args.tokens)]
+            with slots:
+                time.sleep(args.ttft_ms / 1000)
+                if match.group(2) == "chat":
+                    time.sleep(args.token_ms * len(words) / 1000)
+                    self.sendJson(200, {"id": "stub", "type": "textResponse", "textResponse": " ".join(words), "sources": [], "close": True, "error": None})
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                for index, word in enumerate(words):
+                    self.writeEvent({"id": "stub", "type": "textResponseChunk", "textResponse": ("" if index == 0 else " ") + word, "close": False, "error": None})
+                    time.sleep(args.token_ms / 1000)
+                self.writeEvent({"id": "stub", "type": "textResponseChunk", "textResponse": "", "sources": [], "close": True, "error": None})
+                self.close_connection = True
+
+        def writeEvent(self, event):
+            self.wfile.write(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        def sendJson(self, status, body):
+            payload = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            return
+
+    return ChatStubHandler
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Local stand-in for the AnythingLLM chat API")
+    parser.add_argument("--port", type=int, default=3002, help="Port to listen on (default 3002)")
+    parser.add_argument("--slots", type=int, default=2, help="Concurrent generations before requests queue")
+    parser.add_argument("--ttft-ms", type=float, default=300, help="Delay before the first token")
+    parser.add_argument("--tokens", type=int, default=40, help="Words per answer")
+    parser.add_argument("--token-ms", type=float, default=20, help="Delay between streamed words")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests failing with HTTP 500")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), makeHandler(args))
+    print(f"Chat stub on http://127.0.0.1:{args.port} ({args.slots} slots, TTFT {args.ttft_ms:.0f}ms, {args.tokens} x {args.token_ms:.0f}ms tokens)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nShutting down chat stub")
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
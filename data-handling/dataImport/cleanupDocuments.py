@@ -12,6 +12,11 @@ import sys
 import os
 from typing import List, Dict
 
+from profiling import NullProfiler, profilerFromArgs
+
+# Set from --profile in __main__, no-op otherwise
+profiler = NullProfiler()
+
 def loadEnv():
     """Load environment variables from .importFiles.env file."""
     env = {}
@@ -45,7 +50,8 @@ def listAllDocuments(serverUrl, apiKey):
     endpoint = f"{serverUrl}/api/v1/documents"
     
     try:
-        response = requests.get(endpoint, headers=getHeaders(apiKey))
+        with profiler.phase("list-documents"):
+            response = requests.get(endpoint, headers=getHeaders(apiKey))
         if response.status_code == 200:
             return response.json()
         else:
@@ -76,7 +82,8 @@ def extractFileList(documentsData):
     if documentsData and 'localFiles' in documentsData:
         localFiles = documentsData['localFiles']
         if 'items' in localFiles:
-            extractFilesRecursive(localFiles['items'])
+            with profiler.phase("extract-files"):
+                extractFilesRecursive(localFiles['items'])
     
     return files
 
@@ -96,7 +103,8 @@ def deleteDocuments(serverUrl: str, apiKey: str, matchingFiles: List[Dict[str, s
         print(f"Processing batch {batchNum}/{totalBatches} ({len(batch)} files)")
         
         # Process this batch
-        success = deleteDocumentsBatch(serverUrl, apiKey, batch, batchNum)
+        with profiler.phase("delete"):
+            success = deleteDocumentsBatch(serverUrl, apiKey, batch, batchNum)
         if not success:
             print(f"Batch {batchNum} failed - aborting deletion process")
             return False
@@ -132,6 +140,7 @@ def main():
         print("  python cleanup_documents.py delete <filename>       # Delete specific file")
         print("  python cleanup_documents.py delete-pattern <pattern> # Delete files matching pattern")
         print("  python cleanup_documents.py count                   # Count total files")
+        print("  Add --profile [--profile-dir <folder>] to any command to profile it")
         os.sys.exit(1)
     
     env = loadEnv()
@@ -236,4 +245,8 @@ def generatePostBody(matchingFiles: list[dict]) -> dict:
     return {"names": fileNames}
 
 if __name__ == "__main__":
-    main()
+    profiler = profilerFromArgs(sys.argv, "cleanupDocuments")
+    try:
+        main()
+    finally:
+        profiler.finish()
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+Collaboration Graph for WWIZ ("who works with whom")
+
+Builds a sparse person x group incidence matrix from:
+
+- jira-projectSummary usersAndRoles and jira-userStats projectRoles (projects)
+- confluence-userStats spacesActiveIn and confluence-spacesSummary
+  contributors (Confluence spaces)
+
+and scores collaborators from it. Two people's score is the sum, over the
+groups they share, of 1 / log2(1 + group size), so a five-person project
+says much more about who works together than the company wiki does.
+
+The matrix is stored both ways (person -> groups and group -> members), so
+one person's collaborator row is computed from their own groups only:
+memory stays proportional to the number of memberships, never people
+squared. Groups larger than COLLAB_MAX_GROUP, or holding most of the
+company (all-staff spaces like the company wiki), are left out of the
+scores and of the work areas that make someone cross-functional.
+
+Results are exported as:
+- collaboration-person/collaborators-<ehsId>.json: a person's projects,
+  spaces and top collaborators with what they share
+- collaboration-summary/collaboration-cross-functional.json: people whose
+  work spans several project categories and spaces
+- a JSON export for other tools (export command)
+
+Usage:
+    python data-handling/dataImport/collaborationGraph.py top FMP004 [k]
+    python data-handling/dataImport/collaborationGraph.py both "game" "youtube"
+    python data-handling/dataImport/collaborationGraph.py export collaboration.json
+    (add --data <path> to read a tree other than data/)
+"""
+
+import heapq
+import json
+import math
+import sys
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from rollupDocuments import loadRecords, readTree
+
+# Collaborators kept per person
+DEFAULT_TOP_K = 10
+
+# Groups with more members than this carry no "works with" signal and are skipped when scoring
+DEFAULT_MAX_GROUP_SIZE = 1000
+
+# Groups holding at least this share of everyone are all-staff groups and skipped the same way
+ALL_STAFF_SHARE = 0.8
+
+# Folders the collaboration documents are uploaded to
+PERSON_FOLDER = "collaboration-person"
+SUMMARY_FOLDER = "collaboration-summary"
+
+
+class IncidenceMatrix:
+    """Sparse person x group incidence matrix, indexed by row and by column."""
+
+    def __init__(self):
+        self.groupsByPerson: Dict[str, Set[str]] = {}
+        self.membersByGroup: Dict[str, Set[str]] = {}
+        self.groups: Dict[str, Dict] = {}
+        self.people: Dict[str, Dict] = {}
+
+    def addGroup(self, groupId: str, groupType: str, key: str, name: Optional[str], category: Optional[str]) -> None:
+        """Register a group, keeping names already known."""
+        info = self.groups.setdefault(groupId, {"type": groupType, "key": key, "name": None, "category": None})
+        info["name"] = info["name"] or name
+        info["category"] = info["category"] or category
+
+    def addPerson(self, ehsId: str, name: Optional[str] = None, department: Optional[str] = None) -> None:
+        """Register a person, keeping details already known."""
+        info = self.people.setdefault(ehsId, {"name": None, "department": None})
+        info["name"] = info["name"] or name
+        info["department"] = info["department"] or department
+
+    def add(self, ehsId: str, groupId: str) -> None:
+        """Set one cell of the matrix."""
+        self.groupsByPerson.setdefault(ehsId, set()).add(groupId)
+        self.membersByGroup.setdefault(groupId, set()).add(ehsId)
+
+    def groupWeight(self, groupId: str) -> float:
+        """Weight of sharing a group: smaller groups count for more."""
+        return 1.0 / math.log2(1 + len(self.membersByGroup[groupId]))
+
+    def isBroad(self, groupId: str, maxGroupSize: int = DEFAULT_MAX_GROUP_SIZE) -> bool:
+        """Whether a group is too large (or all-staff) to say who works with whom."""
+        size = len(self.membersByGroup.get(groupId, ()))
+        return size > maxGroupSize or size >= ALL_STAFF_SHARE * len(self.groupsByPerson)
+
+    def collaboratorScores(self, ehsId: str, maxGroupSize: int = DEFAULT_MAX_GROUP_SIZE) -> Dict[str, float]:
+        """
+        Compute one row of the co-occurrence matrix.
+
+        Args:
+            ehsId: Person to score collaborators for
+            maxGroupSize: Groups larger than this (and all-staff groups) are ignored
+
+        Returns:
+            Other person -> co-occurrence score
+        """
+        scores: Dict[str, float] = {}
+        for groupId in self.groupsByPerson.get(ehsId, ()):
+            if self.isBroad(groupId, maxGroupSize):
+                continue
+            weight = self.groupWeight(groupId)
+            for other in self.membersByGroup[groupId]:
+                if other != ehsId:
+                    scores[other] = scores.get(other, 0.0) + weight
+        return scores
+
+    def topCollaborators(self, ehsId: str, k: int = DEFAULT_TOP_K, maxGroupSize: int = DEFAULT_MAX_GROUP_SIZE) -> List[Dict]:
+        """
+        Top-k collaborators of a person with the groups they share.
+
+        Returns:
+            List of {"ehsId", "name", "department", "score", "shared"} dictionaries, best first
+        """
+        scores = self.collaboratorScores(ehsId, maxGroupSize)
+        best = heapq.nlargest(k, scores.items(), key=lambda item: (item[1], item[0]))
+        mine = self.groupsByPerson.get(ehsId, set())
+        return [{
+            "ehsId": other,
+            "name": self.people.get(other, {}).get("name"),
+            "department": self.people.get(other, {}).get("department"),
+            "score": round(score, 3),
+            "shared": sorted(self.groups[groupId]["key"] for groupId in mine & self.groupsByPerson[other] if not self.isBroad(groupId, maxGroupSize)),
+        } for other, score in best]
+
+    def categories(self, ehsId: str, maxGroupSize: int = DEFAULT_MAX_GROUP_SIZE) -> Dict[str, List[str]]:
+        """A person's groups by category (project category or space name), leaving out broad groups."""
+        result: Dict[str, List[str]] = {}
+        for groupId in sorted(self.groupsByPerson.get(ehsId, ())):
+            if self.isBroad(groupId, maxGroupSize):
+                continue
+            info = self.groups[groupId]
+            result.setdefault(info["category"] or info["name"] or info["key"], []).append(info["key"])
+        return result
+
+    def membersMatching(self, term: str) -> Set[str]:
+        """People in any group whose key, name or category contains the term (case-insensitive)."""
+        term = term.lower()
+        matching = [groupId for groupId, info in self.groups.items()
+                    if any(term in (value or "").lower() for value in (info["key"], info["name"], info["category"]))]
+        return set().union(*(self.membersByGroup.get(groupId, set()) for groupId in matching)) if matching else set()
+
+
+def buildIncidence(records: Dict[str, List[Dict]]) -> IncidenceMatrix:
+    """
+    Build the person x group matrix from parsed source records.
+
+    Args:
+        records: Source folder -> records (as returned by rollupDocuments.loadRecords)
+
+    Returns:
+        Populated incidence matrix
+    """
+    matrix = IncidenceMatrix()
+
+    for record in records["employmentHero-staff"]:
+        if record.get("ehsId"):
+            matrix.addPerson(record["ehsId"], f"{record.get('firstName', '')} {record.get('lastName', '')}".strip(), record.get("department"))
+
+    for project in records["jira-projectSummary"]:
+        projectKey = project.get("projectKey")
+        if not projectKey:
+            continue
+        groupId = f"project:{projectKey}"
+        matrix.addGroup(groupId, "project", projectKey, project.get("projectName"), project.get("projectCategory"))
+        for user in project.get("usersAndRoles", []):
+            if user.get("ehsId"):
+                matrix.addPerson(user["ehsId"], user.get("displayName"))
+                matrix.add(user["ehsId"], groupId)
+
+    for record in records["jira-userStats"]:
+        for role in record.get("projectRoles", []):
+            if record.get("ehsId") and role.get("projectKey"):
+                groupId = f"project:{role['projectKey']}"
+                matrix.addGroup(groupId, "project", role["projectKey"], role.get("projectName"), None)
+                matrix.addPerson(record["ehsId"], record.get("displayName"))
+                matrix.add(record["ehsId"], groupId)
+
+    for space in records["confluence-spacesSummary"]:
+        spaceKey = space.get("spaceKey")
+        if not spaceKey:
+            continue
+        groupId = f"space:{spaceKey}"
+        matrix.addGroup(groupId, "space", spaceKey, space.get("spaceName"), space.get("spaceName"))
+        for contributor in space.get("contributors", []):
+            if contributor.get("ehsId"):
+                matrix.addPerson(contributor["ehsId"], contributor.get("displayName"))
+                matrix.add(contributor["ehsId"], groupId)
+
+    for record in records["confluence-userStats"]:
+        for activity in record.get("spacesActiveIn", []):
+            if record.get("ehsId") and activity.get("spaceKey"):
+                groupId = f"space:{activity['spaceKey']}"
+                matrix.addGroup(groupId, "space", activity["spaceKey"], activity.get("spaceName"), activity.get("spaceName"))
+                matrix.addPerson(record["ehsId"], record.get("displayName"))
+                matrix.add(record["ehsId"], groupId)
+
+    # Spaces without a category fall back to their name, projects to "Other projects"
+    for info in matrix.groups.values():
+        info["category"] = info["category"] or (info["name"] if info["type"] == "space" else "Other projects")
+
+    return matrix
+
+
+def describeCategories(categories: Dict[str, List[str]]) -> str:
+    """Plain-text list of categories and their group keys."""
+    return "; ".join(f"{category} ({', '.join(keys)})" for category, keys in categories.items())
+
+
+def buildCollaborationDocuments(files: Iterable[Tuple[bytes, str]], k: int = DEFAULT_TOP_K, maxGroupSize: int = DEFAULT_MAX_GROUP_SIZE) -> Dict[str, Tuple[bytes, str]]:
+    """
+    Build per-person collaborator documents and the cross-functional summary.
+
+    Must run on every discovered file (before de-duplication).
+
+    Args:
+        files: (content, target folder) pairs
+        k: Collaborators kept per person
+        maxGroupSize: Groups larger than this (and all-staff groups) are ignored when scoring
+
+    Returns:
+        Dictionary mapping document keys (folder/name) to (content, target folder)
+    """
+    matrix = buildIncidence(loadRecords(files))
+    documents: Dict[str, Tuple[bytes, str]] = {}
+    crossFunctional: List[Dict] = []
+
+    for ehsId in sorted(matrix.groupsByPerson):
+        person = matrix.people.get(ehsId, {})
+        name = person.get("name") or ehsId
+        categories = matrix.categories(ehsId, maxGroupSize)
+        collaborators = matrix.topCollaborators(ehsId, k, maxGroupSize)
+        closest = ", ".join(f"{c['name'] or c['ehsId']} ({', '.join(c['shared'])})" for c in collaborators[:5])
+
+        document = {
+            "ehsId": ehsId,
+            "displayName": name,
+            "department": person.get("department"),
+            "summary": f"{name} works on {describeCategories(categories) or 'no project or space beyond company-wide ones'}. Closest collaborators: {closest or 'none found'}.",
+            "workAreas": categories,
+            "topCollaborators": collaborators,
+            "dataSource": PERSON_FOLDER,
+        }
+        documents[f"{PERSON_FOLDER}/collaborators-{ehsId}.json"] = (json.dumps(document, indent=2, ensure_ascii=False).encode("utf-8"), PERSON_FOLDER)
+
+        if len(categories) > 1:
+            crossFunctional.append({"ehsId": ehsId, "displayName": name, "department": person.get("department"), "workAreas": categories})
+
+    crossFunctional.sort(key=lambda entry: (-len(entry["workAreas"]), entry["ehsId"]))
+    summary = {
+        "summary": f"{len(crossFunctional)} people work across more than one area (project category or Confluence space). "
+                   + " ".join(f"{entry['displayName']}: {describeCategories(entry['workAreas'])}." for entry in crossFunctional[:20]),
+        "areas": sorted({info["category"] for groupId, info in matrix.groups.items() if not matrix.isBroad(groupId, maxGroupSize)}),
+        "crossFunctionalPeople": crossFunctional,
+        "dataSource": SUMMARY_FOLDER,
+    }
+    documents[f"{SUMMARY_FOLDER}/collaboration-cross-functional.json"] = (json.dumps(summary, indent=2, ensure_ascii=False).encode("utf-8"), SUMMARY_FOLDER)
+    return documents
+
+
+def exportMatrix(matrix: IncidenceMatrix, outputPath: str, k: int, maxGroupSize: int) -> None:
+    """Write groups, memberships and top-k collaborators as JSON."""
+    export = {
+        "groups": {groupId: {**info, "members": sorted(matrix.membersByGroup.get(groupId, ()))} for groupId, info in sorted(matrix.groups.items())},
+        "people": {
+            ehsId: {**matrix.people.get(ehsId, {}), "groups": sorted(groupIds), "topCollaborators": matrix.topCollaborators(ehsId, k, maxGroupSize)}
+            for ehsId, groupIds in sorted(matrix.groupsByPerson.items())
+        },
+    }
+    with open(outputPath, "w", encoding="utf-8") as f:
+        json.dump(export, f, indent=2, ensure_ascii=False)
+    print(f"Exported {len(export['people'])} people and {len(export['groups'])} groups to {outputPath}")
+
+
+def main() -> None:
+    args = sys.argv[1:]
+    dataPath = "data"
+    if "--data" in args:
+        index = args.index("--data")
+        dataPath = args[index + 1]
+        del args[index:index + 2]
+
+    if not args or args[0] not in ("top", "both", "export"):
+        print("Usage:")
+        print("  python collaborationGraph.py top <ehsId> [k]          # closest collaborators")
+        print("  python collaborationGraph.py both <term> <term>       # people in groups matching both terms")
+        print("  python collaborationGraph.py export <output.json>     # full matrix and top-k for other tools")
+        sys.exit(1)
+
+    matrix = buildIncidence(loadRecords(readTree(dataPath)))
+    command = args[0]
+
+    if command == "top":
+        k = int(args[2]) if len(args) > 2 else DEFAULT_TOP_K
+        for collaborator in matrix.topCollaborators(args[1], k):
+            print(f"{collaborator['score']:>7.3f}  {collaborator['ehsId']}  {collaborator['name'] or '':<25} {collaborator['department'] or '':<20} {', '.join(collaborator['shared'])}")
+
+    elif command == "both":
+        people = matrix.membersMatching(args[1]) & matrix.membersMatching(args[2])
+        print(f"{len(people)} people work on both '{args[1]}' and '{args[2]}'")
+        for ehsId in sorted(people):
+            print(f"  {ehsId}  {matrix.people.get(ehsId, {}).get('name') or '':<25} {describeCategories(matrix.categories(ehsId))}")
+
+    elif command == "export":
+        exportMatrix(matrix, args[1], DEFAULT_TOP_K, DEFAULT_MAX_GROUP_SIZE)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,480 @@
+"""
+Corpus Migrations for WWIZ Source Records
+
+Changing a record shape used to mean regenerating the whole corpus or
+hand-editing files. Migrations are small declarative JSON files applied
+to every record of the sources they name, across a process pool:
+
+- Versioned: each migration has a version number, and a migrated file
+  records the version it is at in its "schemaVersion" field. Only files
+  behind the newest migration for their source are touched
+- Atomic: every file is written to a temporary file and renamed over the
+  original, so an interrupted run leaves each file either old or migrated -
+  re-running simply carries on with the files still behind (resumable)
+- Dry run: shows unified diffs of the first few changes and counts the rest
+- Re-upload: migrated files keep their names, so the importer's name check
+  would skip them. A run prints (or with --import runs) the import with
+  REFRESH_CHANGED_SOURCES set to the migrated sources, which replaces their
+  documents by content hash, including server copies the import state
+  doesn't track
+
+Migration file (MIGRATIONS_PATH/<version>-<name>.json):
+
+    {
+      "version": 1,
+      "description": "Add the manager's ehsId to staff records",
+      "sources": ["employmentHero-staff"],
+      "operations": [
+        {"op": "lookup", "path": "managerEhsId", "from": "manager",
+         "source": "employmentHero-staff", "key": ["firstName", "lastName"], "value": "ehsId"}
+      ]
+    }
+
+Operations (paths use "a.b" for nested keys and "list[].key" for a key in every list element):
+- rename:  {"path": "issuesAssigned", "to": "assignedIssues"} - new key name in the same object
+- set:     {"path": "region", "value": "APAC"} - always overwrite
+- default: {"path": "region", "value": "APAC"} - only when missing
+- remove:  {"path": "legacyField"}
+- map:     {"path": "status", "values": {"Done": "Closed"}} - replace listed values
+- lookup:  {"path": ..., "from": ..., "source": ..., "key": ..., "value": ...} - set path to the
+           "value" field of the record in another source whose "key" fields (joined by spaces)
+           equal this object's "from" field. Lookups read the other source before anything is migrated
+
+Usage:
+    python data-handling/dataImport/corpusMigrations.py status [--data data] [--migrations folder]
+    python data-handling/dataImport/corpusMigrations.py run [--dry-run] [--import] [--source a,b] [--workers 0] [--diffs 5] [--data data] [--migrations folder]
+"""
+
+import difflib
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Where migration files live (MIGRATIONS_PATH overrides)
+DEFAULT_MIGRATIONS_PATH = os.path.join("data-handling", "dataImport", "migrations")
+
+# Field holding each record's schema version (missing = 0)
+VERSION_FIELD = "schemaVersion"
+
+# Files per worker task
+BATCH_SIZE = 500
+
+# Diffs shown by a dry run
+DEFAULT_DIFFS = 5
+
+OPERATIONS = ["rename", "set", "default", "remove", "map", "lookup"]
+
+# Per-worker migration plan, set once by the pool initializer
+workerPlan: Dict = {}
+
+
+def loadMigrations(migrationsPath: str = DEFAULT_MIGRATIONS_PATH) -> List[Dict]:
+    """
+    Load and check the migration files, oldest first.
+
+    Args:
+        migrationsPath: Folder of migration JSON files
+
+    Returns:
+        Migrations sorted by version
+
+    Raises:
+        ValueError: If a migration is malformed or two share a version
+    """
+    migrations: List[Dict] = []
+    if not os.path.isdir(migrationsPath):
+        return migrations
+
+    for name in sorted(os.listdir(migrationsPath)):
+        if not name.endswith(".json"):
+            continue
+        with open(os.path.join(migrationsPath, name), "r", encoding="utf-8") as f:
+            migration = json.load(f)
+        if not isinstance(migration.get("version"), int) or migration["version"] < 1:
+            raise ValueError(f"{name}: version must be a positive integer")
+        if not migration.get("sources") or not isinstance(migration.get("operations"), list):
+            raise ValueError(f"{name}: sources and operations are required")
+        for operation in migration["operations"]:
+            if operation.get("op") not in OPERATIONS or not operation.get("path"):
+                raise ValueError(f"{name}: unknown operation {operation}")
+        migration["name"] = name
+        migrations.append(migration)
+
+    migrations.sort(key=lambda migration: migration["version"])
+    for earlier, later in zip(migrations, migrations[1:]):
+        if earlier["version"] == later["version"]:
+            raise ValueError(f"{earlier['name']} and {later['name']} share version {later['version']}")
+    return migrations
+
+
+def targetVersions(migrations: List[Dict]) -> Dict[str, int]:
+    """
+    Get the newest migration version for each source.
+
+    Args:
+        migrations: Loaded migrations
+
+    Returns:
+        Source folder name -> version files of that source should be at
+    """
+    targets: Dict[str, int] = {}
+    for migration in migrations:
+        for source in migration["sources"]:
+            targets[source] = max(targets.get(source, 0), migration["version"])
+    return targets
+
+
+def lookupKey(record: Dict, fields) -> Optional[str]:
+    """Join a record's key fields with spaces (None when any is missing)."""
+    values = [record.get(field) for field in (fields if isinstance(fields, list) else [fields])]
+    if any(value in (None, "") for value in values):
+        return None
+    return " ".join(str(value) for value in values)
+
+
+def buildLookups(migrations: List[Dict], dataPath: str) -> Dict[str, Dict[str, object]]:
+    """
+    Read the tables lookup operations need from their source folders.
+
+    Args:
+        migrations: Loaded migrations
+        dataPath: Data root folder
+
+    Returns:
+        "source|key|value" -> {key: value}
+    """
+    lookups: Dict[str, Dict[str, object]] = {}
+    for migration in migrations:
+        for operation in migration["operations"]:
+            if operation["op"] != "lookup":
+                continue
+            tableName = lookupTableName(operation)
+            if tableName in lookups:
+                continue
+            table: Dict[str, object] = {}
+            for filePath in iterSourceFiles(dataPath, [operation["source"]]):
+                try:
+                    with open(filePath, "rb") as f:
+                        record = json.loads(f.read())
+                except (OSError, ValueError):
+                    continue
+                for item in record if isinstance(record, list) else [record]:
+                    key = lookupKey(item, operation["key"]) if isinstance(item, dict) else None
+                    if key is not None and item.get(operation["value"]) is not None:
+                        table[key] = item[operation["value"]]
+            lookups[tableName] = table
+    return lookups
+
+
+def lookupTableName(operation: Dict) -> str:
+    """Name of the lookup table an operation uses."""
+    key = operation["key"] if isinstance(operation["key"], list) else [operation["key"]]
+    return f"{operation['source']}|{','.join(key)}|{operation['value']}"
+
+
+def parentsAt(node, parts: List[str], create: bool = False) -> Iterator[Dict]:
+    """
+    Find every object holding the last key of a path.
+
+    Args:
+        node: Record (or part of one)
+        parts: Path split on "."
+        create: Create missing intermediate objects (for set/default)
+
+    Yields:
+        Parent objects
+    """
+    if not isinstance(node, dict):
+        return
+    if len(parts) == 1:
+        yield node
+        return
+
+    key = parts[0]
+    if key.endswith("[]"):
+        items = node.get(key[:-2])
+        for item in items if isinstance(items, list) else []:
+            yield from parentsAt(item, parts[1:], create)
+        return
+    if key not in node and create:
+        node[key] = {}
+    yield from parentsAt(node.get(key), parts[1:], create)
+
+
+def applyOperation(record: Dict, operation: Dict, lookups: Dict[str, Dict[str, object]]) -> None:
+    """
+    Apply one operation to a record in place.
+
+    Args:
+        record: Parsed record
+        operation: Operation from a migration file
+        lookups: Lookup tables from buildLookups
+    """
+    op = operation["op"]
+    parts = operation["path"].split(".")
+    key = parts[-1]
+
+    for parent in parentsAt(record, parts, create=op in ("set", "default", "lookup")):
+        if op == "rename":
+            if key in parent:
+                parent[operation["to"]] = parent.pop(key)
+        elif op == "set":
+            parent[key] = operation["value"]
+        elif op == "default":
+            parent.setdefault(key, operation["value"])
+        elif op == "remove":
+            parent.pop(key, None)
+        elif op == "map":
+            value = parent.get(key)
+            if isinstance(value, (str, int, float, bool)) and str(value) in operation["values"]:
+                parent[key] = operation["values"][str(value)]
+        elif op == "lookup":
+            source = parent.get(operation["from"])
+            parent[key] = lookups[lookupTableName(operation)].get(str(source)) if source is not None else None
+
+
+def migrateRecord(record: Dict, source: str, migrations: List[Dict], lookups: Dict[str, Dict[str, object]], target: int) -> bool:
+    """
+    Bring one record up to the target version for its source.
+
+    Args:
+        record: Parsed record (changed in place)
+        source: Source folder name
+        migrations: Loaded migrations
+        lookups: Lookup tables
+        target: Version the source should be at
+
+    Returns:
+        True if the record was behind
+    """
+    version = record.get(VERSION_FIELD, 0)
+    if not isinstance(version, int) or version >= target:
+        return False
+    for migration in migrations:
+        if migration["version"] > version and source in migration["sources"]:
+            for operation in migration["operations"]:
+                applyOperation(record, operation, lookups)
+    record[VERSION_FIELD] = target
+    return True
+
+
+def initWorker(plan: Dict) -> None:
+    """Pool initializer - keep the migrations and lookup tables for every batch."""
+    workerPlan.update(plan)
+
+
+def migrateBatch(batch: List[Tuple[str, str]], dryRun: bool, diffs: int) -> Tuple[int, int, List[str], List[str]]:
+    """
+    Migrate a batch of files in one worker.
+
+    Args:
+        batch: (filePath, source) tuples
+        dryRun: Work out the changes without writing them
+        diffs: Most diffs to return
+
+    Returns:
+        (files migrated, files that failed, diffs and error messages, sources with migrated files)
+    """
+    migrations, lookups, targets = workerPlan["migrations"], workerPlan["lookups"], workerPlan["targets"]
+    migrated = failed = 0
+    messages: List[str] = []
+    sources: List[str] = []
+
+    for filePath, source in batch:
+        try:
+            with open(filePath, "r", encoding="utf-8") as f:
+                original = f.read()
+            record = json.loads(original)
+        except (OSError, ValueError) as e:
+            failed += 1
+            messages.append(f"Error: {filePath}: {str(e)}")
+            continue
+
+        records = record if isinstance(record, list) else [record]
+        changed = [migrateRecord(item, source, migrations, lookups, targets[source]) for item in records if isinstance(item, dict)]
+        if not any(changed):
+            continue
+
+        migrated += 1
+        if source not in sources:
+            sources.append(source)
+        content = json.dumps(record, indent=2, ensure_ascii=False)
+        if dryRun:
+            if len(messages) < diffs:
+                messages.append("".join(difflib.unified_diff(original.splitlines(True), content.splitlines(True), filePath, filePath + " (migrated)")))
+            continue
+
+        tempPath = f"{filePath}.tmp"
+        with open(tempPath, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(tempPath, filePath)
+
+    return migrated, failed, messages, sources
+
+
+def iterSourceFiles(dataPath: str, sources: List[str]) -> Iterator[str]:
+    """
+    Walk the JSON files of the given source folders.
+
+    Args:
+        dataPath: Data root folder
+        sources: Source folder names
+
+    Yields:
+        File paths
+    """
+    for source in sources:
+        sourcePath = os.path.join(dataPath, source)
+        if not os.path.isdir(sourcePath):
+            continue
+        for root, dirs, files in os.walk(sourcePath):
+            for name in files:
+                if name.endswith(".json"):
+                    yield os.path.join(root, name)
+
+
+def runMigrations(dataPath: str, migrations: List[Dict], sources: Optional[List[str]] = None, workers: int = 0, dryRun: bool = False, diffs: int = DEFAULT_DIFFS) -> Tuple[Dict[str, int], List[str]]:
+    """
+    Migrate every behind file of the selected sources across a process pool.
+
+    Args:
+        dataPath: Data root folder
+        migrations: Loaded migrations
+        sources: Source folders to migrate (default: every source a migration names)
+        workers: Worker processes (0 = one per CPU, 1 = migrate in this process)
+        dryRun: Show diffs and counts without writing
+        diffs: Diffs shown by a dry run
+
+    Returns:
+        Tuple of (counts of files scanned, migrated and failed, sources with migrated files)
+    """
+    targets = targetVersions(migrations)
+    sources = [source for source in (sources or sorted(targets)) if source in targets]
+    plan = {"migrations": migrations, "lookups": buildLookups(migrations, dataPath), "targets": targets}
+
+    files = [(filePath, source) for source in sources for filePath in iterSourceFiles(dataPath, [source])]
+    batches = [files[i:i + BATCH_SIZE] for i in range(0, len(files), BATCH_SIZE)]
+    workers = workers or os.cpu_count() or 1
+    counts = {"scanned": len(files), "migrated": 0, "failed": 0}
+    migratedSources: List[str] = []
+    shownDiffs = 0
+
+    def collect(result: Tuple[int, int, List[str], List[str]]) -> None:
+        nonlocal shownDiffs
+        migrated, failed, messages, batchSources = result
+        counts["migrated"] += migrated
+        counts["failed"] += failed
+        migratedSources.extend(source for source in batchSources if source not in migratedSources)
+        for message in messages:
+            if message.startswith("Error:"):
+                print(message)
+            elif shownDiffs < diffs:
+                print(message)
+                shownDiffs += 1
+
+    if workers == 1 or len(batches) <= 1:
+        initWorker(plan)
+        for batch in batches:
+            collect(migrateBatch(batch, dryRun, diffs))
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(batches)), initializer=initWorker, initargs=(plan,)) as executor:
+            for index, result in enumerate(executor.map(migrateBatch, batches, [dryRun] * len(batches), [diffs] * len(batches)), 1):
+                collect(result)
+                if index % 100 == 0:
+                    print(f"  {index * BATCH_SIZE}/{len(files)} files checked, {counts['migrated']} migrated")
+
+    return counts, sorted(migratedSources)
+
+
+def versionStatus(dataPath: str, migrations: List[Dict]) -> Dict[str, Dict[int, int]]:
+    """
+    Count the files of each migrated source by schema version.
+
+    Args:
+        dataPath: Data root folder
+        migrations: Loaded migrations
+
+    Returns:
+        Source -> {version: file count}
+    """
+    status: Dict[str, Dict[int, int]] = {}
+    for source in sorted(targetVersions(migrations)):
+        versions = status.setdefault(source, {})
+        for filePath in iterSourceFiles(dataPath, [source]):
+            try:
+                with open(filePath, "rb") as f:
+                    record = json.loads(f.read())
+            except (OSError, ValueError):
+                continue
+            first = record[0] if isinstance(record, list) and record else record
+            version = first.get(VERSION_FIELD, 0) if isinstance(first, dict) else 0
+            versions[version] = versions.get(version, 0) + 1
+    return status
+
+
+def main() -> None:
+    args = sys.argv[1:]
+    options = {"--data": "data", "--source": "", "--workers": "0", "--diffs": str(DEFAULT_DIFFS), "--migrations": ""}
+    for option in list(options):
+        if option in args:
+            index = args.index(option)
+            options[option] = args[index + 1]
+            del args[index:index + 2]
+    dryRun = "--dry-run" in args
+    if dryRun:
+        args.remove("--dry-run")
+    runImport = "--import" in args
+    if runImport:
+        args.remove("--import")
+
+    if not args or args[0] not in ("status", "run"):
+        print("Usage:")
+        print("  python corpusMigrations.py status [--data data] [--migrations folder]")
+        print("  python corpusMigrations.py run [--dry-run] [--import] [--source a,b] [--workers 0] [--diffs 5] [--data data] [--migrations folder]")
+        sys.exit(1)
+
+    migrationsPath = options["--migrations"] or DEFAULT_MIGRATIONS_PATH
+    if not options["--migrations"] and os.path.exists(os.path.join("data-handling", "dataImport", ".importFiles.env")):
+        from importFiles import loadEnv
+        migrationsPath = loadEnv().get("MIGRATIONS_PATH") or DEFAULT_MIGRATIONS_PATH
+    try:
+        migrations = loadMigrations(migrationsPath)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    if not migrations:
+        print(f"No migrations in {migrationsPath}")
+        return
+
+    if args[0] == "status":
+        targets = targetVersions(migrations)
+        print(f"{'Source':<32} {'Target':>6}  Files by version")
+        for source, versions in versionStatus(options["--data"], migrations).items():
+            counts = ", ".join(f"v{version}: {count}" for version, count in sorted(versions.items()))
+            print(f"{source:<32} {targets[source]:>6}  {counts or 'no files'}")
+        return
+
+    sources = [source.strip() for source in options["--source"].split(",") if source.strip()]
+    start = time.time()
+    counts, migratedSources = runMigrations(options["--data"], migrations, sources or None, int(options["--workers"]), dryRun, int(options["--diffs"]))
+    verb = "would be migrated" if dryRun else "migrated"
+    print(f"{counts['migrated']} of {counts['scanned']} files {verb}, {counts['failed']} unreadable ({time.time() - start:.1f}s)")
+    if dryRun or not migratedSources:
+        return
+
+    # Migrated files keep their names - the changed-sources signal makes the importer replace them
+    changed = ",".join(migratedSources)
+    importScript = os.path.join("data-handling", "dataImport", "importFiles.py")
+    if not runImport:
+        print(f"Re-upload the migrated records with:\n  REFRESH_CHANGED_SOURCES={changed} python {importScript}")
+        return
+    print(f"Importing migrated sources: {changed}")
+    sys.exit(subprocess.run([sys.executable, importScript], env={**os.environ, "REFRESH_CHANGED_SOURCES": changed}).returncode)
+
+
+if __name__ == "__main__":
+    main()
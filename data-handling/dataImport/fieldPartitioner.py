@@ -0,0 +1,324 @@
+"""
+Volatile/Stable Field Partitioning for WWIZ Imports
+
+Calendar, Slack and Teams summaries mix fields that change every few
+minutes (current status, next meeting, weekly counters) with fields that
+almost never change (names, emails, channel memberships). Keeping them in
+one document means every status change re-uploads and re-embeds the whole
+profile.
+
+This stage splits them:
+
+- Stable documents: the source files with their volatile fields removed,
+  uploaded and de-duplicated like any other file
+- Live status documents: one small document per person
+  (liveStatus-person/<ehsId>-liveStatus.json) holding the volatile fields
+  from every source
+
+Live status documents are compared against the content hashes recorded in
+the import state. Only changed ones are uploaded, and the previous version
+is removed from AnythingLLM once the new one is in, so frequent refreshes
+touch a handful of tiny documents instead of whole profiles.
+"""
+
+import json
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+from importFiles import parseWorkspaces, uploadSingleFile
+from importState import contentHash, saveState
+from workspaceShards import sourceFolderName
+
+# Folder that live status documents are uploaded to
+LIVE_STATUS_FOLDER = "liveStatus-person"
+
+# Volatile fields per source folder. "a.b" is a nested key, "list[].key" is
+# a key in every element of a list.
+VOLATILE_FIELDS: Dict[str, List[str]] = {
+    "calendar-availabilitySummary": [
+        "availabilitySummary.currentStatus",
+        "availabilitySummary.nextMeeting",
+        "availabilitySummary.busyPeriodsToday",
+        "availabilitySummary.weeklyMeetingLoad",
+        "outOfOffice.currentlyOut",
+        "lastUpdated",
+    ],
+    "slack-userActivitySummary": [
+        "activeSlackWorkspaces[].lastActivity",
+        "activeSlackChannels[].lastActivity",
+        "activeSlackChannels[].messagesSentLastWeek",
+        "activeSlackChannels[].reactionsLastWeek",
+        "activitySummary.messagesSentLastWeek",
+        "activitySummary.reactionsLastWeek",
+        "activitySummary.filesSharedLastWeek",
+        "activitySummary.threadsStartedLastWeek",
+        "activitySummary.lastActiveDate",
+        "activitySummary.onlineStatus",
+        "recentActivity",
+        "lastUpdated",
+    ],
+    "teams-userActivitySummary": [
+        "activeTeamsGroups[].lastActivity",
+        "activeTeamsChannels[].lastActivity",
+        "activeTeamsChannels[].messagesSentLastWeek",
+        "activeTeamsChannels[].reactionsLastWeek",
+        "activitySummary.messagesSentLastWeek",
+        "activitySummary.reactionsLastWeek",
+        "activitySummary.meetingsAttendedLastWeek",
+        "activitySummary.callsInitiatedLastWeek",
+        "activitySummary.filesSharedLastWeek",
+        "activitySummary.lastActiveDate",
+        "recentActivity",
+        "lastUpdated",
+    ],
+}
+
+# Key copied into live list elements so values can be matched to their channel/team
+ARRAY_LABELS: Dict[str, str] = {
+    "activeSlackWorkspaces": "workspaceName",
+    "activeSlackChannels": "channelName",
+    "activeTeamsGroups": "teamName",
+    "activeTeamsChannels": "channelName",
+}
+
+
+def moveField(source: Dict, target: Dict, parts: List[str]) -> None:
+    """
+    Move one volatile field path from a record into the live record.
+
+    Args:
+        source: Record (or nested object) the field is removed from
+        target: Live record (or nested object) the field is added to
+        parts: Remaining path components
+    """
+    key = parts[0]
+
+    if key.endswith("[]"):
+        name = key[:-2]
+        items = source.get(name)
+        if not isinstance(items, list):
+            return
+        label = ARRAY_LABELS.get(name)
+        targetItems = target.setdefault(name, [{label: item.get(label)} if label and isinstance(item, dict) else {} for item in items])
+        for item, targetItem in zip(items, targetItems):
+            if isinstance(item, dict):
+                moveField(item, targetItem, parts[1:])
+        return
+
+    if key not in source:
+        return
+    if len(parts) == 1:
+        target[key] = source.pop(key)
+        return
+
+    child = source[key]
+    if isinstance(child, dict):
+        moveField(child, target.setdefault(key, {}), parts[1:])
+        if not child:
+            del source[key]
+
+
+def splitRecord(record: Dict, volatileFields: List[str]) -> Tuple[Dict, Dict]:
+    """
+    Split a record into its stable and volatile parts.
+
+    Args:
+        record: Parsed source record (not modified)
+        volatileFields: Volatile field paths for the record's source
+
+    Returns:
+        Tuple of (stable record, live fields)
+    """
+    stable = json.loads(json.dumps(record))
+    live: Dict = {}
+    for path in volatileFields:
+        moveField(stable, live, path.split("."))
+    return stable, live
+
+
+def loadRecord(content: bytes, targetFolder: str) -> Optional[Dict]:
+    """Parse a file that has volatile fields, or return None if it has none or isn't a JSON object."""
+    if sourceFolderName(targetFolder) not in VOLATILE_FIELDS:
+        return None
+    try:
+        record = json.loads(content.decode("utf-8"))
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return None
+    return record if isinstance(record, dict) else None
+
+
+def buildLiveDocuments(filesToUpload: Dict[str, Tuple[bytes, str]]) -> Dict[str, Tuple[bytes, str]]:
+    """
+    Build one live status document per person from the volatile fields.
+
+    Must run on every discovered file (before de-duplication), since the
+    stable document of a person being on the server says nothing about
+    whether their status changed.
+
+    Args:
+        filesToUpload: Dictionary of files with content and target folders
+
+    Returns:
+        Dictionary mapping live document keys (folder/name) to (content, target folder)
+    """
+    people: Dict[Tuple[str, str], Dict] = {}
+
+    for filePath, (content, targetFolder) in filesToUpload.items():
+        record = loadRecord(content, targetFolder)
+        if record is None:
+            continue
+        personId = record.get("ehsId") or record.get("upn")
+        if not personId:
+            continue
+
+        source = sourceFolderName(targetFolder)
+        live = splitRecord(record, VOLATILE_FIELDS[source])[1]
+        # Keep any parent folder (e.g. a tenant prefix) so live documents sit next to their sources
+        parent = os.path.dirname(targetFolder.replace("\\", "/"))
+        liveFolder = f"{parent}/{LIVE_STATUS_FOLDER}" if parent else LIVE_STATUS_FOLDER
+
+        person = people.setdefault((liveFolder, personId), {
+            "ehsId": record.get("ehsId"),
+            "upn": record.get("upn"),
+            "displayName": record.get("displayName"),
+            "sources": {},
+            "dataSource": LIVE_STATUS_FOLDER,
+        })
+        person["sources"][source] = live
+
+    liveDocs: Dict[str, Tuple[bytes, str]] = {}
+    for (liveFolder, personId), person in people.items():
+        person["sources"] = dict(sorted(person["sources"].items()))
+        content = json.dumps(person, indent=2, ensure_ascii=False).encode("utf-8")
+        liveDocs[f"{liveFolder}/{personId}-liveStatus.json"] = (content, liveFolder)
+
+    return liveDocs
+
+
+def stripVolatileFields(filesToUpload: Dict[str, Tuple[bytes, str]]) -> Dict[str, Tuple[bytes, str]]:
+    """
+    Remove volatile fields from the files that have them.
+
+    Args:
+        filesToUpload: Dictionary of files with content and target folders
+
+    Returns:
+        Same dictionary with stable-only content for partitioned sources
+    """
+    stripped: Dict[str, Tuple[bytes, str]] = {}
+    for filePath, (content, targetFolder) in filesToUpload.items():
+        record = loadRecord(content, targetFolder)
+        if record is not None:
+            stable = splitRecord(record, VOLATILE_FIELDS[sourceFolderName(targetFolder)])[0]
+            content = json.dumps(stable, indent=2, ensure_ascii=False).encode("utf-8")
+        stripped[filePath] = (content, targetFolder)
+    return stripped
+
+
+def readPersonFiles(dataPath: str, personIds: List[str]) -> Dict[str, Tuple[bytes, str]]:
+    """
+    Read every partitioned source file of some people from the data tree.
+
+    A live status document merges all of a person's sources, so rebuilding it
+    after one source changed (e.g. from a webhook) needs the others too.
+
+    Args:
+        dataPath: Root of the data tree (data/<source>/...)
+        personIds: ehsId or upn values
+
+    Returns:
+        Dictionary of files with content and source folders
+    """
+    wanted = set(personIds)
+    found: Dict[str, Tuple[bytes, str]] = {}
+    for source in VOLATILE_FIELDS:
+        folderPath = os.path.join(dataPath, source)
+        if not os.path.isdir(folderPath):
+            continue
+        for entry in os.scandir(folderPath):
+            if not entry.is_file() or not entry.name.endswith(".json"):
+                continue
+            with open(entry.path, "rb") as f:
+                content = f.read()
+            record = loadRecord(content, source)
+            if record is not None and (record.get("ehsId") or record.get("upn")) in wanted:
+                found[entry.path] = (content, source)
+    return found
+
+
+def findServerLocations(names: List[str], serverUrl: str, apiKey: str) -> Dict[str, List[str]]:
+    """
+    Look up the server locations of documents by their uploaded file name.
+
+    Used when a live document is on the server but not in the import state
+    (e.g. the state file was deleted), so the old copy can still be replaced.
+
+    Returns:
+        File name -> list of document locations (folder/name-uuid.json)
+    """
+    from cleanupDocuments import extractFileList, listAllDocuments
+
+    wanted = set(names)
+    locations: Dict[str, List[str]] = {}
+    for document in extractFileList(listAllDocuments(serverUrl, apiKey)):
+        name = document["name"].replace(f"-{document['id']}.json", "")
+        if name in wanted:
+            locations.setdefault(name, []).append(document["path"])
+    return locations
+
+
+def uploadDerivedDocuments(documents: Dict[str, Tuple[bytes, str]], existingFiles: List[str], documentWorkspaces: Dict[str, str], serverUrl: str, apiKey: str, state: Dict, statePath: str, stateKey: str = "liveStatus", label: str = "Live status") -> List[str]:
+    """
+    Upload changed generated documents and remove the versions they replace.
+
+    Used for documents that are rebuilt on every run rather than read from
+    disk (live status, rollups), so they can't be de-duplicated by name.
+
+    Args:
+        documents: Document key (folder/name) -> (content, target folder)
+        existingFiles: File names already on the server
+        documentWorkspaces: Document key (or target folder, for every document in it) -> comma-separated workspaces
+        serverUrl: AnythingLLM server URL
+        apiKey: API key for authentication
+        state: Import state (hashes and locations are kept under stateKey)
+        statePath: Where to save the import state
+        stateKey: Import state section for this kind of document
+        label: Name used in progress messages
+
+    Returns:
+        Document locations of the uploaded documents
+    """
+    from cleanupDocuments import deleteDocuments
+
+    records = state.setdefault(stateKey, {})
+    changed = {key: value for key, value in documents.items() if records.get(key, {}).get("hash") != contentHash(value[0])}
+    print(f"{label}: {len(changed)} of {len(documents)} documents changed")
+    if not changed:
+        return []
+
+    # Adopt copies uploaded before the state knew about them, so they are replaced rather than duplicated
+    untracked = [os.path.basename(key) for key in changed if key not in records and os.path.basename(key) in existingFiles]
+    serverLocations = findServerLocations(untracked, serverUrl, apiKey) if untracked else {}
+
+    result: List[str] = []
+    replaced: List[Dict[str, str]] = []
+    for key, (content, targetFolder) in changed.items():
+        filename = os.path.basename(key)
+        locations = uploadSingleFile(filename, content, targetFolder, serverUrl, apiKey, parseWorkspaces(documentWorkspaces.get(key, documentWorkspaces.get(targetFolder, ""))))
+        if locations is None:
+            continue
+
+        # Upload first, then remove the old version, so there is never a gap with no document
+        # Only adopt copies in the same folder - other tenants can hold documents with the same name
+        previous = records.get(key, {}).get("locations") or [location for location in serverLocations.get(filename, []) if location.startswith(f"{targetFolder}/")]
+        replaced.extend({"name": location} for location in previous)
+        records[key] = {"hash": contentHash(content), "locations": locations, "uploadedAt": time.time()}
+        result.extend(locations)
+
+    saveState(state, statePath)
+    if replaced:
+        deleteDocuments(serverUrl, apiKey, replaced)
+
+    print(f"{label}: uploaded {len(result)} documents, replaced {len(replaced)} old versions")
+    return result
@@ -0,0 +1,359 @@
+"""
+Streaming Splitter for Oversized Import Files
+
+Files over the AnythingLLM upload limit used to be skipped. This module
+splits large CSV, XML and JSON-array exports into record-aligned parts
+under the limit without ever loading the whole file:
+
+- CSV:  streamed row by row with the csv module, header repeated in every part
+- XML:  streamed with iterparse, each direct child of the root is one record
+- JSON: top-level arrays are decoded one element at a time from a rolling buffer
+
+Parts get stable names (e.g. "hr-export.part0001.csv"), and their content
+hashes and server locations are kept in the import state, so a re-run only
+uploads the parts that changed and replaces their previous versions. Bundle members (bundleReader.py) are
+already in memory and are split from their content instead of a file.
+"""
+
+import csv
+import io
+import json
+import os
+import time
+import xml.etree.ElementTree as ET
+from typing import Dict, Iterator, List, Optional, Set, TextIO, Tuple
+
+from importFiles import parseWorkspaces, uploadSingleFile
+from importState import contentHash, saveState
+
+# File types the splitter understands
+SPLITTABLE_FILE_TYPES: List[str] = ["csv", "xml", "json"]
+
+# Default part size - a little under the 10MB upload limit to leave headroom
+DEFAULT_PART_BYTES = 8 * 1024 * 1024
+
+# Read size used when streaming JSON arrays
+READ_CHUNK_CHARS = 64 * 1024
+
+# Import state section holding the hashes and locations of uploaded parts
+SPLIT_STATE_KEY = "splitParts"
+
+
+def partName(filePath: str, partNumber: int) -> str:
+    """
+    Build the stable upload name for one part of a split file.
+
+    Args:
+        filePath: Path of the original file
+        partNumber: 1-based part number
+
+    Returns:
+        Part file name (e.g. "hr-export.part0001.csv")
+    """
+    stem, ext = os.path.splitext(os.path.basename(filePath))
+    return f"{stem}.part{partNumber:04d}{ext}"
+
+
+def openText(filePath: str, content: Optional[bytes], newline: Optional[str] = None) -> TextIO:
+    """Open a file for reading as text, or wrap content that is already in memory."""
+    if content is not None:
+        return io.TextIOWrapper(io.BytesIO(content), encoding="utf-8", newline=newline)
+    return open(filePath, "r", encoding="utf-8", newline=newline)
+
+
+def splitFile(filePath: str, maxBytes: int = DEFAULT_PART_BYTES, content: Optional[bytes] = None) -> Iterator[Tuple[str, bytes]]:
+    """
+    Split a large file into record-aligned parts.
+
+    Args:
+        filePath: Path of the file to split (names the parts)
+        maxBytes: Maximum size of each part
+        content: File content when it is already in memory (bundle members), None to read filePath
+
+    Yields:
+        (partName, partContent) tuples in file order
+    """
+    ext = filePath.split('.')[-1].lower()
+    splitters = {"csv": splitCsv, "xml": splitXml, "json": splitJsonArray}
+
+    if ext not in splitters:
+        print(f"Cannot split {os.path.basename(filePath)}: unsupported file type '{ext}'")
+        return
+
+    for partNumber, partContent in enumerate(splitters[ext](filePath, maxBytes, content), start=1):
+        yield partName(filePath, partNumber), partContent
+
+
+def splitCsv(filePath: str, maxBytes: int, content: Optional[bytes] = None) -> Iterator[bytes]:
+    """
+    Stream a CSV file into parts, repeating the header row in each part.
+
+    Args:
+        filePath: Path of the CSV file
+        maxBytes: Maximum size of each part
+        content: CSV content already in memory, None to read filePath
+
+    Yields:
+        Encoded CSV parts
+    """
+    with openText(filePath, content, newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+
+        headerBytes = encodeCsvRow(header)
+        part: List[bytes] = [headerBytes]
+        partSize = len(headerBytes)
+
+        for row in reader:
+            rowBytes = encodeCsvRow(row)
+            if partSize + len(rowBytes) > maxBytes and len(part) > 1:
+                yield b"".join(part)
+                part, partSize = [headerBytes], len(headerBytes)
+            if len(headerBytes) + len(rowBytes) > maxBytes:
+                print(f"Skipping oversized CSV row in {os.path.basename(filePath)} ({len(rowBytes)} bytes)")
+                continue
+            part.append(rowBytes)
+            partSize += len(rowBytes)
+
+        if len(part) > 1:
+            yield b"".join(part)
+
+
+def encodeCsvRow(row: List[str]) -> bytes:
+    """
+    Serialise a single CSV row.
+
+    Args:
+        row: Parsed CSV fields
+
+    Returns:
+        UTF-8 encoded CSV line
+    """
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(row)
+    return buffer.getvalue().encode("utf-8")
+
+
+def splitXml(filePath: str, maxBytes: int, content: Optional[bytes] = None) -> Iterator[bytes]:
+    """
+    Stream an XML file into parts, treating each child of the root as a record.
+
+    Each part is a complete document with the original root element
+    (and its attributes) wrapped around a run of records.
+
+    Args:
+        filePath: Path of the XML file
+        maxBytes: Maximum size of each part
+        content: XML content already in memory, None to read filePath
+
+    Yields:
+        Encoded XML parts
+    """
+    root: Optional[ET.Element] = None
+    opening = closing = b""
+    part: List[bytes] = []
+    partSize = 0
+    depth = 0
+
+    for event, elem in ET.iterparse(io.BytesIO(content) if content is not None else filePath, events=("start", "end")):
+        if event == "start":
+            depth += 1
+            if root is None:
+                root = elem
+                shell = ET.tostring(ET.Element(elem.tag, elem.attrib), encoding="unicode")
+                # "<root a='b' />" -> "<root a='b'>" ... "</root>"
+                opening = (shell[:-3].rstrip() + ">").encode("utf-8")
+                closing = f"</{shell[1:].split()[0]}>".encode("utf-8")
+            continue
+
+        depth -= 1
+        if depth != 1:
+            continue
+
+        record = ET.tostring(elem, encoding="utf-8", xml_declaration=False)
+        root.clear()
+
+        wrapperSize = len(opening) + len(closing)
+        if part and partSize + len(record) + wrapperSize > maxBytes:
+            yield opening + b"".join(part) + closing
+            part, partSize = [], 0
+        if len(record) + wrapperSize > maxBytes:
+            print(f"Skipping oversized XML record in {os.path.basename(filePath)} ({len(record)} bytes)")
+            continue
+        part.append(record)
+        partSize += len(record)
+
+    if part:
+        yield opening + b"".join(part) + closing
+
+
+def splitJsonArray(filePath: str, maxBytes: int, content: Optional[bytes] = None) -> Iterator[bytes]:
+    """
+    Stream a JSON file whose top level is an array into smaller arrays.
+
+    Elements are decoded one at a time with raw_decode over a rolling
+    buffer, so memory use is bounded by the largest single element.
+
+    Args:
+        filePath: Path of the JSON file
+        maxBytes: Maximum size of each part
+        content: JSON content already in memory, None to read filePath
+
+    Yields:
+        Encoded JSON array parts
+    """
+    decoder = json.JSONDecoder()
+    part: List[bytes] = []
+    partSize = 2  # "[" + "]"
+
+    with openText(filePath, content) as f:
+        buffer = f.read(READ_CHUNK_CHARS).lstrip()
+        if not buffer.startswith("["):
+            print(f"Cannot split {os.path.basename(filePath)}: top level is not a JSON array")
+            return
+        position = 1
+        endOfFile = False
+
+        while True:
+            # Skip whitespace and element separators
+            while True:
+                while position < len(buffer) and buffer[position] in " \t\r\n,":
+                    position += 1
+                if position < len(buffer) or endOfFile:
+                    break
+                buffer, position = f.read(READ_CHUNK_CHARS), 0
+                endOfFile = not buffer
+
+            if position >= len(buffer) or buffer[position] == "]":
+                break
+
+            try:
+                element, end = decoder.raw_decode(buffer, position)
+                # A number or literal at the very end of the buffer may continue in the next chunk
+                complete = end < len(buffer) or endOfFile
+            except json.JSONDecodeError:
+                complete = False
+                if endOfFile or len(buffer) - position > 2 * maxBytes:
+                    print(f"Stopped splitting {os.path.basename(filePath)}: invalid JSON near character {position}")
+                    break
+
+            if not complete:
+                # Element spans the buffer boundary - read more and retry
+                chunk = f.read(READ_CHUNK_CHARS)
+                endOfFile = not chunk
+                buffer, position = buffer[position:] + chunk, 0
+                continue
+
+            record = buffer[position:end].encode("utf-8")
+            position = end
+
+            separator = 2 if part else 0  # ",\n"
+            if part and partSize + separator + len(record) > maxBytes:
+                yield b"[" + b",\n".join(part) + b"]"
+                part, partSize, separator = [], 2, 0
+            if len(record) + 2 > maxBytes:
+                print(f"Skipping oversized JSON element in {os.path.basename(filePath)} ({len(record)} bytes)")
+                continue
+            part.append(record)
+            partSize += separator + len(record)
+
+    if part:
+        yield b"[" + b",\n".join(part) + b"]"
+
+
+def uploadSplitFiles(oversizedFiles: List[Tuple[str, str]], existingFiles: Set[str], folderWorkspaces: Dict[str, str], serverUrl: str, apiKey: str, maxBytes: int = DEFAULT_PART_BYTES, dryRun: bool = False, scrubConfig: Optional[Dict] = None, uploadFolders: Optional[Dict[str, str]] = None,
+                     contents: Optional[Dict[str, bytes]] = None, state: Optional[Dict] = None, statePath: Optional[str] = None) -> List[str]:
+    """
+    Split oversized files and upload each part as its own document.
+
+    Only one part is held in memory at a time. With an import state, each
+    part's hash and locations are kept under state["splitParts"][filePath]:
+    changed parts replace their previous version, parts the file no longer
+    has are removed, and parts already on the server that the state doesn't
+    know are replaced once. Without one, parts are de-duplicated by name.
+
+    Args:
+        oversizedFiles: (filePath, targetFolder) tuples for files over the upload limit
+        existingFiles: Names already on the server
+        folderWorkspaces: Target folder -> comma-separated workspaces
+        serverUrl: AnythingLLM server URL
+        apiKey: API key for authentication
+        maxBytes: Maximum size of each part
+        dryRun: Only report the parts that would be uploaded
+        scrubConfig: PII scrub configuration (piiScrubber.loadScrubConfig) applied to each part
+        uploadFolders: Target folder -> AnythingLLM folder to upload into, when they differ (tenant prefixes)
+        contents: Content of oversized bundle members by key - these are split from memory
+        state: Import state holding the part hashes (updated in place unless dryRun)
+        statePath: Where to save the state after each file (None leaves saving to the caller)
+
+    Returns:
+        List of document locations for embedding
+    """
+    from uploadScheduler import removeReplaced
+
+    result: List[str] = []
+    splitState = state.setdefault(SPLIT_STATE_KEY, {}) if state is not None else None
+    serverLocations: Optional[Dict[str, List[str]]] = None
+
+    for filePath, targetFolder in oversizedFiles:
+        filename = os.path.basename(filePath)
+        memberContent = (contents or {}).get(filePath)
+        size = len(memberContent) if memberContent is not None else os.path.getsize(filePath)
+        print(f"Splitting {filename} ({size} bytes) into parts of up to {maxBytes} bytes")
+        workspacesList = parseWorkspaces(folderWorkspaces.get(targetFolder, ""))
+        uploadFolder = (uploadFolders or {}).get(targetFolder, targetFolder)
+        previousParts = splitState.get(filePath, {}).get("parts", {}) if splitState is not None else {}
+        parts: Dict[str, Dict] = {}
+        replaced: List[Dict[str, str]] = []
+        partCount = uploadedCount = 0
+
+        for name, content in splitFile(filePath, maxBytes, memberContent):
+            partCount += 1
+            hashValue = contentHash(content)
+            previous = previousParts.get(name)
+            if previous is not None and previous.get("hash") == hashValue:
+                parts[name] = previous
+                continue
+            if previous is None and name in existingFiles:
+                if splitState is None:
+                    continue
+                # Uploaded before the state tracked parts - replace that copy rather than add another
+                if serverLocations is None and not dryRun:
+                    from fieldPartitioner import findServerLocations
+                    serverLocations = findServerLocations(sorted(existingFiles), serverUrl, apiKey)
+                previous = {"locations": [location for location in (serverLocations or {}).get(name, []) if location.startswith(f"{uploadFolder}/")]}
+            if scrubConfig:
+                from piiScrubber import scrubContent
+                content = scrubContent(content, targetFolder, scrubConfig)
+            if dryRun:
+                print(f"File: {name} -> Folder: {uploadFolder} - Size: {len(content)} bytes")
+                continue
+            locations = uploadSingleFile(name, content, uploadFolder, serverUrl, apiKey, workspacesList)
+            if locations is None:
+                # Keep the old version (and its hash) so the part is retried next run
+                if previous is not None and previous.get("hash"):
+                    parts[name] = previous
+                continue
+            uploadedCount += 1
+            result.extend(locations)
+            parts[name] = {"hash": hashValue, "locations": locations}
+            replaced.extend({"name": location} for location in (previous or {}).get("locations", []))
+
+        if dryRun:
+            continue
+        print(f"Uploaded {uploadedCount} new or changed parts of {filename} ({partCount} parts total)")
+        if splitState is not None:
+            # The file has fewer parts than last time - the extra ones are stale
+            for name, previous in previousParts.items():
+                if name not in parts:
+                    replaced.extend({"name": location} for location in previous.get("locations", []))
+            splitState[filePath] = {"uploadedAt": time.time(), "parts": parts}
+            if statePath:
+                saveState(state, statePath)
+        # Upload first, then remove the old versions, so there is never a gap with no document
+        removeReplaced(replaced, serverUrl, apiKey)
+
+    return result
+
@@ -0,0 +1,479 @@
+"""
+Identity Index for WWIZ
+
+People appear under many keys: ehsId, Entra/Google UPNs and email
+aliases, Slack user IDs and handles, Atlassian user IDs and plain display
+names (e.g. in manager fields). Answering "who is that?" used to mean
+scanning every source. This index maps every known identifier to its
+ehsId with a single dictionary lookup, and keeps a character trigram
+index over names and handles for fuzzy matching ("sara chen", "@schen").
+
+The index is rebuilt incrementally: each file's identifiers are stored
+with the file's signature (mtime and size, or a content hash when the
+importer builds it), so only new, changed and deleted files are re-read.
+
+Usage:
+    python data-handling/dataImport/identityIndex.py build [--data data]
+    python data-handling/dataImport/identityIndex.py who <identifier>        # email, @handle, <@U123>, name, ID
+    python data-handling/dataImport/identityIndex.py search <text> [limit]   # fuzzy name/handle match
+"""
+
+import json
+import os
+import re
+import sys
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from importState import contentHash
+
+# Where the index is kept (IDENTITY_INDEX_FILE overrides)
+DEFAULT_INDEX_FILE = os.path.join("data-handling", "dataImport", ".identityIndex.json")
+
+INDEX_VERSION = 1
+
+# Record fields that identify the record's person, and their kind
+IDENTIFIER_FIELDS: Dict[str, str] = {
+    "ehsId": "id",
+    "customSchemas.Employee_Info.Employee_ID": "id",
+    "email": "email",
+    "upn": "email",
+    "userPrincipalName": "email",
+    "primaryEmail": "email",
+    "aliases[]": "email",
+    "slackEmail": "email",
+    "slackUserId": "slack",
+    "slackUsername": "handle",
+    "atlassianUserId": "atlassian",
+    "displayName": "name",
+    "slackDisplayName": "name",
+}
+
+# Kinds that go in the trigram index
+FUZZY_KINDS: Set[str] = {"name", "handle"}
+
+# Lowest trigram similarity returned by search
+DEFAULT_MIN_SCORE = 0.3
+DEFAULT_LIMIT = 5
+
+EMAIL_PATTERN = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+MENTION_PATTERN = re.compile(r"<@(\w+)>|(?<![\w.])@([\w.-]+\w)")
+
+
+def normalizeIdentifier(value: str) -> str:
+    """
+    Normalise an identifier for lookup.
+
+    Case and surrounding whitespace are ignored, and Slack mentions
+    ("<@U123>", "@sarah.chen") and "mailto:" prefixes are unwrapped.
+
+    Args:
+        value: Identifier as written
+
+    Returns:
+        Lookup key
+    """
+    value = " ".join(str(value).split()).lower()
+    if value.startswith("<@") and value.endswith(">"):
+        value = value[2:-1].split("|")[0]
+    if value.startswith("mailto:"):
+        value = value[len("mailto:"):]
+    return value.lstrip("@")
+
+
+def trigrams(term: str) -> Set[str]:
+    """
+    Character trigrams of a term, padded so short terms and word edges count.
+
+    Args:
+        term: Normalised name or handle
+
+    Returns:
+        Set of trigrams
+    """
+    padded = f"  {term} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def valuesAt(record, parts: List[str]) -> Iterator:
+    """Yield the values at a field path ("a.b", "list[]") inside a record."""
+    if not parts:
+        yield record
+        return
+    key = parts[0]
+    if not isinstance(record, dict):
+        return
+    if key.endswith("[]"):
+        items = record.get(key[:-2])
+        for item in items if isinstance(items, list) else []:
+            yield from valuesAt(item, parts[1:])
+        return
+    if key in record:
+        yield from valuesAt(record[key], parts[1:])
+
+
+def extractIdentity(record: Dict) -> Tuple[List[List[str]], Dict[str, Dict[str, str]]]:
+    """
+    Pull a record's identifiers and profile details.
+
+    Args:
+        record: Parsed source record
+
+    Returns:
+        ([kind, identifier, ehsId] entries, {ehsId: {"name", "department"}})
+    """
+    ehsId = record.get("ehsId") if isinstance(record, dict) else None
+    if not ehsId or not isinstance(ehsId, str):
+        return [], {}
+
+    entries: Dict[str, str] = {}
+    for path, kind in IDENTIFIER_FIELDS.items():
+        for value in valuesAt(record, path.split(".")):
+            if isinstance(value, str) and value.strip():
+                entries.setdefault(normalizeIdentifier(value), kind)
+                if kind == "email":
+                    entries.setdefault(normalizeIdentifier(value).split("@")[0], "handle")
+    if record.get("firstName") and record.get("lastName"):
+        entries.setdefault(normalizeIdentifier(f"{record['firstName']} {record['lastName']}"), "name")
+
+    name = record.get("displayName") or " ".join(part for part in [record.get("firstName"), record.get("lastName")] if part)
+    department = record.get("department") or (record.get("customSchemas") or {}).get("Employee_Info", {}).get("Department")
+    profile = {key: value for key, value in [("name", name), ("department", department)] if value}
+    return [[kind, identifier, ehsId] for identifier, kind in entries.items()], {ehsId: profile} if profile else {}
+
+
+class IdentityIndex:
+    """Identifier -> ehsId map plus a trigram index, kept per source file."""
+
+    def __init__(self, indexPath: Optional[str] = DEFAULT_INDEX_FILE):
+        self.indexPath = indexPath
+        self.files: Dict[str, Dict] = {}
+        self.identifiers: Dict[str, Dict[str, int]] = {}
+        self.fuzzyTerms: Dict[str, int] = {}
+        self.grams: Dict[str, Set[str]] = {}
+        self.profiles: Dict[str, Dict[str, Dict[str, str]]] = {}
+        self.changed = False
+
+        if indexPath and os.path.exists(indexPath):
+            try:
+                with open(indexPath, "r", encoding="utf-8") as f:
+                    saved = json.load(f)
+            except (OSError, ValueError):
+                saved = {}
+            if saved.get("version") == INDEX_VERSION:
+                for filePath, fileEntry in saved.get("files", {}).items():
+                    self.addFile(filePath, fileEntry)
+
+    def addFile(self, filePath: str, fileEntry: Dict) -> None:
+        """Add one file's identifiers to the lookup tables."""
+        self.files[filePath] = fileEntry
+        for kind, identifier, ehsId in fileEntry["entries"]:
+            people = self.identifiers.setdefault(identifier, {})
+            people[ehsId] = people.get(ehsId, 0) + 1
+            if kind in FUZZY_KINDS:
+                self.fuzzyTerms[identifier] = self.fuzzyTerms.get(identifier, 0) + 1
+                if self.fuzzyTerms[identifier] == 1:
+                    for gram in trigrams(identifier):
+                        self.grams.setdefault(gram, set()).add(identifier)
+        for ehsId, profile in fileEntry.get("profiles", {}).items():
+            self.profiles.setdefault(ehsId, {})[filePath] = profile
+
+    def removeFile(self, filePath: str) -> None:
+        """Take one file's identifiers back out of the lookup tables."""
+        fileEntry = self.files.pop(filePath, None)
+        if fileEntry is None:
+            return
+        for kind, identifier, ehsId in fileEntry["entries"]:
+            people = self.identifiers.get(identifier, {})
+            people[ehsId] = people.get(ehsId, 1) - 1
+            if people[ehsId] <= 0:
+                people.pop(ehsId)
+            if not people:
+                self.identifiers.pop(identifier, None)
+            if kind in FUZZY_KINDS:
+                self.fuzzyTerms[identifier] = self.fuzzyTerms.get(identifier, 1) - 1
+                if self.fuzzyTerms[identifier] <= 0:
+                    self.fuzzyTerms.pop(identifier)
+                    for gram in trigrams(identifier):
+                        terms = self.grams.get(gram)
+                        if terms is not None:
+                            terms.discard(identifier)
+                            if not terms:
+                                self.grams.pop(gram)
+        for ehsId in fileEntry.get("profiles", {}):
+            self.profiles.get(ehsId, {}).pop(filePath, None)
+            if not self.profiles.get(ehsId):
+                self.profiles.pop(ehsId, None)
+
+    def updateFile(self, filePath: str, signature: str, readContent: Callable[[], bytes]) -> bool:
+        """
+        Re-index a file if its signature changed.
+
+        Args:
+            filePath: File path (index key)
+            signature: Change signature (mtime/size or content hash)
+            readContent: Returns the file content when it has to be re-read
+
+        Returns:
+            True if the file was (re-)indexed
+        """
+        current = self.files.get(filePath)
+        if current is not None and current["signature"] == signature:
+            return False
+
+        entries: List[List[str]] = []
+        profiles: Dict[str, Dict[str, str]] = {}
+        try:
+            record = json.loads(readContent())
+        except (OSError, ValueError):
+            record = None
+        for item in record if isinstance(record, list) else [record]:
+            itemEntries, itemProfiles = extractIdentity(item)
+            entries.extend(itemEntries)
+            profiles.update(itemProfiles)
+
+        self.removeFile(filePath)
+        self.addFile(filePath, {"signature": signature, "entries": entries, "profiles": profiles})
+        self.changed = True
+        return True
+
+    def prune(self, keep: Set[str], under: Optional[str] = None) -> int:
+        """
+        Drop files that no longer exist.
+
+        Args:
+            keep: Paths that are still present
+            under: Only prune paths below this folder
+
+        Returns:
+            Number of files removed
+        """
+        prefix = os.path.join(under, "") if under else ""
+        gone = [filePath for filePath in self.files if filePath not in keep and filePath.startswith(prefix)]
+        for filePath in gone:
+            self.removeFile(filePath)
+        if gone:
+            self.changed = True
+        return len(gone)
+
+    def updateFromTree(self, dataPath: str) -> Dict[str, int]:
+        """
+        Bring the index up to date with a data folder, re-reading only changed files.
+
+        Args:
+            dataPath: Data root folder
+
+        Returns:
+            Counts of indexed, unchanged and removed files
+        """
+        counts = {"indexed": 0, "unchanged": 0, "removed": 0}
+        seen: Set[str] = set()
+        for root, dirs, files in os.walk(dataPath):
+            for name in files:
+                if not name.endswith(".json"):
+                    continue
+                filePath = os.path.join(root, name)
+                seen.add(filePath)
+                stat = os.stat(filePath)
+
+                def readContent(path: str = filePath) -> bytes:
+                    with open(path, "rb") as f:
+                        return f.read()
+
+                if self.updateFile(filePath, f"{stat.st_mtime_ns}:{stat.st_size}", readContent):
+                    counts["indexed"] += 1
+                else:
+                    counts["unchanged"] += 1
+        counts["removed"] = self.prune(seen, dataPath)
+        return counts
+
+    def updateFromFiles(self, filesToUpload: Dict[str, Tuple[bytes, str]], prune: bool = True) -> Dict[str, int]:
+        """
+        Bring the index up to date with files already read by the importer.
+
+        Args:
+            filesToUpload: Dictionary of files with content and target folders
+            prune: Drop indexed files missing from filesToUpload (off for partial runs)
+
+        Returns:
+            Counts of indexed, unchanged and removed files
+        """
+        counts = {"indexed": 0, "unchanged": 0, "removed": 0}
+        for filePath, (content, targetFolder) in filesToUpload.items():
+            if not filePath.lower().endswith(".json"):
+                continue
+            # Files on disk use the same signature as updateFromTree, so the CLI and importer share work
+            if os.path.isfile(filePath):
+                stat = os.stat(filePath)
+                signature = f"{stat.st_mtime_ns}:{stat.st_size}"
+            else:
+                signature = contentHash(content)
+            if self.updateFile(filePath, signature, lambda content=content: content):
+                counts["indexed"] += 1
+            else:
+                counts["unchanged"] += 1
+        if prune:
+            counts["removed"] = self.prune(set(filesToUpload))
+        return counts
+
+    def save(self) -> None:
+        """Write the index back if anything changed (atomically)."""
+        if not self.indexPath or not self.changed:
+            return
+        temporary = f"{self.indexPath}.tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            json.dump({"version": INDEX_VERSION, "files": self.files}, f)
+        os.replace(temporary, self.indexPath)
+        self.changed = False
+
+    def profile(self, ehsId: str) -> Dict[str, str]:
+        """
+        Name and department for a person, merged across their source files.
+
+        Args:
+            ehsId: Person's ehsId
+
+        Returns:
+            Profile (empty if unknown)
+        """
+        merged: Dict[str, str] = {}
+        for filePath, profile in sorted(self.profiles.get(ehsId, {}).items()):
+            for key, value in profile.items():
+                merged.setdefault(key, value)
+        return merged
+
+    def candidates(self, identifier: str) -> List[str]:
+        """
+        Every ehsId an identifier belongs to.
+
+        Args:
+            identifier: Email, handle, Slack/Atlassian ID, name or ehsId
+
+        Returns:
+            Sorted ehsIds (more than one when a name is shared)
+        """
+        return sorted(self.identifiers.get(normalizeIdentifier(identifier), {}))
+
+    def resolve(self, identifier: str) -> Optional[str]:
+        """
+        Look up the ehsId for an identifier.
+
+        Args:
+            identifier: Email, handle, Slack/Atlassian ID, name or ehsId
+
+        Returns:
+            ehsId, or None when unknown or ambiguous
+        """
+        people = self.identifiers.get(normalizeIdentifier(identifier))
+        return next(iter(people)) if people and len(people) == 1 else None
+
+    def search(self, text: str, limit: int = DEFAULT_LIMIT, minScore: float = DEFAULT_MIN_SCORE) -> List[Dict]:
+        """
+        Fuzzy-match a name or handle by trigram similarity.
+
+        Args:
+            text: Name or handle, possibly misspelt
+            limit: Most matches to return
+            minScore: Lowest Dice similarity (0-1) to return
+
+        Returns:
+            Matches (term, score, ehsIds), best first
+        """
+        term = normalizeIdentifier(text)
+        queryGrams = trigrams(term)
+        shared: Dict[str, int] = {}
+        for gram in queryGrams:
+            for candidate in self.grams.get(gram, ()):
+                shared[candidate] = shared.get(candidate, 0) + 1
+
+        matches = []
+        for candidate, common in shared.items():
+            score = 2 * common / (len(queryGrams) + len(trigrams(candidate)))
+            if score >= minScore:
+                matches.append({"term": candidate, "score": round(score, 3), "ehsIds": sorted(self.identifiers.get(candidate, {}))})
+        matches.sort(key=lambda match: (-match["score"], match["term"]))
+        return matches[:limit]
+
+    def findPeople(self, text: str) -> List[str]:
+        """
+        Find the people a piece of text mentions by email, Slack mention or full name.
+
+        Args:
+            text: Free text (e.g. a chat question)
+
+        Returns:
+            ehsIds in order of first mention
+        """
+        found: List[str] = []
+        mentions = EMAIL_PATTERN.findall(text) + [first or second for first, second in MENTION_PATTERN.findall(text)]
+        words = re.findall(r"[\w'-]+", text)
+        mentions += [f"{first} {second}" for first, second in zip(words, words[1:])]
+        for mention in mentions:
+            ehsId = self.resolve(mention)
+            if ehsId and ehsId not in found:
+                found.append(ehsId)
+        return found
+
+
+def loadIdentityIndex(env: Dict[str, str]) -> IdentityIndex:
+    """
+    Open the identity index named in the environment settings.
+
+    Args:
+        env: Environment settings (IDENTITY_INDEX_FILE)
+
+    Returns:
+        IdentityIndex (empty if it hasn't been built)
+    """
+    return IdentityIndex(env.get("IDENTITY_INDEX_FILE") or DEFAULT_INDEX_FILE)
+
+
+def main() -> None:
+    args = sys.argv[1:]
+    dataPath = None
+    if "--data" in args:
+        index = args.index("--data")
+        dataPath = args[index + 1]
+        del args[index:index + 2]
+
+    if not args or args[0] not in ("build", "who", "search") or (args[0] != "build" and len(args) < 2):
+        print("Usage:")
+        print("  python identityIndex.py build [--data data]        # index new and changed files")
+        print("  python identityIndex.py who <identifier>           # email, @handle, <@U123>, name or ID -> ehsId")
+        print("  python identityIndex.py search <text> [limit]      # fuzzy name/handle match")
+        sys.exit(1)
+
+    env: Dict[str, str] = {}
+    if os.path.exists(os.path.join("data-handling", "dataImport", ".importFiles.env")):
+        from importFiles import loadEnv
+        env = loadEnv()
+    identityIndex = loadIdentityIndex(env)
+
+    if args[0] == "build":
+        dataPath = dataPath or env.get("FILE_PATH", "data")
+        counts = identityIndex.updateFromTree(dataPath)
+        identityIndex.save()
+        print(f"Indexed {counts['indexed']} files ({counts['unchanged']} unchanged, {counts['removed']} removed) - "
+              f"{len(identityIndex.identifiers)} identifiers for {len(identityIndex.profiles)} people")
+        return
+
+    if not identityIndex.files:
+        print("Identity index is empty - run: python data-handling/dataImport/identityIndex.py build")
+        sys.exit(1)
+
+    if args[0] == "who":
+        identifier = " ".join(args[1:])
+        people = identityIndex.candidates(identifier)
+        if not people:
+            print(f"No exact match for '{identifier}' - closest:")
+            people = [ehsId for match in identityIndex.search(identifier, 3) for ehsId in match["ehsIds"]]
+        for ehsId in dict.fromkeys(people):
+            profile = identityIndex.profile(ehsId)
+            print(f"{ehsId}  {profile.get('name', ''):<25} {profile.get('department', '')}")
+    else:
+        limit = int(args[2]) if len(args) > 2 else DEFAULT_LIMIT
+        for match in identityIndex.search(args[1], limit):
+            print(f"{match['score']:>6.3f}  {match['term']:<35} {', '.join(match['ehsIds'])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,8 +8,10 @@ Features:
 - Creates folder structure in AnythingLLM matching local directory
 - Uploads JSON, TXT, XML, and CSV files
 - Avoids duplicate uploads by checking existing files
+- Validates JSON records against the sample-data templates before upload
 - Embeds uploaded files in specified workspaces
-- Supports dry-run mode for testing
+- Supports dry-run mode for testing, with token, chunk, duration and storage estimates
+- Imports several tenants in one run from a tenant manifest
 
 Author: Tim Firman
 Company: Full Metal Productions
@@ -17,10 +19,15 @@ Project: WWIZ (Who's Who in the Zoo)
 """
 
 import requests
+import json
 import os
 import sys
 import urllib.parse
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
+
+from importState import DEFAULT_STATE_FILE, contentHash, hasChanged, loadState
+from profiling import NullProfiler, profilerFromArgs
+from workspaceShards import ensureShardWorkspaces, groupFilesByShard, sourceFolderName, workspacesForDocument, workspacesForFolder
 
 # Global configuration variables
 serverUrl: str
@@ -36,6 +43,12 @@ testing: bool = False
 smallBatchRun : bool = False
 smallBatchSize : int = 0
 
+# Set from --profile in __main__, no-op otherwise
+profiler = NullProfiler()
+
+# AnythingLLM upload size limit
+MAX_UPLOAD_BYTES: int = 10 * 1024 * 1024  # 10MB
+
 
 def main() -> None:
     """
@@ -56,8 +69,28 @@ def main() -> None:
     includedFileTypes = env.get("INCLUDED_FILE_TYPES", "txt,json,xml,csv").split(",")
     
     dryRun = dryRun.lower() == 'true' if isinstance(dryRun, str) else dryRun
+    # Aliases switched by a blue/green rebuild resolve to their active workspace
+    from workspaceRebuild import resolveWorkspaces, DEFAULT_POINTER_FILE
+    workspaces = resolveWorkspaces(workspaces, env.get("WORKSPACE_POINTER_FILE", DEFAULT_POINTER_FILE))
     smallBatchRun = env.get("SMALL_BATCH", "false").lower() == 'true'
     smallBatchSize = int(env.get("SMALL_BATCH_LIMIT", 0))
+    sharding = env.get("SHARDING", "off").lower()
+    shardPrefix = env.get("SHARD_PREFIX", "wwiz")
+    splitLargeFiles = env.get("SPLIT_LARGE_FILES", "true").lower() == 'true'
+    splitPartBytes = int(env.get("SPLIT_PART_BYTES", 0) or 0)
+    validateSchemas = env.get("VALIDATE_SCHEMAS", "true").lower() == 'true'
+    partitionFields = env.get("PARTITION_FIELDS", "false").lower() == 'true'
+    buildRollups = env.get("ROLLUPS", "false").lower() == 'true'
+    buildCollaboration = env.get("COLLABORATION", "false").lower() == 'true'
+    buildWorkloadScores = env.get("WORKLOAD_SCORES", "false").lower() == 'true'
+    scrubPii = env.get("PII_SCRUB", "false").lower() == 'true'
+    sampleSize = env.get("SAMPLE_SIZE", "").strip()
+
+    # One run can ingest many companies, each with its own data tree and quota
+    if env.get("TENANT_MANIFEST"):
+        from tenantImport import runTenantImport
+        runTenantImport(env, dryRun)
+        return
 
     if not serverURL or not filePath:
         print(f"Error, variables missing. Check your .env\nserverURL: {serverURL}\nfilePath: {filePath}")
@@ -67,25 +100,239 @@ def main() -> None:
     else: 
         print("Variables Set")
         
+    from bundleReader import isBundle
+    bundle = isBundle(filePath)
+    if bundle and env.get("WORK_QUEUE"):
+        print("Error: WORK_QUEUE workers read files from disk - unpack the bundle or clear WORK_QUEUE")
+        return
+
+    # Dry runs plan from a streaming walk instead of loading every file (constant memory)
+    if dryRun and env.get("CAPACITY_PLAN", "true").lower() == 'true' and not bundle:
+        from capacityPlanner import runCapacityPlan
+        with profiler.phase("capacity-plan"):
+            runCapacityPlan(env, set(buildExistingFileList(serverURL, apiKey)))
+        return
+
     # Build list of files to upload with their target folders
-    filesToUpload: Dict[str, Tuple[bytes, str]] = buildFileListWithFolders(filePath, recursive, smallBatchRun, smallBatchSize, includedFileTypes)
-    
-    # Get existing files to avoid duplicates
-    existingFiles: List[str] = buildExistingFileList(serverURL, apiKey)
-    filesToUpload = removeDuplicates(filesToUpload, existingFiles)
+    oversizedFiles: Optional[List[Tuple[str, str]]] = [] if splitLargeFiles else None
+    # Oversized bundle members are already in memory and are split from there
+    oversizedContents: Dict[str, bytes] = {}
+    with profiler.phase("discovery"):
+        filesToUpload: Dict[str, Tuple[bytes, str]] = buildFileListWithFolders(filePath, recursive, smallBatchRun, smallBatchSize, includedFileTypes, oversizedFiles, oversizedContents)
+
+    # Department shards need every staff record, not just the ones uploaded this run
+    departmentIndex: Dict[str, str] = {}
+    if sharding == "department":
+        from workspaceShards import buildDepartmentIndex, loadDepartmentIndex
+        departmentIndex = buildDepartmentIndex(filesToUpload) if bundle else loadDepartmentIndex(filePath)
+
+    # Keep the identifier -> ehsId index in step with the source files (before sampling or scrubbing)
+    if env.get("IDENTITY_INDEX", "false").lower() == 'true':
+        from identityIndex import loadIdentityIndex
+        with profiler.phase("identity-index"):
+            identityIndex = loadIdentityIndex(env)
+            indexCounts = identityIndex.updateFromFiles(filesToUpload, prune=not smallBatchRun)
+            identityIndex.save()
+        print(f"Identity index: {indexCounts['indexed']} files indexed, {indexCounts['removed']} removed, {len(identityIndex.identifiers)} identifiers")
+
+    # Representative test runs: the same seeded people/projects from every source folder
+    if sampleSize:
+        from importSampler import printSampleSummary, sampleFiles, DEFAULT_SEED
+        byDepartment = env.get("SAMPLE_BY_DEPARTMENT", "false").lower() == 'true'
+        try:
+            with profiler.phase("sample"):
+                filesToUpload, sampleSummary = sampleFiles(filesToUpload, sampleSize, env.get("SAMPLE_SEED") or DEFAULT_SEED, byDepartment)
+        except ValueError as e:
+            print(f"Error: {e}")
+            return
+        printSampleSummary(sampleSummary, byDepartment)
+        if oversizedFiles:
+            print(f"Leaving out {len(oversizedFiles)} oversized files from the sample run")
+            oversizedFiles = []
+
+    # Personal data is removed before anything else (including the derived documents) reads the files
+    scrubConfig: Optional[Dict] = None
+    if scrubPii:
+        try:
+            with profiler.phase("pii-scrub"):
+                filesToUpload, scrubConfig = scrubUploadList(filesToUpload, env)
+        except ValueError as e:
+            print(f"Error: {e}")
+            return
+
+    # Live status and rollups come from every file, including ones that are already uploaded.
+    # A partial run (SMALL_BATCH, SAMPLE_SIZE) has only some files, and documents built from
+    # them would replace the complete ones on the server - leave them for a full run
+    liveDocs: Dict[str, Tuple[bytes, str]] = {}
+    rollupDocs: Dict[str, Tuple[bytes, str]] = {}
+    collaborationDocs: Dict[str, Tuple[bytes, str]] = {}
+    workloadDocs: Dict[str, Tuple[bytes, str]] = {}
+    workloadWorkspaces: Optional[str] = None
+    if smallBatchRun or sampleSize:
+        skipped = [name for name, enabled in [("rollup", buildRollups), ("collaboration", buildCollaboration), ("workload score", buildWorkloadScores)] if enabled]
+        # A sample has every source of its people, so their live status is complete; a small batch doesn't
+        if partitionFields and smallBatchRun:
+            skipped.insert(0, "live status")
+        if skipped:
+            print(f"Partial run - not building {', '.join(skipped)} documents")
+        buildRollups = buildCollaboration = buildWorkloadScores = False
+    if partitionFields:
+        from fieldPartitioner import buildLiveDocuments, stripVolatileFields
+        if not smallBatchRun:
+            with profiler.phase("partition"):
+                liveDocs = buildLiveDocuments(filesToUpload)
+    if buildRollups:
+        from rollupDocuments import buildRollupDocuments
+        with profiler.phase("rollups"):
+            rollupDocs = buildRollupDocuments(filesToUpload)
+    if buildCollaboration:
+        from collaborationGraph import buildCollaborationDocuments, DEFAULT_MAX_GROUP_SIZE, DEFAULT_TOP_K
+        with profiler.phase("collaboration"):
+            collaborationDocs = buildCollaborationDocuments(filesToUpload.values(), int(env.get("COLLAB_TOP_K", DEFAULT_TOP_K)), int(env.get("COLLAB_MAX_GROUP", DEFAULT_MAX_GROUP_SIZE)))
+    if buildWorkloadScores:
+        from workloadScores import buildScoreDocuments
+        with profiler.phase("workload-scores"):
+            workloadDocs = buildScoreDocuments(filesToUpload.values())
+        # Burnout scores never go to the general workspaces - without a restricted one they stay on disk
+        from workloadScores import restrictedWorkspaces, writeScoreDocuments, DEFAULT_SCORES_DIR
+        workloadWorkspaces = restrictedWorkspaces(resolveWorkspaces(env.get("WORKLOAD_WORKSPACES"), env.get("WORKSPACE_POINTER_FILE", DEFAULT_POINTER_FILE)), workspaces, sharding, shardPrefix)
+        if workloadWorkspaces is None and workloadDocs:
+            scoresDir = env.get("WORKLOAD_SCORES_DIR", DEFAULT_SCORES_DIR)
+            if not dryRun:
+                writeScoreDocuments(workloadDocs, scoresDir)
+            print(f"WORKLOAD_WORKSPACES is unset or shares a workspace with WORKSPACES/shards - {len(workloadDocs)} workload score documents written to {scoresDir}, not uploaded")
+            workloadDocs = {}
+    
+    # Get existing files to avoid duplicates (files uploaded before are compared by content hash)
+    statePath = env.get("IMPORT_STATE_FILE", DEFAULT_STATE_FILE)
+    if env.get("WORK_QUEUE"):
+        # Pick up what queue workers uploaded since the last plan
+        from workQueue import syncImportState
+        syncImportState(env["WORK_QUEUE"], statePath, env.get("WORK_QUEUE_JOURNAL", "wal"))
+    state = loadState(statePath)
+    with profiler.phase("existing-files"):
+        existingFiles: List[str] = buildExistingFileList(serverURL, apiKey)
+    with profiler.phase("dedupe"):
+        filesToUpload = removeUnchanged(filesToUpload, existingFiles, state, parseChangedSources(env))
+        # Later stages (field stripping, canonical near-duplicates) change content - record what dedupe compares
+        sourceHashes = {path: contentHash(content) for path, (content, folder) in filesToUpload.items()}
+
+    # Check records against the sample-data templates before they cost upload and embedding time
+    if validateSchemas and filesToUpload:
+        with profiler.phase("validate"):
+            validFiles = removeInvalidFiles(filesToUpload, env)
+        if validFiles is None:
+            return
+        filesToUpload = validFiles
+
+    # Near-duplicates cost an embedding each - report them, or keep one representative per cluster
+    nearDuplicateMode = env.get("NEAR_DUPLICATES", "off").lower()
+    if nearDuplicateMode in ("report", "canonical") and filesToUpload:
+        from nearDuplicates import detectNearDuplicates, keepCanonical, printClusterSummary, DEFAULT_THRESHOLD
+        with profiler.phase("near-duplicates"):
+            clusters = detectNearDuplicates(filesToUpload, float(env.get("NEAR_DUPLICATE_THRESHOLD", 0) or DEFAULT_THRESHOLD))
+        printClusterSummary(clusters, filesToUpload)
+        if nearDuplicateMode == "canonical" and clusters:
+            filesToUpload, droppedCount = keepCanonical(filesToUpload, clusters)
+            print(f"Uploading one file per cluster - {droppedCount} near-duplicates left out")
+
+    if partitionFields:
+        with profiler.phase("partition"):
+            filesToUpload = stripVolatileFields(filesToUpload)
     
     if dryRun:
         print(f"Dry run enabled. Files to upload: {len(filesToUpload)}")
         for filePath, (content, targetFolder) in filesToUpload.items():
             print(f"File: {os.path.basename(filePath)} -> Folder: {targetFolder} - Size: {len(content)} bytes")
+        if liveDocs:
+            print(f"Live status documents: {len(liveDocs)} (uploaded when changed)")
+        if rollupDocs:
+            print(f"Rollup documents: {len(rollupDocs)} (uploaded when changed)")
+        if collaborationDocs:
+            print(f"Collaboration documents: {len(collaborationDocs)} (uploaded when changed)")
+        if workloadDocs:
+            print(f"Workload score documents: {len(workloadDocs)} (uploaded when changed)")
+        if sharding != "off":
+            groupFilesByShard(filesToUpload, sharding, shardPrefix, env.get("SHARD_MAP", ""), departmentIndex)
+        if oversizedFiles:
+            from fileSplitter import uploadSplitFiles, DEFAULT_PART_BYTES
+            uploadSplitFiles(oversizedFiles, set(existingFiles), {}, serverURL, apiKey, splitPartBytes or DEFAULT_PART_BYTES, dryRun=True, scrubConfig=scrubConfig, contents=oversizedContents, state=state)
         return
     
     # Create folder structure in AnythingLLM
-    folderStructure: List[str] = extractFolderStructure(filesToUpload)
-    createFolderStructure(folderStructure, serverURL, apiKey)
-    
-    # Upload files to their respective folders
-    uploadResults = uploadFilesToFolders(filesToUpload, serverURL, apiKey, workspaces)
+    with profiler.phase("folders"):
+        folderStructure: List[str] = sorted(set(extractFolderStructure(filesToUpload)) | {folder for path, folder in oversizedFiles or [] if folder} | {folder for content, folder in list(liveDocs.values()) + list(rollupDocs.values()) + list(collaborationDocs.values()) + list(workloadDocs.values())})
+        createFolderStructure(folderStructure, serverURL, apiKey)
+    
+    # Work out which workspaces each file is embedded in
+    if sharding != "off":
+        # Each shard gets its own workspace, plus anything listed in WORKSPACES
+        shards = groupFilesByShard(filesToUpload, sharding, shardPrefix, env.get("SHARD_MAP", ""), departmentIndex)
+        ensureShardWorkspaces(list(shards.keys()), serverURL, apiKey)
+        fileWorkspaces = {
+            path: ",".join(ws for ws in [shard, workspaces or ""] if ws)
+            for shard, shardFiles in shards.items() for path in shardFiles
+        }
+    else:
+        fileWorkspaces = {path: workspaces or "" for path in filesToUpload}
+
+    # Upload files to their respective folders, most valuable first
+    from uploadScheduler import parseFolderPriorities, runScheduledUploads, scheduleUploads, writeDeferredReport, DEFAULT_DEFERRED_REPORT
+
+    # Generated documents are small and change often - upload the changed ones first, replacing their old versions
+    derivedResults: List[str] = []
+    derivedKinds = [
+        (liveDocs, "liveStatus", "Live status", None),
+        (rollupDocs, "rollups", "Rollups", None),
+        (collaborationDocs, "collaboration", "Collaboration", None),
+        # Burnout scores are sensitive - only uploaded when WORKLOAD_WORKSPACES is a restricted workspace
+        (workloadDocs, "workloadScores", "Workload scores", workloadWorkspaces),
+    ]
+    for documents, stateKey, label, workspaceOverride in derivedKinds:
+        if not documents:
+            continue
+        from fieldPartitioner import uploadDerivedDocuments
+        if workspaceOverride:
+            derivedWorkspaces = {folder: workspaceOverride for content, folder in documents.values()}
+        else:
+            derivedWorkspaces = {key: workspacesForDocument(content, folder, sharding, shardPrefix, env.get("SHARD_MAP", ""), workspaces, departmentIndex) for key, (content, folder) in documents.items()}
+        if sharding != "off" and not workspaceOverride:
+            ensureShardWorkspaces(sorted({ws for value in derivedWorkspaces.values() for ws in parseWorkspaces(value)} - set(parseWorkspaces(workspaces))), serverURL, apiKey)
+        with profiler.phase(stateKey):
+            derivedResults.extend(uploadDerivedDocuments(documents, existingFiles, derivedWorkspaces, serverURL, apiKey, state, statePath, stateKey, label))
+
+    with profiler.phase("schedule"):
+        schedule = scheduleUploads(filesToUpload, fileWorkspaces, parseFolderPriorities(env.get("FOLDER_PRIORITIES", "")), state)
+
+    # Hand the plan to queue workers (workQueue.py work) instead of uploading here
+    if env.get("WORK_QUEUE"):
+        from workQueue import enqueueSchedule
+        from uploadScheduler import previousLocations
+        folderWorkspaces = {folder: workspacesForFolder(folder, sharding, shardPrefix, env.get("SHARD_MAP", ""), workspaces) for path, folder in oversizedFiles or []}
+        if sharding != "off" and folderWorkspaces:
+            ensureShardWorkspaces(sorted({ws.split(",")[0] for ws in folderWorkspaces.values()}), serverURL, apiKey)
+        with profiler.phase("enqueue"):
+            enqueueSchedule(env["WORK_QUEUE"], schedule, [(path, folder, folderWorkspaces[folder]) for path, folder in oversizedFiles or []], env.get("WORK_QUEUE_JOURNAL", "wal"),
+                            sourceHashes, previousLocations(schedule, state, existingFiles, serverURL, apiKey))
+        print(f"Planned {len(schedule) + len(oversizedFiles or [])} items - run workQueue.py work to upload them")
+        return
+
+    with profiler.phase("upload"):
+        uploadResults, deferred = runScheduledUploads(schedule, serverURL, apiKey, float(env.get("MAX_RUNTIME", 0) or 0), state, statePath, existingFiles, sourceHashes)
+    writeDeferredReport(deferred, env.get("DEFERRED_REPORT", DEFAULT_DEFERRED_REPORT))
+    uploadResults.extend(derivedResults)
+
+    # Stream oversized exports through the splitter, one part in memory at a time
+    if oversizedFiles and deferred:
+        print(f"Time budget used up - {len(oversizedFiles)} oversized files left for the next run")
+    elif oversizedFiles:
+        from fileSplitter import uploadSplitFiles, DEFAULT_PART_BYTES
+        folderWorkspaces = {folder: workspacesForFolder(folder, sharding, shardPrefix, env.get("SHARD_MAP", ""), workspaces) for path, folder in oversizedFiles}
+        if sharding != "off":
+            ensureShardWorkspaces(sorted({ws.split(",")[0] for ws in folderWorkspaces.values()}), serverURL, apiKey)
+        with profiler.phase("split-upload"):
+            uploadResults.extend(uploadSplitFiles(oversizedFiles, set(existingFiles), folderWorkspaces, serverURL, apiKey, splitPartBytes or DEFAULT_PART_BYTES, scrubConfig=scrubConfig, contents=oversizedContents,
+                                                   state=state, statePath=statePath))
 
     # Embed files in workspaces
     #  embedFilesInAgents(uploadResults, workspaces, serverURL, apiKey)
@@ -93,16 +340,68 @@ def main() -> None:
     print("All files processed and embedded in agent.")
 
 
-def buildFileListWithFolders(filePath: str, recursive: bool, smallBatchRun: bool, smallBatchSize: int, includedFileTypes: List[str]) -> Dict[str, Tuple[bytes, str]]:
+def scrubUploadList(filesToUpload: Dict[str, Tuple[bytes, str]], env: Dict[str, str]) -> Tuple[Dict[str, Tuple[bytes, str]], Dict]:
+    """
+    Remove personal data from the upload list (PII_SCRUB).
+
+    Args:
+        filesToUpload: Dictionary of files with content and target folders
+        env: Environment variables
+
+    Returns:
+        Tuple of (scrubbed files, scrub configuration for later stages such as split parts)
+
+    Raises:
+        ValueError: If the scrub configuration is invalid
+    """
+    from piiScrubber import loadScrubConfig, printScrubSummary, scrubFiles
+
+    scrubConfig = loadScrubConfig(env)
+    filesToUpload, scrubStats = scrubFiles(filesToUpload, scrubConfig, int(env.get("PII_WORKERS", 0) or 0))
+    printScrubSummary(scrubStats, len(filesToUpload))
+    return filesToUpload, scrubConfig
+
+
+def removeInvalidFiles(filesToUpload: Dict[str, Tuple[bytes, str]], env: Dict[str, str]) -> Optional[Dict[str, Tuple[bytes, str]]]:
+    """
+    Check records against the sample-data templates and drop the ones that fail.
+
+    Args:
+        filesToUpload: Dictionary of files with content and target folders
+        env: Environment variables
+
+    Returns:
+        Files that passed validation, or None if STOP_ON_INVALID stops the run
+    """
+    from schemaValidators import printValidationSummary, validateFiles
+
+    summary = validateFiles([(path, sourceFolderName(folder)) for path, (content, folder) in filesToUpload.items()], int(env.get("VALIDATION_WORKERS", 0) or 0),
+                            contents={path: content for path, (content, folder) in filesToUpload.items()})
+    invalidFiles = {path for folder in summary.values() for path in folder["invalid"]}
+    printValidationSummary(summary)
+    if invalidFiles and env.get("STOP_ON_INVALID", "false").lower() == 'true':
+        print(f"Stopping: {len(invalidFiles)} files failed validation (STOP_ON_INVALID=True)")
+        return None
+    if invalidFiles:
+        print(f"Skipping {len(invalidFiles)} files that failed validation")
+    return {path: value for path, value in filesToUpload.items() if path not in invalidFiles}
+
+
+def buildFileListWithFolders(filePath: str, recursive: bool, smallBatchRun: bool, smallBatchSize: int, includedFileTypes: List[str], oversizedFiles: Optional[List[Tuple[str, str]]] = None,
+                             oversizedContents: Optional[Dict[str, bytes]] = None) -> Dict[str, Tuple[bytes, str]]:
     """
     Build a dictionary of files to upload with their target folder paths.
     
     Args:
-        filePath: Root directory to scan for files
+        filePath: Root directory to scan for files, or a tar/zip/JSONL bundle (bundleReader.py)
         recursive: Whether to scan subdirectories recursively
         smallBatchRun: Whether to limit the number of files processed
         smallBatchSize: Maximum number of files to process when smallBatchRun is True
         includedFileTypes: List of file extensions to include (e.g., ['txt', 'json', 'xml', 'csv'])
+        oversizedFiles: If given, splittable files over the upload limit are appended here
+            as (path, targetFolder) instead of being read into memory
+        oversizedContents: For bundles, receives the content of oversized members (already
+            in memory) so the splitter reads them from there; without it they are uploaded whole
         
     Returns:
         Dictionary mapping file paths to (file_content, target_folder) tuples
@@ -113,6 +412,11 @@ def buildFileListWithFolders(filePath: str, recursive: bool, smallBatchRun: bool
     
     filesDict: Dict[str, Tuple[bytes, str]] = {}
     
+    # Archives and JSONL exports are read in place instead of being unpacked first
+    from bundleReader import isBundle, readBundle
+    if isBundle(filePath):
+        return readBundle(filePath, loadEnv(), smallBatchRun, smallBatchSize, includedFileTypes, oversizedFiles, oversizedContents)
+    
     if not os.path.exists(filePath) or not os.path.isdir(filePath):
         print(f"Error: {filePath} does not exist or is not a directory")
         sys.exit(1)
@@ -137,6 +441,10 @@ def buildFileListWithFolders(filePath: str, recursive: bool, smallBatchRun: bool
                     relativePath = os.path.relpath(root, filePath)
                     targetFolder = relativePath if relativePath != "." else ""
                     
+                    if isSplittable(fullPath, ext, oversizedFiles):
+                        oversizedFiles.append((fullPath, targetFolder))
+                        continue
+                    
                     with open(fullPath, "rb") as f:
                         filesDict[fullPath] = (f.read(), targetFolder)
     else:
@@ -151,6 +459,9 @@ def buildFileListWithFolders(filePath: str, recursive: bool, smallBatchRun: bool
                 if ext in includedFileTypes:
                     fullPath = os.path.join(filePath, file)
                     if os.path.isfile(fullPath):
+                        if isSplittable(fullPath, ext, oversizedFiles):
+                            oversizedFiles.append((fullPath, ""))
+                            continue
                         with open(fullPath, "rb") as f:
                             filesDict[fullPath] = (f.read(), "")
         elif os.path.isfile(filePath):
@@ -162,6 +473,22 @@ def buildFileListWithFolders(filePath: str, recursive: bool, smallBatchRun: bool
     return filesDict
 
 
+def isSplittable(fullPath: str, ext: str, oversizedFiles: Optional[List[Tuple[str, str]]]) -> bool:
+    """
+    Check whether a file should be streamed through the splitter instead of read whole.
+    
+    Args:
+        fullPath: Path of the file
+        ext: Lowercase file extension
+        oversizedFiles: Oversized file list (None when splitting is disabled)
+        
+    Returns:
+        True if the file is over the upload limit and can be split
+    """
+    from fileSplitter import SPLITTABLE_FILE_TYPES
+    return oversizedFiles is not None and ext in SPLITTABLE_FILE_TYPES and os.path.getsize(fullPath) > MAX_UPLOAD_BYTES
+
+
 def extractFolderStructure(filesToUpload: Dict[str, Tuple[bytes, str]]) -> List[str]:
     """
     Extract unique folder paths from the files to upload.
@@ -298,37 +625,70 @@ def cleanAPIFileNames(fileDict: Dict) -> str:
     return newFilename    
     
 
-def removeDuplicates(filesToUpload: Dict[str, Tuple[bytes, str]], existingFiles: List[str]) -> Dict[str, Tuple[bytes, str]]:
+def removeUnchanged(filesToUpload: Dict[str, Tuple[bytes, str]], existingFiles: List[str], state: Dict, changedSources: Optional[List[str]] = None) -> Dict[str, Tuple[bytes, str]]:
     """
-    Remove files that already exist on the server from the upload list.
-    
+    Remove files whose current content is already on the server from the upload list.
+
+    Files in the import state are compared by content hash, so edited files are
+    uploaded again (replacing their old version). Files the state doesn't know
+    fall back to the name check - except in changedSources, where a server copy
+    the state doesn't know may be stale, so it is replaced too.
+
     Args:
         filesToUpload: Dictionary of files to upload
         existingFiles: List of existing file names on server
-        
+        state: Import state (content hashes of earlier uploads)
+        changedSources: Source folders known to have changed (REFRESH_CHANGED_SOURCES)
+
     Returns:
-        Filtered dictionary with duplicates removed
+        Filtered dictionary with unchanged files removed
     """
+    existing = set(existingFiles)
+    changedSources = set(changedSources or [])
     cleanedFilesToUpload = {}
+    changedCount = 0
     skippedCount = 0
-    
+
     for filePath, (content, targetFolder) in filesToUpload.items():
-        filename = os.path.basename(filePath)
-        if filename not in existingFiles:
+        if filePath in state["files"]:
+            keep = hasChanged(state, filePath, content)
+            changedCount += keep
+        elif os.path.basename(filePath) in existing:
+            keep = sourceFolderName(targetFolder) in changedSources
+            changedCount += keep
+        else:
+            keep = True
+        if keep:
             cleanedFilesToUpload[filePath] = (content, targetFolder)
         else:
             skippedCount += 1
-            
+
         # Testing limit
         if testing and len(cleanedFilesToUpload) >= 10:
             break
-    
+
     if skippedCount > 0:
-        print(f"Skipped {skippedCount} duplicate files")
-            
+        print(f"Skipped {skippedCount} unchanged files")
+    if changedCount > 0:
+        print(f"{changedCount} changed files will replace their uploaded versions")
+
     return cleanedFilesToUpload
 
 
+def parseChangedSources(env: Dict[str, str]) -> List[str]:
+    """
+    Read the source folders a refresh reported as changed.
+
+    refreshScheduler.py passes them to the import command in the process
+    environment; REFRESH_CHANGED_SOURCES in .importFiles.env is used otherwise.
+
+    Returns:
+        Source folder names (empty when not run from a refresh)
+    """
+    value = os.environ.get("REFRESH_CHANGED_SOURCES", env.get("REFRESH_CHANGED_SOURCES", ""))
+    return [source.strip() for source in value.split(",") if source.strip()]
+
+
 def uploadFilesToFolders(filesToUpload: Dict[str, Tuple[bytes, str]], serverUrl: str, apiKey: str, workspaces: str) -> List[str]:
     """
     Upload files to AnythingLLM server, organizing them into folders.
@@ -342,92 +702,127 @@ def uploadFilesToFolders(filesToUpload: Dict[str, Tuple[bytes, str]], serverUrl:
     Returns:
         List of document locations for embedding
     """
-    
-    
-    baseEndpoint = f"{serverUrl}/api/v1/document/upload"
-    auth = f"Bearer {apiKey}"
-    # Don't set Content-Type header - let requests handle multipart/form-data
-    headers = {'Authorization': auth}
-    
     result = []
     
     uploadCount = 0
     totalFiles = len(filesToUpload)
     
     # Parse workspaces properly - should be comma-separated string
-    workspacesList = [ws.strip() for ws in workspaces.split(",") if ws.strip()] if isinstance(workspaces, str) else workspaces
+    workspacesList = parseWorkspaces(workspaces)
     
     for filePath, (fileContent, targetFolder) in filesToUpload.items():
         filename = os.path.basename(filePath)
+        locations = uploadSingleFile(filename, fileContent, targetFolder, serverUrl, apiKey, workspacesList)
         
-        # Check file size (AnythingLLM might have limits)
-        fileSize = len(fileContent)
-        if fileSize > 10 * 1024 * 1024:  # 10MB limit
-            print(f"Skipping {filename}: File too large ({fileSize} bytes)")
-            continue
-        
-        # For JSON files, validate content
-        ext = filename.split('.')[-1].lower()
-        if ext == 'json':
-            try:
-                import json
-                json.loads(fileContent.decode('utf-8'))
-            except (json.JSONDecodeError, UnicodeDecodeError) as e:
-                print(f"Skipping {filename}: Invalid JSON content - {str(e)}")
-                continue
-        
-        # Build endpoint URL with folder path
-        if targetFolder:
-            # URL encode the folder path
-            encodedFolder = urllib.parse.quote(targetFolder, safe='')
-            targetEndpoint = f"{baseEndpoint}/{encodedFolder}"
-        else:
-            targetEndpoint = baseEndpoint
-        
-        # Prepare multipart form data
-        files = {
-            'file': (filename, fileContent)
-        }
+        if locations is not None:
+            uploadCount += 1
+            result.extend(locations)
+            print(f"Uploaded: {filename} ({uploadCount}/{totalFiles}) - Size: {len(fileContent)} bytes")
+            
+        if uploadCount % 25 == 0 and uploadCount > 0:
+            print(f"Progress: {uploadCount}/{totalFiles} files uploaded...")
+    
+    print(f"Upload complete. Successfully uploaded {uploadCount} out of {totalFiles} files.")
+    return result
+
+
+def parseWorkspaces(workspaces) -> List[str]:
+    """
+    Split a comma-separated WORKSPACES value into a list of workspace slugs.
+    
+    Args:
+        workspaces: Comma-separated string (or an already split list)
         
-        # Add workspace parameter as single form field (not multiple)
-        data = {}
-        if workspacesList:
-            # Join multiple workspaces with comma as per API docs
-            data['addToWorkspaces'] = ','.join(workspacesList)
+    Returns:
+        List of workspace slugs
+    """
+    if not workspaces:
+        return []
+    return [ws.strip() for ws in workspaces.split(",") if ws.strip()] if isinstance(workspaces, str) else workspaces
+
+
+def uploadSingleFile(filename: str, fileContent: bytes, targetFolder: str, serverUrl: str, apiKey: str, workspacesList: List[str]) -> Optional[List[str]]:
+    """
+    Upload one file to an AnythingLLM folder and add it to workspaces.
+    
+    Args:
+        filename: Name the document is uploaded as
+        fileContent: Raw file content
+        targetFolder: Folder to upload into ("" for the default folder)
+        serverUrl: AnythingLLM server URL
+        apiKey: API key for authentication
+        workspacesList: Workspaces to add the document to
         
+    Returns:
+        List of document locations on success, None if skipped or failed
+    """
+    baseEndpoint = f"{serverUrl}/api/v1/document/upload"
+    auth = f"Bearer {apiKey}"
+    # Don't set Content-Type header - let requests handle multipart/form-data
+    headers = {'Authorization': auth}
+    
+    # Check file size (AnythingLLM might have limits)
+    fileSize = len(fileContent)
+    if fileSize > MAX_UPLOAD_BYTES:
+        print(f"Skipping {filename}: File too large ({fileSize} bytes)")
+        return None
+    
+    # For JSON files, validate content
+    ext = filename.split('.')[-1].lower()
+    if ext == 'json':
         try:
-            response = requests.post(targetEndpoint, headers=headers, files=files, data=data)
+            json.loads(fileContent.decode('utf-8'))
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            print(f"Skipping {filename}: Invalid JSON content - {str(e)}")
+            return None
+    
+    # Build endpoint URL with folder path
+    if targetFolder:
+        # URL encode the folder path
+        encodedFolder = urllib.parse.quote(targetFolder, safe='')
+        targetEndpoint = f"{baseEndpoint}/{encodedFolder}"
+    else:
+        targetEndpoint = baseEndpoint
+    
+    # Prepare multipart form data
+    files = {
+        'file': (filename, fileContent)
+    }
+    
+    # Add workspace parameter as single form field (not multiple)
+    data = {}
+    if workspacesList:
+        # Join multiple workspaces with comma as per API docs
+        data['addToWorkspaces'] = ','.join(workspacesList)
+    
+    try:
+        response = requests.post(targetEndpoint, headers=headers, files=files, data=data)
 
-            if response.status_code == 200:
-                uploadCount += 1
+        if response.status_code == 200:
+            locations = []
+            # Check if response is JSON
+            try:
+                jsonResponse = response.json()
+                for document in jsonResponse.get('documents', []):
+                    locations.append(document['location'])
+            except json.JSONDecodeError:
+                print(f"Warning: {filename} uploaded but response not JSON")
+            return locations
                 
-                # Check if response is JSON
-                try:
-                    jsonResponse = response.json()
-                    for document in jsonResponse.get('documents', []):
-                        result.append(document['location'])
-                    print(f"Uploaded: {filename} ({uploadCount}/{totalFiles}) - Size: {fileSize} bytes")
-                except json.JSONDecodeError:
-                    print(f"Warning: {filename} uploaded but response not JSON")
-                    
-            else:
-                print(f"Failed to upload {filename}: {response.status_code} - {response.text}")
-                # Log additional debug info for failures
-                print(f"  File size: {fileSize} bytes")
-                print(f"  Target folder: {targetFolder}")
-                print(f"  Endpoint: {targetEndpoint}")
-                print(f"  Workspaces: {data.get('addToWorkspaces', 'None')}")
-
-        except Exception as e:
-            print(f"Error uploading {filename}: {str(e)}")
+        else:
+            print(f"Failed to upload {filename}: {response.status_code} - {response.text}")
+            # Log additional debug info for failures
             print(f"  File size: {fileSize} bytes")
+            print(f"  Target folder: {targetFolder}")
             print(f"  Endpoint: {targetEndpoint}")
-            
-        if uploadCount % 25 == 0 and uploadCount > 0:
-            print(f"Progress: {uploadCount}/{totalFiles} files uploaded...")
+            print(f"  Workspaces: {data.get('addToWorkspaces', 'None')}")
+
+    except Exception as e:
+        print(f"Error uploading {filename}: {str(e)}")
+        print(f"  File size: {fileSize} bytes")
+        print(f"  Endpoint: {targetEndpoint}")
     
-    print(f"Upload complete. Successfully uploaded {uploadCount} out of {totalFiles} files.")
-    return result
+    return None
 
 
 def embedFilesInAgents(uploadResults: List[str], workspaces: str, serverUrl: str, apiKey: str) -> None:
@@ -513,5 +908,9 @@ def loadEnv() -> Dict[str, str]:
 
 
 if __name__ == "__main__":
-    main()
+    profiler = profilerFromArgs(sys.argv, "importFiles")
+    try:
+        main()
+    finally:
+        profiler.finish()
     
\ No newline at end of file
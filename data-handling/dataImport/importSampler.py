@@ -0,0 +1,201 @@
+"""
+Stratified Sampling for Test Imports
+
+SMALL_BATCH stops the directory walk after N files, so a small run usually
+holds one or two source folders. SAMPLE_SIZE instead picks a reproducible
+sample from every source folder (and, with SAMPLE_BY_DEPARTMENT, every
+department within it):
+
+- Size: a count per stratum ("5") or a fraction of each stratum ("0.1" or "10%"),
+  never less than one
+- Seeded: files are ranked by a hash of SAMPLE_SEED and their sampling key,
+  so the same seed always gives the same sample
+- Consistent: the key is the person's ehsId (or the project/space key), so
+  the same people are picked in every source and their live status
+  documents are complete. Rollup, collaboration and workload score
+  documents need the whole corpus, so importFiles.py skips them on
+  sampled runs
+
+Usage:
+    python data-handling/dataImport/importSampler.py <size> [--data data] [--seed wwiz] [--by-department]
+"""
+
+import hashlib
+import json
+import math
+import os
+import sys
+from typing import Dict, List, Optional, Tuple
+
+from workspaceShards import buildDepartmentIndex, sourceFolderName
+
+# Default seed - change it to draw a different sample
+DEFAULT_SEED = "wwiz"
+
+# Record fields tried in order for the sampling key
+KEY_FIELDS: List[str] = ["ehsId", "projectKey", "spaceKey"]
+
+# Stratum label for files without a department
+NO_DEPARTMENT = "-"
+
+
+def parseSampleSize(size: str) -> Tuple[Optional[int], Optional[float]]:
+    """
+    Parse SAMPLE_SIZE into a per-stratum count or fraction.
+
+    Args:
+        size: "5" (count), "0.1" or "10%" (fraction)
+
+    Returns:
+        (count, fraction) with exactly one of them set
+
+    Raises:
+        ValueError: If the size isn't a positive count or a fraction up to 1
+    """
+    size = size.strip()
+    if size.endswith("%"):
+        fraction = float(size[:-1]) / 100
+    elif "." in size:
+        fraction = float(size)
+    else:
+        count = int(size)
+        if count < 1:
+            raise ValueError(f"SAMPLE_SIZE must be at least 1, got {size}")
+        return count, None
+
+    if not 0 < fraction <= 1:
+        raise ValueError(f"SAMPLE_SIZE fraction must be between 0 and 1, got {size}")
+    return None, fraction
+
+
+def sampleKey(filePath: str, content: bytes) -> Tuple[str, Optional[Dict]]:
+    """
+    Get the key a file is sampled by.
+
+    Person files share their ehsId and project/space files their key, so every
+    file about the same person or project is kept or dropped together.
+
+    Args:
+        filePath: File path
+        content: Raw file content
+
+    Returns:
+        (sampling key, parsed record or None)
+    """
+    record = None
+    if filePath.lower().endswith(".json"):
+        try:
+            record = json.loads(content)
+        except ValueError:
+            record = None
+    if isinstance(record, dict):
+        for field in KEY_FIELDS:
+            if record.get(field):
+                return f"{field}:{record[field]}", record
+    return "file:" + os.path.splitext(os.path.basename(filePath))[0], record if isinstance(record, dict) else None
+
+
+def rank(seed: str, key: str) -> int:
+    """
+    Seeded position of a key in the sampling order.
+
+    Args:
+        seed: Sample seed
+        key: Sampling key
+
+    Returns:
+        64-bit rank (lowest ranks are sampled first)
+    """
+    return int.from_bytes(hashlib.sha256(f"{seed}:{key}".encode("utf-8")).digest()[:8], "big")
+
+
+def sampleFiles(filesToUpload: Dict[str, Tuple[bytes, str]], size: str, seed: str = DEFAULT_SEED, byDepartment: bool = False) -> Tuple[Dict[str, Tuple[bytes, str]], Dict[Tuple[str, str], Tuple[int, int]]]:
+    """
+    Select a seeded sample stratified by source folder (and department).
+
+    Args:
+        filesToUpload: Dictionary of files with content and target folders
+        size: Per-stratum count or fraction (see parseSampleSize)
+        seed: Sample seed
+        byDepartment: Also stratify person files by department
+
+    Returns:
+        (sampled files, {(folder, department): (keys kept, keys total)})
+
+    Raises:
+        ValueError: If size can't be parsed
+    """
+    count, fraction = parseSampleSize(size)
+    departments = buildDepartmentIndex(filesToUpload) if byDepartment else {}
+
+    # stratum -> sampling key -> files with that key
+    strata: Dict[Tuple[str, str], Dict[str, List[str]]] = {}
+    for filePath, (content, folder) in filesToUpload.items():
+        key, record = sampleKey(filePath, content)
+        department = NO_DEPARTMENT
+        if byDepartment and record is not None:
+            department = record.get("department") or departments.get(record.get("ehsId", "")) or NO_DEPARTMENT
+        strata.setdefault((sourceFolderName(folder), department), {}).setdefault(key, []).append(filePath)
+
+    sampled: Dict[str, Tuple[bytes, str]] = {}
+    summary: Dict[Tuple[str, str], Tuple[int, int]] = {}
+    for stratum, keys in strata.items():
+        keep = count if count is not None else math.ceil(fraction * len(keys))
+        chosen = sorted(keys, key=lambda key: rank(seed, key))[:keep]
+        for key in chosen:
+            for filePath in keys[key]:
+                sampled[filePath] = filesToUpload[filePath]
+        summary[stratum] = (len(chosen), len(keys))
+
+    return sampled, summary
+
+
+def printSampleSummary(summary: Dict[Tuple[str, str], Tuple[int, int]], byDepartment: bool = False) -> None:
+    """
+    Print how many records each stratum kept.
+
+    Args:
+        summary: Stratum counts from sampleFiles
+        byDepartment: Whether strata include the department
+    """
+    print(f"\n{'Folder':<32} {'Department' if byDepartment else '':<20} {'Sampled':>8} {'Total':>8}")
+    for (folder, department), (kept, total) in sorted(summary.items()):
+        print(f"{folder or '(root)':<32} {department if byDepartment else '':<20} {kept:>8} {total:>8}")
+    kept = sum(kept for kept, total in summary.values())
+    total = sum(total for kept, total in summary.values())
+    print(f"Sampled {kept} of {total} records across {len(summary)} strata")
+
+
+def main() -> None:
+    args = sys.argv[1:]
+    dataPath = "data"
+    seed = DEFAULT_SEED
+    byDepartment = "--by-department" in args
+    if byDepartment:
+        args.remove("--by-department")
+    for option in ("--data", "--seed"):
+        if option in args:
+            index = args.index(option)
+            if option == "--data":
+                dataPath = args[index + 1]
+            else:
+                seed = args[index + 1]
+            del args[index:index + 2]
+
+    if not args:
+        print("Usage: python data-handling/dataImport/importSampler.py <size> [--data data] [--seed wwiz] [--by-department]")
+        sys.exit(1)
+
+    from importFiles import buildFileListWithFolders
+    files = buildFileListWithFolders(dataPath, True, False, 0, ["json", "csv", "xml", "txt"])
+    try:
+        sampled, summary = sampleFiles(files, args[0], seed, byDepartment)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    printSampleSummary(summary, byDepartment)
+    print(f"{len(sampled)} of {len(files)} files")
+
+
+if __name__ == "__main__":
+    main()
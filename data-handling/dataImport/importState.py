@@ -0,0 +1,106 @@
+"""
+Import State for WWIZ Knowledge Base Imports
+
+Small JSON state file shared by the import tooling. It records what was
+uploaded on previous runs (content hash and time per file) so later runs
+can tell changed files from unchanged ones.
+
+The file is written atomically (temp file + rename) so a run that is
+killed part way through never leaves a corrupt state file behind.
+"""
+
+import hashlib
+import json
+import os
+import time
+from typing import Dict, List, Optional
+
+# Default location, overridable with IMPORT_STATE_FILE
+DEFAULT_STATE_FILE = os.path.join("data-handling", "dataImport", ".importState.json")
+
+
+def loadState(statePath: str = DEFAULT_STATE_FILE) -> Dict:
+    """
+    Load the import state file.
+
+    Args:
+        statePath: Path to the state file
+
+    Returns:
+        State dictionary (empty sections if the file doesn't exist yet)
+    """
+    state: Dict = {"files": {}}
+
+    if os.path.exists(statePath):
+        try:
+            with open(statePath, "r", encoding="utf-8") as f:
+                state.update(json.load(f))
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Warning: could not read import state {statePath}: {str(e)}")
+
+    return state
+
+
+def saveState(state: Dict, statePath: str = DEFAULT_STATE_FILE) -> None:
+    """
+    Atomically write the import state file.
+
+    Args:
+        state: State dictionary to save
+        statePath: Path to the state file
+    """
+    folder = os.path.dirname(statePath)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+
+    tempPath = f"{statePath}.tmp"
+    with open(tempPath, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tempPath, statePath)
+
+
+def contentHash(content: bytes) -> str:
+    """
+    Hash file content for change detection.
+
+    Args:
+        content: Raw file content
+
+    Returns:
+        Hex SHA-1 digest
+    """
+    return hashlib.sha1(content).hexdigest()
+
+
+def hasChanged(state: Dict, filePath: str, content: bytes) -> bool:
+    """
+    Check whether a file differs from the last uploaded version.
+
+    Args:
+        state: Import state dictionary
+        filePath: Local file path (state key)
+        content: Current file content
+
+    Returns:
+        True if the file was never uploaded or its content changed
+    """
+    record = state["files"].get(filePath)
+    return record is None or record.get("hash") != contentHash(content)
+
+
+def recordUpload(state: Dict, filePath: str, content: bytes, locations: Optional[List[str]] = None, hashValue: Optional[str] = None) -> None:
+    """
+    Record a successful upload in the state dictionary.
+
+    Args:
+        state: Import state dictionary
+        filePath: Local file path (state key)
+        content: Uploaded file content
+        locations: Server document locations, kept so a later version can replace them
+        hashValue: Hash to record instead of the uploaded content's - the hash the next
+            run's de-duplication compares (before upload-only changes such as stripped fields)
+    """
+    record = {"hash": hashValue or contentHash(content), "uploadedAt": time.time()}
+    if locations is not None:
+        record["locations"] = locations
+    state["files"][filePath] = record
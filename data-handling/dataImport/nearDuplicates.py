@@ -0,0 +1,432 @@
+"""
+Near-Duplicate Detection for Import Files
+
+Much of the corpus says the same thing twice: Entra and Google identity
+records repeat a person's name, email, UPN and department, and released
+project summaries differ only in their counts. Every copy costs an
+embedding and crowds other documents out of search results.
+
+This module finds near-duplicates without comparing every pair of files:
+
+- Shingles: every word of a JSON record's values becomes a "key=word"
+  token with the key it sits under, so the same word in different fields
+  (a name vs. a manager's name) doesn't count as a match. Keys that mean
+  the same thing in different sources share one canonical name (upn,
+  primaryEmail and userPrincipalName are all "email"), so the Entra and
+  Google records of a person match on their shared facts; bookkeeping
+  fields like lastUpdated and directory account settings (licences, admin
+  and status flags) are left out. Numbers are kept, or activity records of
+  different people with similar roles would look alike. Other files are
+  shingled as word 3-grams
+- MinHash: one-permutation hashing - every shingle is hashed once into one of
+  256 bins, and empty bins borrow from other bins in a fixed random order
+  (optimal densification) - so a signature costs one hash per shingle
+  instead of one per shingle per permutation. Signatures are 32-bit arrays
+  (1KB per file)
+- LSH: signatures are cut into bands, and only files sharing a band bucket
+  are compared, so the work grows with the number of files, not its square
+- Clusters: pairs whose estimated Jaccard similarity reaches the threshold
+  are merged into clusters with union-find - never across records about
+  different people or spaces (ehsId, spaceKey), however similar. Project
+  summaries may merge; each dropped one's projectKey is carried over in
+  canonical mode
+
+NEAR_DUPLICATES=report prints the clusters; NEAR_DUPLICATES=canonical also
+uploads only one representative per cluster (the largest file), with a
+"nearDuplicates" list naming the files it stands in for and the values each
+of them has that the representative doesn't. Files whose differences can't
+be carried over (non-JSON content) are uploaded as they are.
+
+Usage:
+    python data-handling/dataImport/nearDuplicates.py [data] [--threshold 0.45] [--show 10] [--check]
+
+--check exits with an error unless every person's Entra and Google records
+end up in the same cluster.
+"""
+
+import hashlib
+import json
+import operator
+import os
+import random
+import re
+import sys
+import time
+from array import array
+from typing import Dict, List, Optional, Set, Tuple
+
+# Signature size and LSH banding (BANDS * ROWS must equal NUM_BINS). 64 bands of 4
+# find pairs at 0.55 similarity 99.8% of the time and compare only 1 in 10 pairs at 0.2
+NUM_BINS = 256
+BANDS = 64
+ROWS = 4
+
+# Words per shingle in non-JSON files
+SHINGLE_WORDS = 3
+
+# Default estimated Jaccard similarity for two files to count as near-duplicates. A person's
+# Entra and Google records share about 0.5 of their tokens; their Slack and Teams activity
+# (different facts) stays below 0.45
+DEFAULT_THRESHOLD = 0.45
+
+# Bookkeeping fields that say nothing about the content
+IGNORED_FIELDS: Set[str] = {"fileId", "dataSource", "lastUpdated", "schemaVersion"}
+
+# Directory account settings each source keeps its own way - not compared, but carried over in canonical mode
+ACCOUNT_SETTING_FIELDS: Set[str] = {"accountEnabled", "suspended", "archived", "agreedToTerms", "isMailboxSetup", "isAdmin", "isDelegatedAdmin", "assignedLicenses"}
+
+# Source-specific keys -> the canonical key their words are shingled under
+FIELD_ALIASES: Dict[str, str] = {
+    "upn": "email",
+    "userPrincipalName": "email",
+    "primaryEmail": "email",
+    "slackEmail": "email",
+    "aliases": "email",
+    "Employee_ID": "ehsId",
+    "Department": "department",
+    "orgUnitPath": "department",
+    "positionTitle": "jobTitle",
+    "officeLocation": "location",
+    "Manager": "manager",
+    "createdDateTime": "created",
+    "creationTime": "created",
+    "lastSignInDateTime": "lastLogin",
+    "lastLoginTime": "lastLogin",
+    "mobilePhone": "phone",
+    "businessPhones": "phone",
+}
+
+# Fields naming who or what a record is about - records that differ in one are never duplicates
+IDENTITY_FIELDS: List[str] = ["ehsId", "spaceKey"]
+
+# Identity sources holding one record per person, which --check expects to cluster together
+IDENTITY_SOURCES: Tuple[str, str] = ("entraAd-user", "googleCloudIdentity-user")
+
+# Field added to canonical files in canonical mode
+REFERENCE_FIELD = "nearDuplicates"
+
+WORD_PATTERN = re.compile(r"\w+")
+EMPTY_BIN = 0xFFFFFFFF
+BIN_BITS = NUM_BINS.bit_length() - 1
+# Order in which each empty bin looks for a bin to borrow from - fixed, so every file borrows alike
+PROBE_ORDER: List[List[int]] = [random.Random(index).sample(range(NUM_BINS), NUM_BINS) for index in range(NUM_BINS)]
+
+
+def documentWords(node, words: List[str], key: str = "") -> None:
+    """Collect "key=word" tokens (canonical keys) for every value in a record, skipping ignored fields."""
+    if isinstance(node, dict):
+        for childKey, value in node.items():
+            if childKey not in IGNORED_FIELDS and childKey not in ACCOUNT_SETTING_FIELDS:
+                documentWords(value, words, FIELD_ALIASES.get(childKey, childKey))
+    elif isinstance(node, list):
+        for item in node:
+            documentWords(item, words, key)
+    elif node is not None:
+        words.extend(f"{key}={word}" for word in WORD_PATTERN.findall(str(node).lower()))
+
+
+def recordIdentity(content: bytes, filePath: str) -> Dict[str, str]:
+    """Identity fields of a JSON object record (empty for anything else)."""
+    if not filePath.lower().endswith(".json"):
+        return {}
+    try:
+        record = json.loads(content)
+    except ValueError:
+        return {}
+    if not isinstance(record, dict):
+        return {}
+    return {field: str(record[field]) for field in IDENTITY_FIELDS if record.get(field) is not None}
+
+
+def shingles(content: bytes, filePath: str) -> Set[bytes]:
+    """
+    Turn a document into its set of word shingles.
+
+    Args:
+        content: Raw file content
+        filePath: File path (JSON files are shingled by key=word tokens of their values)
+
+    Returns:
+        Set of encoded shingles
+    """
+    words: List[str] = []
+    if filePath.lower().endswith(".json"):
+        try:
+            documentWords(json.loads(content), words)
+            return {word.encode("utf-8") for word in words}
+        except ValueError:
+            pass
+
+    words = WORD_PATTERN.findall(content.decode("utf-8", errors="replace").lower())
+    if len(words) < SHINGLE_WORDS:
+        return {" ".join(words).encode("utf-8")} if words else set()
+    return {" ".join(words[i:i + SHINGLE_WORDS]).encode("utf-8") for i in range(len(words) - SHINGLE_WORDS + 1)}
+
+
+def minHash(shingleSet: Set[bytes]) -> Optional[array]:
+    """
+    One-permutation MinHash signature of a shingle set.
+
+    Each shingle is hashed once; the low bits pick its bin and the rest is
+    its value. Each empty bin takes the value of the first non-empty bin in
+    its probe order, which keeps the estimate accurate for short documents.
+
+    Args:
+        shingleSet: Document shingles
+
+    Returns:
+        Array of NUM_BINS 32-bit values, or None for an empty document
+    """
+    if not shingleSet:
+        return None
+
+    bins = [EMPTY_BIN] * NUM_BINS
+    for shingle in shingleSet:
+        value = int.from_bytes(hashlib.blake2b(shingle, digest_size=8).digest(), "little")
+        index = value & (NUM_BINS - 1)
+        value = (value >> BIN_BITS) & EMPTY_BIN
+        if value < bins[index]:
+            bins[index] = value
+
+    if EMPTY_BIN in bins:
+        filled = list(bins)
+        for index in range(NUM_BINS):
+            if bins[index] == EMPTY_BIN:
+                filled[index] = next(bins[probe] for probe in PROBE_ORDER[index] if bins[probe] != EMPTY_BIN)
+        bins = filled
+    return array("I", bins)
+
+
+def similarity(first: array, second: array) -> float:
+    """
+    Estimated Jaccard similarity of two signatures.
+
+    Args:
+        first: MinHash signature
+        second: MinHash signature
+
+    Returns:
+        Fraction of matching bins (0-1)
+    """
+    return sum(map(operator.eq, first, second)) / NUM_BINS
+
+
+def findClusters(signatures: Dict[str, array], threshold: float = DEFAULT_THRESHOLD, identities: Optional[Dict[str, Dict[str, str]]] = None) -> List[List[str]]:
+    """
+    Group files whose signatures are near-duplicates.
+
+    Args:
+        signatures: File path -> MinHash signature
+        threshold: Lowest estimated Jaccard similarity for a duplicate
+        identities: File path -> identity fields (recordIdentity); clusters never mix different values
+
+    Returns:
+        Clusters of two or more file paths, largest first
+    """
+    parent: Dict[str, str] = {path: path for path in signatures}
+    # Identity fields of each cluster, kept on its root
+    clusterIdentity: Dict[str, Dict[str, str]] = {path: dict((identities or {}).get(path, {})) for path in signatures}
+
+    def conflicts(first: str, second: str) -> bool:
+        other = clusterIdentity[second]
+        return any(field in other and other[field] != value for field, value in clusterIdentity[first].items())
+
+    def find(path: str) -> str:
+        while parent[path] != path:
+            parent[path] = parent[parent[path]]
+            path = parent[path]
+        return path
+
+    compared: Set[Tuple[str, str]] = set()
+    for band in range(BANDS):
+        buckets: Dict[bytes, List[str]] = {}
+        start = band * ROWS
+        for path, signature in signatures.items():
+            buckets.setdefault(signature[start:start + ROWS].tobytes(), []).append(path)
+
+        # Each file is compared with one member of every cluster already in the bucket,
+        # so a bucket of many copies of the same document stays linear
+        for members in buckets.values():
+            if len(members) < 2:
+                continue
+            representatives: Dict[str, str] = {}
+            for path in members:
+                root = find(path)
+                for otherRoot, other in list(representatives.items()):
+                    if otherRoot == root or find(other) == root:
+                        continue
+                    pair = (other, path)
+                    if pair in compared:
+                        continue
+                    compared.add(pair)
+                    otherRoot = find(other)
+                    if not conflicts(root, otherRoot) and similarity(signatures[other], signatures[path]) >= threshold:
+                        clusterIdentity[otherRoot].update(clusterIdentity[root])
+                        parent[root] = otherRoot
+                        root = otherRoot
+                representatives = {find(other): other for other in representatives.values()}
+                representatives.setdefault(root, path)
+
+    clusters: Dict[str, List[str]] = {}
+    for path in signatures:
+        clusters.setdefault(find(path), []).append(path)
+    return sorted((sorted(members) for members in clusters.values() if len(members) > 1), key=lambda members: (-len(members), members[0]))
+
+
+def detectNearDuplicates(filesToUpload: Dict[str, Tuple[bytes, str]], threshold: float = DEFAULT_THRESHOLD) -> List[List[str]]:
+    """
+    Find clusters of near-duplicate files among the files to upload.
+
+    Args:
+        filesToUpload: Dictionary of files with content and target folders
+        threshold: Lowest estimated Jaccard similarity for a duplicate
+
+    Returns:
+        Clusters of file paths, largest first
+    """
+    signatures: Dict[str, array] = {}
+    identities: Dict[str, Dict[str, str]] = {}
+    for filePath, (content, targetFolder) in filesToUpload.items():
+        signature = minHash(shingles(content, filePath))
+        if signature is not None:
+            signatures[filePath] = signature
+            identities[filePath] = recordIdentity(content, filePath)
+    return findClusters(signatures, threshold, identities)
+
+
+def identityPairs(filesToUpload: Dict[str, Tuple[bytes, str]]) -> List[Tuple[str, str]]:
+    """
+    Pair each person's records from the two identity sources.
+
+    Args:
+        filesToUpload: Dictionary of files with content and target folders
+
+    Returns:
+        (Entra record, Google record) file paths with the same ehsId
+    """
+    bySource: Dict[str, Dict[str, str]] = {source: {} for source in IDENTITY_SOURCES}
+    for filePath, (content, targetFolder) in filesToUpload.items():
+        source = os.path.basename(targetFolder or "")
+        if source in bySource:
+            ehsId = recordIdentity(content, filePath).get("ehsId")
+            if ehsId:
+                bySource[source][ehsId] = filePath
+    first, second = (bySource[source] for source in IDENTITY_SOURCES)
+    return [(first[ehsId], second[ehsId]) for ehsId in sorted(first) if ehsId in second]
+
+
+def unclusteredPairs(pairs: List[Tuple[str, str]], clusters: List[List[str]]) -> List[Tuple[str, str]]:
+    """Pairs whose two files didn't end up in the same cluster."""
+    clusterOf = {path: index for index, members in enumerate(clusters) for path in members}
+    return [(first, second) for first, second in pairs if first not in clusterOf or clusterOf.get(second) != clusterOf[first]]
+
+
+def distinctValues(record: Dict, canonical: Dict) -> Dict:
+    """Top-level fields of a record whose values the canonical record doesn't have."""
+    return {key: value for key, value in record.items()
+            if key not in IGNORED_FIELDS and key != REFERENCE_FIELD and canonical.get(key) != value}
+
+
+def keepCanonical(filesToUpload: Dict[str, Tuple[bytes, str]], clusters: List[List[str]]) -> Tuple[Dict[str, Tuple[bytes, str]], int]:
+    """
+    Keep one representative per cluster, carrying over what the others add.
+
+    The largest file of each cluster is kept (it usually carries the most
+    detail). When it is a JSON object, it gets a nearDuplicates list with
+    each dropped file's name and the values that file has and it doesn't.
+    Files whose differences can't be carried over (the representative or the
+    file isn't a JSON object) are only dropped when they are identical.
+
+    Args:
+        filesToUpload: Dictionary of files with content and target folders
+        clusters: Clusters from detectNearDuplicates
+
+    Returns:
+        (files to upload, number of files dropped)
+    """
+    kept = dict(filesToUpload)
+    dropped = 0
+    for members in clusters:
+        canonical = max(members, key=lambda path: (len(filesToUpload[path][0]), path))
+        content, targetFolder = filesToUpload[canonical]
+        record = loadObject(content)
+
+        references: List[Dict] = []
+        for path in members:
+            if path == canonical:
+                continue
+            other = loadObject(filesToUpload[path][0]) if record is not None else None
+            if other is not None:
+                references.append({"file": os.path.basename(path), "values": distinctValues(other, record)})
+            elif filesToUpload[path][0] != content:
+                continue
+            del kept[path]
+            dropped += 1
+
+        if record is not None and references:
+            record[REFERENCE_FIELD] = references
+            kept[canonical] = (json.dumps(record, indent=2, ensure_ascii=False).encode("utf-8"), targetFolder)
+    return kept, dropped
+
+
+def loadObject(content: bytes) -> Optional[Dict]:
+    """Parse content that is a JSON object, or return None."""
+    try:
+        record = json.loads(content)
+    except ValueError:
+        return None
+    return record if isinstance(record, dict) else None
+
+
+def printClusterSummary(clusters: List[List[str]], filesToUpload: Dict[str, Tuple[bytes, str]], show: int = 10) -> None:
+    """
+    Print the near-duplicate clusters found.
+
+    Args:
+        clusters: Clusters from detectNearDuplicates
+        filesToUpload: Dictionary of files with content and target folders
+        show: Most clusters to list
+    """
+    duplicates = sum(len(members) - 1 for members in clusters)
+    print(f"Near-duplicates: {len(clusters)} clusters, {duplicates} files could be dropped")
+    for members in clusters[:show]:
+        folders = sorted({filesToUpload[path][1] for path in members})
+        print(f"  {len(members)} files ({', '.join(folders)}): {', '.join(os.path.basename(path) for path in members[:6])}{' ...' if len(members) > 6 else ''}")
+
+
+def main() -> None:
+    args = sys.argv[1:]
+    check = "--check" in args
+    if check:
+        args.remove("--check")
+    threshold = DEFAULT_THRESHOLD
+    show = 10
+    for option in ("--threshold", "--show"):
+        if option in args:
+            index = args.index(option)
+            if option == "--threshold":
+                threshold = float(args[index + 1])
+            else:
+                show = int(args[index + 1])
+            del args[index:index + 2]
+    dataPath = args[0] if args else "data"
+
+    from importFiles import buildFileListWithFolders
+    files = buildFileListWithFolders(dataPath, True, False, 0, ["json", "csv", "xml", "txt"])
+    start = time.time()
+    clusters = detectNearDuplicates(files, threshold)
+    printClusterSummary(clusters, files, show)
+    print(f"Checked {len(files)} files in {time.time() - start:.2f}s")
+
+    if check:
+        pairs = identityPairs(files)
+        missed = unclusteredPairs(pairs, clusters)
+        print(f"Identity pairs clustered: {len(pairs) - len(missed)} of {len(pairs)}")
+        for first, second in missed[:show]:
+            print(f"  Not clustered: {os.path.basename(first)} / {os.path.basename(second)}")
+        if missed or not pairs:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,20 @@
+"""
+Percentile Helper
+
+Nearest-rank percentiles shared by the load test report (chatLoadTest.py)
+and the documents the importer builds from the corpus (rollupDocuments.py,
+workloadScores.py), kept apart so importer stages don't load the load test.
+"""
+
+import math
+from typing import List, Optional
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile of a list (None if empty)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    # Smallest value with at least pct% of the values at or below it
+    index = max(0, min(len(ordered) - 1, math.ceil(pct * len(ordered) / 100) - 1))
+    return ordered[index]
@@ -0,0 +1,411 @@
+"""
+PII Scrubbing and Pseudonymisation for WWIZ Imports
+
+The collectors' files carry more personal data than the agent needs:
+mobile and desk phone numbers, platform user IDs (Slack, Atlassian) and
+whatever people type into free-text fields. This stage runs on every
+discovered file, before anything else reads it:
+
+- Field rules per source folder (PII_RULES below, extended or overridden
+  by PII_RULES_FILE): "drop" removes the field, "redact" replaces it with
+  "[redacted]", "hash" replaces it with a pseudonym and "keep" leaves it
+  alone and unscanned. Paths use the fieldPartitioner syntax: "a.b" is a
+  nested key, "list[].key" a key in every element of a list.
+- Text scanners: precompiled patterns for phone numbers, card numbers
+  (Luhn-checked), Australian tax file numbers (checksum-checked), IP
+  addresses and email addresses outside PII_EMAIL_DOMAINS, run over every
+  other string value (and over whole CSV/XML/text files).
+
+Pseudonyms are HMAC-SHA256 of the value keyed with PII_HASH_SALT, so the
+same ID gets the same pseudonym in every file and on every run (records
+still join up) but can't be reversed without the salt.
+
+Files are scrubbed in batches across a process pool. Number scanners only
+run on runs of digits long enough to be a phone or card number, and files
+with no rules and no matches are passed through without being parsed, so
+the stage costs well under a millisecond per file. Files that change are
+re-written as compact JSON.
+
+Usage:
+    python data-handling/dataImport/piiScrubber.py [data path] [--workers N]   # report what would be scrubbed
+"""
+
+import hashlib
+import hmac
+import json
+import os
+import re
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from workspaceShards import sourceFolderName
+
+# Field rules per source folder
+PII_RULES: Dict[str, Dict[str, str]] = {
+    "entraAd-user": {
+        "mobilePhone": "redact",
+        "businessPhones": "redact",
+    },
+    "employmentHero-staff": {
+        "dateOfBirth": "drop",
+        "homeAddress": "drop",
+        "personalEmail": "drop",
+        "personalMobile": "drop",
+        "emergencyContact": "drop",
+        "taxFileNumber": "drop",
+        "bankAccount": "drop",
+        "salary": "drop",
+    },
+    "googleCloudIdentity-user": {
+        "recoveryEmail": "drop",
+        "recoveryPhone": "drop",
+    },
+    "slack-userActivitySummary": {
+        "slackUserId": "hash",
+    },
+    "jira-userStats": {
+        "atlassianUserId": "hash",
+    },
+    "confluence-userStats": {
+        "atlassianUserId": "hash",
+    },
+    "calendar-availabilitySummary": {
+        # Leave types can reveal health or personal circumstances
+        "outOfOffice.nextPlannedLeave.type": "redact",
+    },
+}
+
+ACTIONS = ("drop", "redact", "hash", "keep")
+
+REDACTED = "[redacted]"
+PSEUDONYM_PREFIX = "anon-"
+PSEUDONYM_LENGTH = 16
+
+# Number scanners: name -> pattern. Matches are checked by SCANNER_CHECKS before being replaced with "[name]".
+SCANNERS: Dict[str, str] = {
+    "card": r"\d(?<![\w.-]\d)\d{3}(?:[ -]?\d{4}){2}[ -]?\d{1,7}(?![\w-])",
+    "tfn": r"\d(?<![\w.-]\d)\d{2}[ -]?\d{3}[ -]?\d{3}(?![\w-])",
+    "phone": r"(?:\+(?<![\w+]\+)\d{1,3}[ .-]?(?:\(\d{1,4}\)[ .-]?)?\d{1,4}(?:[ .-]?\d{2,4}){1,4}|\((?<![\w+]\()0\d\)[ .-]?\d{4}[ .-]?\d{4}|0(?<![\w+]0)\d(?:[ .-]?\d){8})(?![\w-])",
+    "ip": r"\d(?<![\w.]\d)\d{0,2}\.(?:\d{1,3}\.){2}\d{1,3}(?![\w.])",
+}
+
+# Every number scanner needs a run of 7+ digits and separators. Finding those runs first is several
+# times faster than trying every scanner at every position, since most text (timestamps included) has none.
+CANDIDATE_PATTERN = re.compile(r"[\d+(][\d ().+-]{5,}\d")
+
+# Email scanner: addresses are found from their "@", which is much cheaper than a pattern search
+EMAIL_LOCAL_CHARS = frozenset("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789._%+-")
+EMAIL_DOMAIN_PATTERN = re.compile(r"[A-Za-z0-9-]+(?:\.[A-Za-z0-9-]+)*\.[A-Za-z]{2,}")
+SCANNER_NAMES = list(SCANNERS) + ["email"]
+
+# Combined number scanner patterns, compiled once per process for each set of active scanners
+_patterns: Dict[Tuple[str, ...], "re.Pattern"] = {}
+
+# Files handed to a worker at a time
+BATCH_SIZE = 500
+
+TFN_WEIGHTS = [1, 4, 3, 7, 5, 8, 6, 9, 10]
+
+
+def digits(text: str) -> str:
+    return re.sub(r"\D", "", text)
+
+
+def luhnValid(number: str) -> bool:
+    """Luhn checksum (card numbers)."""
+    total = 0
+    for index, digit in enumerate(reversed(number)):
+        value = int(digit) * (2 if index % 2 else 1)
+        total += value - 9 if value > 9 else value
+    return total % 10 == 0
+
+
+def tfnValid(number: str) -> bool:
+    """Australian tax file number checksum."""
+    return len(number) == 9 and sum(int(digit) * weight for digit, weight in zip(number, TFN_WEIGHTS)) % 11 == 0
+
+
+def checkEmail(match: str, config: Dict) -> bool:
+    domain = match.rsplit("@", 1)[-1].lower()
+    return bool(config["emailDomains"]) and not any(domain == allowed or domain.endswith("." + allowed) for allowed in config["emailDomains"])
+
+
+SCANNER_CHECKS: Dict[str, Callable[[str, Dict], bool]] = {
+    "card": lambda match, config: 13 <= len(digits(match)) <= 19 and luhnValid(digits(match)),
+    "tfn": lambda match, config: tfnValid(digits(match)),
+    "phone": lambda match, config: 8 <= len(digits(match)) <= 15,
+    "ip": lambda match, config: all(int(part) <= 255 for part in match.split(".")),
+}
+
+
+def pseudonym(value, salt: bytes) -> str:
+    """Stable keyed pseudonym for a value (same value and salt, same pseudonym)."""
+    digest = hmac.new(salt, str(value).encode("utf-8"), hashlib.sha256).hexdigest()
+    return PSEUDONYM_PREFIX + digest[:PSEUDONYM_LENGTH]
+
+
+def loadScrubConfig(env: Dict[str, str]) -> Dict:
+    """
+    Build the scrub configuration from the environment.
+
+    Raises:
+        ValueError: PII_HASH_SALT is missing or a rules file is invalid
+    """
+    salt = env.get("PII_HASH_SALT", "")
+    if not salt:
+        raise ValueError("PII_SCRUB=True needs PII_HASH_SALT (a long random secret, kept out of the data)")
+
+    rules = {source: dict(fields) for source, fields in PII_RULES.items()}
+    rulesFile = env.get("PII_RULES_FILE")
+    if rulesFile:
+        try:
+            with open(rulesFile, "r", encoding="utf-8") as f:
+                extra = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            raise ValueError(f"Could not read PII_RULES_FILE {rulesFile}: {str(e)}")
+        for source, fields in extra.items():
+            for path, action in fields.items():
+                if action not in ACTIONS:
+                    raise ValueError(f"Unknown PII action '{action}' for {source} {path} (use one of {', '.join(ACTIONS)})")
+                rules.setdefault(source, {})[path] = action
+
+    emailDomains = [domain.strip().lower() for domain in env.get("PII_EMAIL_DOMAINS", "").split(",") if domain.strip()]
+    scanners = [name.strip() for name in env.get("PII_SCANNERS", ",".join(SCANNER_NAMES)).split(",")]
+    return {
+        "rules": rules,
+        "salt": salt.encode("utf-8"),
+        "emailDomains": emailDomains,
+        # Work addresses are everywhere - the email scanner only runs when the company domains are known
+        "scanners": tuple(name for name in SCANNER_NAMES if name in scanners and (name != "email" or emailDomains)),
+        "numberScanners": tuple(name for name in SCANNERS if name in scanners),
+    }
+
+
+def scanPattern(config: Dict) -> "re.Pattern":
+    """One pattern matching every active number scanner."""
+    active = config["numberScanners"]
+    if active not in _patterns:
+        _patterns[active] = re.compile("|".join(f"(?P<{name}>{SCANNERS[name]})" for name in active) or r"(?!)")
+    return _patterns[active]
+
+
+def findPii(text: str, config: Dict) -> Iterator[Tuple[int, int, str]]:
+    """
+    Find every scanner match that passes its check.
+
+    Yields:
+        (start, end, scanner name), number matches first, then email matches
+    """
+    pattern = scanPattern(config)
+    for candidate in CANDIDATE_PATTERN.finditer(text):
+        # One character past the run so the scanners' lookaheads see what follows it
+        for match in pattern.finditer(text, candidate.start(), candidate.end() + 1):
+            if SCANNER_CHECKS[match.lastgroup](match.group(), config):
+                yield match.start(), match.end(), match.lastgroup
+    if "email" in config["scanners"]:
+        at = text.find("@")
+        while at != -1:
+            start = at
+            while start > 0 and text[start - 1] in EMAIL_LOCAL_CHARS:
+                start -= 1
+            domain = EMAIL_DOMAIN_PATTERN.match(text, at + 1)
+            if start < at and domain and checkEmail(text[start:domain.end()], config):
+                yield start, domain.end(), "email"
+            at = text.find("@", at + 1)
+
+
+def scanText(text: str, config: Dict, stats: Counter) -> str:
+    """Replace every scanner match in a string with "[scanner name]"."""
+    pieces = []
+    position = 0
+    # Longest match first where two start together (e.g. "0412345678@gmail.com")
+    for start, end, name in sorted(findPii(text, config), key=lambda match: (match[0], -match[1])):
+        if start < position:
+            continue
+        pieces += [text[position:start], f"[{name}]"]
+        position = end
+        stats[f"text:{name}"] += 1
+    return "".join(pieces) + text[position:] if pieces else text
+
+
+def applyRule(node, parts: List[str], action: str, path: str, config: Dict, stats: Counter) -> None:
+    """Apply one field rule at a path inside a record."""
+    key = parts[0]
+    if key.endswith("[]"):
+        items = node.get(key[:-2]) if isinstance(node, dict) else None
+        for item in items if isinstance(items, list) else []:
+            applyRule(item, parts[1:], action, path, config, stats)
+        return
+    if not isinstance(node, dict) or key not in node:
+        return
+    if len(parts) > 1:
+        applyRule(node[key], parts[1:], action, path, config, stats)
+        return
+
+    value = node[key]
+    if action == "drop":
+        del node[key]
+    elif action == "redact":
+        node[key] = [REDACTED for item in value] if isinstance(value, list) else (REDACTED if value is not None else None)
+    elif action == "hash":
+        node[key] = [pseudonym(item, config["salt"]) for item in value] if isinstance(value, list) else (pseudonym(value, config["salt"]) if value is not None else None)
+    if action != "keep":
+        stats[f"{action}:{path}"] += 1
+
+
+def scanValues(node, path: str, skip: set, config: Dict, stats: Counter):
+    """Scan every string in a record, except at paths that have a rule."""
+    if path in skip:
+        return node
+    if isinstance(node, str):
+        return scanText(node, config, stats)
+    if isinstance(node, dict):
+        return {key: scanValues(value, f"{path}.{key}" if path else key, skip, config, stats) for key, value in node.items()}
+    if isinstance(node, list):
+        return [scanValues(item, f"{path}[]" if path else "[]", skip, config, stats) for item in node]
+    return node
+
+
+def scrubRecord(record, rules: Dict[str, str], config: Dict, stats: Counter, scan: bool = True):
+    """
+    Apply a source's field rules, then the text scanners, to a parsed record (or list of records).
+
+    Args:
+        scan: Run the text scanners (False when the file's text has no matches at all)
+    """
+    if isinstance(record, list):
+        return [scrubRecord(item, rules, config, stats, scan) for item in record]
+    if not isinstance(record, dict):
+        return record
+    for path, action in rules.items():
+        applyRule(record, path.split("."), action, path, config, stats)
+    return scanValues(record, "", set(rules), config, stats) if scan else record
+
+
+def scrubContent(content: bytes, targetFolder: str, config: Dict, stats: Optional[Counter] = None) -> bytes:
+    """
+    Scrub one file's content.
+
+    Args:
+        content: File bytes
+        targetFolder: Target folder (its last component is the source)
+        config: Scrub configuration (loadScrubConfig)
+        stats: Counter of rules applied and scanner matches, updated in place
+
+    Returns:
+        Scrubbed content (the same object when nothing changed)
+    """
+    stats = stats if stats is not None else Counter()
+    try:
+        text = content.decode("utf-8")
+    except UnicodeDecodeError:
+        return content
+
+    rules = config["rules"].get(sourceFolderName(targetFolder), {})
+    hasPii = next(findPii(text, config), None) is not None
+    if not rules and not hasPii:
+        return content
+
+    try:
+        record = json.loads(text)
+    except json.JSONDecodeError:
+        # CSV / XML / text - scanners only
+        scrubbed = scanText(text, config, stats)
+        return content if scrubbed == text else scrubbed.encode("utf-8")
+
+    before = sum(stats.values())
+    record = scrubRecord(record, rules, config, stats, hasPii)
+    if sum(stats.values()) == before:
+        return content
+    # Compact separators keep the C encoder (indent=2 is several times slower at a million files)
+    return json.dumps(record, ensure_ascii=False).encode("utf-8")
+
+
+def scrubBatch(batch: List[Tuple[str, bytes, str]], config: Dict) -> Tuple[List[Tuple[str, bytes]], Counter]:
+    """
+    Scrub a batch of files in one worker.
+
+    Returns:
+        ((filePath, scrubbed content) for every file that changed, stats)
+    """
+    stats: Counter = Counter()
+    changed = []
+    for filePath, content, targetFolder in batch:
+        scrubbed = scrubContent(content, targetFolder, config, stats)
+        if scrubbed is not content:
+            changed.append((filePath, scrubbed))
+            stats["files"] += 1
+    return changed, stats
+
+
+def scrubFiles(filesToUpload: Dict[str, Tuple[bytes, str]], config: Dict, workers: int = 0) -> Tuple[Dict[str, Tuple[bytes, str]], Counter]:
+    """
+    Scrub every file across a process pool.
+
+    Args:
+        filesToUpload: Dictionary of files with content and target folders
+        config: Scrub configuration (loadScrubConfig)
+        workers: Worker processes (0 = one per CPU, 1 = scrub in this process)
+
+    Returns:
+        Tuple of (same dictionary with scrubbed content, stats of rules applied and scanner matches
+        plus "files" changed)
+    """
+    items = [(path, content, folder) for path, (content, folder) in filesToUpload.items()]
+    batches = [items[i:i + BATCH_SIZE] for i in range(0, len(items), BATCH_SIZE)]
+    workers = workers or os.cpu_count() or 1
+
+    if workers == 1 or len(batches) <= 1:
+        results = [scrubBatch(batch, config) for batch in batches]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(batches))) as executor:
+            results = list(executor.map(scrubBatch, batches, [config] * len(batches)))
+
+    scrubbed = dict(filesToUpload)
+    stats: Counter = Counter()
+    for changed, batchStats in results:
+        stats.update(batchStats)
+        for path, content in changed:
+            scrubbed[path] = (content, filesToUpload[path][1])
+    return scrubbed, stats
+
+
+def printScrubSummary(stats: Counter, totalFiles: int) -> None:
+    """Print what the scrub stage did."""
+    print(f"PII scrub: {stats['files']} of {totalFiles} files changed")
+    for key, count in sorted(stats.items()):
+        if key == "files":
+            continue
+        action, path = key.split(":", 1)
+        print(f"  {action:<7} {path:<45} {count:>8}")
+
+
+def main() -> None:
+    args = sys.argv[1:]
+    workers = 0
+    if "--workers" in args:
+        index = args.index("--workers")
+        workers = int(args[index + 1])
+        del args[index:index + 2]
+    dataPath = args[0] if args else "data"
+
+    from importFiles import buildFileListWithFolders, loadEnv
+    env = loadEnv() if os.path.exists(os.path.join("data-handling", "dataImport", ".importFiles.env")) else {}
+    try:
+        config = loadScrubConfig({**env, "PII_HASH_SALT": env.get("PII_HASH_SALT") or "report-only"})
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    files = buildFileListWithFolders(dataPath, True, False, 0, ["json", "csv", "xml", "txt"])
+    start = time.time()
+    scrubbed, stats = scrubFiles(files, config, workers)
+    printScrubSummary(stats, len(files))
+    print(f"Scrubbed in {time.time() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""
+Profiling Hooks for the WWIZ Data-Handling Scripts
+
+Pass --profile to importFiles.py, cleanupDocuments.py or
+generate_test_data.py to find out where a slow run spends its time.
+
+When enabled, each named phase of the script gets:
+- cProfile stats (merged into one .pstats file, top functions printed per phase)
+- A sampled call stack written as a collapsed-stack file (flamegraph.pl,
+  speedscope and inferno all read this format)
+- tracemalloc top allocators and peak traced memory
+- Peak RSS of the process (where the platform reports it)
+
+Without --profile the scripts get a NullProfiler whose phases are a shared
+no-op context, so there is no profiling overhead at all.
+
+Usage:
+    python data-handling/dataImport/importFiles.py --profile
+    python data-handling/dataImport/cleanupDocuments.py count --profile --profile-dir profiles
+"""
+
+import contextlib
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, List
+
+# Default output folder, overridable with --profile-dir
+DEFAULT_PROFILE_DIR = "profiles"
+
+# Stack sampling interval in seconds
+SAMPLE_INTERVAL = 0.005
+
+# Number of functions / allocation sites printed per report
+REPORT_TOP_N = 10
+
+_NULL_PHASE = contextlib.nullcontext()
+
+
+class NullProfiler:
+    """Profiler used when --profile is off - every hook is a no-op."""
+
+    def phase(self, name: str):
+        return _NULL_PHASE
+
+    def finish(self) -> None:
+        return None
+
+
+class PhaseProfiler:
+    """
+    Collects cProfile stats, stack samples and memory usage per named phase.
+    """
+
+    def __init__(self, scriptName: str, outputDir: str = DEFAULT_PROFILE_DIR):
+        import cProfile
+        import tracemalloc
+
+        self.scriptName = scriptName
+        self.outputDir = outputDir
+        self.runId = time.strftime("%Y%m%d-%H%M%S")
+        self.phaseTimes: Dict[str, float] = {}
+        self.phaseProfiles: Dict[str, List["cProfile.Profile"]] = {}
+        self.phaseStack: List[str] = []
+        self.stackSamples: Counter = Counter()
+        self.mainThreadId = threading.get_ident()
+        self.stopSampling = threading.Event()
+        self.cProfile = cProfile
+        self.tracemalloc = tracemalloc
+
+        tracemalloc.start(10)
+        self.sampler = threading.Thread(target=self._sampleStacks, name="profiling-sampler", daemon=True)
+        self.sampler.start()
+        print(f"Profiling enabled - results will be written to {outputDir}/")
+
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        """
+        Profile a named phase. Nested phases are timed and labelled in the
+        stack samples, but cProfile stats are attributed to the outer phase.
+        """
+        nested = bool(self.phaseStack)
+        profile = None if nested else self.cProfile.Profile()
+        self.phaseStack.append(name)
+        started = time.perf_counter()
+
+        if profile:
+            profile.enable()
+        try:
+            yield
+        finally:
+            if profile:
+                profile.disable()
+                self.phaseProfiles.setdefault(name, []).append(profile)
+            self.phaseTimes[name] = self.phaseTimes.get(name, 0.0) + time.perf_counter() - started
+            self.phaseStack.pop()
+
+    def _sampleStacks(self) -> None:
+        """Periodically record the main thread's stack in collapsed form."""
+        while not self.stopSampling.wait(SAMPLE_INTERVAL):
+            frame = sys._current_frames().get(self.mainThreadId)
+            frames: List[str] = []
+            while frame is not None:
+                code = frame.f_code
+                frames.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            phase = ";".join(self.phaseStack) or "main"
+            self.stackSamples[";".join([phase] + frames[::-1])] += 1
+
+    def finish(self) -> None:
+        """Stop profiling, print a per-phase summary and write the output files."""
+        import pstats
+
+        self.stopSampling.set()
+        self.sampler.join()
+        snapshot = self.tracemalloc.take_snapshot()
+        current, peakTraced = self.tracemalloc.get_traced_memory()
+        self.tracemalloc.stop()
+
+        os.makedirs(self.outputDir, exist_ok=True)
+        baseName = os.path.join(self.outputDir, f"{self.scriptName}-{self.runId}")
+
+        print("\n=== Profile summary ===")
+        for name, seconds in self.phaseTimes.items():
+            print(f"\n[{name}] {seconds:.3f}s")
+            if name in self.phaseProfiles:
+                stats = pstats.Stats(*self.phaseProfiles[name], stream=sys.stdout)
+                stats.sort_stats("cumulative").print_stats(REPORT_TOP_N)
+
+        # One merged pstats file for snakeviz / pstats browsing
+        statsPath = f"{baseName}.pstats"
+        profiles = [profile for phaseProfiles in self.phaseProfiles.values() for profile in phaseProfiles]
+        if profiles:
+            pstats.Stats(*profiles).dump_stats(statsPath)
+            print(f"cProfile stats written to {statsPath}")
+
+        collapsedPath = f"{baseName}.collapsed"
+        with open(collapsedPath, "w", encoding="utf-8") as f:
+            for stack, count in self.stackSamples.most_common():
+                f.write(f"{stack} {count}\n")
+        print(f"Collapsed stacks written to {collapsedPath} ({sum(self.stackSamples.values())} samples)")
+
+        print(f"\nTop {REPORT_TOP_N} allocators (tracemalloc):")
+        for stat in snapshot.statistics("lineno")[:REPORT_TOP_N]:
+            print(f"  {stat}")
+        print(f"Peak traced memory: {peakTraced / 1024 / 1024:.1f} MB")
+
+        peakRss = getPeakRss()
+        print(f"Peak RSS: {peakRss / 1024 / 1024:.1f} MB" if peakRss else "Peak RSS: not available on this platform")
+
+
+def getPeakRss() -> int:
+    """
+    Get the peak resident set size of this process.
+
+    Returns:
+        Peak RSS in bytes, or 0 if the platform doesn't report it
+    """
+    try:
+        import resource
+    except ImportError:
+        return 0
+
+    maxRss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes
+    return maxRss if sys.platform == "darwin" else maxRss * 1024
+
+
+def profilerFromArgs(argv: List[str], scriptName: str):
+    """
+    Create a profiler from the command line, removing the profiling flags.
+
+    Recognises --profile and --profile-dir <folder>. The flags are removed
+    from argv in place so the script's own argument handling is unaffected.
+
+    Args:
+        argv: Command line arguments (usually sys.argv)
+        scriptName: Prefix for output file names
+
+    Returns:
+        PhaseProfiler if --profile was passed, otherwise a NullProfiler
+    """
+    outputDir = DEFAULT_PROFILE_DIR
+    if "--profile-dir" in argv:
+        index = argv.index("--profile-dir")
+        if index + 1 < len(argv):
+            outputDir = argv[index + 1]
+            del argv[index:index + 2]
+        else:
+            del argv[index]
+
+    if "--profile" not in argv:
+        return NullProfiler()
+
+    argv.remove("--profile")
+    return PhaseProfiler(scriptName, outputDir)
@@ -0,0 +1,413 @@
+#!/usr/bin/env python3
+"""
+Aggregate Rollup Documents for WWIZ
+
+Questions like "how busy is the Art team this week" or "how many open
+issues does MMORPG have" otherwise make the LLM retrieve and add up dozens
+of person-level chunks. This stage precomputes the answers as compact
+summary documents:
+
+- Departments (rollup-department-<department>.json): headcount, teams and
+  positions, meeting-load distribution, Jira workload, Confluence and
+  Slack/Teams activity for everyone in the department
+- Projects (rollup-project-<projectKey>.json): issue counts by status,
+  members and their roles and departments
+- Spaces (rollup-space-<spaceKey>.json): pages, contributors and their
+  departments
+- Company (rollup-company.json): the same headline numbers company-wide
+
+Every source file is parsed once into per-person columns, and all rollups
+are computed from those columns in one pass. Each document opens with a
+one-line plain-text summary so a single retrieval hit answers the question.
+
+Rollups are uploaded like live status documents: only when their content
+hash changes, replacing the previous version.
+
+Usage:
+    python data-handling/dataImport/rollupDocuments.py [data path]   # print the rollups
+"""
+
+import json
+import os
+import re
+import sys
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from percentiles import percentile
+from workspaceShards import sourceFolderName
+
+# Folders rollup documents are uploaded to
+ROLLUP_FOLDERS = {
+    "department": "rollup-department",
+    "project": "rollup-project",
+    "space": "rollup-space",
+    "company": "rollup-company",
+}
+
+# Sources read by the rollup stage
+ROLLUP_SOURCES = [
+    "employmentHero-staff",
+    "calendar-availabilitySummary",
+    "jira-userStats",
+    "jira-projectSummary",
+    "confluence-userStats",
+    "confluence-spacesSummary",
+    "slack-userActivitySummary",
+    "teams-userActivitySummary",
+]
+
+# Department used for people without an Employment Hero record
+UNKNOWN_DEPARTMENT = "Unknown"
+
+# Per-person columns: (name, source, path inside the record)
+PERSON_COLUMNS: List[Tuple[str, str, str]] = [
+    ("meetingHours", "calendar-availabilitySummary", "availabilitySummary.weeklyMeetingLoad.totalMeetingHours"),
+    ("focusHours", "calendar-availabilitySummary", "availabilitySummary.weeklyMeetingLoad.focusTimeHours"),
+    ("availableHours", "calendar-availabilitySummary", "availabilitySummary.weeklyMeetingLoad.availableHours"),
+    ("meetingDensity", "calendar-availabilitySummary", "availabilitySummary.weeklyMeetingLoad.meetingDensity"),
+    ("currentStatus", "calendar-availabilitySummary", "availabilitySummary.currentStatus"),
+    ("assignedIssues", "jira-userStats", "workloadSummary.assignedIssues"),
+    ("inProgressIssues", "jira-userStats", "workloadSummary.inProgressIssues"),
+    ("completedThisMonth", "jira-userStats", "workloadSummary.completedThisMonth"),
+    ("pagesCreated", "confluence-userStats", "totalContributionSummary.totalPagesCreated"),
+    ("pagesModified", "confluence-userStats", "totalContributionSummary.totalPagesModified"),
+    ("slackMessages", "slack-userActivitySummary", "activitySummary.messagesSentLastWeek"),
+    ("slackActivity", "slack-userActivitySummary", "activitySummary.averageDailyActivity"),
+    ("teamsMessages", "teams-userActivitySummary", "activitySummary.messagesSentLastWeek"),
+    ("teamsMeetings", "teams-userActivitySummary", "activitySummary.meetingsAttendedLastWeek"),
+    ("teamsActivity", "teams-userActivitySummary", "activitySummary.averageDailyActivity"),
+]
+
+
+def getPath(record: Dict, path: str):
+    """Read a dotted path from a record (None if any part is missing)."""
+    value = record
+    for key in path.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+
+def loadRecords(files: Iterable[Tuple[bytes, str]]) -> Dict[str, List[Dict]]:
+    """
+    Parse the files of the rollup sources, once each.
+
+    Args:
+        files: (content, target folder) pairs
+
+    Returns:
+        Source folder -> list of records
+    """
+    records: Dict[str, List[Dict]] = {source: [] for source in ROLLUP_SOURCES}
+    for content, targetFolder in files:
+        source = sourceFolderName(targetFolder)
+        if source not in records:
+            continue
+        try:
+            record = json.loads(content.decode("utf-8"))
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            continue
+        if isinstance(record, dict):
+            records[source].append(record)
+    return records
+
+
+def buildColumns(records: Dict[str, List[Dict]]) -> Dict[str, Dict[str, object]]:
+    """
+    Build per-person columns keyed by ehsId.
+
+    Args:
+        records: Source folder -> records
+
+    Returns:
+        Column name -> {ehsId: value}, plus department, team, position and name columns
+    """
+    columns: Dict[str, Dict[str, object]] = {name: {} for name in ["department", "team", "position", "name"] + [column[0] for column in PERSON_COLUMNS]}
+
+    for record in records["employmentHero-staff"]:
+        ehsId = record.get("ehsId")
+        if ehsId:
+            columns["department"][ehsId] = record.get("department") or UNKNOWN_DEPARTMENT
+            columns["team"][ehsId] = record.get("team")
+            columns["position"][ehsId] = record.get("positionTitle")
+            columns["name"][ehsId] = f"{record.get('firstName', '')} {record.get('lastName', '')}".strip()
+
+    bySource: Dict[str, List[Tuple[str, str]]] = {}
+    for name, source, path in PERSON_COLUMNS:
+        bySource.setdefault(source, []).append((name, path))
+
+    for source, fields in bySource.items():
+        for record in records[source]:
+            ehsId = record.get("ehsId")
+            if not ehsId:
+                continue
+            columns["name"].setdefault(ehsId, record.get("displayName"))
+            for name, path in fields:
+                value = getPath(record, path)
+                if value is not None:
+                    columns[name][ehsId] = value
+
+    return columns
+
+
+def distribution(column: Dict[str, object], people: List[str]) -> Optional[Dict[str, float]]:
+    """Min / median / p90 / max / mean / total of a numeric column over a group."""
+    values = [column[ehsId] for ehsId in people if isinstance(column.get(ehsId), (int, float))]
+    if not values:
+        return None
+    return {
+        "min": min(values),
+        "median": percentile(values, 50),
+        "p90": percentile(values, 90),
+        "max": max(values),
+        "mean": round(sum(values) / len(values), 1),
+        "total": round(sum(values), 1),
+        "people": len(values),
+    }
+
+
+def counts(column: Dict[str, object], people: List[str]) -> Dict[str, int]:
+    """Value counts of a categorical column over a group, most common first."""
+    return dict(Counter(column[ehsId] for ehsId in people if column.get(ehsId) is not None).most_common())
+
+
+def groupSummary(columns: Dict[str, Dict[str, object]], people: List[str]) -> Dict:
+    """Workload and activity rollup for a group of people."""
+    return {
+        "meetingLoad": {
+            "meetingHoursThisWeek": distribution(columns["meetingHours"], people),
+            "focusHoursThisWeek": distribution(columns["focusHours"], people),
+            "availableHoursThisWeek": distribution(columns["availableHours"], people),
+            "meetingDensity": counts(columns["meetingDensity"], people),
+            "currentStatus": counts(columns["currentStatus"], people),
+        },
+        "jiraWorkload": {
+            "assignedIssues": distribution(columns["assignedIssues"], people),
+            "inProgressIssues": distribution(columns["inProgressIssues"], people),
+            "completedThisMonth": distribution(columns["completedThisMonth"], people),
+        },
+        "confluenceActivity": {
+            "pagesCreated": distribution(columns["pagesCreated"], people),
+            "pagesModified": distribution(columns["pagesModified"], people),
+        },
+        "chatActivity": {
+            "slackMessagesLastWeek": distribution(columns["slackMessages"], people),
+            "slackDailyActivity": counts(columns["slackActivity"], people),
+            "teamsMessagesLastWeek": distribution(columns["teamsMessages"], people),
+            "teamsMeetingsLastWeek": distribution(columns["teamsMeetings"], people),
+            "teamsDailyActivity": counts(columns["teamsActivity"], people),
+        },
+    }
+
+
+def describeLoad(summary: Dict) -> str:
+    """Plain-text meeting load and workload phrase for a group summary."""
+    parts = []
+    meetings = summary["meetingLoad"]["meetingHoursThisWeek"]
+    if meetings:
+        parts.append(f"median {meetings['median']}h of meetings this week (p90 {meetings['p90']}h)")
+    density = summary["meetingLoad"]["meetingDensity"]
+    if density:
+        parts.append(", ".join(f"{count} {level}" for level, count in density.items()) + " meeting load")
+    assigned = summary["jiraWorkload"]["assignedIssues"]
+    if assigned:
+        parts.append(f"{assigned['total']:g} assigned Jira issues")
+    return "; ".join(parts)
+
+
+def rollupDepartments(columns: Dict[str, Dict[str, object]]) -> List[Dict]:
+    """One rollup per department, plus the company-wide rollup."""
+    members: Dict[str, List[str]] = {}
+    everyone = sorted(set(columns["name"]) | set(columns["department"]))
+    for ehsId in everyone:
+        members.setdefault(columns["department"].get(ehsId, UNKNOWN_DEPARTMENT), []).append(ehsId)
+
+    rollups = []
+    for department, people in sorted(members.items()):
+        summary = groupSummary(columns, people)
+        rollups.append({
+            "rollupType": "department",
+            "department": department,
+            "summary": f"{department} department: {len(people)} people; {describeLoad(summary)}.",
+            "headcount": len(people),
+            "teams": counts(columns["team"], people),
+            "positions": counts(columns["position"], people),
+            "members": [{"ehsId": ehsId, "name": columns["name"].get(ehsId)} for ehsId in people],
+            **summary,
+        })
+
+    company = groupSummary(columns, everyone)
+    rollups.append({
+        "rollupType": "company",
+        "department": None,
+        "summary": f"Company: {len(everyone)} people in {len(members)} departments; {describeLoad(company)}.",
+        "headcount": len(everyone),
+        "departments": {department: len(people) for department, people in sorted(members.items(), key=lambda item: -len(item[1]))},
+        **company,
+    })
+    return rollups
+
+
+def rollupProjects(records: List[Dict], userStats: List[Dict], columns: Dict[str, Dict[str, object]]) -> List[Dict]:
+    """One rollup per Jira project: issue counts by status, members, roles and departments."""
+    # Members come from the project's usersAndRoles and from each person's own projectRoles
+    memberRoles: Dict[str, Dict[str, List[str]]] = {}
+    for project in records:
+        for user in project.get("usersAndRoles", []):
+            if user.get("ehsId"):
+                memberRoles.setdefault(project.get("projectKey"), {})[user["ehsId"]] = user.get("roles", [])
+    for record in userStats:
+        for role in record.get("projectRoles", []):
+            if record.get("ehsId") and role.get("projectKey"):
+                memberRoles.setdefault(role["projectKey"], {}).setdefault(record["ehsId"], role.get("roles", []))
+
+    rollups = []
+    for project in sorted(records, key=lambda record: record.get("projectKey", "")):
+        projectKey = project.get("projectKey")
+        if not projectKey:
+            continue
+
+        statusTotals: Counter = Counter()
+        for epic in project.get("ticketsByEpicAndStatus", []):
+            statusTotals.update(epic.get("statusCounts", {}))
+
+        members = sorted(memberRoles.get(projectKey, {}))
+        roles: Counter = Counter(role for userRoles in memberRoles.get(projectKey, {}).values() for role in userRoles)
+        stats = project.get("projectStats", {})
+        openIssues = stats.get("openIssues", sum(count for status, count in statusTotals.items() if status != "Done"))
+
+        rollups.append({
+            "rollupType": "project",
+            "projectKey": projectKey,
+            "projectName": project.get("projectName"),
+            "summary": f"{project.get('projectName', projectKey)} ({projectKey}): {openIssues} open of {stats.get('totalIssues', sum(statusTotals.values()))} issues, "
+                       f"{len(project.get('ticketsByEpicAndStatus', []))} epics, {len(members)} members, lead {project.get('lead', 'unknown')}.",
+            "lead": project.get("lead"),
+            "category": project.get("projectCategory"),
+            "openIssues": openIssues,
+            "totalIssues": stats.get("totalIssues"),
+            "completedIssues": stats.get("completedIssues"),
+            "issuesByStatus": dict(statusTotals.most_common()),
+            "epics": len(project.get("ticketsByEpicAndStatus", [])),
+            "memberCount": len(members),
+            "roles": dict(roles.most_common()),
+            "memberDepartments": counts(columns["department"], members),
+            "memberWorkload": {
+                "assignedIssues": distribution(columns["assignedIssues"], members),
+                "meetingHoursThisWeek": distribution(columns["meetingHours"], members),
+            },
+        })
+    return rollups
+
+
+def rollupSpaces(records: List[Dict], columns: Dict[str, Dict[str, object]]) -> List[Dict]:
+    """One rollup per Confluence space (split space files are merged first)."""
+    spaces: Dict[str, Dict] = {}
+    for record in records:
+        spaceKey = record.get("spaceKey")
+        if not spaceKey:
+            continue
+        space = spaces.setdefault(spaceKey, {"contributors": [], "articles": []})
+        for key, value in record.items():
+            if key in ("contributors", "articles"):
+                space[key].extend(value or [])
+            else:
+                space.setdefault(key, value)
+
+    rollups = []
+    for spaceKey, space in sorted(spaces.items()):
+        contributors = space["contributors"]
+        people = [contributor.get("ehsId") for contributor in contributors if contributor.get("ehsId")]
+        activity = space.get("activitySummary", {})
+        top = sorted(contributors, key=lambda contributor: -(contributor.get("pagesCreated", 0) + contributor.get("pagesModified", 0)))[:5]
+
+        rollups.append({
+            "rollupType": "space",
+            "spaceKey": spaceKey,
+            "spaceName": space.get("spaceName"),
+            "summary": f"{space.get('spaceName', spaceKey)} ({spaceKey}) Confluence space: {activity.get('totalPages', len(space['articles']))} pages, "
+                       f"{len(people)} contributors, {sum(c.get('pagesCreated', 0) for c in contributors)} pages created and "
+                       f"{sum(c.get('pagesModified', 0) for c in contributors)} modified by them.",
+            "pages": activity.get("totalPages"),
+            "blogPosts": activity.get("totalBlogPosts"),
+            "comments": activity.get("totalComments"),
+            "recentlyUpdatedPages": activity.get("recentlyUpdatedPages"),
+            "contributorCount": len(people),
+            "contributorRoles": dict(Counter(c.get("role") for c in contributors if c.get("role")).most_common()),
+            "contributorDepartments": counts(columns["department"], people),
+            "topContributors": [{"ehsId": c.get("ehsId"), "name": c.get("displayName"), "pagesCreated": c.get("pagesCreated", 0), "pagesModified": c.get("pagesModified", 0)} for c in top],
+        })
+    return rollups
+
+
+def rollupFileName(rollup: Dict) -> str:
+    """File name for a rollup document (e.g. "rollup-department-art-animation.json")."""
+    if rollup["rollupType"] == "company":
+        return "rollup-company.json"
+    key = {"department": rollup.get("department"), "project": rollup.get("projectKey"), "space": rollup.get("spaceKey"), }[rollup["rollupType"]]
+    slug = re.sub(r"[^a-z0-9]+", "-", str(key).lower()).strip("-") or "unknown"
+    return f"rollup-{rollup['rollupType']}-{slug}.json"
+
+
+def buildRollups(files: Iterable[Tuple[bytes, str]]) -> List[Dict]:
+    """
+    Compute every rollup from the source files.
+
+    Args:
+        files: (content, target folder) pairs
+
+    Returns:
+        List of rollup dictionaries
+    """
+    records = loadRecords(files)
+    columns = buildColumns(records)
+    return rollupDepartments(columns) + rollupProjects(records["jira-projectSummary"], records["jira-userStats"], columns) + rollupSpaces(records["confluence-spacesSummary"], columns)
+
+
+def buildRollupDocuments(filesToUpload: Dict[str, Tuple[bytes, str]]) -> Dict[str, Tuple[bytes, str]]:
+    """
+    Build rollup documents for upload.
+
+    Must run on every discovered file (before de-duplication), since a
+    rollup covers people whose own documents are already uploaded.
+
+    Args:
+        filesToUpload: Dictionary of files with content and target folders
+
+    Returns:
+        Dictionary mapping document keys (folder/name) to (content, target folder)
+    """
+    documents: Dict[str, Tuple[bytes, str]] = {}
+    for rollup in buildRollups(filesToUpload.values()):
+        folder = ROLLUP_FOLDERS[rollup["rollupType"]]
+        rollup["dataSource"] = folder
+        documents[f"{folder}/{rollupFileName(rollup)}"] = (json.dumps(rollup, indent=2, ensure_ascii=False).encode("utf-8"), folder)
+    return documents
+
+
+def readTree(dataPath: str) -> List[Tuple[bytes, str]]:
+    """Read the rollup source files from a data tree laid out like data/."""
+    files = []
+    for source in ROLLUP_SOURCES:
+        folder = os.path.join(dataPath, source)
+        if not os.path.isdir(folder):
+            continue
+        for name in sorted(os.listdir(folder)):
+            if name.endswith(".json"):
+                with open(os.path.join(folder, name), "rb") as f:
+                    files.append((f.read(), source))
+    return files
+
+
+def main() -> None:
+    dataPath = sys.argv[1] if len(sys.argv) > 1 else "data"
+    rollups = buildRollups(readTree(dataPath))
+    for rollup in rollups:
+        print(f"{rollupFileName(rollup)}: {rollup['summary']}")
+    print(f"\n{len(rollups)} rollups")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,395 @@
+"""
+Compiled Schema Validators for WWIZ Source Records
+
+The templates in sample-data/<source>/sample.json define the intended
+shape of each record type. This module turns each template into a
+straight-line Python validator (generated source, compiled once) that
+checks required top-level keys, value types (nested objects and arrays
+included) and the ehsId/fileId formats without walking the template
+again for every record.
+
+Validation runs in batch across a process pool - each worker reads and
+parses its own files - and produces a per-folder error summary, so bad
+records are stopped before they cost upload and embedding time.
+
+Usage:
+    python data-handling/dataImport/schemaValidators.py                 # validate data/
+    python data-handling/dataImport/schemaValidators.py data/jira-userStats --workers 4
+    python data-handling/dataImport/schemaValidators.py --show-code jira-userStats
+"""
+
+import json
+import os
+import re
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Template folder, relative to the repo root
+SAMPLE_DATA_PATH = "sample-data"
+
+# fileId prefix per source (matches generate_test_data.py)
+FILE_ID_PREFIXES: Dict[str, str] = {
+    "employmentHero-staff": "EHS",
+    "entraAd-user": "EAD",
+    "googleCloudIdentity-user": "GCI",
+    "jira-userStats": "JIR",
+    "confluence-userStats": "CNF",
+    "calendar-availabilitySummary": "CAL",
+    "teams-userActivitySummary": "TMS",
+    "slack-userActivitySummary": "SLK",
+}
+
+# Template keys that real records may leave out
+OPTIONAL_KEYS: Dict[str, List[str]] = {
+    "calendar-availabilitySummary": ["outOfOffice", "recurringCommitments"],
+    "teams-userActivitySummary": ["activeTeamsChannels", "recentActivity"],
+    "slack-userActivitySummary": ["recentActivity"],
+}
+
+# Sources where only these keys are required (large spaces are split into
+# <KEY>-main / -articles / -contributors files that each carry part of the record)
+REQUIRED_KEYS: Dict[str, List[str]] = {
+    "confluence-spacesSummary": ["spaceKey", "dataSource"],
+}
+
+# Keys that may be null (e.g. the CEO has no manager)
+NULLABLE_KEYS: Dict[str, List[str]] = {
+    "employmentHero-staff": ["manager"],
+}
+
+# Nested objects and arrays are checked this many levels deep
+MAX_DEPTH = 3
+
+# Errors listed per folder in the summary
+SUMMARY_TOP_N = 5
+
+# Files handed to a worker at a time
+BATCH_SIZE = 500
+
+EHS_ID_PATTERN = r"^[A-Z]{3}\d{3,6}$"
+
+_TYPE_CHECKS = {
+    "str": ("type({v}) is not str", "string"),
+    "bool": ("type({v}) is not bool", "boolean"),
+    "number": ("type({v}) is not int and type({v}) is not float", "number"),
+    "dict": ("type({v}) is not dict", "object"),
+    "list": ("type({v}) is not list", "array"),
+}
+
+
+def templateType(value) -> Optional[str]:
+    """Map a template value to a type check name (None = any type)."""
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, (int, float)):
+        return "number"
+    if isinstance(value, str):
+        return "str"
+    if isinstance(value, dict):
+        return "dict"
+    if isinstance(value, list):
+        return "list"
+    return None
+
+
+def generateValidatorSource(source: str, template: Dict) -> str:
+    """
+    Generate the Python source of a validator for one record type.
+
+    Args:
+        source: Source folder name
+        template: Parsed sample.json template
+
+    Returns:
+        Source code defining validate(record) -> List[str]
+    """
+    lines = [
+        "def validate(record):",
+        "    errors = []",
+        "    if type(record) is not dict:",
+        "        return ['record: expected object']",
+    ]
+    counter = [0]
+
+    def newVar() -> str:
+        counter[0] += 1
+        return f"v{counter[0]}"
+
+    def emitValue(var: str, value, path: str, indent: str, depth: int, nullable: bool) -> None:
+        """Emit the checks for a value already bound to var."""
+        checkType = templateType(value)
+        if checkType is None:
+            return
+
+        condition, typeName = _TYPE_CHECKS[checkType]
+        condition = condition.format(v=var)
+        if nullable:
+            condition = f"{var} is not None and {condition}"
+        lines.append(f"{indent}if {condition}:")
+        lines.append(f"{indent}    errors.append({path + ': expected ' + typeName!r})")
+
+        key = path.rsplit(".", 1)[-1].split("[")[0]
+        if checkType == "str" and (key == "ehsId" or key.endswith("EhsId")):
+            lines.append(f"{indent}elif {var} is not None and not EHS_ID({var}):" if nullable else f"{indent}elif not EHS_ID({var}):")
+            lines.append(f"{indent}    errors.append({path + ': invalid ehsId '!r} + repr({var}))")
+        elif checkType == "dict" and depth < MAX_DEPTH and value:
+            lines.append(f"{indent}elif {var} is not None:" if nullable else f"{indent}else:")
+            # Nested keys vary per record (status names, time slots), so they are type-checked when present
+            emitObject(var, value, path, indent + "    ", depth + 1, list(value), [])
+        elif checkType == "list" and depth < MAX_DEPTH and value and templateType(value[0]) is not None:
+            item = newVar()
+            lines.append(f"{indent}elif {var} is not None:" if nullable else f"{indent}else:")
+            lines.append(f"{indent}    for {item} in {var}:")
+            emitValue(item, value[0], f"{path}[]", indent + "        ", depth + 1, True)
+
+    def emitObject(var: str, template: Dict, path: str, indent: str, depth: int, optional: List[str], nullableKeys: List[str]) -> None:
+        """Emit key checks for an object already bound to var."""
+        for key, value in template.items():
+            keyPath = f"{path}.{key}" if path else key
+            child = newVar()
+            lines.append(f"{indent}{child} = {var}.get({key!r}, MISSING)")
+            lines.append(f"{indent}if {child} is MISSING:")
+            if key in optional:
+                lines.append(f"{indent}    pass")
+            else:
+                lines.append(f"{indent}    errors.append({'missing key: ' + keyPath!r})")
+            # Nested values may be null (e.g. an empty calendar slot); top-level only where listed
+            nullable = depth > 0 or key in nullableKeys
+            lines.append(f"{indent}else:")
+            before = len(lines)
+            emitValue(child, value, keyPath, indent + "    ", depth, nullable)
+            if len(lines) == before:
+                lines.append(f"{indent}    pass")
+
+    templateKeys = list(template.keys())
+    required = REQUIRED_KEYS.get(source)
+    optional = [key for key in templateKeys if key not in required] if required else OPTIONAL_KEYS.get(source, [])
+    emitObject("record", template, "", "    ", 0, optional, NULLABLE_KEYS.get(source, []))
+
+    prefix = FILE_ID_PREFIXES.get(source)
+    if prefix:
+        lines.append("    fileId = record.get('fileId')")
+        lines.append(f"    if fileId is not None and (type(fileId) is not str or not FILE_ID(fileId)):")
+        lines.append("        errors.append('fileId: invalid ' + repr(fileId))")
+
+    lines.append("    return errors")
+    return "\n".join(lines) + "\n"
+
+
+def compileValidator(source: str, template: Dict) -> Callable[[Dict], List[str]]:
+    """
+    Generate and compile the validator for one record type.
+
+    Args:
+        source: Source folder name
+        template: Parsed sample.json template
+
+    Returns:
+        validate(record) function returning a list of error messages
+    """
+    namespace = {
+        "MISSING": object(),
+        "EHS_ID": re.compile(EHS_ID_PATTERN).match,
+        "FILE_ID": re.compile(rf"^{FILE_ID_PREFIXES.get(source, '[A-Z]{3}')}\d{{3,6}}$").match,
+    }
+    code = compile(generateValidatorSource(source, template), f"<validator {source}>", "exec")
+    exec(code, namespace)
+    return namespace["validate"]
+
+
+def loadTemplates(samplePath: str = SAMPLE_DATA_PATH) -> Dict[str, Dict]:
+    """
+    Load every sample.json template.
+
+    Args:
+        samplePath: Folder holding <source>/sample.json templates
+
+    Returns:
+        Dictionary mapping source names to templates
+    """
+    templates = {}
+    if not os.path.isdir(samplePath):
+        return templates
+
+    for source in sorted(os.listdir(samplePath)):
+        templatePath = os.path.join(samplePath, source, "sample.json")
+        if os.path.isfile(templatePath):
+            with open(templatePath, "r", encoding="utf-8") as f:
+                templates[source] = json.load(f)
+    return templates
+
+
+# Compiled validators, built once per process
+_validators: Dict[str, Callable[[Dict], List[str]]] = {}
+
+
+def getValidators(samplePath: str = SAMPLE_DATA_PATH) -> Dict[str, Callable[[Dict], List[str]]]:
+    """Compile (once per process) and return the validators for every template."""
+    if not _validators:
+        for source, template in loadTemplates(samplePath).items():
+            _validators[source] = compileValidator(source, template)
+    return _validators
+
+
+def validateBatch(batch: List[Tuple[str, str, Optional[bytes]]], samplePath: str = SAMPLE_DATA_PATH) -> List[Tuple[str, str, List[str]]]:
+    """
+    Validate a batch of files in one worker.
+
+    Args:
+        batch: (filePath, source, content) tuples - content is None for files read from disk
+        samplePath: Template folder
+
+    Returns:
+        (filePath, source, errors) tuples for every file with errors
+    """
+    validators = getValidators(samplePath)
+    failures = []
+
+    for filePath, source, content in batch:
+        try:
+            if content is None:
+                with open(filePath, "rb") as f:
+                    content = f.read()
+            record = json.loads(content)
+        except (OSError, ValueError) as e:
+            failures.append((filePath, source, [f"unreadable JSON: {str(e)}"]))
+            continue
+
+        # Some exports hold a list of records in one file
+        records = record if isinstance(record, list) else [record]
+        errors = [error for item in records for error in validators[source](item)]
+        if errors:
+            failures.append((filePath, source, errors))
+
+    return failures
+
+
+def validateFiles(files: List[Tuple[str, str]], workers: int = 0, samplePath: str = SAMPLE_DATA_PATH, contents: Optional[Dict[str, bytes]] = None) -> Dict[str, Dict]:
+    """
+    Validate JSON files against their source templates across a process pool.
+
+    Files whose source has no template are counted but not checked.
+
+    Args:
+        files: (filePath, source folder name) tuples
+        workers: Worker processes (0 = one per CPU, 1 = validate in this process)
+        samplePath: Template folder
+        contents: Content to check instead of the file on disk (scrubbed files, bundle members), keyed by filePath
+
+    Returns:
+        Per-folder summary: {source: {"checked": n, "invalid": {filePath: [errors]}, "unchecked": n}}
+    """
+    templates = set(loadTemplates(samplePath))
+    summary: Dict[str, Dict] = {}
+    checkable: List[Tuple[str, str, Optional[bytes]]] = []
+
+    for filePath, source in files:
+        folder = summary.setdefault(source, {"checked": 0, "invalid": {}, "unchecked": 0})
+        if source in templates and filePath.lower().endswith(".json"):
+            folder["checked"] += 1
+            checkable.append((filePath, source, (contents or {}).get(filePath)))
+        else:
+            folder["unchecked"] += 1
+
+    batches = [checkable[i:i + BATCH_SIZE] for i in range(0, len(checkable), BATCH_SIZE)]
+    workers = workers or os.cpu_count() or 1
+
+    if workers == 1 or len(batches) <= 1:
+        results = [validateBatch(batch, samplePath) for batch in batches]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(batches))) as executor:
+            results = list(executor.map(validateBatch, batches, [samplePath] * len(batches)))
+
+    for failures in results:
+        for filePath, source, errors in failures:
+            summary[source]["invalid"][filePath] = errors
+
+    return summary
+
+
+def printValidationSummary(summary: Dict[str, Dict]) -> int:
+    """
+    Print the per-folder error summary.
+
+    Args:
+        summary: Result of validateFiles
+
+    Returns:
+        Number of invalid files
+    """
+    totalInvalid = 0
+    print(f"\n{'Folder':<32} {'Checked':>8} {'Invalid':>8} {'Unchecked':>10}")
+
+    for source, folder in sorted(summary.items()):
+        invalid = folder["invalid"]
+        totalInvalid += len(invalid)
+        print(f"{source:<32} {folder['checked']:>8} {len(invalid):>8} {folder['unchecked']:>10}")
+
+        # Group by message so one systematic fault doesn't flood the output
+        errorCounts = Counter(error for errors in invalid.values() for error in set(errors))
+        for error, count in errorCounts.most_common(SUMMARY_TOP_N):
+            print(f"    {count} file(s): {error}")
+        if invalid:
+            examples = ", ".join(os.path.basename(path) for path in sorted(invalid)[:SUMMARY_TOP_N])
+            print(f"    e.g. {examples}")
+
+    return totalInvalid
+
+
+def collectFiles(rootPath: str) -> List[Tuple[str, str]]:
+    """
+    Walk a data folder and pair each file with its source folder name.
+
+    Args:
+        rootPath: Data folder (e.g. "data" or "data/jira-userStats")
+
+    Returns:
+        (filePath, source) tuples
+    """
+    files = []
+    for dirPath, dirNames, fileNames in os.walk(rootPath):
+        dirNames.sort()
+        source = os.path.basename(os.path.normpath(dirPath))
+        for fileName in sorted(fileNames):
+            if not fileName.startswith("."):
+                files.append((os.path.join(dirPath, fileName), source))
+    return files
+
+
+def main() -> None:
+    args = sys.argv[1:]
+
+    if "--show-code" in args:
+        source = args[args.index("--show-code") + 1]
+        templates = loadTemplates()
+        if source not in templates:
+            print(f"No template for {source}. Available: {', '.join(templates)}")
+            sys.exit(1)
+        print(generateValidatorSource(source, templates[source]))
+        return
+
+    workers = 0
+    if "--workers" in args:
+        index = args.index("--workers")
+        workers = int(args[index + 1])
+        del args[index:index + 2]
+
+    rootPath = args[0] if args else "data"
+    files = collectFiles(rootPath)
+    print(f"Validating {len(files)} files in {rootPath}...")
+
+    started = time.perf_counter()
+    summary = validateFiles(files, workers)
+    elapsed = time.perf_counter() - started
+    invalid = printValidationSummary(summary)
+
+    print(f"\nValidated {sum(folder['checked'] for folder in summary.values())} files in {elapsed:.2f}s - {invalid} invalid")
+    if invalid:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,502 @@
+#!/usr/bin/env python3
+"""
+Meeting Slot Finder for WWIZ
+
+Answers "find a time this week for Alex Thompson, Maya Patel and Jordan
+Martinez" from the calendar-availabilitySummary records, which the LLM
+can't do reliably by reading the files.
+
+Each person's week is encoded as a bitset - a Python int with one bit per
+15-minute UTC slot - from:
+
+- workingHours: start/end per weekday in the person's own timezone
+  (converted with zoneinfo, so daylight saving changes are handled)
+- busyPeriodsToday and nextMeeting
+- recurringCommitments with a time of day (daily ones on every working
+  day, weekly and bi-weekly ones on their day - bi-weekly ones are treated
+  as every week, since the records don't say which week they fall in)
+- outOfOffice: currentlyOut and nextPlannedLeave
+
+A group's common free time is the AND of everyone's bitsets, so a query
+costs one integer AND per attendee. Free windows long enough for the
+meeting are ranked by time-of-day fit (how few attendees would be in the
+first or last hour of their day or over lunch) and by length (a longer
+window is easier to move the meeting around in).
+
+Encoded weeks are cached per person (.slotCache.json) and only rebuilt
+when the person's calendar record changes or the search starts on
+another day.
+
+Usage:
+    python data-handling/dataImport/slotFinder.py "Alex Thompson" "Maya Patel" "Jordan Martinez"
+    python data-handling/dataImport/slotFinder.py FMP004 FMP018 --minutes 60 --limit 3
+    python data-handling/dataImport/slotFinder.py --department Development --after 2025-08-25T00:00:00Z
+    (add --data <path> to read a tree other than data/, --cache <file> to move the cache)
+"""
+
+import hashlib
+import json
+import os
+import re
+import sys
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from rollupDocuments import UNKNOWN_DEPARTMENT, getPath, loadRecords, readTree
+
+SLOT_MINUTES = 15
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+
+# An encoded week covers the seven days from the query's UTC day, plus a day either side
+# so working days in every timezone fit inside it
+LEAD_DAYS = 1
+SEARCH_DAYS = 7
+SPAN_DAYS = SEARCH_DAYS + 2 * LEAD_DAYS
+SPAN_SLOTS = SPAN_DAYS * SLOTS_PER_DAY
+
+# Hours of a person's own day a meeting fits badly in (besides the first and last hour of their day)
+LUNCH = (time(12, 0), time(13, 0))
+EDGE_MINUTES = 60
+
+# Ranking: share of the score from time-of-day fit vs window length, and the window
+# length (in meetings) that counts as fully flexible
+FIT_WEIGHT = 0.7
+FLEXIBLE_WINDOW = 4
+
+DEFAULT_MINUTES = 30
+DEFAULT_LIMIT = 5
+DEFAULT_CACHE_FILE = ".slotCache.json"
+
+DAY_NAMES = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+
+
+def parseTimestamp(value) -> Optional[datetime]:
+    """Parse an ISO timestamp ("2025-08-23T14:00:00Z") to an aware UTC datetime, None if unusable."""
+    if not isinstance(value, str):
+        return None
+    try:
+        moment = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(timezone.utc)
+
+
+def parseClock(value) -> Optional[time]:
+    """Parse "09:00" to a time, None if unusable."""
+    match = re.fullmatch(r"(\d{1,2}):(\d{2})", value.strip()) if isinstance(value, str) else None
+    if not match or int(match.group(1)) > 24 or int(match.group(2)) > 59:
+        return None
+    return time(23, 59) if int(match.group(1)) == 24 else time(int(match.group(1)), int(match.group(2)))
+
+
+def parseMinutes(value) -> int:
+    """Parse a duration ("30 minutes", "2 hours", "1 hour 30 minutes", 45) to minutes, 0 if unusable."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return int(value)
+    if not isinstance(value, str):
+        return 0
+    hours = re.search(r"(\d+(?:\.\d+)?)\s*h", value)
+    minutes = re.search(r"(\d+)\s*m", value)
+    return int(float(hours.group(1)) * 60 if hours else 0) + int(minutes.group(1) if minutes else 0)
+
+
+def zoneFor(workingHours) -> timezone:
+    """Timezone of a workingHours block (UTC if missing or unknown)."""
+    try:
+        return ZoneInfo((workingHours or {}).get("timezone") or "UTC")
+    except (ZoneInfoNotFoundError, ValueError):
+        return timezone.utc
+
+
+def spanStart(moment: datetime) -> datetime:
+    """Start (UTC midnight) of the encoded week searched from a moment."""
+    day = moment.astimezone(timezone.utc).date() - timedelta(days=LEAD_DAYS)
+    return datetime.combine(day, time(0), tzinfo=timezone.utc)
+
+
+def slotFloor(moment: datetime, start: datetime) -> int:
+    """Slot containing a moment."""
+    return int((moment - start).total_seconds() // (SLOT_MINUTES * 60))
+
+
+def slotCeil(moment: datetime, start: datetime) -> int:
+    """First slot starting at or after a moment."""
+    return -int(-(moment - start).total_seconds() // (SLOT_MINUTES * 60))
+
+
+def rangeMask(first: int, last: int) -> int:
+    """Bits for slots first..last-1, clipped to the span."""
+    first, last = max(first, 0), min(last, SPAN_SLOTS)
+    return ((1 << (last - first)) - 1) << first if last > first else 0
+
+
+def localDays(zone, start: datetime) -> Iterable[date]:
+    """Local calendar days overlapping the span, with a day's margin either side."""
+    first = start.astimezone(zone).date() - timedelta(days=1)
+    return (first + timedelta(days=offset) for offset in range(SPAN_DAYS + 2))
+
+
+def localRange(day: date, begin: time, end: time, zone, start: datetime, inner: bool = True) -> int:
+    """
+    Bits for a local time range on a local day.
+
+    Args:
+        inner: Only slots wholly inside the range (working hours) rather than every slot it touches (busy time)
+    """
+    fromUtc = datetime.combine(day, begin, tzinfo=zone).astimezone(timezone.utc)
+    toUtc = datetime.combine(day, end, tzinfo=zone).astimezone(timezone.utc)
+    if inner:
+        return rangeMask(slotCeil(fromUtc, start), slotFloor(toUtc, start))
+    return rangeMask(slotFloor(fromUtc, start), slotCeil(toUtc, start))
+
+
+def encodeWorkingHours(workingHours, start: datetime) -> Tuple[int, int]:
+    """
+    Encode a person's working hours over a span.
+
+    Args:
+        workingHours: Calendar workingHours (timezone plus start/end per weekday)
+        start: Span start (UTC)
+
+    Returns:
+        (working slots, awkward slots - first/last hour of each day and lunch)
+    """
+    if not isinstance(workingHours, dict):
+        return 0, 0
+    zone = zoneFor(workingHours)
+    working = awkward = 0
+    for day in localDays(zone, start):
+        hours = workingHours.get(DAY_NAMES[day.weekday()])
+        begin = parseClock(hours.get("start")) if isinstance(hours, dict) else None
+        end = parseClock(hours.get("end")) if isinstance(hours, dict) else None
+        if not begin or not end or end <= begin:
+            continue
+        working |= localRange(day, begin, end, zone, start)
+        firstHour = (datetime.combine(day, begin) + timedelta(minutes=EDGE_MINUTES)).time()
+        lastHour = (datetime.combine(day, end) - timedelta(minutes=EDGE_MINUTES)).time()
+        awkward |= localRange(day, begin, min(firstHour, end), zone, start, inner=False)
+        awkward |= localRange(day, max(lastHour, begin), end, zone, start, inner=False)
+        awkward |= localRange(day, *LUNCH, zone, start, inner=False)
+    return working, awkward & working
+
+
+def encodeBusy(record: Dict, start: datetime) -> int:
+    """
+    Encode a person's busy time over a span: meetings, recurring commitments and leave.
+
+    Args:
+        record: calendar-availabilitySummary record
+        start: Span start (UTC)
+
+    Returns:
+        Busy slots
+    """
+    workingHours = record.get("workingHours") if isinstance(record.get("workingHours"), dict) else {}
+    zone = zoneFor(workingHours)
+    busy = 0
+
+    periods = list(getPath(record, "availabilitySummary.busyPeriodsToday") or [])
+    periods.append(getPath(record, "availabilitySummary.nextMeeting"))
+    for period in periods:
+        if not isinstance(period, dict):
+            continue
+        fromUtc, toUtc = parseTimestamp(period.get("start")), parseTimestamp(period.get("end"))
+        if fromUtc and toUtc:
+            busy |= rangeMask(slotFloor(fromUtc, start), slotCeil(toUtc, start))
+
+    for commitment in record.get("recurringCommitments") or []:
+        begin = parseClock(commitment.get("time")) if isinstance(commitment, dict) else None
+        minutes = parseMinutes(commitment.get("duration")) if begin else 0
+        if not minutes:
+            continue
+        weekday = str(commitment.get("day") or "").lower()
+        for day in localDays(zone, start):
+            dayName = DAY_NAMES[day.weekday()]
+            if (weekday and weekday != dayName) or (not weekday and not workingHours.get(dayName)):
+                continue
+            fromUtc = datetime.combine(day, begin, tzinfo=zone).astimezone(timezone.utc)
+            busy |= rangeMask(slotFloor(fromUtc, start), slotCeil(fromUtc + timedelta(minutes=minutes), start))
+
+    outOfOffice = record.get("outOfOffice") if isinstance(record.get("outOfOffice"), dict) else {}
+    if outOfOffice.get("currentlyOut"):
+        return rangeMask(0, SPAN_SLOTS)
+    leave = outOfOffice.get("nextPlannedLeave")
+    if isinstance(leave, dict):
+        try:
+            first, last = date.fromisoformat(str(leave.get("start"))[:10]), date.fromisoformat(str(leave.get("end"))[:10])
+        except ValueError:
+            first = last = None
+        if first and last:
+            fromUtc = datetime.combine(first, time(0), tzinfo=zone).astimezone(timezone.utc)
+            toUtc = datetime.combine(last + timedelta(days=1), time(0), tzinfo=zone).astimezone(timezone.utc)
+            busy |= rangeMask(slotFloor(fromUtc, start), slotCeil(toUtc, start))
+
+    return busy
+
+
+def encodeWeek(record: Dict, start: datetime) -> Tuple[int, int]:
+    """
+    Encode one person's week.
+
+    Args:
+        record: calendar-availabilitySummary record
+        start: Span start (UTC)
+
+    Returns:
+        (free slots, awkward slots)
+    """
+    working, awkward = encodeWorkingHours(record.get("workingHours"), start)
+    return working & ~encodeBusy(record, start), awkward
+
+
+def recordVersion(record: Dict) -> str:
+    """Fingerprint of a calendar record, so cached weeks are rebuilt when it changes."""
+    return hashlib.md5(json.dumps(record, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def windows(mask: int, minimum: int) -> List[Tuple[int, int]]:
+    """
+    Runs of set bits at least `minimum` slots long.
+
+    Returns:
+        (first slot, slot after the last) per run, in order
+    """
+    runs = []
+    offset = 0
+    while mask:
+        skip = (mask & -mask).bit_length() - 1
+        mask >>= skip
+        offset += skip
+        length = (~mask & (mask + 1)).bit_length() - 1
+        if length >= minimum:
+            runs.append((offset, offset + length))
+        mask >>= length
+        offset += length
+    return runs
+
+
+class SlotFinder:
+    """Encoded calendar weeks for everyone, and common free time queries over them."""
+
+    def __init__(self, records: Dict[str, List[Dict]], cachePath: Optional[str] = None):
+        """
+        Args:
+            records: Source folder -> records (calendar-availabilitySummary and employmentHero-staff)
+            cachePath: File encoded weeks are cached in (None to keep them in memory only)
+        """
+        self.records: Dict[str, Dict] = {}
+        self.departments: Dict[str, str] = {}
+        self.lookup: Dict[str, List[str]] = {}
+        self.cachePath = cachePath
+        self.cache: Dict[str, Dict] = {}
+        self.versions: Dict[str, str] = {}
+        self.cacheChanged = False
+
+        for record in records.get("calendar-availabilitySummary", []):
+            if record.get("ehsId"):
+                self.records[record["ehsId"]] = record
+        for record in records.get("employmentHero-staff", []):
+            if record.get("ehsId"):
+                self.departments[record["ehsId"]] = record.get("department") or UNKNOWN_DEPARTMENT
+
+        for ehsId, record in self.records.items():
+            keys = {ehsId, record.get("fileId"), record.get("upn"), record.get("displayName"), record.get("firstName"),
+                    f"{record.get('firstName', '')} {record.get('lastName', '')}".strip()}
+            for key in keys:
+                if isinstance(key, str) and key:
+                    self.lookup.setdefault(key.lower(), []).append(ehsId)
+
+        if cachePath and os.path.exists(cachePath):
+            try:
+                with open(cachePath, "r", encoding="utf-8") as f:
+                    self.cache = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                self.cache = {}
+
+    def resolve(self, attendee: str) -> str:
+        """
+        Find the ehsId for an attendee given as ehsId, calendar fileId, UPN, full name or (unique) first name.
+
+        Raises:
+            ValueError: Unknown or ambiguous attendee
+        """
+        matches = sorted(set(self.lookup.get(attendee.strip().lower(), [])))
+        if not matches:
+            raise ValueError(f"No calendar found for '{attendee}'")
+        if len(matches) > 1:
+            raise ValueError(f"'{attendee}' matches several people: {', '.join(f'{ehsId} ({self.name(ehsId)})' for ehsId in matches)}")
+        return matches[0]
+
+    def department(self, name: str) -> List[str]:
+        """Everyone with a calendar in a department."""
+        return sorted(ehsId for ehsId, department in self.departments.items() if department.lower() == name.lower() and ehsId in self.records)
+
+    def name(self, ehsId: str) -> str:
+        return self.records.get(ehsId, {}).get("displayName") or ehsId
+
+    def encodedWeek(self, ehsId: str, start: datetime) -> Tuple[int, int]:
+        """A person's (free, awkward) slots for a week, from the cache when their record hasn't changed."""
+        record = self.records[ehsId]
+        if ehsId not in self.versions:
+            self.versions[ehsId] = recordVersion(record)
+        version = self.versions[ehsId]
+        cached = self.cache.get(ehsId)
+        if cached and cached.get("start") == start.isoformat() and cached.get("version") == version:
+            return int(cached["free"], 16), int(cached["awkward"], 16)
+
+        free, awkward = encodeWeek(record, start)
+        self.cache[ehsId] = {"start": start.isoformat(), "version": version, "free": format(free, "x"), "awkward": format(awkward, "x")}
+        self.cacheChanged = True
+        return free, awkward
+
+    def saveCache(self) -> None:
+        """Write the encoded weeks back to the cache file if any were rebuilt."""
+        if not self.cachePath or not self.cacheChanged:
+            return
+        temporary = f"{self.cachePath}.tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            json.dump(self.cache, f)
+        os.replace(temporary, self.cachePath)
+        self.cacheChanged = False
+
+    def findSlots(self, attendees: List[str], minutes: int = DEFAULT_MINUTES, after: Optional[datetime] = None,
+                  before: Optional[datetime] = None, limit: int = DEFAULT_LIMIT) -> List[Dict]:
+        """
+        Find the best meeting times everyone is free for.
+
+        Args:
+            attendees: ehsIds
+            minutes: Meeting length
+            after: Earliest start (default: now)
+            before: Latest end (default: a week after `after`)
+            limit: Most slots to return (the best start in each of the best windows)
+
+        Returns:
+            Slots, best first: start/end, the free window around them, fit and score
+        """
+        after = (after or datetime.now(timezone.utc)).astimezone(timezone.utc)
+        start = spanStart(after)
+        end = min(before or after + timedelta(days=SEARCH_DAYS), start + timedelta(days=SPAN_DAYS))
+        need = max(1, -(-minutes // SLOT_MINUTES))
+
+        common = rangeMask(slotCeil(after, start), slotFloor(end, start))
+        awkwards = []
+        for ehsId in attendees:
+            free, awkward = self.encodedWeek(ehsId, start)
+            common &= free
+            awkwards.append(awkward)
+            if not common:
+                break
+
+        slots = []
+        meeting = (1 << need) - 1
+        for first, last in windows(common, need):
+            windowMask = rangeMask(first, last)
+            relevant = [awkward for awkward in awkwards if awkward & windowMask]
+            bestStart, bestAwkward = first, len(relevant) + 1
+            for candidate in range(first, last - need + 1):
+                count = sum(1 for awkward in relevant if (awkward >> candidate) & meeting)
+                if count < bestAwkward:
+                    bestStart, bestAwkward = candidate, count
+                    if not count:
+                        break
+            fit = 1 - bestAwkward / len(attendees)
+            length = min(1.0, (last - first) / (need * FLEXIBLE_WINDOW))
+            slotStart = start + timedelta(minutes=bestStart * SLOT_MINUTES)
+            slots.append({
+                "start": slotStart,
+                "end": slotStart + timedelta(minutes=minutes),
+                "windowStart": start + timedelta(minutes=first * SLOT_MINUTES),
+                "windowEnd": start + timedelta(minutes=last * SLOT_MINUTES),
+                "fit": round(fit, 3),
+                "score": round(FIT_WEIGHT * fit + (1 - FIT_WEIGHT) * length, 3),
+            })
+
+        slots.sort(key=lambda slot: (-slot["score"], slot["start"]))
+        return slots[:limit]
+
+    def blockers(self, attendees: List[str], after: Optional[datetime] = None) -> List[Tuple[str, int]]:
+        """
+        Attendees whose absence would free up the most common time, for when nobody overlaps.
+
+        Returns:
+            (ehsId, free minutes the others would have in common without them), most first
+        """
+        after = (after or datetime.now(timezone.utc)).astimezone(timezone.utc)
+        start = spanStart(after)
+        window = rangeMask(slotCeil(after, start), slotFloor(after + timedelta(days=SEARCH_DAYS), start))
+        frees = [self.encodedWeek(ehsId, start)[0] for ehsId in attendees]
+
+        # prefix[i] & suffix[i + 1] is everyone except attendee i
+        prefix, suffix = [window], [window] * (len(frees) + 1)
+        for free in frees:
+            prefix.append(prefix[-1] & free)
+        for index in range(len(frees) - 1, -1, -1):
+            suffix[index] = suffix[index + 1] & frees[index]
+        without = [(ehsId, (prefix[index] & suffix[index + 1]).bit_count() * SLOT_MINUTES) for index, ehsId in enumerate(attendees)]
+        return sorted(without, key=lambda item: -item[1])
+
+
+def describeSlot(slot: Dict, zones: List[str]) -> str:
+    """A slot in UTC and in each attendee timezone."""
+    local = []
+    for zoneName in zones:
+        zone = zoneFor({"timezone": zoneName})
+        begin, end = slot["start"].astimezone(zone), slot["end"].astimezone(zone)
+        local.append(f"{begin:%a %d %b %H:%M}-{end:%H:%M} {begin.tzname()}")
+    return f"{slot['start']:%a %d %b %H:%M}-{slot['end']:%H:%M} UTC  ({'; '.join(local)})"
+
+
+def main() -> None:
+    args = sys.argv[1:]
+    options = {"--data": "data", "--minutes": str(DEFAULT_MINUTES), "--limit": str(DEFAULT_LIMIT), "--after": None, "--department": None, "--cache": DEFAULT_CACHE_FILE}
+    for option in list(options):
+        if option in args:
+            index = args.index(option)
+            options[option] = args[index + 1]
+            del args[index:index + 2]
+
+    if not args and not options["--department"]:
+        print("Usage:")
+        print("  python slotFinder.py <attendee> <attendee> ... [--minutes 30] [--limit 5] [--after <ISO time>]")
+        print("  python slotFinder.py --department <department> [...]")
+        print("  Attendees are ehsIds, UPNs or names; --after defaults to the calendar snapshot time")
+        sys.exit(1)
+
+    finder = SlotFinder(loadRecords(readTree(options["--data"])), options["--cache"])
+    try:
+        attendees = [finder.resolve(attendee) for attendee in args]
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    if options["--department"]:
+        attendees += finder.department(options["--department"])
+    attendees = sorted(set(attendees), key=attendees.index)
+    if not attendees:
+        print(f"Error: nobody with a calendar in '{options['--department']}'")
+        sys.exit(1)
+
+    # Busy periods in the records are relative to when they were collected, so search from then by default
+    snapshot = max((parseTimestamp(finder.records[ehsId].get("lastUpdated")) for ehsId in attendees), key=lambda moment: moment or datetime.min.replace(tzinfo=timezone.utc))
+    after = parseTimestamp(options["--after"]) if options["--after"] else snapshot
+    minutes = int(options["--minutes"])
+
+    slots = finder.findSlots(attendees, minutes, after, limit=int(options["--limit"]))
+    finder.saveCache()
+
+    print(f"{len(attendees)} attendees, {minutes} minutes, week from {after:%a %d %b %Y %H:%M} UTC")
+    zones = sorted({(finder.records[ehsId].get("workingHours") or {}).get("timezone") or "UTC" for ehsId in attendees})
+    if not slots:
+        print("No common free time - attendees blocking the most:")
+        for ehsId, freeMinutes in finder.blockers(attendees, after)[:3]:
+            print(f"  without {finder.name(ehsId)} ({ehsId}): {freeMinutes / 60:.1f}h in common")
+        return
+    for slot in slots:
+        print(f"  {slot['score']:.2f}  {describeSlot(slot, zones)}  free {slot['windowStart']:%H:%M}-{slot['windowEnd']:%H:%M} UTC, fit {slot['fit']:.2f}")
+
+
+if __name__ == "__main__":
+    main()
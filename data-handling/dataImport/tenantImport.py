@@ -0,0 +1,470 @@
+"""
+Multi-Tenant Import for WWIZ
+
+Ingests several companies in one run. Each tenant in the manifest has its
+own data tree, AnythingLLM folder prefix, workspaces, upload concurrency
+quota and fairness weight:
+
+    {
+      "defaults": {"concurrency": 2, "weight": 1},
+      "tenants": [
+        {"name": "fmp",  "filePath": "data",           "folderPrefix": "fmp",  "workspaces": "wizz", "concurrency": 4},
+        {"name": "acme", "filePath": "tenants/acme",   "folderPrefix": "acme", "workspaces": "acme-wizz", "weight": 2}
+      ]
+    }
+
+Uploads from all tenants share one worker pool (MAX_CONCURRENT_UPLOADS).
+The dispatcher visits tenants in deficit round-robin order: every visit
+adds FAIR_QUANTUM_BYTES x weight of credit, and a tenant may only send
+files its credit covers and only while it is under its own concurrency
+quota. A tenant with a 100k-file backlog therefore gets its share of the
+pool, not all of it, and a 50-file update from another tenant starts
+straight away.
+
+Within a tenant, files keep the usual order (folder priority, changed
+first, smallest first). As in a single-tenant import, files the import
+state knows are compared by content hash, and an edited file replaces its
+earlier server copy once the new version is uploaded.
+
+Tenants are prepared (read, scrubbed, validated and, with PARTITION_FIELDS,
+split into stable files and live status documents) concurrently, and each
+tenant joins the dispatcher as soon as its own queue is ready, so a small
+tenant isn't held up by a large one's preparation. Oversized files are
+split afterwards, one tenant per worker.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Deque, Dict, List, Optional, Set, Tuple
+
+import requests
+
+from bundleReader import isBundle
+from importFiles import buildFileListWithFolders, createFolderStructure, extractFolderStructure, parseWorkspaces, uploadSingleFile
+from importState import DEFAULT_STATE_FILE, contentHash, hasChanged, loadState, recordUpload, saveState
+from uploadScheduler import parseFolderPriorities, previousLocations, removeReplaced, scheduleUploads
+from workspaceShards import ensureShardWorkspaces, sourceFolderName
+
+# Defaults for tenants that don't set their own
+DEFAULT_TENANT_CONCURRENCY = 2
+DEFAULT_TENANT_WEIGHT = 1.0
+
+# Shared upload pool size, overridable with MAX_CONCURRENT_UPLOADS
+DEFAULT_MAX_CONCURRENT_UPLOADS = 8
+
+# Credit added per round-robin visit, overridable with FAIR_QUANTUM_BYTES
+DEFAULT_FAIR_QUANTUM_BYTES = 256 * 1024
+
+# Tenants prepared at the same time, overridable with TENANT_PREPARE_WORKERS
+DEFAULT_TENANT_PREPARE_WORKERS = 4
+
+
+class TenantQueue:
+    """Upload queue and fairness bookkeeping for one tenant."""
+
+    def __init__(self, name: str, folderPrefix: str, workspaces: List[str], concurrency: int, weight: float):
+        self.name = name
+        self.folderPrefix = folderPrefix
+        self.workspaces = workspaces
+        self.concurrency = max(1, concurrency)
+        self.weight = max(0.01, weight)
+        self.files: Deque[Tuple[str, bytes, str]] = deque()
+        self.oversized: List[Tuple[str, str]] = []
+        self.oversizedContents: Dict[str, bytes] = {}
+        self.live: Dict[str, Tuple[bytes, str]] = {}
+        self.sourceHashes: Dict[str, str] = {}
+        self.previous: Dict[str, List[str]] = {}
+        self.ready = False
+        self.deficit = 0.0
+        self.inFlight = 0
+        self.uploaded = 0
+        self.failed = 0
+        self.bytesUploaded = 0
+        self.locations: List[str] = []
+        self.startedAt = 0.0
+        self.finishedAt = 0.0
+
+
+def loadManifest(manifestPath: str) -> List[Dict]:
+    """
+    Load the tenant manifest, applying the manifest defaults to every tenant.
+
+    Args:
+        manifestPath: Path to the JSON manifest
+
+    Returns:
+        List of tenant dictionaries
+    """
+    with open(manifestPath, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+
+    defaults = manifest.get("defaults", {})
+    tenants = []
+    for tenant in manifest.get("tenants", []):
+        merged = {**defaults, **tenant}
+        if not merged.get("name") or not merged.get("filePath"):
+            print(f"Ignoring tenant without name/filePath: {tenant}")
+            continue
+        merged.setdefault("folderPrefix", merged["name"])
+        tenants.append(merged)
+    return tenants
+
+
+def tenantFolder(folderPrefix: str, relativeFolder: str) -> str:
+    """
+    Build the AnythingLLM folder for a tenant's source folder.
+
+    Args:
+        folderPrefix: Tenant folder prefix (e.g. "acme")
+        relativeFolder: Folder relative to the tenant's data tree (e.g. "jira-userStats")
+
+    Returns:
+        Prefixed folder (e.g. "acme-jira-userStats")
+    """
+    if not folderPrefix:
+        return relativeFolder
+    return f"{folderPrefix}-{relativeFolder}" if relativeFolder else folderPrefix
+
+
+def buildExistingFilesByFolder(serverUrl: str, apiKey: str) -> Set[Tuple[str, str]]:
+    """
+    List existing documents as (folder, file name) pairs.
+
+    Tenants can hold files with the same name (every company has an
+    EHS001.json), so de-duplication has to be per folder, not per name.
+
+    Args:
+        serverUrl: AnythingLLM server URL
+        apiKey: API key for authentication
+
+    Returns:
+        Set of (folder, cleaned file name) tuples
+    """
+    existing: Set[Tuple[str, str]] = set()
+
+    try:
+        response = requests.get(f"{serverUrl}/api/v1/documents", headers={'Authorization': f"Bearer {apiKey}"})
+        if response.status_code != 200:
+            print(f"Error fetching existing files: {response.text}")
+            return existing
+
+        for folder in response.json().get("localFiles", {}).get("items", []):
+            if folder.get("type") != "folder":
+                continue
+            for item in folder.get("items", []):
+                if item.get("type") == "file" and item.get("name"):
+                    existing.add((folder["name"], item["name"].replace(f"-{item.get('id')}.json", "")))
+
+    except Exception as e:
+        print(f"Error fetching existing files: {str(e)}")
+
+    return existing
+
+
+def createTenantQueue(tenant: Dict) -> TenantQueue:
+    """Create an empty (not yet prepared) queue for a tenant manifest entry."""
+    return TenantQueue(
+        tenant["name"],
+        tenant["folderPrefix"],
+        parseWorkspaces(tenant.get("workspaces", "")),
+        int(tenant.get("concurrency", DEFAULT_TENANT_CONCURRENCY)),
+        float(tenant.get("weight", DEFAULT_TENANT_WEIGHT)),
+    )
+
+
+def prepareTenant(queue: TenantQueue, tenant: Dict, env: Dict[str, str], existing: Set[Tuple[str, str]], state: Dict, includedFileTypes: List[str], validateSchemas: bool, scrubConfig: Optional[Dict] = None) -> None:
+    """
+    Fill one tenant's upload queue in upload order.
+
+    Args:
+        queue: The tenant's queue (files, oversized files and live status documents are added to it)
+        tenant: Tenant manifest entry
+        env: Environment variables
+        existing: (folder, name) pairs already on the server
+        state: Import state (content hashes and locations of earlier uploads)
+        includedFileTypes: File extensions to include
+        validateSchemas: Skip files that fail schema validation
+        scrubConfig: PII scrub configuration (piiScrubber.loadScrubConfig), None to upload files as they are
+    """
+    bundle = isBundle(tenant["filePath"])
+    if not bundle and (not os.path.isdir(tenant["filePath"]) or not any(os.scandir(tenant["filePath"]))):
+        print(f"[{queue.name}] Skipping: {tenant['filePath']} is missing or empty")
+        return
+
+    # Files over the upload limit are split later instead of being sent whole
+    oversizedFiles: Optional[List[Tuple[str, str]]] = [] if env.get("SPLIT_LARGE_FILES", "true").lower() == 'true' else None
+    allFiles = buildFileListWithFolders(tenant["filePath"], tenant.get("recursive", True), False, 0, includedFileTypes, oversizedFiles, queue.oversizedContents)
+    # Same rule as removeUnchanged: tracked files by content hash, untracked ones by name in the tenant's folder
+    filesToUpload = {
+        path: (content, folder) for path, (content, folder) in allFiles.items()
+        if (hasChanged(state, path, content) if path in state["files"]
+            else (tenantFolder(queue.folderPrefix, folder), os.path.basename(path)) not in existing)
+    }
+    queue.sourceHashes = {path: contentHash(content) for path, (content, folder) in filesToUpload.items()}
+    queue.oversized = oversizedFiles or []
+
+    # Same split as a single-tenant import: live status from every file, stable fields only in the uploads
+    partitionFields = env.get("PARTITION_FIELDS", "false").lower() == 'true'
+    if partitionFields:
+        from fieldPartitioner import buildLiveDocuments
+        for key, (content, folder) in buildLiveDocuments(allFiles).items():
+            queue.live[f"{tenantFolder(queue.folderPrefix, folder)}/{os.path.basename(key)}"] = (content, tenantFolder(queue.folderPrefix, folder))
+
+    if scrubConfig:
+        from piiScrubber import scrubFiles
+        filesToUpload, scrubStats = scrubFiles(filesToUpload, scrubConfig, int(env.get("PII_WORKERS", 0) or 0))
+        print(f"[{queue.name}] PII scrub: {scrubStats['files']} of {len(filesToUpload)} files changed")
+
+    if validateSchemas and filesToUpload:
+        from schemaValidators import validateFiles
+        summary = validateFiles([(path, sourceFolderName(folder)) for path, (content, folder) in filesToUpload.items()], int(env.get("VALIDATION_WORKERS", 0) or 0),
+                                contents={path: content for path, (content, folder) in filesToUpload.items()})
+        invalidFiles = {path for folder in summary.values() for path in folder["invalid"]}
+        if invalidFiles:
+            print(f"[{queue.name}] Skipping {len(invalidFiles)} files that failed validation")
+            filesToUpload = {path: value for path, value in filesToUpload.items() if path not in invalidFiles}
+
+    if partitionFields:
+        from fieldPartitioner import stripVolatileFields
+        filesToUpload = stripVolatileFields(filesToUpload)
+
+    # Usual in-tenant order, using the unprefixed folder names for priorities
+    priorities = parseFolderPriorities(tenant.get("folderPriorities", env.get("FOLDER_PRIORITIES", "")))
+    schedule = [(path, content, tenantFolder(queue.folderPrefix, folder), workspaces) for path, content, folder, workspaces in scheduleUploads(filesToUpload, {}, priorities, state)]
+    queue.files.extend((path, content, folder) for path, content, folder, workspaces in schedule)
+
+    # Edited files replace their earlier server copies once the new version is up
+    tenantFolders = {folder for path, content, folder, workspaces in schedule}
+    queue.previous = previousLocations(schedule, state, [name for folder, name in existing if folder in tenantFolders], env.get("ANYTHINGLLM_URL", ""), env.get("ANYTHINGLLM_API_KEY", ""))
+
+
+def runFairUploads(tenants: List[TenantQueue], serverUrl: str, apiKey: str, maxConcurrent: int, quantum: int, state: Dict, statePath: str,
+                   prepare: Optional[Callable[[TenantQueue], None]] = None, prepareWorkers: int = DEFAULT_TENANT_PREPARE_WORKERS) -> None:
+    """
+    Upload every tenant's queue through one shared pool with deficit round-robin fairness.
+
+    Args:
+        tenants: Tenant queues (emptied as files are dispatched)
+        serverUrl: AnythingLLM server URL
+        apiKey: API key for authentication
+        maxConcurrent: Uploads in flight across all tenants
+        quantum: Credit in bytes added per visit (scaled by tenant weight)
+        state: Import state, updated as files upload
+        statePath: Where to save the import state
+        prepare: Fills a tenant's queue - run in the background, each tenant joins once its queue is ready
+        prepareWorkers: Tenants prepared at the same time
+    """
+    condition = threading.Condition()
+    inFlight = [0]
+    completed = [0]
+    replaced: List[Dict[str, str]] = []
+    started = time.monotonic()
+
+    def prepared(tenant: TenantQueue, future: Future) -> None:
+        if future.exception():
+            print(f"[{tenant.name}] Preparation failed: {future.exception()}")
+            tenant.files.clear()
+        with condition:
+            tenant.ready = True
+            condition.notify_all()
+
+    preparePool = ThreadPoolExecutor(max_workers=max(1, prepareWorkers)) if prepare else None
+    for tenant in tenants:
+        if preparePool:
+            preparePool.submit(prepare, tenant).add_done_callback(lambda future, tenant=tenant: prepared(tenant, future))
+        else:
+            tenant.ready = True
+
+    def upload(tenant: TenantQueue, filePath: str, content: bytes, folder: str) -> None:
+        locations = None
+        try:
+            locations = uploadSingleFile(os.path.basename(filePath), content, folder, serverUrl, apiKey, tenant.workspaces)
+        finally:
+            with condition:
+                tenant.inFlight -= 1
+                inFlight[0] -= 1
+                if locations is not None:
+                    tenant.uploaded += 1
+                    tenant.bytesUploaded += len(content)
+                    tenant.locations.extend(locations)
+                    recordUpload(state, filePath, content, locations, tenant.sourceHashes.get(filePath))
+                    replaced.extend({"name": location} for location in tenant.previous.get(filePath, []))
+                    completed[0] += 1
+                    if completed[0] % 25 == 0:
+                        saveState(state, statePath)
+                        print(f"Progress: {completed[0]} files uploaded across {len(tenants)} tenants...")
+                else:
+                    tenant.failed += 1
+                if not tenant.files and tenant.inFlight == 0:
+                    tenant.finishedAt = time.monotonic() - started
+                condition.notify_all()
+
+    with ThreadPoolExecutor(max_workers=maxConcurrent) as executor:
+        rotation = 0
+        while True:
+            with condition:
+                active = [tenant for tenant in tenants if tenant.ready and tenant.files]
+                if not active:
+                    if all(tenant.ready for tenant in tenants):
+                        break
+                    condition.wait()
+                    continue
+
+                # Start each pass at the next tenant so no one is always first
+                rotation = (rotation + 1) % len(active)
+                dispatched = False
+                for tenant in active[rotation:] + active[:rotation]:
+                    if inFlight[0] >= maxConcurrent:
+                        break
+                    if tenant.inFlight >= tenant.concurrency:
+                        continue
+
+                    tenant.deficit += quantum * tenant.weight
+                    while tenant.files and tenant.inFlight < tenant.concurrency and inFlight[0] < maxConcurrent:
+                        filePath, content, folder = tenant.files[0]
+                        if len(content) > tenant.deficit:
+                            break
+                        tenant.files.popleft()
+                        tenant.deficit -= len(content)
+                        tenant.inFlight += 1
+                        inFlight[0] += 1
+                        if not tenant.startedAt:
+                            tenant.startedAt = time.monotonic() - started
+                        executor.submit(upload, tenant, filePath, content, folder)
+                        dispatched = True
+
+                    # Idle tenants don't bank credit
+                    if not tenant.files:
+                        tenant.deficit = 0.0
+
+                blocked = inFlight[0] >= maxConcurrent or all(tenant.inFlight >= tenant.concurrency for tenant in active)
+                if not dispatched and blocked:
+                    condition.wait()
+
+    if preparePool:
+        preparePool.shutdown()
+    saveState(state, statePath)
+    removeReplaced(replaced, serverUrl, apiKey)
+
+
+def uploadOversizedFiles(tenants: List[TenantQueue], existing: Set[Tuple[str, str]], serverUrl: str, apiKey: str, maxConcurrent: int, partBytes: int, scrubConfig: Optional[Dict] = None,
+                         state: Optional[Dict] = None, statePath: Optional[str] = None) -> None:
+    """
+    Split and upload every tenant's oversized files, one tenant per worker.
+
+    Args:
+        tenants: Prepared tenant queues
+        existing: (folder, name) pairs already on the server
+        serverUrl: AnythingLLM server URL
+        apiKey: API key for authentication
+        maxConcurrent: Tenants splitting at the same time
+        partBytes: Maximum size of each part
+        scrubConfig: PII scrub configuration applied to each part
+        state: Import state holding the part hashes (changed parts replace their old versions)
+        statePath: Where to save the state once every tenant is done
+    """
+    from fileSplitter import uploadSplitFiles
+
+    def uploadTenant(tenant: TenantQueue) -> None:
+        folders = {folder: tenantFolder(tenant.folderPrefix, folder) for path, folder in tenant.oversized}
+        existingNames = {name for folder, name in existing if folder in folders.values()}
+        locations = uploadSplitFiles(tenant.oversized, existingNames, {folder: ",".join(tenant.workspaces) for folder in folders}, serverUrl, apiKey, partBytes,
+                                     scrubConfig=scrubConfig, uploadFolders=folders, contents=tenant.oversizedContents, state=state)
+        tenant.uploaded += len(locations)
+        tenant.locations.extend(locations)
+
+    withOversized = [tenant for tenant in tenants if tenant.oversized]
+    if not withOversized:
+        return
+    print(f"Splitting oversized files for {len(withOversized)} tenants")
+    with ThreadPoolExecutor(max_workers=max(1, min(maxConcurrent, len(withOversized)))) as executor:
+        list(executor.map(uploadTenant, withOversized))
+    if state is not None and statePath:
+        saveState(state, statePath)
+
+
+def printTenantSummary(tenants: List[TenantQueue]) -> None:
+    """Print per-tenant upload results."""
+    print(f"\n{'Tenant':<20} {'Uploaded':>9} {'Failed':>7} {'MB':>8} {'Started':>8} {'Done':>8}")
+    for tenant in tenants:
+        print(f"{tenant.name:<20} {tenant.uploaded:>9} {tenant.failed:>7} {tenant.bytesUploaded / 1024 / 1024:>8.2f} {tenant.startedAt:>7.1f}s {tenant.finishedAt:>7.1f}s")
+
+
+def runTenantImport(env: Dict[str, str], dryRun: bool) -> None:
+    """
+    Import every tenant in TENANT_MANIFEST.
+
+    Args:
+        env: Environment variables
+        dryRun: Only report what each tenant would upload
+    """
+    serverUrl = env.get("ANYTHINGLLM_URL")
+    apiKey = env.get("ANYTHINGLLM_API_KEY")
+    manifestPath = env["TENANT_MANIFEST"]
+
+    if not serverUrl or not os.path.exists(manifestPath):
+        print(f"Error, tenant import needs ANYTHINGLLM_URL and a manifest\nserverURL: {serverUrl}\nTENANT_MANIFEST: {manifestPath}")
+        return
+
+    tenantConfigs = loadManifest(manifestPath)
+    print(f"Tenant manifest: {len(tenantConfigs)} tenants")
+
+    includedFileTypes = env.get("INCLUDED_FILE_TYPES", "txt,json,xml,csv").split(",")
+    validateSchemas = env.get("VALIDATE_SCHEMAS", "true").lower() == 'true'
+    statePath = env.get("IMPORT_STATE_FILE", DEFAULT_STATE_FILE)
+    state = loadState(statePath)
+    existing = buildExistingFilesByFolder(serverUrl, apiKey)
+
+    scrubConfig = None
+    if env.get("PII_SCRUB", "false").lower() == 'true':
+        from piiScrubber import loadScrubConfig
+        try:
+            scrubConfig = loadScrubConfig(env)
+        except ValueError as e:
+            print(f"Error: {e}")
+            return
+
+    tenants = [createTenantQueue(tenant) for tenant in tenantConfigs]
+    configs = {id(queue): tenant for queue, tenant in zip(tenants, tenantConfigs)}
+    prepareWorkers = int(env.get("TENANT_PREPARE_WORKERS", DEFAULT_TENANT_PREPARE_WORKERS))
+
+    def prepare(queue: TenantQueue) -> None:
+        prepareTenant(queue, configs[id(queue)], env, existing, state, includedFileTypes, validateSchemas, scrubConfig)
+        print(f"[{queue.name}] {len(queue.files)} files to upload ({sum(len(content) for path, content, folder in queue.files)} bytes), "
+              f"{len(queue.oversized)} oversized files to split, concurrency {queue.concurrency}, weight {queue.weight:g}, workspaces: {', '.join(queue.workspaces) or 'none'}")
+        if dryRun:
+            return
+        folders = extractFolderStructure({path: (content, folder) for path, content, folder in queue.files})
+        folders += sorted({tenantFolder(queue.folderPrefix, folder) for path, folder in queue.oversized} - set(folders))
+        folders += sorted({folder for content, folder in queue.live.values()} - set(folders))
+        createFolderStructure(folders, serverUrl, apiKey)
+        ensureShardWorkspaces(queue.workspaces, serverUrl, apiKey)
+
+    if dryRun:
+        with ThreadPoolExecutor(max_workers=max(1, prepareWorkers)) as executor:
+            list(executor.map(prepare, tenants))
+        print("Dry run enabled - nothing uploaded.")
+        return
+
+    maxConcurrent = int(env.get("MAX_CONCURRENT_UPLOADS", DEFAULT_MAX_CONCURRENT_UPLOADS))
+    quantum = int(env.get("FAIR_QUANTUM_BYTES", DEFAULT_FAIR_QUANTUM_BYTES))
+    runFairUploads(tenants, serverUrl, apiKey, maxConcurrent, quantum, state, statePath, prepare, prepareWorkers)
+
+    from fileSplitter import DEFAULT_PART_BYTES
+    uploadOversizedFiles(tenants, existing, serverUrl, apiKey, maxConcurrent, int(env.get("SPLIT_PART_BYTES", 0) or 0) or DEFAULT_PART_BYTES, scrubConfig, state, statePath)
+
+    # Live status documents are replaced by content hash, like in a single-tenant import
+    from fieldPartitioner import uploadDerivedDocuments
+    for tenant in tenants:
+        if tenant.live:
+            existingNames = [name for folder, name in existing if folder in {liveFolder for content, liveFolder in tenant.live.values()}]
+            workspaces = ",".join(tenant.workspaces)
+            locations = uploadDerivedDocuments(tenant.live, existingNames, {folder: workspaces for content, folder in tenant.live.values()}, serverUrl, apiKey, state, statePath,
+                                               label=f"[{tenant.name}] Live status")
+            tenant.uploaded += len(locations)
+            tenant.locations.extend(locations)
+    printTenantSummary(tenants)
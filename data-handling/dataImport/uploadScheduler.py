@@ -0,0 +1,230 @@
+"""
+Priority-Aware Upload Scheduler for WWIZ
+
+Orders upload work so the most valuable documents land in the knowledge
+base first, and stops cleanly when a wall-clock budget runs out.
+
+Ordering:
+1. Per-folder priority (FOLDER_PRIORITIES, highest first)
+2. Changed files before new ones (content hash vs. the import state) -
+   a stale copy answers questions wrongly, a missing one not at all
+3. Smallest files first
+
+A changed file replaces its previous version: the new copy is uploaded
+first and the old one removed afterwards, so there is never a gap.
+
+Anything not uploaded before MAX_RUNTIME seconds is written to a
+deferred report so the next run knows what is still missing.
+"""
+
+import json
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+from fieldPartitioner import findServerLocations
+from importFiles import parseWorkspaces, uploadSingleFile
+from importState import recordUpload, saveState
+from workspaceShards import sourceFolderName
+
+# Default priorities - HRIS and project data are what most questions need first
+DEFAULT_FOLDER_PRIORITIES: Dict[str, int] = {
+    "employmentHero-staff": 100,
+    "jira-projectSummary": 90,
+    "entraAd-user": 70,
+    "jira-userStats": 60,
+    "confluence-spacesSummary": 60,
+    "googleCloudIdentity-user": 50,
+    "confluence-userStats": 50,
+    "calendar-availabilitySummary": 40,
+    "teams-userActivitySummary": 30,
+    "slack-userActivitySummary": 20,
+}
+
+# Priority for folders not listed
+DEFAULT_PRIORITY = 10
+
+# Default deferred report location, overridable with DEFERRED_REPORT
+DEFAULT_DEFERRED_REPORT = os.path.join("data-handling", "dataImport", "importDeferred.json")
+
+# A scheduled upload: (filePath, fileContent, targetFolder, workspaces)
+ScheduledUpload = Tuple[str, bytes, str, str]
+
+
+def parseFolderPriorities(folderPriorities: str) -> Dict[str, int]:
+    """
+    Parse a FOLDER_PRIORITIES value, layered over the defaults.
+
+    Format: "employmentHero-staff=100,jira-projectSummary=90"
+
+    Args:
+        folderPriorities: FOLDER_PRIORITIES string from the env file
+
+    Returns:
+        Dictionary mapping folder names to priorities
+    """
+    priorities = dict(DEFAULT_FOLDER_PRIORITIES)
+
+    for entry in (folderPriorities or "").split(","):
+        if "=" not in entry:
+            continue
+        folder, priority = entry.split("=", 1)
+        try:
+            priorities[folder.strip()] = int(priority)
+        except ValueError:
+            print(f"Ignoring invalid priority for {folder.strip()}: {priority}")
+
+    return priorities
+
+
+def scheduleUploads(filesToUpload: Dict[str, Tuple[bytes, str]], fileWorkspaces: Dict[str, str], priorities: Dict[str, int], state: Dict) -> List[ScheduledUpload]:
+    """
+    Order files by folder priority, then changed-before-new, then smallest-first.
+
+    Args:
+        filesToUpload: Dictionary of files with content and target folders
+        fileWorkspaces: File path -> comma-separated workspaces for that file
+        priorities: Folder -> priority mapping
+        state: Import state (scheduled files it already knows are changed ones)
+
+    Returns:
+        Ordered list of scheduled uploads
+    """
+    def sortKey(item: Tuple[str, Tuple[bytes, str]]) -> Tuple[int, int, int, str]:
+        filePath, (content, targetFolder) = item
+        priority = priorities.get(sourceFolderName(targetFolder), DEFAULT_PRIORITY)
+        changed = filePath in state["files"]
+        return (-priority, 0 if changed else 1, len(content), filePath)
+
+    ordered = sorted(filesToUpload.items(), key=sortKey)
+    return [(filePath, content, targetFolder, fileWorkspaces.get(filePath, "")) for filePath, (content, targetFolder) in ordered]
+
+
+def previousLocations(schedule: List[ScheduledUpload], state: Dict, existingFiles: List[str], serverUrl: str, apiKey: str) -> Dict[str, List[str]]:
+    """
+    Find the server copies that scheduled files replace.
+
+    Server copies the state has no locations for (uploaded before it kept
+    them) are looked up by name.
+
+    Args:
+        schedule: Scheduled uploads
+        state: Import state (locations of earlier uploads)
+        existingFiles: File names already on the server
+        serverUrl: AnythingLLM server URL
+        apiKey: API key for authentication
+
+    Returns:
+        File path -> document locations to remove once the new version is uploaded
+    """
+    existing = set(existingFiles)
+    untracked = [os.path.basename(filePath) for filePath, content, folder, workspaces in schedule
+                 if os.path.basename(filePath) in existing and not state["files"].get(filePath, {}).get("locations")]
+    serverLocations = findServerLocations(untracked, serverUrl, apiKey) if untracked else {}
+
+    previous: Dict[str, List[str]] = {}
+    for filePath, content, folder, workspaces in schedule:
+        # Untracked copies only count in the file's own folder - other folders can hold the same name
+        locations = state["files"].get(filePath, {}).get("locations") or [location for location in serverLocations.get(os.path.basename(filePath), []) if location.startswith(f"{folder}/")]
+        if locations:
+            previous[filePath] = locations
+    return previous
+
+
+def runScheduledUploads(schedule: List[ScheduledUpload], serverUrl: str, apiKey: str, maxRuntime: float, state: Dict, statePath: str, existingFiles: Optional[List[str]] = None, sourceHashes: Optional[Dict[str, str]] = None) -> Tuple[List[str], List[ScheduledUpload]]:
+    """
+    Upload scheduled files in order until the work or the time budget runs out.
+
+    Files already on the server are replaced: their old versions are removed
+    once the new ones are uploaded.
+
+    Args:
+        schedule: Ordered list of scheduled uploads
+        serverUrl: AnythingLLM server URL
+        apiKey: API key for authentication
+        maxRuntime: Wall-clock budget in seconds (0 for no limit)
+        state: Import state, updated as files upload
+        statePath: Where to save the import state
+        existingFiles: File names already on the server
+        sourceHashes: File path -> hash to record (as de-duplicated, before upload-only changes)
+
+    Returns:
+        Tuple of (document locations for embedding, deferred uploads)
+    """
+    deadline: Optional[float] = time.monotonic() + maxRuntime if maxRuntime > 0 else None
+    result: List[str] = []
+    replaced: List[Dict[str, str]] = []
+    uploadCount = 0
+    totalFiles = len(schedule)
+
+    previousVersions = previousLocations(schedule, state, existingFiles or [], serverUrl, apiKey)
+
+    if deadline:
+        print(f"Upload time budget: {maxRuntime:.0f} seconds")
+
+    for index, (filePath, fileContent, targetFolder, workspaces) in enumerate(schedule):
+        if deadline and time.monotonic() >= deadline:
+            print(f"Time budget reached after {uploadCount} uploads - deferring {totalFiles - index} files")
+            saveState(state, statePath)
+            removeReplaced(replaced, serverUrl, apiKey)
+            return result, schedule[index:]
+
+        filename = os.path.basename(filePath)
+        locations = uploadSingleFile(filename, fileContent, targetFolder, serverUrl, apiKey, parseWorkspaces(workspaces))
+
+        if locations is not None:
+            uploadCount += 1
+            result.extend(locations)
+            replaced.extend({"name": location} for location in previousVersions.get(filePath, []))
+            recordUpload(state, filePath, fileContent, locations, (sourceHashes or {}).get(filePath))
+            print(f"Uploaded: {filename} ({uploadCount}/{totalFiles}) - Size: {len(fileContent)} bytes")
+
+        if uploadCount % 25 == 0 and uploadCount > 0:
+            print(f"Progress: {uploadCount}/{totalFiles} files uploaded...")
+            saveState(state, statePath)
+
+    saveState(state, statePath)
+    removeReplaced(replaced, serverUrl, apiKey)
+    print(f"Upload complete. Successfully uploaded {uploadCount} out of {totalFiles} files.")
+    return result, []
+
+
+def removeReplaced(replaced: List[Dict[str, str]], serverUrl: str, apiKey: str) -> None:
+    """Delete the old versions of re-uploaded files (after the state is saved)."""
+    if not replaced:
+        return
+    from cleanupDocuments import deleteDocuments
+    print(f"Removing {len(replaced)} replaced document versions")
+    deleteDocuments(serverUrl, apiKey, replaced)
+
+
+def writeDeferredReport(deferred: List[ScheduledUpload], reportPath: str = DEFAULT_DEFERRED_REPORT) -> None:
+    """
+    Print and save the list of files deferred to the next run.
+
+    Args:
+        deferred: Scheduled uploads that were not attempted
+        reportPath: Where to write the JSON report
+    """
+    byFolder: Dict[str, List[str]] = {}
+    for filePath, content, targetFolder, workspaces in deferred:
+        byFolder.setdefault(targetFolder or "root", []).append(os.path.basename(filePath))
+
+    report = {
+        "generatedAt": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "deferredFiles": len(deferred),
+        "deferredBytes": sum(len(content) for filePath, content, targetFolder, workspaces in deferred),
+        "folders": {folder: sorted(files) for folder, files in sorted(byFolder.items())},
+    }
+
+    with open(reportPath, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    if not deferred:
+        print("Nothing deferred - all scheduled files were processed.")
+        return
+
+    print(f"Deferred to next run: {len(deferred)} files ({report['deferredBytes']} bytes)")
+    for folder, files in report["folders"].items():
+        print(f"  {folder}: {len(files)} files")
+    print(f"Deferred report written to {reportPath}")
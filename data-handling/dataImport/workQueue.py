@@ -0,0 +1,473 @@
+#!/usr/bin/env python3
+"""
+Durable Work Queue for Parallel WWIZ Imports
+
+Splits an import into a planner and any number of workers that share one
+SQLite queue file:
+
+- Planner: importFiles.py with WORK_QUEUE set does discovery, de-duplication,
+  scrubbing, validation, field stripping, sharding and ordering as usual, then
+  enqueues one work item per file instead of uploading. Items carry the
+  prepared content, so workers upload exactly what a direct run would
+- Workers: `workQueue.py work` claims items with a lease, uploads them,
+  removes the versions they replace and records the result. Leases are
+  renewed while an item is being worked on (long splits included); a worker
+  that dies leaves its lease to expire and the item is picked up again;
+  failures are retried with back-off up to MAX_ATTEMPTS
+- Finished items are written back to the import state (.importState.json)
+  after `work` and before the next plan, so later runs de-duplicate them.
+  Split items record their part hashes the same way, and an oversized file
+  that changed is queued again so only its changed parts are replaced
+
+Each claim is a single UPDATE ... RETURNING statement, so two workers can
+never hold the same item, and items are keyed by path so re-planning the
+same tree never enqueues a file twice (changed files are re-queued).
+
+The queue runs in WAL mode so readers and the claiming writer don't block
+each other. WAL needs shared memory, so workers on other hosts must use a
+queue file on a filesystem with working locks and WORK_QUEUE_JOURNAL=delete.
+
+Usage:
+    python data-handling/dataImport/importFiles.py                   # with WORK_QUEUE set: plan
+    python data-handling/dataImport/workQueue.py work --workers 4     # upload
+    python data-handling/dataImport/workQueue.py status
+    python data-handling/dataImport/workQueue.py retry-failed
+"""
+
+import hashlib
+import json
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from multiprocessing import Process
+from typing import Dict, List, Optional, Tuple
+
+from importState import DEFAULT_STATE_FILE, contentHash, loadState, saveState
+
+# Seconds a claimed item belongs to a worker before others may take it over
+DEFAULT_LEASE_SECONDS = 300
+
+# Attempts before an item is marked failed
+DEFAULT_MAX_ATTEMPTS = 5
+
+# Retry back-off: BACKOFF_SECONDS * 2^(attempt - 1)
+BACKOFF_SECONDS = 5
+
+# Idle workers poll this often while other workers still hold leases
+POLL_SECONDS = 2
+
+# Columns added after the first release - older queue files get them on open
+ADDED_COLUMNS = {"content": "BLOB", "replaces": "TEXT", "parts": "TEXT"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    kind TEXT NOT NULL DEFAULT 'file',
+    folder TEXT NOT NULL,
+    workspaces TEXT NOT NULL DEFAULT '',
+    hash TEXT,
+    size INTEGER NOT NULL DEFAULT 0,
+    priority INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    availableAt REAL NOT NULL DEFAULT 0,
+    leaseOwner TEXT,
+    leaseExpires REAL,
+    result TEXT,
+    error TEXT,
+    updatedAt REAL NOT NULL,
+    content BLOB,
+    replaces TEXT,
+    parts TEXT
+);
+CREATE INDEX IF NOT EXISTS itemsClaim ON items (status, priority, id);
+"""
+
+
+def connect(queuePath: str, journalMode: str = "wal") -> sqlite3.Connection:
+    """
+    Open (and create if needed) the queue database.
+
+    Args:
+        queuePath: SQLite file path
+        journalMode: "wal" for one host, "delete" when workers on other hosts share the file
+
+    Returns:
+        Connection in autocommit mode
+    """
+    folder = os.path.dirname(queuePath)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+
+    connection = sqlite3.connect(queuePath, timeout=30, isolation_level=None)
+    connection.row_factory = sqlite3.Row
+    connection.execute(f"PRAGMA journal_mode={journalMode}")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.execute("PRAGMA busy_timeout=30000")
+    connection.executescript(SCHEMA)
+    columns = {row["name"] for row in connection.execute("PRAGMA table_info(items)")}
+    for column, columnType in ADDED_COLUMNS.items():
+        if column not in columns:
+            connection.execute(f"ALTER TABLE items ADD COLUMN {column} {columnType}")
+    return connection
+
+
+def enqueueSchedule(queuePath: str, schedule: List[Tuple[str, bytes, str, str]], oversizedFiles: List[Tuple[str, str, str]], journalMode: str = "wal",
+                    sourceHashes: Optional[Dict[str, str]] = None, replaces: Optional[Dict[str, List[str]]] = None) -> Dict[str, int]:
+    """
+    Enqueue a planned import.
+
+    New paths are added, paths whose content changed since they were queued
+    are reset to pending, and everything else is left alone.
+
+    Args:
+        queuePath: SQLite file path
+        schedule: Ordered (filePath, content, targetFolder, workspaces) uploads - content as it is to be uploaded
+        oversizedFiles: (filePath, targetFolder, workspaces) files for the splitter
+        journalMode: SQLite journal mode
+        sourceHashes: File path -> hash the import state records (as de-duplicated, before upload-only changes)
+        replaces: File path -> server locations the upload replaces (uploadScheduler.previousLocations)
+
+    Returns:
+        Counts of added/requeued/unchanged items
+    """
+    connection = connect(queuePath, journalMode)
+    now = time.time()
+    counts = {"added": 0, "requeued": 0, "unchanged": 0}
+    sourceHashes = sourceHashes or {}
+    replaces = replaces or {}
+
+    rows = [(path, "file", folder, workspaces, sourceHashes.get(path) or contentHash(content), len(content), priority, content, json.dumps(replaces.get(path, [])))
+            for priority, (path, content, folder, workspaces) in enumerate(schedule)]
+    # Split jobs go last so a long split doesn't hold up the small files; their hash re-queues a changed file
+    rows += [(path, "split", folder, workspaces, fileHash(path), os.path.getsize(path), len(schedule) + index, None, None)
+             for index, (path, folder, workspaces) in enumerate(oversizedFiles)]
+
+    connection.execute("BEGIN IMMEDIATE")
+    try:
+        for path, kind, folder, workspaces, hashValue, size, priority, content, replaced in rows:
+            existing = connection.execute("SELECT hash, status FROM items WHERE path = ?", (path,)).fetchone()
+            if existing is None:
+                connection.execute(
+                    "INSERT INTO items (path, kind, folder, workspaces, hash, size, priority, content, replaces, updatedAt) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (path, kind, folder, workspaces, hashValue, size, priority, content, replaced, now))
+                counts["added"] += 1
+            elif existing["status"] != "leased" and (existing["hash"] != hashValue or existing["status"] == "failed"):
+                connection.execute(
+                    "UPDATE items SET kind = ?, folder = ?, workspaces = ?, hash = ?, size = ?, priority = ?, content = ?, replaces = ?, status = 'pending', "
+                    "attempts = 0, availableAt = 0, error = NULL, updatedAt = ? WHERE path = ?",
+                    (kind, folder, workspaces, hashValue, size, priority, content, replaced, now, path))
+                counts["requeued"] += 1
+            else:
+                counts["unchanged"] += 1
+        connection.execute("COMMIT")
+    except Exception:
+        connection.execute("ROLLBACK")
+        raise
+    finally:
+        connection.close()
+
+    print(f"Queued in {queuePath}: {counts['added']} new, {counts['requeued']} re-queued, {counts['unchanged']} already queued")
+    return counts
+
+
+def fileHash(filePath: str) -> str:
+    """Hash a file in chunks, like importState.contentHash would its whole content."""
+    digest = hashlib.sha1()
+    with open(filePath, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def claimItem(connection: sqlite3.Connection, workerId: str, leaseSeconds: float) -> Optional[sqlite3.Row]:
+    """
+    Atomically claim the next available item.
+
+    Pending items whose back-off has passed and leased items whose lease has
+    expired are both eligible.
+
+    Args:
+        connection: Queue connection
+        workerId: Unique worker id (lease owner)
+        leaseSeconds: Lease length
+
+    Returns:
+        The claimed row, or None if nothing is available
+    """
+    now = time.time()
+    return connection.execute(
+        """
+        UPDATE items
+        SET status = 'leased', leaseOwner = ?, leaseExpires = ?, attempts = attempts + 1, updatedAt = ?
+        WHERE id = (
+            SELECT id FROM items
+            WHERE (status = 'pending' AND availableAt <= ?) OR (status = 'leased' AND leaseExpires < ?)
+            ORDER BY priority, id
+            LIMIT 1
+        )
+        RETURNING id, path, kind, folder, workspaces, attempts, content, replaces
+        """,
+        (workerId, now + leaseSeconds, now, now, now),
+    ).fetchone()
+
+
+def renewLease(connection: sqlite3.Connection, itemId: int, workerId: str, leaseSeconds: float) -> bool:
+    """
+    Extend a lease this worker holds.
+
+    Returns:
+        False if the lease was already lost to another worker
+    """
+    cursor = connection.execute(
+        "UPDATE items SET leaseExpires = ? WHERE id = ? AND leaseOwner = ? AND status = 'leased'",
+        (time.time() + leaseSeconds, itemId, workerId))
+    return cursor.rowcount == 1
+
+
+def holdLease(queuePath: str, journalMode: str, itemId: int, workerId: str, leaseSeconds: float, stop: threading.Event) -> None:
+    """Renew a lease every third of its length until stopped (runs beside a long upload)."""
+    connection = connect(queuePath, journalMode)
+    try:
+        while not stop.wait(leaseSeconds / 3):
+            if not renewLease(connection, itemId, workerId, leaseSeconds):
+                break
+    finally:
+        connection.close()
+
+
+def completeItem(connection: sqlite3.Connection, item: sqlite3.Row, workerId: str, locations: List[str], hashValue: Optional[str], parts: Optional[Dict] = None) -> bool:
+    """
+    Record a successful upload, if this worker still holds the lease.
+
+    Returns:
+        False if the lease was lost to another worker
+    """
+    cursor = connection.execute(
+        "UPDATE items SET status = 'done', result = ?, hash = COALESCE(?, hash), parts = ?, error = NULL, leaseOwner = NULL, leaseExpires = NULL, updatedAt = ? "
+        "WHERE id = ? AND leaseOwner = ? AND status = 'leased'",
+        (json.dumps(locations), hashValue, json.dumps(parts) if parts is not None else None, time.time(), item["id"], workerId))
+    return cursor.rowcount == 1
+
+
+def failItem(connection: sqlite3.Connection, item: sqlite3.Row, workerId: str, error: str, maxAttempts: int) -> None:
+    """Release a failed item for retry with back-off, or mark it failed for good."""
+    final = item["attempts"] >= maxAttempts
+    connection.execute(
+        "UPDATE items SET status = ?, error = ?, availableAt = ?, leaseOwner = NULL, leaseExpires = NULL, updatedAt = ? "
+        "WHERE id = ? AND leaseOwner = ? AND status = 'leased'",
+        ("failed" if final else "pending", error, time.time() + BACKOFF_SECONDS * 2 ** (item["attempts"] - 1), time.time(), item["id"], workerId))
+
+
+def processItem(item: sqlite3.Row, serverUrl: str, apiKey: str, splitPartBytes: int, scrubConfig: Optional[Dict] = None,
+                statePath: str = DEFAULT_STATE_FILE) -> Tuple[Optional[List[str]], Optional[str], str, Optional[Dict]]:
+    """
+    Upload one queued item and remove the versions it replaces.
+
+    File items carry the content the planner prepared. Items queued without
+    it (older queue files) are re-read from disk and scrubbed (scrubConfig)
+    here, as are the oversized files the splitter streams. Split items start
+    from the part hashes in the import state (read only - workers never
+    write it) and return the file's new part record.
+
+    Returns:
+        Tuple of (locations or None on failure, content hash to record (None keeps the queued one),
+        error message, part record for the import state (split items only))
+    """
+    from importFiles import buildExistingFileList, parseWorkspaces, uploadSingleFile
+
+    if item["kind"] == "split":
+        if not os.path.exists(item["path"]):
+            return None, None, "file no longer exists", None
+        from fileSplitter import uploadSplitFiles, SPLIT_STATE_KEY
+        existingFiles = set(buildExistingFileList(serverUrl, apiKey))
+        previous = loadState(statePath).get(SPLIT_STATE_KEY, {}).get(item["path"])
+        splitState: Dict = {"files": {}, SPLIT_STATE_KEY: {item["path"]: previous} if previous else {}}
+        locations = uploadSplitFiles([(item["path"], item["folder"])], existingFiles, {item["folder"]: item["workspaces"]}, serverUrl, apiKey, splitPartBytes,
+                                     scrubConfig=scrubConfig, state=splitState)
+        return locations, None, "", splitState[SPLIT_STATE_KEY].get(item["path"])
+
+    content = item["content"]
+    hashValue = None
+    if content is None:
+        if not os.path.exists(item["path"]):
+            return None, None, "file no longer exists"
+        with open(item["path"], "rb") as f:
+            content = f.read()
+        if scrubConfig:
+            from piiScrubber import scrubContent
+            content = scrubContent(content, item["folder"], scrubConfig)
+        hashValue = contentHash(content)
+
+    locations = uploadSingleFile(os.path.basename(item["path"]), content, item["folder"], serverUrl, apiKey, parseWorkspaces(item["workspaces"]))
+    if locations is not None and item["replaces"]:
+        from uploadScheduler import removeReplaced
+        removeReplaced([{"name": location} for location in json.loads(item["replaces"])], serverUrl, apiKey)
+    return locations, hashValue, "upload failed", None
+
+
+def syncImportState(queuePath: str, statePath: str = DEFAULT_STATE_FILE, journalMode: str = "wal") -> int:
+    """
+    Copy finished file items into the import state, like a direct upload would record them.
+
+    Args:
+        queuePath: SQLite file path
+        statePath: Import state file
+        journalMode: SQLite journal mode
+
+    Returns:
+        Number of state entries written
+    """
+    if not os.path.exists(queuePath):
+        return 0
+    from fileSplitter import SPLIT_STATE_KEY
+
+    connection = connect(queuePath, journalMode)
+    rows = connection.execute("SELECT path, kind, hash, result, parts, updatedAt FROM items WHERE status = 'done' AND "
+                              "((kind = 'file' AND hash IS NOT NULL) OR (kind = 'split' AND parts IS NOT NULL))").fetchall()
+    connection.close()
+
+    state = loadState(statePath)
+    written = 0
+    for row in rows:
+        section = state.setdefault(SPLIT_STATE_KEY, {}) if row["kind"] == "split" else state["files"]
+        # A later direct upload (or an earlier sync) wins over this queue result
+        if section.get(row["path"], {}).get("uploadedAt", 0) >= row["updatedAt"]:
+            continue
+        if row["kind"] == "split":
+            section[row["path"]] = {**json.loads(row["parts"]), "uploadedAt": row["updatedAt"]}
+        else:
+            section[row["path"]] = {"hash": row["hash"], "uploadedAt": row["updatedAt"], "locations": json.loads(row["result"] or "[]")}
+        written += 1
+
+    if written:
+        saveState(state, statePath)
+        print(f"Import state: recorded {written} files uploaded by queue workers")
+    return written
+
+
+def runWorker(queuePath: str, env: Dict[str, str], journalMode: str) -> None:
+    """
+    Claim and process items until the queue is drained.
+
+    Args:
+        queuePath: SQLite file path
+        env: Environment variables
+        journalMode: SQLite journal mode
+    """
+    from fileSplitter import DEFAULT_PART_BYTES
+
+    workerId = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+    leaseSeconds = float(env.get("WORK_QUEUE_LEASE", DEFAULT_LEASE_SECONDS))
+    maxAttempts = int(env.get("WORK_QUEUE_MAX_ATTEMPTS", DEFAULT_MAX_ATTEMPTS))
+    splitPartBytes = int(env.get("SPLIT_PART_BYTES", 0) or 0) or DEFAULT_PART_BYTES
+    serverUrl = env.get("ANYTHINGLLM_URL")
+    apiKey = env.get("ANYTHINGLLM_API_KEY")
+    statePath = env.get("IMPORT_STATE_FILE", DEFAULT_STATE_FILE)
+    scrubConfig = None
+    if env.get("PII_SCRUB", "false").lower() == 'true':
+        from piiScrubber import loadScrubConfig
+        try:
+            scrubConfig = loadScrubConfig(env)
+        except ValueError as e:
+            print(f"[{workerId}] Error: {e}")
+            return
+    connection = connect(queuePath, journalMode)
+    done = failed = 0
+
+    while True:
+        item = claimItem(connection, workerId, leaseSeconds)
+        if item is None:
+            # Stay around while others hold leases or retries are backing off - their items may come back
+            waiting = connection.execute("SELECT COUNT(*) FROM items WHERE status IN ('pending', 'leased')").fetchone()[0]
+            if not waiting:
+                break
+            time.sleep(POLL_SECONDS)
+            continue
+
+        # Keep the lease alive however long the upload (or split) takes
+        stop = threading.Event()
+        heartbeat = threading.Thread(target=holdLease, args=(queuePath, journalMode, item["id"], workerId, leaseSeconds, stop), daemon=True)
+        heartbeat.start()
+        try:
+            locations, hashValue, error, parts = processItem(item, serverUrl, apiKey, splitPartBytes, scrubConfig, statePath)
+        except Exception as e:
+            locations, hashValue, error, parts = None, None, str(e), None
+        finally:
+            stop.set()
+            heartbeat.join()
+
+        if locations is not None:
+            if completeItem(connection, item, workerId, locations, hashValue, parts):
+                done += 1
+            else:
+                print(f"[{workerId}] Lease on {os.path.basename(item['path'])} expired before it finished - result discarded")
+        else:
+            failed += 1
+            failItem(connection, item, workerId, error, maxAttempts)
+
+    connection.close()
+    print(f"[{workerId}] Finished: {done} uploaded, {failed} failed attempts")
+
+
+def printStatus(queuePath: str, journalMode: str) -> None:
+    """Print item counts by status and the failed items."""
+    connection = connect(queuePath, journalMode)
+    counts = {row["status"]: row["total"] for row in connection.execute("SELECT status, COUNT(*) AS total FROM items GROUP BY status")}
+    print(f"Queue {queuePath}: " + ", ".join(f"{status} {counts.get(status, 0)}" for status in ["pending", "leased", "done", "failed"]))
+
+    for row in connection.execute("SELECT path, attempts, error FROM items WHERE status = 'failed' ORDER BY path LIMIT 20"):
+        print(f"  FAILED {row['path']} ({row['attempts']} attempts): {row['error']}")
+    connection.close()
+
+
+def main() -> None:
+    from importFiles import loadEnv
+
+    if len(sys.argv) < 2:
+        print("Usage:")
+        print("  python workQueue.py work [--workers N]   # Upload queued items with N worker processes")
+        print("  python workQueue.py status               # Show queue progress")
+        print("  python workQueue.py retry-failed         # Put failed items back in the queue")
+        sys.exit(1)
+
+    env = loadEnv()
+    queuePath = env.get("WORK_QUEUE")
+    journalMode = env.get("WORK_QUEUE_JOURNAL", "wal")
+    if not queuePath:
+        print("WORK_QUEUE is not set in .importFiles.env")
+        sys.exit(1)
+
+    command = sys.argv[1].lower()
+
+    if command == "work":
+        workers = int(sys.argv[sys.argv.index("--workers") + 1]) if "--workers" in sys.argv else 1
+        print(f"Starting {workers} workers on {queuePath}")
+        processes = [Process(target=runWorker, args=(queuePath, env, journalMode)) for _ in range(workers)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        syncImportState(queuePath, env.get("IMPORT_STATE_FILE", DEFAULT_STATE_FILE), journalMode)
+        printStatus(queuePath, journalMode)
+
+    elif command == "status":
+        printStatus(queuePath, journalMode)
+
+    elif command == "retry-failed":
+        connection = connect(queuePath, journalMode)
+        cursor = connection.execute("UPDATE items SET status = 'pending', attempts = 0, availableAt = 0, updatedAt = ? WHERE status = 'failed'", (time.time(),))
+        print(f"Re-queued {cursor.rowcount} failed items")
+        connection.close()
+
+    else:
+        print("Invalid command. Use 'work', 'status' or 'retry-failed'")
+
+
+if __name__ == "__main__":
+    main()
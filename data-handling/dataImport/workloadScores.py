@@ -0,0 +1,446 @@
+#!/usr/bin/env python3
+"""
+Workload and Burnout Risk Scoring for WWIZ
+
+Scores everyone's workload and burnout risk from signals the sources
+already carry:
+
+- Calendar: meeting, focus and available hours and meeting density
+- Jira: assigned and in-progress issues and time logged this month
+- Slack / Teams: messages, meetings and calls last week, and how much
+  activity falls outside the person's working hours (timestamps checked
+  against the calendar workingHours in the person's timezone)
+
+Signals are loaded into aligned columns (one array("d") per signal, one
+row per ehsId) and every score is computed column-wise in one batch:
+
+1. Each signal is normalised to its percentile rank across the company
+   (0 = lowest, 1 = highest), so hours and message counts are comparable
+   and outliers don't dominate. Missing signals count as the median.
+2. workload = weighted mean of the workload signals (WORKLOAD_WEIGHTS)
+3. risk = weighted mean of workload, lack of free time, after-hours
+   activity and meeting density (RISK_WEIGHTS)
+4. Each person also gets their percentile within their department
+
+Results are emitted as per-person and per-department documents. Scores
+are relative to the company and meant as a prompt for a conversation, not
+a diagnosis - they are only uploaded to a restricted workspace
+(WORKLOAD_WORKSPACES, which must not share a workspace with WORKSPACES or
+the shards), and written to WORKLOAD_SCORES_DIR otherwise.
+
+Usage:
+    python data-handling/dataImport/workloadScores.py [data path]   # print the highest risk people and departments
+"""
+
+import json
+import math
+import os
+import re
+import sys
+from array import array
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from percentiles import percentile
+from rollupDocuments import UNKNOWN_DEPARTMENT, getPath, loadRecords, readTree
+
+# Folders score documents are uploaded to
+PERSON_FOLDER = "workload-person"
+TEAM_FOLDER = "workload-team"
+
+# Where scores are written when there is no restricted workspace to upload them to
+DEFAULT_SCORES_DIR = "data-handling/dataImport/workloadReports"
+
+# Signal columns: (name, source, path inside the record)
+SIGNALS: List[Tuple[str, str, str]] = [
+    ("meetingHours", "calendar-availabilitySummary", "availabilitySummary.weeklyMeetingLoad.totalMeetingHours"),
+    ("focusHours", "calendar-availabilitySummary", "availabilitySummary.weeklyMeetingLoad.focusTimeHours"),
+    ("availableHours", "calendar-availabilitySummary", "availabilitySummary.weeklyMeetingLoad.availableHours"),
+    ("meetingDensity", "calendar-availabilitySummary", "availabilitySummary.weeklyMeetingLoad.meetingDensity"),
+    ("assignedIssues", "jira-userStats", "workloadSummary.assignedIssues"),
+    ("inProgressIssues", "jira-userStats", "workloadSummary.inProgressIssues"),
+    ("hoursLogged", "jira-userStats", "workloadSummary.totalTimeLoggedThisMonth"),
+    ("slackMessages", "slack-userActivitySummary", "activitySummary.messagesSentLastWeek"),
+    ("teamsMessages", "teams-userActivitySummary", "activitySummary.messagesSentLastWeek"),
+    ("teamsMeetings", "teams-userActivitySummary", "activitySummary.meetingsAttendedLastWeek"),
+    ("teamsCalls", "teams-userActivitySummary", "activitySummary.callsInitiatedLastWeek"),
+]
+
+# Workload: weights of the normalised signals (negative = less is more load)
+WORKLOAD_WEIGHTS: Dict[str, float] = {
+    "meetingHours": 0.2,
+    "focusHours": -0.1,
+    "assignedIssues": 0.15,
+    "inProgressIssues": 0.15,
+    "hoursLogged": 0.15,
+    "slackMessages": 0.075,
+    "teamsMessages": 0.075,
+    "teamsMeetings": 0.05,
+    "teamsCalls": 0.05,
+}
+
+# Risk: weights of workload and the strain signals
+RISK_WEIGHTS: Dict[str, float] = {
+    "workload": 0.45,
+    "availableHours": -0.2,
+    "afterHoursShare": 0.2,
+    "meetingDensity": 0.15,
+}
+
+# Risk bands (lower bound -> band)
+RISK_BANDS: List[Tuple[float, str]] = [(0.7, "high"), (0.6, "elevated"), (0.0, "normal")]
+
+# Categorical signals as numbers
+LEVELS: Dict[str, float] = {"light": 0.0, "low": 0.0, "moderate": 0.5, "heavy": 1.0, "high": 1.0}
+
+DAY_NAMES = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+
+NAN = float("nan")
+
+
+def toNumber(value) -> float:
+    """Convert a signal value (number, "49h 56m" duration or level) to a float, NaN if unusable."""
+    if isinstance(value, bool) or value is None:
+        return NAN
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        if value.lower() in LEVELS:
+            return LEVELS[value.lower()]
+        duration = re.fullmatch(r"\s*(?:(\d+)h)?\s*(?:(\d+)m)?\s*", value)
+        if duration and any(duration.groups()):
+            return int(duration.group(1) or 0) + int(duration.group(2) or 0) / 60
+    return NAN
+
+
+def afterHoursShare(timestamps: List[str], workingHours: Optional[Dict]) -> float:
+    """
+    Fraction of activity timestamps outside a person's working hours.
+
+    Args:
+        timestamps: UTC ISO timestamps of recent activity
+        workingHours: Calendar workingHours (timezone plus start/end per weekday)
+
+    Returns:
+        Share between 0 and 1, NaN without timestamps or working hours
+    """
+    if not timestamps or not isinstance(workingHours, dict):
+        return NAN
+    try:
+        zone = ZoneInfo(workingHours.get("timezone") or "UTC")
+    except (ZoneInfoNotFoundError, ValueError):
+        zone = timezone.utc
+
+    outside = counted = 0
+    for timestamp in timestamps:
+        try:
+            local = datetime.strptime(timestamp[:19], "%Y-%m-%dT%H:%M:%S").replace(tzinfo=timezone.utc).astimezone(zone)
+        except (TypeError, ValueError):
+            continue
+        counted += 1
+        day = workingHours.get(DAY_NAMES[local.weekday()])
+        if not day or not (day.get("start", "") <= local.strftime("%H:%M") < day.get("end", "")):
+            outside += 1
+    return outside / counted if counted else NAN
+
+
+def activityTimestamps(record: Dict) -> List[str]:
+    """Timestamps of a Slack/Teams record's recent activity, channel activity and last active date."""
+    timestamps = [item.get("timestamp") for item in record.get("recentActivity") or [] if isinstance(item, dict)]
+    for key in ("activeSlackChannels", "activeTeamsChannels", "activeTeamsGroups"):
+        timestamps += [item.get("lastActivity") for item in record.get(key) or [] if isinstance(item, dict)]
+    timestamps.append(getPath(record, "activitySummary.lastActiveDate"))
+    return [timestamp for timestamp in timestamps if isinstance(timestamp, str)]
+
+
+class ScoreTable:
+    """Aligned signal columns, one row per person."""
+
+    def __init__(self, ehsIds: List[str]):
+        self.ehsIds = ehsIds
+        self.index = {ehsId: row for row, ehsId in enumerate(ehsIds)}
+        self.columns: Dict[str, array] = {}
+        self.names: Dict[str, str] = {}
+        self.departments: Dict[str, str] = {}
+
+    def column(self, name: str) -> array:
+        """Get (creating as all-NaN) a column."""
+        if name not in self.columns:
+            self.columns[name] = array("d", [NAN]) * len(self.ehsIds)
+        return self.columns[name]
+
+
+def buildTable(records: Dict[str, List[Dict]]) -> ScoreTable:
+    """
+    Load every signal into aligned columns keyed by ehsId.
+
+    Args:
+        records: Source folder -> records (as returned by rollupDocuments.loadRecords)
+
+    Returns:
+        Populated score table
+    """
+    sources = {source for name, source, path in SIGNALS} | {"employmentHero-staff"}
+    ehsIds = sorted({record["ehsId"] for source in sources for record in records.get(source, []) if record.get("ehsId")})
+    table = ScoreTable(ehsIds)
+
+    for record in records["employmentHero-staff"]:
+        if record.get("ehsId"):
+            table.departments[record["ehsId"]] = record.get("department") or UNKNOWN_DEPARTMENT
+            table.names[record["ehsId"]] = f"{record.get('firstName', '')} {record.get('lastName', '')}".strip()
+
+    workingHours: Dict[str, Dict] = {}
+    for name, source, path in SIGNALS:
+        column = table.column(name)
+        for record in records[source]:
+            row = table.index.get(record.get("ehsId"))
+            if row is not None:
+                column[row] = toNumber(getPath(record, path))
+                table.names.setdefault(record["ehsId"], record.get("displayName"))
+                if source == "calendar-availabilitySummary":
+                    workingHours[record["ehsId"]] = record.get("workingHours")
+
+    # After-hours share pools Slack and Teams activity against the calendar working hours
+    timestamps: Dict[str, List[str]] = {}
+    for source in ("slack-userActivitySummary", "teams-userActivitySummary"):
+        for record in records[source]:
+            if record.get("ehsId"):
+                timestamps.setdefault(record["ehsId"], []).extend(activityTimestamps(record))
+    column = table.column("afterHoursShare")
+    for ehsId, personTimestamps in timestamps.items():
+        column[table.index[ehsId]] = afterHoursShare(personTimestamps, workingHours.get(ehsId))
+
+    return table
+
+
+def rankNormalise(column: array) -> array:
+    """
+    Replace values by their percentile rank (0-1, ties averaged, NaN -> 0.5).
+
+    Args:
+        column: Raw signal column
+
+    Returns:
+        New normalised column
+    """
+    result = array("d", [0.5]) * len(column)
+    present = sorted((value, row) for row, value in enumerate(column) if not math.isnan(value))
+    if len(present) < 2:
+        return result
+
+    last = len(present) - 1
+    start = 0
+    while start < len(present):
+        end = start
+        while end + 1 < len(present) and present[end + 1][0] == present[start][0]:
+            end += 1
+        rank = (start + end) / 2 / last
+        for position in range(start, end + 1):
+            result[present[position][1]] = rank
+        start = end + 1
+    return result
+
+
+def weightedScore(columns: Dict[str, array], weights: Dict[str, float], rows: int) -> array:
+    """Weighted mean of normalised columns; negative weights use 1 - value."""
+    total = sum(abs(weight) for weight in weights.values())
+    score = array("d", [0.0]) * rows
+    for name, weight in weights.items():
+        column = columns[name]
+        if weight >= 0:
+            for row in range(rows):
+                score[row] += weight * column[row]
+        else:
+            for row in range(rows):
+                score[row] -= weight * (1 - column[row])
+    for row in range(rows):
+        score[row] /= total
+    return score
+
+
+def scoreTable(table: ScoreTable) -> Dict[str, array]:
+    """
+    Compute normalised signals, workload, risk and in-department percentiles.
+
+    Args:
+        table: Loaded score table
+
+    Returns:
+        Column name -> column for the normalised signals and the scores
+    """
+    rows = len(table.ehsIds)
+    normalised = {name: rankNormalise(column) for name, column in table.columns.items()}
+    normalised["workload"] = weightedScore(normalised, WORKLOAD_WEIGHTS, rows)
+    normalised["risk"] = weightedScore(normalised, RISK_WEIGHTS, rows)
+
+    # Percentile within the department, from the rank of the score among colleagues
+    byDepartment: Dict[str, List[int]] = {}
+    for row, ehsId in enumerate(table.ehsIds):
+        byDepartment.setdefault(table.departments.get(ehsId, UNKNOWN_DEPARTMENT), []).append(row)
+    for name in ("workload", "risk"):
+        teamPercentile = array("d", [0.5]) * rows
+        for members in byDepartment.values():
+            ranked = rankNormalise(array("d", [normalised[name][row] for row in members]))
+            for position, row in enumerate(members):
+                teamPercentile[row] = ranked[position]
+        normalised[f"{name}TeamPercentile"] = teamPercentile
+
+    return normalised
+
+
+def riskBand(risk: float) -> str:
+    """Band name for a risk score."""
+    return next(band for lowerBound, band in RISK_BANDS if risk >= lowerBound)
+
+
+def rawValue(table: ScoreTable, name: str, row: int) -> Optional[float]:
+    """Raw signal value rounded for display (None if missing)."""
+    value = table.columns[name][row]
+    return None if math.isnan(value) else round(value, 2)
+
+
+def buildScores(files: Iterable[Tuple[bytes, str]]) -> Tuple[List[Dict], List[Dict]]:
+    """
+    Score everyone and summarise per department.
+
+    Args:
+        files: (content, target folder) pairs
+
+    Returns:
+        Tuple of (per-person scores, per-department scores), highest risk first
+    """
+    table = buildTable(loadRecords(files))
+    scores = scoreTable(table)
+
+    people = []
+    for row, ehsId in enumerate(table.ehsIds):
+        risk = scores["risk"][row]
+        drivers = sorted(((name, scores[name][row]) for name in WORKLOAD_WEIGHTS if WORKLOAD_WEIGHTS[name] > 0), key=lambda item: -item[1])[:3]
+        people.append({
+            "ehsId": ehsId,
+            "displayName": table.names.get(ehsId),
+            "department": table.departments.get(ehsId, UNKNOWN_DEPARTMENT),
+            "workloadScore": round(scores["workload"][row], 3),
+            "riskScore": round(risk, 3),
+            "riskBand": riskBand(risk),
+            "workloadPercentileInDepartment": round(scores["workloadTeamPercentile"][row] * 100),
+            "riskPercentileInDepartment": round(scores["riskTeamPercentile"][row] * 100),
+            "topDrivers": [name for name, value in drivers if value >= 0.75],
+            "signals": {name: rawValue(table, name, row) for name in table.columns},
+        })
+    people.sort(key=lambda person: (-person["riskScore"], person["ehsId"]))
+
+    departments: Dict[str, List[Dict]] = {}
+    for person in people:
+        departments.setdefault(person["department"], []).append(person)
+
+    teams = []
+    for department, members in departments.items():
+        workloads = [member["workloadScore"] for member in members]
+        risks = [member["riskScore"] for member in members]
+        teams.append({
+            "department": department,
+            "headcount": len(members),
+            "workload": {"median": percentile(workloads, 50), "p90": percentile(workloads, 90), "max": max(workloads)},
+            "risk": {"median": percentile(risks, 50), "p90": percentile(risks, 90), "max": max(risks)},
+            "riskBands": {band: sum(1 for member in members if member["riskBand"] == band) for lowerBound, band in RISK_BANDS},
+            "highestRisk": [{"ehsId": m["ehsId"], "displayName": m["displayName"], "riskScore": m["riskScore"], "topDrivers": m["topDrivers"]} for m in members[:5]],
+        })
+    teams.sort(key=lambda team: -team["risk"]["median"])
+
+    return people, teams
+
+
+def describeDrivers(drivers: List[str]) -> str:
+    """Plain-text list of score drivers."""
+    return ", ".join(re.sub(r"([A-Z])", r" \1", driver).lower() for driver in drivers) or "no single driver"
+
+
+def buildScoreDocuments(files: Iterable[Tuple[bytes, str]]) -> Dict[str, Tuple[bytes, str]]:
+    """
+    Build per-person and per-department score documents.
+
+    Must run on every discovered file (before de-duplication), since scores are relative to everyone.
+
+    Args:
+        files: (content, target folder) pairs
+
+    Returns:
+        Dictionary mapping document keys (folder/name) to (content, target folder)
+    """
+    from rollupDocuments import rollupFileName
+
+    people, teams = buildScores(files)
+    documents: Dict[str, Tuple[bytes, str]] = {}
+
+    for person in people:
+        person["summary"] = (f"{person['displayName']} ({person['department']}): {person['riskBand']} burnout risk "
+                             f"(risk {person['riskScore']:.2f}, workload {person['workloadScore']:.2f}, "
+                             f"{person['riskPercentileInDepartment']}th percentile in department); main drivers: {describeDrivers(person['topDrivers'])}.")
+        person["dataSource"] = PERSON_FOLDER
+        documents[f"{PERSON_FOLDER}/workload-{person['ehsId']}.json"] = (json.dumps(person, indent=2, ensure_ascii=False).encode("utf-8"), PERSON_FOLDER)
+
+    for team in teams:
+        team["summary"] = (f"{team['department']} department workload: median risk {team['risk']['median']:.2f} (p90 {team['risk']['p90']:.2f}), "
+                           f"{team['riskBands']['high']} high and {team['riskBands']['elevated']} elevated risk of {team['headcount']} people.")
+        team["dataSource"] = TEAM_FOLDER
+        fileName = rollupFileName({"rollupType": "department", "department": team["department"]}).replace("rollup-department", "workload-team")
+        documents[f"{TEAM_FOLDER}/{fileName}"] = (json.dumps(team, indent=2, ensure_ascii=False).encode("utf-8"), TEAM_FOLDER)
+
+    return documents
+
+
+def restrictedWorkspaces(workloadWorkspaces: Optional[str], workspaces: Optional[str], sharding: str, shardPrefix: str) -> Optional[str]:
+    """
+    Check that score documents would only land in restricted workspaces.
+
+    Args:
+        workloadWorkspaces: WORKLOAD_WORKSPACES (aliases resolved)
+        workspaces: WORKSPACES (aliases resolved)
+        sharding: Sharding mode - shard workspaces are general too
+        shardPrefix: Prefix of the shard workspace slugs
+
+    Returns:
+        The workload workspaces, or None if unset or shared with the general workspaces
+    """
+    restricted = {ws.strip() for ws in (workloadWorkspaces or "").split(",") if ws.strip()}
+    general = {ws.strip() for ws in (workspaces or "").split(",") if ws.strip()}
+    if not restricted or restricted & general:
+        return None
+    if sharding != "off" and any(ws.startswith(f"{shardPrefix}-") for ws in restricted):
+        return None
+    return workloadWorkspaces
+
+
+def writeScoreDocuments(documents: Dict[str, Tuple[bytes, str]], outputDir: str) -> int:
+    """
+    Write score documents to disk (outputDir/<folder>/<name>) instead of uploading them.
+
+    Returns:
+        Number of documents written
+    """
+    for key, (content, folder) in documents.items():
+        targetPath = os.path.join(outputDir, folder, os.path.basename(key))
+        os.makedirs(os.path.dirname(targetPath), exist_ok=True)
+        with open(f"{targetPath}.tmp", "wb") as f:
+            f.write(content)
+        os.replace(f"{targetPath}.tmp", targetPath)
+    return len(documents)
+
+
+def main() -> None:
+    dataPath = sys.argv[1] if len(sys.argv) > 1 else "data"
+    people, teams = buildScores(readTree(dataPath))
+
+    print(f"{'Department':<22} {'People':>6} {'Risk p50':>9} {'Risk p90':>9} {'High':>5} {'Elevated':>9}")
+    for team in teams:
+        print(f"{team['department']:<22} {team['headcount']:>6} {team['risk']['median']:>9.2f} {team['risk']['p90']:>9.2f} {team['riskBands']['high']:>5} {team['riskBands']['elevated']:>9}")
+
+    print(f"\n{'ehsId':<8} {'Name':<22} {'Department':<20} {'Risk':>5} {'Band':<9} Drivers")
+    for person in people[:15]:
+        print(f"{person['ehsId']:<8} {person['displayName'] or '':<22} {person['department']:<20} {person['riskScore']:>5.2f} {person['riskBand']:<9} {describeDrivers(person['topDrivers'])}")
+
+
+if __name__ == "__main__":
+    main()
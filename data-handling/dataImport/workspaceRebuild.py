@@ -0,0 +1,551 @@
+#!/usr/bin/env python3
+"""
+Blue/Green Workspace Rebuild for WWIZ
+
+Re-indexes the knowledge base without a window where chat returns nothing.
+Instead of deleting everything and re-uploading into the live workspace:
+
+1. A fresh shadow workspace (<alias>-<timestamp>) is created
+2. FILE_PATH is uploaded into it at a throttled rate (and lower CPU
+   priority) so the rebuild doesn't compete with live chat traffic
+   after the importer's PII scrub and schema validation stages, along
+   with the generated documents an import would upload (live status,
+   rollups, collaboration)
+3. The shadow is verified: every expected document is embedded, then a
+   set of probe queries must come back with an answer and sources
+4. The alias pointer file is switched to the shadow atomically (temp file
+   + os.replace), so readers see either the old or the new slug, and
+   the import state is pointed at the shadow's copies so later imports
+   replace those
+5. The old workspace and its documents are garbage-collected in the
+   background after a grace period for in-flight chats - but only if a
+   rebuild created it. The workspace an alias started out as is never
+   deleted automatically
+
+Anything that chats with or imports into the alias (importFiles.py,
+chatLoadTest.py, chatRouter.py) resolves it through the pointer file.
+
+Usage:
+    python data-handling/dataImport/workspaceRebuild.py rebuild [alias]
+    python data-handling/dataImport/workspaceRebuild.py status
+    python data-handling/dataImport/workspaceRebuild.py rollback [alias]
+    python data-handling/dataImport/workspaceRebuild.py gc <slug>
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from typing import Dict, List, Optional
+
+import requests
+
+# Default pointer file location, overridable with WORKSPACE_POINTER_FILE
+DEFAULT_POINTER_FILE = os.path.join("data-handling", "dataImport", "activeWorkspace.json")
+
+# Rebuild defaults
+DEFAULT_REBUILD_UPLOAD_RATE = 2.0     # files per second
+DEFAULT_REBUILD_NICE = 10
+DEFAULT_PROBE_COUNT = 3
+DEFAULT_GC_DELAY_SECONDS = 60
+
+# Slow uploads mean the server is busy with live traffic - back off further
+BUSY_LATENCY_FACTOR = 3.0
+
+
+def loadPointers(pointerPath: str = DEFAULT_POINTER_FILE) -> Dict:
+    """
+    Load the alias pointer file.
+
+    Args:
+        pointerPath: Pointer file path
+
+    Returns:
+        {"aliases": {alias: {"active": slug, "previous": slug, "created": [slugs], ...}}}
+    """
+    if not os.path.exists(pointerPath):
+        return {"aliases": {}}
+    with open(pointerPath, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def savePointers(pointers: Dict, pointerPath: str = DEFAULT_POINTER_FILE) -> None:
+    """
+    Atomically replace the alias pointer file.
+
+    Args:
+        pointers: Pointer dictionary
+        pointerPath: Pointer file path
+    """
+    folder = os.path.dirname(pointerPath)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    tempPath = f"{pointerPath}.tmp"
+    with open(tempPath, "w", encoding="utf-8") as f:
+        json.dump(pointers, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tempPath, pointerPath)
+
+
+def resolveWorkspace(slug: str, pointerPath: str = DEFAULT_POINTER_FILE) -> str:
+    """
+    Resolve an alias to its active workspace slug.
+
+    Args:
+        slug: Alias or plain workspace slug
+        pointerPath: Pointer file path
+
+    Returns:
+        Active slug for an alias, otherwise the slug unchanged
+    """
+    return loadPointers(pointerPath).get("aliases", {}).get(slug, {}).get("active", slug)
+
+
+def resolveWorkspaces(workspaces: str, pointerPath: str = DEFAULT_POINTER_FILE) -> str:
+    """
+    Resolve every alias in a comma-separated workspace list.
+
+    Args:
+        workspaces: Comma-separated workspace slugs (e.g. WORKSPACES)
+        pointerPath: Pointer file path
+
+    Returns:
+        Comma-separated active slugs
+    """
+    if not workspaces or not os.path.exists(pointerPath):
+        return workspaces
+    return ",".join(resolveWorkspace(ws.strip(), pointerPath) for ws in workspaces.split(",") if ws.strip())
+
+
+def getHeaders(apiKey: str) -> Dict[str, str]:
+    return {'Authorization': f"Bearer {apiKey}", 'Content-Type': 'application/json'}
+
+
+def getWorkspace(slug: str, serverUrl: str, apiKey: str) -> Optional[Dict]:
+    """
+    Fetch a workspace, including its embedded documents.
+
+    Returns:
+        Workspace dictionary, or None if it doesn't exist
+    """
+    response = requests.get(f"{serverUrl}/api/v1/workspace/{slug}", headers=getHeaders(apiKey))
+    if response.status_code != 200:
+        return None
+    workspace = response.json().get("workspace")
+    # AnythingLLM returns a one-element list here
+    if isinstance(workspace, list):
+        workspace = workspace[0] if workspace else None
+    return workspace
+
+
+def createShadowWorkspace(alias: str, serverUrl: str, apiKey: str) -> Optional[str]:
+    """
+    Create the shadow workspace for a rebuild.
+
+    Args:
+        alias: Alias being rebuilt
+        serverUrl: AnythingLLM server URL
+        apiKey: API key for authentication
+
+    Returns:
+        Shadow workspace slug, or None on failure
+    """
+    name = f"{alias}-{time.strftime('%Y%m%d-%H%M%S')}"
+    response = requests.post(f"{serverUrl}/api/v1/workspace/new", headers=getHeaders(apiKey), json={"name": name})
+    if response.status_code != 200:
+        print(f"Failed to create shadow workspace {name}: {response.status_code} - {response.text}")
+        return None
+    return response.json().get("workspace", {}).get("slug", name)
+
+
+def recordCreated(alias: str, slug: str, pointerPath: str) -> None:
+    """Remember a shadow workspace created for an alias - only these are ever garbage-collected."""
+    pointers = loadPointers(pointerPath)
+    entry = pointers.setdefault("aliases", {}).setdefault(alias, {})
+    entry["created"] = entry.get("created", []) + [slug]
+    savePointers(pointers, pointerPath)
+
+
+def createdByRebuild(slug: str, pointerPath: str) -> bool:
+    """Check whether a workspace was created by a rebuild (rather than by hand or by the first import)."""
+    return any(slug in entry.get("created", []) for entry in loadPointers(pointerPath).get("aliases", {}).values())
+
+
+def uploadThrottled(filesToUpload: Dict, slug: str, serverUrl: str, apiKey: str, rate: float) -> Dict[str, List[str]]:
+    """
+    Upload files into the shadow workspace one at a time at a capped rate.
+
+    When an upload takes much longer than the early ones, the server is
+    busy with live traffic and the next upload waits that much longer.
+
+    Args:
+        filesToUpload: Dictionary of files with content and target folders
+        slug: Shadow workspace slug
+        serverUrl: AnythingLLM server URL
+        apiKey: API key for authentication
+        rate: Maximum files per second
+
+    Returns:
+        File path (or document key) -> document locations, for the files that uploaded
+    """
+    from importFiles import uploadSingleFile
+
+    interval = 1 / rate if rate > 0 else 0
+    baseline: Optional[float] = None
+    uploaded: Dict[str, List[str]] = {}
+    total = len(filesToUpload)
+
+    for index, (filePath, (content, targetFolder)) in enumerate(sorted(filesToUpload.items()), start=1):
+        started = time.monotonic()
+        locations = uploadSingleFile(os.path.basename(filePath), content, targetFolder, serverUrl, apiKey, [slug])
+        elapsed = time.monotonic() - started
+
+        if locations is not None:
+            uploaded[filePath] = locations
+        if index % 25 == 0:
+            print(f"Rebuild progress: {index}/{total} files ({len(uploaded)} uploaded)")
+
+        wait = interval - elapsed
+        if baseline and elapsed > baseline * BUSY_LATENCY_FACTOR:
+            wait = max(wait, elapsed)
+        baseline = elapsed if baseline is None else (baseline * 9 + elapsed) / 10
+        if wait > 0:
+            time.sleep(wait)
+
+    return uploaded
+
+
+def verifyShadow(slug: str, expectedDocuments: int, probes: List[str], serverUrl: str, apiKey: str) -> bool:
+    """
+    Check the shadow workspace before it takes traffic.
+
+    Args:
+        slug: Shadow workspace slug
+        expectedDocuments: Documents the rebuild meant to embed (the full prepared file list)
+        probes: Questions that must return an answer with sources
+        serverUrl: AnythingLLM server URL
+        apiKey: API key for authentication
+
+    Returns:
+        True if the shadow is ready for cutover
+    """
+    from chatRouter import chatWithWorkspace
+
+    workspace = getWorkspace(slug, serverUrl, apiKey)
+    documentCount = len((workspace or {}).get("documents", []))
+    print(f"Verify: {documentCount} documents embedded (expected at least {expectedDocuments})")
+    if expectedDocuments <= 0 or documentCount < expectedDocuments:
+        return False
+
+    passed = True
+    for question in probes:
+        response = chatWithWorkspace(question, slug, serverUrl, apiKey)
+        answered = bool(response.get("textResponse")) and bool(response.get("sources"))
+        print(f"  Probe {'OK  ' if answered else 'FAIL'} {question}")
+        passed = passed and answered
+
+    return passed
+
+
+def switchAlias(alias: str, slug: str, pointerPath: str) -> Optional[str]:
+    """
+    Point an alias at a new workspace.
+
+    Args:
+        alias: Alias name
+        slug: Workspace that becomes active
+        pointerPath: Pointer file path
+
+    Returns:
+        The previously active slug (None if the alias is new)
+    """
+    pointers = loadPointers(pointerPath)
+    entry = pointers.setdefault("aliases", {}).get(alias, {})
+    previous = entry.get("active", alias)
+
+    history = entry.get("history", [])
+    history.append({"active": slug, "switchedAt": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())})
+    pointers["aliases"][alias] = {**entry, "active": slug, "previous": previous, "history": history[-10:]}
+
+    savePointers(pointers, pointerPath)
+    return previous if previous != slug else None
+
+
+def garbageCollect(slug: str, keepSlug: str, serverUrl: str, apiKey: str, pointerPath: str = DEFAULT_POINTER_FILE) -> None:
+    """
+    Delete an old workspace and the documents only it used.
+
+    Only workspaces a rebuild created (and that no alias points at) are
+    removed, so the original workspace behind an alias is never deleted.
+
+    Args:
+        slug: Workspace to remove
+        keepSlug: Active workspace - its documents are never deleted
+        serverUrl: AnythingLLM server URL
+        apiKey: API key for authentication
+        pointerPath: Pointer file path
+    """
+    from cleanupDocuments import deleteDocuments
+
+    pointers = loadPointers(pointerPath).get("aliases", {})
+    if not createdByRebuild(slug, pointerPath):
+        print(f"GC: {slug} was not created by a rebuild - leaving it in place")
+        return
+    if slug in {entry.get("active") for entry in pointers.values()}:
+        print(f"GC: {slug} is active again - leaving it in place")
+        return
+
+    old = getWorkspace(slug, serverUrl, apiKey)
+    if not old:
+        print(f"GC: workspace {slug} already gone")
+        return
+
+    keep = {doc.get("docpath") for doc in (getWorkspace(keepSlug, serverUrl, apiKey) or {}).get("documents", [])}
+    orphaned = [{"name": doc["docpath"]} for doc in old.get("documents", []) if doc.get("docpath") and doc["docpath"] not in keep]
+
+    if orphaned and not deleteDocuments(serverUrl, apiKey, orphaned):
+        print(f"GC: document removal failed - leaving workspace {slug} in place")
+        return
+
+    response = requests.delete(f"{serverUrl}/api/v1/workspace/{slug}", headers=getHeaders(apiKey))
+    if response.status_code == 200:
+        print(f"GC: removed workspace {slug} and {len(orphaned)} documents")
+        pointers = loadPointers(pointerPath)
+        for entry in pointers.get("aliases", {}).values():
+            entry["created"] = [created for created in entry.get("created", []) if created != slug]
+        savePointers(pointers, pointerPath)
+    else:
+        print(f"GC: failed to delete workspace {slug}: {response.status_code} - {response.text}")
+
+
+def loadProbes(env: Dict[str, str]) -> List[str]:
+    """Probe questions: REBUILD_PROBES file (default SuggestedTestCases.md), first REBUILD_PROBE_COUNT."""
+    from chatLoadTest import SUGGESTED_TEST_CASES, loadQuestions
+
+    probeFile = env.get("REBUILD_PROBES", SUGGESTED_TEST_CASES)
+    if not os.path.exists(probeFile):
+        print(f"Probe file not found: {probeFile} - only the document count is verified")
+        return []
+    return loadQuestions(probeFile)[:int(env.get("REBUILD_PROBE_COUNT", DEFAULT_PROBE_COUNT))]
+
+
+def buildDerivedDocuments(filesToUpload: Dict, alias: str, env: Dict[str, str]) -> Dict[str, Dict]:
+    """
+    Build the generated documents a full import keeps in the alias.
+
+    Live status, rollups and collaboration documents are built as in
+    importFiles.py. Workload scores only go into the shadow when the alias
+    is one of the restricted WORKLOAD_WORKSPACES.
+
+    Args:
+        filesToUpload: Scrubbed and validated source files (volatile fields not yet stripped)
+        alias: Alias being rebuilt
+        env: Environment variables
+
+    Returns:
+        Import state section (liveStatus, rollups, ...) -> document key -> (content, target folder)
+    """
+    derived: Dict[str, Dict] = {}
+    if env.get("PARTITION_FIELDS", "false").lower() == 'true':
+        from fieldPartitioner import buildLiveDocuments
+        derived["liveStatus"] = buildLiveDocuments(filesToUpload)
+    if env.get("ROLLUPS", "false").lower() == 'true':
+        from rollupDocuments import buildRollupDocuments
+        derived["rollups"] = buildRollupDocuments(filesToUpload)
+    if env.get("COLLABORATION", "false").lower() == 'true':
+        from collaborationGraph import buildCollaborationDocuments, DEFAULT_MAX_GROUP_SIZE, DEFAULT_TOP_K
+        derived["collaboration"] = buildCollaborationDocuments(filesToUpload.values(), int(env.get("COLLAB_TOP_K", DEFAULT_TOP_K)), int(env.get("COLLAB_MAX_GROUP", DEFAULT_MAX_GROUP_SIZE)))
+    if env.get("WORKLOAD_SCORES", "false").lower() == 'true':
+        from workloadScores import buildScoreDocuments, restrictedWorkspaces
+        restricted = restrictedWorkspaces(env.get("WORKLOAD_WORKSPACES"), env.get("WORKSPACES"), env.get("SHARDING", "off").lower(), env.get("SHARD_PREFIX", "wwiz"))
+        if alias in {ws.strip() for ws in (restricted or "").split(",")}:
+            derived["workloadScores"] = buildScoreDocuments(filesToUpload.values())
+        else:
+            print(f"Workload scores stay in their restricted workspaces - not rebuilt into '{alias}'")
+    return {stateKey: documents for stateKey, documents in derived.items() if documents}
+
+
+def recordShadow(state: Dict, filesToUpload: Dict, derived: Dict[str, Dict], locations: Dict[str, List[str]], sourceHashes: Dict[str, str]) -> None:
+    """
+    Point the import state at the shadow's copies once it takes over.
+
+    The old workspace's documents are garbage-collected, so later imports
+    must replace the shadow's copies instead. Files the shadow is missing
+    lose their record and are uploaded again by the next import.
+
+    Args:
+        state: Import state
+        filesToUpload: Source files uploaded into the shadow
+        derived: Generated documents uploaded into the shadow, by import state section
+        locations: File path (or document key) -> shadow document locations
+        sourceHashes: File path -> hash the importer's de-duplication compares
+    """
+    from importState import contentHash, recordUpload
+
+    for filePath, (content, targetFolder) in filesToUpload.items():
+        if filePath in locations:
+            recordUpload(state, filePath, content, locations[filePath], sourceHashes.get(filePath))
+        else:
+            state["files"].pop(filePath, None)
+    for stateKey, documents in derived.items():
+        records = state.setdefault(stateKey, {})
+        for key, (content, targetFolder) in documents.items():
+            if key in locations:
+                records[key] = {"hash": contentHash(content), "locations": locations[key], "uploadedAt": time.time()}
+            else:
+                records.pop(key, None)
+
+
+def rebuild(alias: str, env: Dict[str, str], pointerPath: str) -> bool:
+    """
+    Run a full blue/green rebuild of an alias.
+
+    Args:
+        alias: Alias to rebuild
+        env: Environment variables
+        pointerPath: Pointer file path
+
+    Returns:
+        True if the alias was switched to a verified shadow workspace
+    """
+    from importFiles import buildFileListWithFolders, createFolderStructure, extractFolderStructure, removeInvalidFiles, scrubUploadList
+    from importState import DEFAULT_STATE_FILE, contentHash, loadState, saveState
+
+    serverUrl = env.get("ANYTHINGLLM_URL")
+    apiKey = env.get("ANYTHINGLLM_API_KEY")
+
+    # Give live chat traffic on this host the CPU first
+    if hasattr(os, "nice"):
+        os.nice(int(env.get("REBUILD_NICE", DEFAULT_REBUILD_NICE)))
+
+    filesToUpload = buildFileListWithFolders(env.get("FILE_PATH", "data"), env.get("RECURSIVE", "true").lower() == 'true', False, 0, env.get("INCLUDED_FILE_TYPES", "txt,json,xml,csv").split(","))
+
+    # The same scrub and validation stages as a normal import - a rebuild must not bring back what they remove
+    if env.get("PII_SCRUB", "false").lower() == 'true':
+        try:
+            filesToUpload = scrubUploadList(filesToUpload, env)[0]
+        except ValueError as e:
+            print(f"Error: {e}")
+            return False
+    if env.get("VALIDATE_SCHEMAS", "true").lower() == 'true' and filesToUpload:
+        validFiles = removeInvalidFiles(filesToUpload, env)
+        if validFiles is None:
+            return False
+        filesToUpload = validFiles
+
+    # Hashes as the importer's de-duplication sees them (after the scrub, before stripped fields)
+    sourceHashes = {path: contentHash(content) for path, (content, folder) in filesToUpload.items()}
+
+    # A shadow holds what an import would: stable fields in the source files, plus every generated document
+    derived = buildDerivedDocuments(filesToUpload, alias, env) if filesToUpload else {}
+    if env.get("PARTITION_FIELDS", "false").lower() == 'true' and filesToUpload:
+        from fieldPartitioner import stripVolatileFields
+        filesToUpload = stripVolatileFields(filesToUpload)
+    shadowDocuments = {**filesToUpload, **{key: value for documents in derived.values() for key, value in documents.items()}}
+
+    if not filesToUpload:
+        print(f"Nothing to rebuild '{alias}' from - check FILE_PATH")
+        return False
+
+    slug = createShadowWorkspace(alias, serverUrl, apiKey)
+    if not slug:
+        return False
+    recordCreated(alias, slug, pointerPath)
+    print(f"Rebuilding '{alias}' into shadow workspace {slug} ({len(filesToUpload)} files, {len(shadowDocuments) - len(filesToUpload)} generated documents)")
+
+    createFolderStructure(extractFolderStructure(shadowDocuments), serverUrl, apiKey)
+    rate = float(env.get("REBUILD_UPLOAD_RATE", DEFAULT_REBUILD_UPLOAD_RATE) or 0)
+    uploaded = uploadThrottled(shadowDocuments, slug, serverUrl, apiKey, rate)
+    print(f"Uploaded {len(uploaded)} of {len(shadowDocuments)} files into {slug}")
+
+    if not verifyShadow(slug, len(shadowDocuments), loadProbes(env), serverUrl, apiKey):
+        print(f"Verification failed - '{alias}' still points at {resolveWorkspace(alias, pointerPath)}. Shadow {slug} kept for inspection.")
+        return False
+
+    previous = switchAlias(alias, slug, pointerPath)
+    print(f"Cutover: '{alias}' now points at {slug}")
+
+    # Later imports replace the shadow's copies - the old workspace's are garbage-collected
+    statePath = env.get("IMPORT_STATE_FILE", DEFAULT_STATE_FILE)
+    state = loadState(statePath)
+    recordShadow(state, filesToUpload, derived, uploaded, sourceHashes)
+    saveState(state, statePath)
+
+    if previous and not createdByRebuild(previous, pointerPath):
+        print(f"Old workspace {previous} was not created by a rebuild - kept (remove it by hand once you no longer need to roll back)")
+    elif previous:
+        delay = float(env.get("REBUILD_GC_DELAY", DEFAULT_GC_DELAY_SECONDS))
+        print(f"Old workspace {previous} will be removed in {delay:.0f}s (rollback until then: workspaceRebuild.py rollback {alias})")
+
+        def delayedGc() -> None:
+            time.sleep(delay)
+            # A rollback during the grace period makes the old workspace active again
+            if resolveWorkspace(alias, pointerPath) == slug:
+                garbageCollect(previous, slug, serverUrl, apiKey, pointerPath)
+
+        threading.Thread(target=delayedGc, name="workspace-gc").start()
+
+    return True
+
+
+def main() -> None:
+    from importFiles import loadEnv
+
+    if len(sys.argv) < 2:
+        print("Usage:")
+        print("  python workspaceRebuild.py rebuild [alias]   # Build, verify and switch to a fresh workspace")
+        print("  python workspaceRebuild.py status            # Show where each alias points")
+        print("  python workspaceRebuild.py rollback [alias]  # Point the alias back at the previous workspace")
+        print("  python workspaceRebuild.py gc <slug>         # Remove an old workspace and its documents")
+        sys.exit(1)
+
+    env = loadEnv()
+    pointerPath = env.get("WORKSPACE_POINTER_FILE", DEFAULT_POINTER_FILE)
+    command = sys.argv[1].lower()
+    defaultAlias = env.get("REBUILD_WORKSPACE") or (env.get("WORKSPACES") or "wizz").split(",")[0].strip() or "wizz"
+    alias = sys.argv[2] if len(sys.argv) > 2 else defaultAlias
+
+    if command == "rebuild":
+        if not rebuild(alias, env, pointerPath):
+            sys.exit(1)
+
+    elif command == "status":
+        aliases = loadPointers(pointerPath).get("aliases", {})
+        if not aliases:
+            print("No aliases yet - every workspace is used by its own slug")
+        for name, entry in aliases.items():
+            if not entry.get("active"):
+                print(f"{name} -> {name} (no cutover yet, shadows: {', '.join(entry.get('created', [])) or 'none'})")
+                continue
+            print(f"{name} -> {entry['active']} (previous: {entry.get('previous')}, switched {entry['history'][-1]['switchedAt']})")
+
+    elif command == "rollback":
+        entry = loadPointers(pointerPath).get("aliases", {}).get(alias)
+        if not entry or not entry.get("previous"):
+            print(f"Nothing to roll back for '{alias}'")
+            sys.exit(1)
+        if not getWorkspace(entry["previous"], env.get("ANYTHINGLLM_URL"), env.get("ANYTHINGLLM_API_KEY")):
+            print(f"Previous workspace {entry['previous']} no longer exists")
+            sys.exit(1)
+        switchAlias(alias, entry["previous"], pointerPath)
+        print(f"Rolled back: '{alias}' now points at {entry['previous']}")
+
+    elif command == "gc" and len(sys.argv) > 2:
+        slug = sys.argv[2]
+        active = {entry.get("active") for entry in loadPointers(pointerPath).get("aliases", {}).values()}
+        if slug in active:
+            print(f"{slug} is active - switch the alias away from it first")
+            sys.exit(1)
+        if not createdByRebuild(slug, pointerPath):
+            print(f"{slug} was not created by a rebuild - delete it by hand if you really mean to")
+            sys.exit(1)
+        garbageCollect(slug, resolveWorkspace(defaultAlias, pointerPath), env.get("ANYTHINGLLM_URL"), env.get("ANYTHINGLLM_API_KEY"), pointerPath)
+
+    else:
+        print("Invalid command. Use 'rebuild', 'status', 'rollback' or 'gc <slug>'")
+
+
+if __name__ == "__main__":
+    main()
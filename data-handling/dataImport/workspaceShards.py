@@ -0,0 +1,450 @@
+"""
+Workspace Sharding and Query Routing for WWIZ
+
+Splits the knowledge base into several smaller AnythingLLM workspaces
+("shards") instead of embedding every document in one vector space, and
+routes each chat question to the shard(s) most likely to hold the answer.
+
+Sharding modes (SHARDING in .importFiles.env):
+- off:        all files go to WORKSPACES (original behaviour)
+- folder:     files are grouped by source folder (people, projects, ...)
+- department: person-level files are grouped by the person's department,
+              everything else falls back to its folder shard
+
+Author: Tim Firman
+Company: Full Metal Productions
+Project: WWIZ (Who's Who in the Zoo)
+"""
+
+import json
+import os
+import re
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import requests
+
+# Default folder -> shard mapping, overridable with SHARD_MAP
+DEFAULT_FOLDER_SHARDS: Dict[str, str] = {
+    "employmentHero-staff": "people",
+    "entraAd-user": "people",
+    "googleCloudIdentity-user": "people",
+    "jira-projectSummary": "projects",
+    "jira-userStats": "projects",
+    "confluence-userStats": "knowledge",
+    "confluence-spacesSummary": "knowledge",
+    "calendar-availabilitySummary": "availability",
+    "teams-userActivitySummary": "activity",
+    "slack-userActivitySummary": "activity",
+}
+
+# Shard used for files whose folder isn't in the map
+DEFAULT_SHARD = "people"
+
+# Folders of generated documents -> the source folder whose shard answers their questions
+# (live status is asked about like availability, department and company rollups like people)
+DERIVED_FOLDER_SOURCES: Dict[str, str] = {
+    "liveStatus-person": "calendar-availabilitySummary",
+    "rollup-department": "employmentHero-staff",
+    "rollup-company": "employmentHero-staff",
+    "rollup-project": "jira-projectSummary",
+    "rollup-space": "confluence-spacesSummary",
+    "collaboration-person": "employmentHero-staff",
+    "collaboration-summary": "jira-projectSummary",
+}
+
+# Keywords used by the router to score each folder shard
+SHARD_KEYWORDS: Dict[str, List[str]] = {
+    "people": ["who", "report", "reports", "manager", "manage", "role", "position", "title",
+               "email", "contact", "department", "team", "hired", "joined", "service", "staff",
+               "employee", "lead", "director", "skills", "experience"],
+    "projects": ["project", "projects", "jira", "issue", "issues", "ticket", "tickets", "epic",
+                 "game", "games", "released", "release", "production", "bug", "mod", "mods",
+                 "codebase", "workload", "sprint", "mmorpg", "horror", "cyberrealm"],
+    "knowledge": ["confluence", "wiki", "docs", "documentation", "page", "pages", "article",
+                  "articles", "space", "spaces", "written", "guide", "process"],
+    "availability": ["available", "availability", "free", "busy", "meeting", "meetings",
+                     "calendar", "schedule", "bandwidth", "capacity", "week", "today",
+                     "tomorrow", "focus", "leave", "ooo"],
+    "activity": ["slack", "teams", "online", "active", "message", "messages", "channel",
+                 "channels", "chat", "responsive", "activity"],
+}
+
+# Words in department names that don't name a department on their own
+DEPARTMENT_FILLER_WORDS = {"and", "of", "the", "department", "dept"}
+
+# Person-level folders that can be sharded by department
+PERSON_FOLDERS: List[str] = [
+    "employmentHero-staff", "entraAd-user", "googleCloudIdentity-user", "jira-userStats",
+    "confluence-userStats", "calendar-availabilitySummary", "teams-userActivitySummary",
+    "slack-userActivitySummary",
+]
+
+# Generated documents about one person or department, sharded like person-level files
+DEPARTMENT_DERIVED_FOLDERS: List[str] = ["liveStatus-person", "collaboration-person", "rollup-department"]
+
+
+def slugify(value: str) -> str:
+    """
+    Convert a name into an AnythingLLM style workspace slug.
+
+    Args:
+        value: Name to convert (e.g. "Art & Animation")
+
+    Returns:
+        Lowercase slug (e.g. "art-animation")
+    """
+    return re.sub(r"[^a-z0-9]+", "-", value.lower()).strip("-")
+
+
+def parseShardMap(shardMap: str) -> Dict[str, str]:
+    """
+    Parse a SHARD_MAP value into a folder -> shard dictionary.
+
+    Format: "people=employmentHero-staff|entraAd-user;projects=jira-projectSummary"
+
+    Generated-document folders the map doesn't name join the shard of their
+    source folder (see DERIVED_FOLDER_SOURCES).
+
+    Args:
+        shardMap: SHARD_MAP string from the env file (empty for defaults)
+
+    Returns:
+        Dictionary mapping source folder names to shard names
+    """
+    folderShards: Dict[str, str] = {} if shardMap else dict(DEFAULT_FOLDER_SHARDS)
+    for entry in (shardMap or "").split(";"):
+        if "=" not in entry:
+            continue
+        shard, folders = entry.split("=", 1)
+        for folder in folders.split("|"):
+            if folder.strip():
+                folderShards[folder.strip()] = shard.strip()
+
+    for folder, source in DERIVED_FOLDER_SOURCES.items():
+        folderShards.setdefault(folder, folderShards.get(source, DEFAULT_SHARD))
+    return folderShards
+
+
+def personShardNames(folderShards: Dict[str, str]) -> set:
+    """
+    Folder shards holding only person-level source folders.
+
+    In department mode their files live in the department shards instead,
+    so these shards are never searched.
+
+    Args:
+        folderShards: Folder -> shard mapping
+
+    Returns:
+        Shard names
+    """
+    sources = {folder: shard for folder, shard in folderShards.items() if folder not in DERIVED_FOLDER_SOURCES}
+    return {shard for folder, shard in sources.items() if folder in PERSON_FOLDERS} - {shard for folder, shard in sources.items() if folder not in PERSON_FOLDERS}
+
+
+def shardSlug(shardPrefix: str, shard: str) -> str:
+    """
+    Build the workspace slug for a shard.
+
+    Args:
+        shardPrefix: Prefix shared by all shard workspaces (e.g. "wwiz")
+        shard: Shard name (e.g. "people")
+
+    Returns:
+        Workspace slug (e.g. "wwiz-people")
+    """
+    return slugify(f"{shardPrefix}-{shard}") if shardPrefix else slugify(shard)
+
+
+def buildDepartmentIndex(filesToUpload: Dict[str, Tuple[bytes, str]]) -> Dict[str, str]:
+    """
+    Build an ehsId -> department lookup from the HRIS staff records being uploaded.
+
+    Args:
+        filesToUpload: Dictionary of files with content and target folders
+
+    Returns:
+        Dictionary mapping ehsId to department name
+    """
+    departments: Dict[str, str] = {}
+    for filePath, (content, targetFolder) in filesToUpload.items():
+        if sourceFolderName(targetFolder) != "employmentHero-staff":
+            continue
+        try:
+            record = json.loads(content.decode("utf-8"))
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            continue
+        if record.get("ehsId") and record.get("department"):
+            departments[record["ehsId"]] = record["department"]
+    return departments
+
+
+def loadDepartmentIndex(dataPath: str) -> Dict[str, str]:
+    """
+    Build the ehsId -> department lookup from every HRIS staff record on disk.
+
+    Incremental runs only upload what changed, so the lookup has to come from
+    the whole source tree rather than the upload list.
+
+    Args:
+        dataPath: Root data folder (staff folders may be nested, e.g. per tenant)
+
+    Returns:
+        Dictionary mapping ehsId to department name
+    """
+    staffFiles: Dict[str, Tuple[bytes, str]] = {}
+    for root, dirs, files in os.walk(dataPath):
+        if sourceFolderName(root) != "employmentHero-staff":
+            continue
+        for name in files:
+            if name.endswith(".json"):
+                with open(os.path.join(root, name), "rb") as f:
+                    staffFiles[os.path.join(root, name)] = (f.read(), "employmentHero-staff")
+    return buildDepartmentIndex(staffFiles)
+
+
+def sourceFolderName(targetFolder: str) -> str:
+    """
+    Return the source folder name (last component) of a target folder path.
+
+    Args:
+        targetFolder: Relative folder path (e.g. "jira-userStats" or "tenant/jira-userStats")
+
+    Returns:
+        Source folder name, or "" for the root folder
+    """
+    return targetFolder.replace("\\", "/").split("/")[-1] if targetFolder else ""
+
+
+def shardForFile(content: bytes, targetFolder: str, sharding: str, folderShards: Dict[str, str], departments: Dict[str, str]) -> str:
+    """
+    Work out which shard a single file belongs to.
+
+    Args:
+        content: Raw file content
+        targetFolder: Folder the file is uploaded to
+        sharding: Sharding mode ("folder" or "department")
+        folderShards: Folder -> shard mapping
+        departments: ehsId -> department lookup (department mode only)
+
+    Returns:
+        Shard name
+    """
+    folder = sourceFolderName(targetFolder)
+    folderShard = folderShards.get(folder, DEFAULT_SHARD)
+
+    if sharding != "department" or (folder not in PERSON_FOLDERS and folder not in DEPARTMENT_DERIVED_FOLDERS):
+        return folderShard
+
+    try:
+        record = json.loads(content.decode("utf-8"))
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return folderShard
+
+    department = record.get("department") or departments.get(record.get("ehsId", ""))
+    return slugify(department) if department else folderShard
+
+
+def groupFilesByShard(filesToUpload: Dict[str, Tuple[bytes, str]], sharding: str, shardPrefix: str, shardMap: str = "", departments: Optional[Dict[str, str]] = None) -> Dict[str, Dict[str, Tuple[bytes, str]]]:
+    """
+    Partition the upload list into one file dictionary per shard workspace.
+
+    Args:
+        filesToUpload: Dictionary of files with content and target folders
+        sharding: Sharding mode ("folder" or "department")
+        shardPrefix: Prefix for shard workspace slugs
+        shardMap: Optional SHARD_MAP override
+        departments: ehsId -> department lookup for the whole corpus (see loadDepartmentIndex);
+            staff records in the upload list take precedence
+
+    Returns:
+        Dictionary mapping shard workspace slug to its files
+    """
+    folderShards = parseShardMap(shardMap)
+    if sharding == "department":
+        departments = {**(departments or {}), **buildDepartmentIndex(filesToUpload)}
+    else:
+        departments = {}
+
+    shards: Dict[str, Dict[str, Tuple[bytes, str]]] = {}
+    for filePath, (content, targetFolder) in filesToUpload.items():
+        shard = shardForFile(content, targetFolder, sharding, folderShards, departments)
+        shards.setdefault(shardSlug(shardPrefix, shard), {})[filePath] = (content, targetFolder)
+
+    print(f"Sharding ({sharding}): {len(filesToUpload)} files across {len(shards)} workspaces")
+    for slug, files in sorted(shards.items()):
+        print(f"  {slug}: {len(files)} files")
+
+    return shards
+
+
+def workspacesForFolder(targetFolder: str, sharding: str, shardPrefix: str, shardMap: str, workspaces: str) -> str:
+    """
+    Work out the workspaces for a file when only its folder is known.
+
+    Used for content that can't be attributed to a person (e.g. split
+    CSV exports), so department mode falls back to the folder shard.
+
+    Args:
+        targetFolder: Folder the file is uploaded to
+        sharding: Sharding mode ("off", "folder" or "department")
+        shardPrefix: Prefix for shard workspace slugs
+        shardMap: Optional SHARD_MAP override
+        workspaces: Comma-separated WORKSPACES value
+
+    Returns:
+        Comma-separated workspaces, shard workspace first
+    """
+    if sharding == "off":
+        return workspaces or ""
+
+    shard = parseShardMap(shardMap).get(sourceFolderName(targetFolder), DEFAULT_SHARD)
+    return ",".join(ws for ws in [shardSlug(shardPrefix, shard), workspaces or ""] if ws)
+
+
+def workspacesForDocument(content: bytes, targetFolder: str, sharding: str, shardPrefix: str, shardMap: str, workspaces: str, departments: Dict[str, str]) -> str:
+    """
+    Work out the workspaces for a generated document (live status, rollup, collaboration).
+
+    Documents about one person or department go to that department's shard
+    in department mode. Company-wide documents whose folder shard only exists
+    in folder mode (e.g. the company rollup) go to every department shard, so
+    the questions routed there can find them.
+
+    Args:
+        content: Document content
+        targetFolder: Folder the document is uploaded to
+        sharding: Sharding mode ("off", "folder" or "department")
+        shardPrefix: Prefix for shard workspace slugs
+        shardMap: Optional SHARD_MAP override
+        workspaces: Comma-separated WORKSPACES value
+        departments: ehsId -> department lookup (department mode)
+
+    Returns:
+        Comma-separated workspaces, shard workspaces first
+    """
+    if sharding == "off":
+        return workspaces or ""
+
+    folderShards = parseShardMap(shardMap)
+    shard = shardForFile(content, targetFolder, sharding, folderShards, departments)
+    shards = [shard]
+    if sharding == "department" and shard in personShardNames(folderShards):
+        shards = sorted({slugify(department) for department in departments.values()}) or shards
+    return ",".join(ws for ws in [shardSlug(shardPrefix, shard) for shard in shards] + [workspaces or ""] if ws)
+
+
+def ensureShardWorkspaces(shardSlugs: List[str], serverUrl: str, apiKey: str) -> None:
+    """
+    Create any shard workspaces that don't exist yet.
+
+    Args:
+        shardSlugs: Workspace slugs to make sure exist
+        serverUrl: AnythingLLM server URL
+        apiKey: API key for authentication
+    """
+    headers = {'Authorization': f"Bearer {apiKey}", 'Content-Type': 'application/json'}
+
+    for slug in shardSlugs:
+        try:
+            response = requests.get(f"{serverUrl}/api/v1/workspace/{slug}", headers=headers)
+            workspace = response.json().get("workspace") if response.status_code == 200 else None
+            if workspace:
+                continue
+
+            response = requests.post(f"{serverUrl}/api/v1/workspace/new", headers=headers, json={"name": slug})
+            if response.status_code == 200:
+                print(f"Created shard workspace: {slug}")
+            else:
+                print(f"Failed to create shard workspace {slug}: {response.status_code} - {response.text}")
+
+        except Exception as e:
+            print(f"Error checking shard workspace {slug}: {str(e)}")
+
+
+def routeQuestion(question: str, sharding: str, shardPrefix: str, shardMap: str = "", departments: List[str] = None, maxShards: int = 2) -> List[str]:
+    """
+    Pick the shard workspace(s) to search for a chat question.
+
+    Scores every shard by keyword hits in the question and returns the
+    best scoring shards. In department mode a named department wins outright
+    (any word of its name that no other department or shard keyword uses
+    counts), and a person-level topic goes to department shards, largest
+    first. Falls back to the default shard when nothing matches. Never
+    returns more than maxShards workspaces.
+
+    Args:
+        question: User's chat question
+        sharding: Sharding mode ("folder" or "department")
+        shardPrefix: Prefix for shard workspace slugs
+        shardMap: Optional SHARD_MAP override
+        departments: Department names available as shards, largest first (department mode)
+        maxShards: Maximum number of shards to search
+
+    Returns:
+        List of workspace slugs, best match first
+    """
+    words = re.findall(r"[a-z0-9]+", question.lower())
+    wordSet = set(words)
+    folderMap = parseShardMap(shardMap)
+    folderShards = sorted(set(folderMap.values()))
+
+    # In department mode person-level folders live in the department shards, so
+    # only the shards of the other folders exist as folder shards
+    departmentShards: List[str] = []
+    personShards: set = set()
+    if sharding == "department" and departments:
+        named = namedDepartments(wordSet, departments)
+        if named:
+            return [shardSlug(shardPrefix, slugify(d)) for d in named[:maxShards]]
+        departmentShards = [shardSlug(shardPrefix, slugify(d)) for d in departments]
+        personShards = personShardNames(folderMap)
+
+    scores: Dict[str, int] = {}
+    for shard in folderShards:
+        keywords = SHARD_KEYWORDS.get(shard, [shard])
+        score = sum(1 for word in words if word in keywords)
+        if score:
+            scores[shard] = score
+
+    if scores:
+        ranked = [shard for shard, score in sorted(scores.items(), key=lambda item: (-item[1], item[0] in personShards, item[0]))]
+        if ranked[0] in personShards:
+            # A person-level topic could be in any department - spend the rest of the budget on the next largest
+            ranked += [ranked[0]] * maxShards
+    else:
+        ranked = [DEFAULT_SHARD] + [shard for shard in folderShards if shard != DEFAULT_SHARD and shard not in personShards]
+
+    slugs: List[str] = []
+    remainingDepartments = iter(departmentShards)
+    for shard in ranked:
+        if len(slugs) >= maxShards:
+            break
+        slug = next(remainingDepartments, None) if shard in personShards else shardSlug(shardPrefix, shard)
+        if slug and slug not in slugs:
+            slugs.append(slug)
+    return slugs
+
+
+def namedDepartments(wordSet: set, departments: List[str]) -> List[str]:
+    """
+    Find the departments a question names.
+
+    A department is named by its full name or by any distinctive word of it:
+    one no other department shares that isn't a filler word or a shard
+    keyword ("Art" names "Art & Animation", "game" alone doesn't name
+    "Game Design").
+
+    Args:
+        wordSet: Lowercase words of the question
+        departments: Department names
+
+    Returns:
+        Named departments, in the order given
+    """
+    nameWords = {department: set(re.findall(r"[a-z0-9]+", department.lower())) - DEPARTMENT_FILLER_WORDS for department in departments}
+    wordCounts = Counter(word for words in nameWords.values() for word in words)
+    keywords = {keyword for shardKeywords in SHARD_KEYWORDS.values() for keyword in shardKeywords}
+    return [department for department, words in nameWords.items()
+            if words and (words <= wordSet or any(word in wordSet and wordCounts[word] == 1 and word not in keywords for word in words))]
@@ -6,9 +6,14 @@ Creates realistic employee data across all data types for 50 employees.
 
 import json
 import os
+import sys
 from datetime import datetime, timedelta
 import random
 
+# Profiling hooks are shared with the import scripts
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "dataImport"))
+from profiling import profilerFromArgs
+
 # Company structure for Full Metal Productions
 COMPANY_NAME = "Full Metal Productions"
 COMPANY_DOMAIN = "fullmetalproductions.com"
@@ -762,16 +767,20 @@ def generate_confluence_spaces():
             json.dump(space_data, f, indent=2)
 
 if __name__ == "__main__":
+    profiler = profilerFromArgs(sys.argv, "generate_test_data")
     print("Generating test data for Full Metal Productions...")
     print(f"Creating data for {len(EMPLOYEES)} employees...")
     
-    generate_employee_data()
+    with profiler.phase("employees"):
+        generate_employee_data()
     print("✅ Employee data generated")
     
-    generate_project_data()
+    with profiler.phase("projects"):
+        generate_project_data()
     print("✅ Project data generated")
     
-    generate_confluence_spaces()
+    with profiler.phase("confluence-spaces"):
+        generate_confluence_spaces()
     print("✅ Confluence spaces generated")
     
     print("\n🎉 All test data generated successfully!")
@@ -788,3 +797,5 @@ if __name__ == "__main__":
     print("   • CAL001-CAL052: calendar-availabilitySummary/")
     print("   • TMS001-TMS052: teams-userActivitySummary/")
     print("   • SLK001-SLK052: slack-userActivitySummary/")
+    
+    profiler.finish()